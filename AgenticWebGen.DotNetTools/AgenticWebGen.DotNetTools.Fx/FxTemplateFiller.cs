@@ -77,12 +77,22 @@ namespace AgenticWebGen.Fx
                 htmlTemplate = htmlTemplate.Replace($"{{{{{kvp.Key}}}}}", kvp.Value);
             }
 
-            //Upload the filled template
-            string timestamp = DateTime.UtcNow.ToString("yyyyMMddHHmmss");
-            string outputBlobName = $"filled_template_{timestamp}.html";
+            //Upload the filled template, named by the SHA-256 of its content so concurrent
+            //requests never overwrite each other and identical cards are stored once
+            byte[] htmlBytes = System.Text.Encoding.UTF8.GetBytes(htmlTemplate);
+            string contentHash = Convert.ToHexString(System.Security.Cryptography.SHA256.HashData(htmlBytes)).ToLowerInvariant();
+            string outputBlobName = $"filled_template_{contentHash}.html";
             var cardsContainerClient = blobServiceClient.GetBlobContainerClient(cardsContainerName);
             var outputBlobClient = cardsContainerClient.GetBlobClient(outputBlobName);
-            using var uploadStream = new MemoryStream(System.Text.Encoding.UTF8.GetBytes(htmlTemplate));
+            if (await outputBlobClient.ExistsAsync())
+            {
+                _logger.LogInformation("Identical card already published: {OutputBlobName}", outputBlobName);
+                return new OkObjectResult(new
+                {
+                    url = outputBlobClient.Uri.ToString()
+                });
+            }
+            using var uploadStream = new MemoryStream(htmlBytes);
             var headers = new BlobHttpHeaders { ContentType = "text/html" };
 
             // Asegrate de que el stream est en la posicin 0
@@ -6,6 +6,7 @@ using Microsoft.Azure.Functions.Worker;
 using Microsoft.Extensions.Logging;
 using System;
 using System.IO;
+using System.Security.Cryptography;
 using System.Text;
 using System.Threading.Tasks;
 
@@ -32,9 +33,18 @@ public class FxReportUploader
             return new BadRequestObjectResult("Request body cannot be empty. Please provide HTML content.");
         }
 
+        // A text/css body is the shared report stylesheet, referenced by the reports
+        // instead of inlining the template CSS; it never changes under its name, so
+        // browsers may cache it indefinitely
+        bool isStylesheet = req.ContentType?.StartsWith("text/css", StringComparison.OrdinalIgnoreCase) == true;
+
         // Configure Blob Storage settings
+        // The blob is named by the SHA-256 of the content, so concurrent uploads never
+        // overwrite each other and identical reports are stored once
         const string containerName = "reports";
-        string blobName = $"report_{DateTime.UtcNow.ToString("yyyyMMddHHmmss")}.html";
+        byte[] htmlBytes = Encoding.UTF8.GetBytes(htmlContent);
+        string contentHash = Convert.ToHexString(SHA256.HashData(htmlBytes)).ToLowerInvariant();
+        string blobName = isStylesheet ? $"styles_{contentHash}.css" : $"report_{contentHash}.html";
 
         try
         {
@@ -56,13 +66,20 @@ public class FxReportUploader
             await containerClient.CreateIfNotExistsAsync(PublicAccessType.Blob);
 
             var blobClient = containerClient.GetBlobClient(blobName);
+            if (await blobClient.ExistsAsync())
+            {
+                _logger.LogInformation($"Identical report already uploaded as {blobName}");
+                return new OkObjectResult(new { url = blobClient.Uri.ToString() });
+            }
             
             // Upload HTML content with appropriate content type
-            using var stream = new MemoryStream(Encoding.UTF8.GetBytes(htmlContent));
+            using var stream = new MemoryStream(htmlBytes);
             await blobClient.UploadAsync(stream, overwrite: true);
             
-            // Set content type to text/html to make it browser-viewable
-            await blobClient.SetHttpHeadersAsync(new BlobHttpHeaders { ContentType = "text/html" });
+            // Set the content type so browsers render the report or apply the stylesheet
+            await blobClient.SetHttpHeadersAsync(isStylesheet
+                ? new BlobHttpHeaders { ContentType = "text/css", CacheControl = "public, max-age=31536000, immutable" }
+                : new BlobHttpHeaders { ContentType = "text/html" });
             
             _logger.LogInformation($"HTML content uploaded to {blobName}");
             
@@ -17,7 +17,9 @@ How does this script work?
 --------------------------
 - It connects to Azure AI Foundry using your credentials and project endpoint.
 - It checks if a business card generator agent already exists; if not, it creates one.
-- The agent is configured to always return a JSON object with business card details.
+- The agent is configured to always return a JSON object with business card details: its response format
+  is a JSON schema of the card contract (all six fields required, no other property), and every reply is
+  still validated locally before it is published.
 - You can access the agent and the client from other scripts using the `AgentModule` class.
 
 How to use this script?
@@ -38,8 +40,13 @@ Dependencies:
 
 import os
 from azure.ai.agents import AgentsClient
+from azure.ai.agents.models import ResponseFormatJsonSchema, ResponseFormatJsonSchemaType
 from azure.identity import DefaultAzureCredential
 from dotenv import load_dotenv
+from tools.fake_agents_client import fake_client_enabled, get_fake_agents_client
+from tools.session_cassette import get_replay_agents_client, record_session, replay_enabled
+from tools.tracing import span
+from tools.card_contract import card_json_schema
 
 # Global variables to store instances of the agent and client
 _card_generator_agent = None
@@ -56,10 +63,18 @@ def _get_agents_client():
     global _agents_client
     if _agents_client is None:
         load_dotenv()  # Load environment variables from .env file
-        _agents_client = AgentsClient(
-            endpoint=os.environ.get("PROJECT_ENDPOINT"),
-            credential=DefaultAzureCredential()
-        )
+        with span("client.init"):
+            if fake_client_enabled():
+                # Offline mode: scripted runs instead of the Foundry project
+                _agents_client = get_fake_agents_client()
+            elif replay_enabled():
+                # Offline mode: the runs of a recorded session
+                _agents_client = get_replay_agents_client()
+            else:
+                _agents_client = record_session(AgentsClient(
+                    endpoint=os.environ.get("PROJECT_ENDPOINT"),
+                    credential=DefaultAzureCredential()
+                ))
     return _agents_client
 
 
@@ -79,13 +94,6 @@ def _create_card_generator_agent():
     client = _get_agents_client()
     agent_name = "ag-card-generator"
 
-    # Check if agent already exists in the Foundry project
-    agents = list(client.list_agents())
-    for agent in agents:
-        if agent.name == agent_name:
-            _card_generator_agent = agent
-            return _card_generator_agent
-
     # Instructions for the agent: always return a JSON object with card details
     instructions = """You are a creative data generator for professional business cards. 
 When asked to generate card data, return ONLY a valid JSON object with exactly these 6 fields:
@@ -109,12 +117,34 @@ Example format:
   "date": "2024-01-15"
 }"""
 
+    # Response format: the card contract's JSON schema guides the reply (it is validated locally as well)
+    response_format = ResponseFormatJsonSchemaType(
+        json_schema=ResponseFormatJsonSchema(
+            name="business_card",
+            description="Business card data for the HTML template filler",
+            schema=card_json_schema(),
+        )
+    )
+
+    # Check if agent already exists in the Foundry project
+    with span("agent.resolve", agent=agent_name):
+        existing_agent = next((a for a in client.list_agents() if a.name == agent_name), None)
+    if existing_agent:
+        # Update instructions and response format on existing agent
+        _card_generator_agent = client.update_agent(
+            agent_id=existing_agent.id,
+            instructions=instructions,
+            response_format=response_format
+        )
+        return _card_generator_agent
+
     # Create the agent in Azure AI Foundry
     _card_generator_agent = client.create_agent(
         model=os.environ.get("MODEL_DEPLOYMENT_NAME"),
         name=agent_name,
         description="Generates creative business card data in JSON format",
-        instructions=instructions
+        instructions=instructions,
+        response_format=response_format
     )
     return _card_generator_agent
 
@@ -4,6 +4,8 @@ import json
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from agents.ag_card_generator import ag_card_generator
+from tools.run_helper import run_agent
+from tools.card_contract import parse_card, validation_stats
 
 def test_card_generator():
     """Test the card generator agent."""
@@ -17,36 +19,22 @@ def test_card_generator():
     if not user_prompt:
         user_prompt = "Generate a business card for someone called Walter"
     
-    # 🎯 Create conversation and run
-    thread = agents_client.threads.create()
-    
-    agents_client.messages.create(
-        thread_id=thread.id,
-        role="user",
-        content=user_prompt
-    )
-    
-    # Start the agent run
-    run = agents_client.runs.create_and_process(
-        thread_id=thread.id,
-        agent_id=agent.id
-    )
+    # 🎯 Create conversation, run and fetch the reply
+    result = run_agent(agents_client, agent, user_prompt)
     
     # Check results
-    if run.status == "completed":
-        messages = agents_client.messages.list(thread_id=thread.id)
-        messages_list = list(messages)  # Convert to list first
-        
-        for msg in reversed(messages_list):  # Now we can reverse
-            if msg.role == "assistant":
-                # Extract the actual text content from the message
-                if hasattr(msg.content, '__iter__') and len(msg.content) > 0:
-                    response = msg.content[0].text.value
-                else:
-                    response = str(msg.content)
-                
-                print(response)
-                break
+    if result.completed:
+        print(result.text)
+        # Validate locally before the card is published
+        card, errors = parse_card(result.text)
+        if card is None:
+            print(f"❌ Invalid card: {'; '.join(errors)}")
+        else:
+            print(f"✅ Valid card for {card['name']}")
+        stats = validation_stats()
+        checked = sum(stats.values())
+        print(f"📊 {checked} replies checked: {stats.get('rejected', 0)} rejected, "
+              f"{stats.get('repaired', 0)} repaired locally (retries saved)")
 
 if __name__ == "__main__":
     test_card_generator()
\ No newline at end of file
@@ -4,7 +4,12 @@ import json
 from azure.ai.agents import AgentsClient
 from azure.identity import DefaultAzureCredential
 from dotenv import load_dotenv
+from tools.fake_agents_client import fake_client_enabled, get_fake_agents_client
+from tools.session_cassette import get_replay_agents_client, record_session, replay_enabled
+from tools.tracing import span
 from tools.template_loader import load_html_template
+from tools.sql_querier import query_database
+from tools.drilldown_cube import build_drilldown_cube
 
 # Global variables to store instances
 _report_builder_agent = None
@@ -15,10 +20,18 @@ def _get_agents_client():
     global _agents_client
     if _agents_client is None:
         load_dotenv()
-        _agents_client = AgentsClient(
-            endpoint=os.environ.get("PROJECT_ENDPOINT"),
-            credential=DefaultAzureCredential()
-        )
+        with span("client.init"):
+            if fake_client_enabled():
+                # Offline mode: scripted runs instead of the Foundry project
+                _agents_client = get_fake_agents_client()
+            elif replay_enabled():
+                # Offline mode: the runs of a recorded session
+                _agents_client = get_replay_agents_client()
+            else:
+                _agents_client = record_session(AgentsClient(
+                    endpoint=os.environ.get("PROJECT_ENDPOINT"),
+                    credential=DefaultAzureCredential()
+                ))
     return _agents_client
 
 
@@ -50,6 +63,48 @@ def _create_report_builder_agent():
         }
     }
 
+    query_database_tool = {
+        "type": "function",
+        "function": {
+            "name": "query_database",
+            "description": "Run a read-only T-SQL query on the sales database (dbo.Products, dbo.Sales, dbo.SaleItems). Small results come back whole; large ones as column statistics, the first rows and a random sample, so aggregate in SQL for exact figures",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "sql": {
+                        "type": "string",
+                        "description": "T-SQL SELECT query to run, with ? placeholders for parameters"
+                    },
+                    "parameters": {
+                        "type": "array",
+                        "items": {"type": ["string", "number", "boolean", "null"]},
+                        "description": "Values of the ? placeholders, in order"
+                    }
+                },
+                "required": ["sql"]
+            }
+        }
+    }
+
+    drilldown_cube_tool = {
+        "type": "function",
+        "function": {
+            "name": "build_drilldown_cube",
+            "description": "Pre-aggregate sales by date, product and promotion into an interactive drill-down that is embedded in the report. Returns totals, top members and a placeholder comment to insert where the drill-down belongs",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "date_grain": {
+                        "type": "string",
+                        "enum": ["day", "week", "month"],
+                        "description": "Granularity of the date level (defaults to 'day')"
+                    }
+                },
+                "required": []
+            }
+        }
+    }
+
     # Agent instructions 
     instructions = """You are an intelligent report builder that creates comprehensive data visualizations and reports from JSON datasets.
 
@@ -60,6 +115,8 @@ In that HTML you will find a placeholder for the report title and a section to i
 Learn the structure of the HTML template: its styling and where to inject content into it.
 
 2. Now is the time for Dataset Analysis: You will receive a dataset in JSON format. Analyze the structure, data types, relationships, and patterns within the data to understand what information it contains.
+If you are asked about data that is not in the message, use the query_database tool to fetch it. Prefer aggregated queries (GROUP BY, SUM, COUNT, TOP) over fetching raw rows: large results are summarized and truncated.
+If you are asked for a drill-down of sales by date, product or promotion, call build_drilldown_cube once and put the placeholder comment it returns, exactly as returned, where the drill-down belongs: it is replaced with an interactive drill-down after your reply, so do not build that table or chart yourself. Use the totals and top members it returns for your narrative.
 3. Report Format Decision: Based on the dataset structure and content, decide the best way to present the information:
     Graphic/Chart: Use when data shows trends, comparisons, distributions, or relationships (line charts, bar charts, pie charts, scatter plots, etc.)
 
@@ -73,7 +130,7 @@ HTML Report Generation: Using the obtained HTML template, create a complete HTML
         Replace "Report Title Placeholder" with an appropriate, descriptive title for your report
         Inject your report content (table, chart, or formatted text) inside the report-container section
         Preserve all existing template styling and structure
-        Add any additional CSS styles needed for your report within the existing <style> tags
+        Add any additional CSS styles needed for your report within the existing <style> tags, or in a new <style> block after the stylesheet <link> if the template links its styles instead; keep that <link> unchanged
         If you need JavaScript for charts, add <script> tags before the closing </body> tag
         For graphics, you may reference external JavaScript libraries like Chart.js, D3.js, or Plotly.js via CDN by adding script tags to the <head> section
         Ensure the final HTML is well-formed, responsive, and visually appealing
@@ -86,13 +143,14 @@ HTML Report Generation: Using the obtained HTML template, create a complete HTML
         Important: Your response should be the complete, modified HTML template with your report content injected and the title updated. The entire HTML document should be ready to save and open in a browser."""
 
     # Check if agent already exists
-    existing_agent = next((a for a in client.list_agents() if a.name == agent_name), None)
+    with span("agent.resolve", agent=agent_name):
+        existing_agent = next((a for a in client.list_agents() if a.name == agent_name), None)
     if existing_agent:
         # Update tools and instructions on existing agent
         _report_builder_agent = client.update_agent(
             agent_id=existing_agent.id,
             instructions=instructions,
-            tools=[load_template_tool]
+            tools=[load_template_tool, query_database_tool, drilldown_cube_tool]
         )
     else:
         # Create new agent
@@ -101,12 +159,12 @@ HTML Report Generation: Using the obtained HTML template, create a complete HTML
             name=agent_name,
             description="Builds HTML reports from JSON datasets using templates",
             instructions=instructions,
-            tools=[load_template_tool]
+            tools=[load_template_tool, query_database_tool, drilldown_cube_tool]
         )
 
     # Enable auto function calls using the client's method
     # Pass a set of callables for automatic tool execution
-    client.enable_auto_function_calls({load_html_template})
+    client.enable_auto_function_calls({load_html_template, query_database, build_drilldown_cube})
     return _report_builder_agent
 
 
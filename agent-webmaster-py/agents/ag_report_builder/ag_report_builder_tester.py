@@ -5,14 +5,24 @@ import json
 import time
 import webbrowser
 import tempfile
-import uuid
 from datetime import datetime
 
 # Ensure current directory is on Python path
 script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, script_dir)
+sys.path.append(os.path.dirname(os.path.dirname(script_dir)))
 
 from ag_report_builder import AgentModule
+from tools.run_helper import AgentRunResult, format_timings, run_agent
+from tools.model_router import record_routing, route_request, routing_enabled
+from tools.thread_reaper import ThreadLedger
+from tools.drilldown_cube import embed_drilldowns
+from tools.artifact_store import get_artifact_store
+from tools.html_optimizer import minification_enabled, optimize_html
+from tools.report_stylesheet import link_stylesheet, shared_stylesheet
+from tools.report_fanout import fanout_enabled, generate_report_fanout
+from tools.report_history import FULL, UNCHANGED, incremental_enabled, make_report_id, regenerate_report
+from tools.tracing import span
 
 class ReportTester:
     def __init__(self):
@@ -21,6 +31,9 @@ class ReportTester:
         self.client = self.agent_module.client
         self.agent = self.agent_module.instance
         self.generated_reports = []  # Track generated reports for easy access
+        self.thread_ledger = ThreadLedger()  # Track threads so the reaper can delete them
+        self.use_cache = "--no-cache" not in sys.argv  # Reuse reports of identical requests
+        self.artifact_store = get_artifact_store()  # Reports are saved under their content hash
         
     def get_sample_datasets(self):
         """Return a dictionary of sample datasets for different report types."""
@@ -218,104 +231,169 @@ class ReportTester:
         print(f"📝 Description: {dataset_info['description']}")
         print("─" * 60)
         
-        # Prepare the prompt with data
-        full_prompt = f"{dataset_info['prompt']}\n\nDataset:\n{json.dumps(dataset_info['data'], indent=2)}"
-        
-        try:
-            # Create thread and send message
-            thread = self.client.threads.create()
-            self.client.messages.create(
-                thread_id=thread.id, 
-                role="user", 
-                content=full_prompt
-            )
-            
-            print("⏳ Generating report... This may take a moment.")
-            print("🔄 The agent is analyzing data and creating visualizations...")
-            
-            # Start the run
-            start_time = time.time()
-            run = self.client.runs.create_and_process(
-                thread_id=thread.id, 
-                agent_id=self.agent.id
-            )
+        # Trace the whole generation, including writing the file, as one trace
+        with span("report.generate", dataset=dataset_info['name']):
+            try:
+                print("⏳ Generating report... This may take a moment.")
+                print("🔄 The agent is analyzing data and creating visualizations...")
             
-            generation_time = time.time() - start_time
+                # Multi-section datasets are generated with one concurrent run per section when fan-out is enabled,
+                # and only the sections whose data changed since the last report when incremental mode is enabled
+                fanout = None
+                if incremental_enabled():
+                    fanout = regenerate_report(
+                        self.client,
+                        self.agent,
+                        make_report_id(dataset_info['name'], dataset_info['prompt'], dataset_info['data']),
+                        dataset_info['prompt'],
+                        dataset_info['data'],
+                        dataset_info['name'],
+                        ledger=self.thread_ledger,
+                        use_cache=self.use_cache
+                    )
+                elif fanout_enabled():
+                    fanout = generate_report_fanout(
+                        self.client,
+                        self.agent,
+                        dataset_info['prompt'],
+                        dataset_info['data'],
+                        dataset_info['name'],
+                        ledger=self.thread_ledger,
+                        use_cache=self.use_cache
+                    )
+                reused_all = False
+                if fanout is not None and fanout.completed:
+                    mode = getattr(fanout, "mode", None)
+                    reused_all = mode == UNCHANGED
+                    if mode == FULL:
+                        print(f"🔁 Full regeneration: {'; '.join(fanout.reasons) or 'every section changed'}")
+                    elif reused_all:
+                        print(f"♻️  No data changed since the last report: all {len(fanout.reused)} sections reused")
+                    elif mode:
+                        print(f"♻️  Incremental regeneration ({fanout.diff.changed_ratio:.0%} of the data changed): "
+                              f"{len(fanout.reused)} sections reused, {len(fanout.patched)} tables updated locally")
+                    if fanout.sections:
+                        print(f"🧩 {len(fanout.sections)} sections generated in parallel "
+                              f"({fanout.run_seconds:.1f}s of runs in {fanout.wall_seconds:.1f}s)")
+                    for section in fanout.sections:
+                        outcome = "cached" if section.result.cached else f"{section.result.timings.get('total', 0):.1f}s"
+                        tier = f" ({section.decision.tier} model)" if section.decision else ""
+                        print(f"   {'✅' if section.fragment else '❌'} {section.name}: {outcome}{tier}")
+                    result = AgentRunResult(
+                        status="completed",
+                        text=fanout.html,
+                        timings={"sections": fanout.run_seconds, "total": fanout.wall_seconds},
+                        cached=bool(fanout.sections) and all(section.result.cached for section in fanout.sections)
+                    )
+                else:
+                    if fanout is not None:
+                        print("⚠️  No section could be generated, generating the report in a single run")
+                    # Simple datasets run on the fast model deployment when routing is enabled
+                    # (section runs are routed one by one on their own data)
+                    decision = route_request(dataset_info['prompt'], dataset_info['data']) if routing_enabled() else None
+                    if decision:
+                        print(f"🧭 Routed to the {decision.tier} model ({decision.model or 'agent model'}): "
+                              f"{'; '.join(decision.reasons)}")
+                    # Reuse a cached report, or create thread with the message, run and fetch only the newest reply
+                    result = run_agent(
+                        self.client,
+                        self.agent,
+                        dataset_info['prompt'],
+                        ledger=self.thread_ledger,
+                        dataset=dataset_info['data'],
+                        use_cache=self.use_cache,
+                        model=decision.model if decision else None
+                    )
+                    if decision:
+                        record_routing(decision, result, getattr(self.agent, "name", None))
+                generation_time = result.timings["total"]
             
-            if run.status == "completed":
-                print(f"✅ Report generated successfully in {generation_time:.1f} seconds!")
-                print("─" * 60)
+                if result.completed and result.text is not None:
+                    if result.cached:
+                        print(f"⚡ Report served from cache in {generation_time * 1000:.0f} ms!")
+                    elif reused_all:
+                        print(f"♻️  Report rebuilt from the stored sections in {generation_time * 1000:.0f} ms!")
+                    else:
+                        print(f"✅ Report generated successfully in {generation_time:.1f} seconds!")
+                    print(f"⏱️  {format_timings(result.timings)}")
+                    print("─" * 60)
                 
-                # Get the assistant's response
-                for msg in reversed(list(self.client.messages.list(thread_id=thread.id))):
-                    if msg.role == "assistant":
-                        html_content = msg.content[0].text.value if hasattr(msg.content[0], "text") else str(msg.content)
-                        
-                        # Generate a unique filename with timestamp and random ID
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        random_id = str(uuid.uuid4())[:8]  # First 8 characters of UUID
-                        filename = f"report_{timestamp}_{random_id}.html"
+                    # Replace drill-down placeholders with the embedded cube and its widget
+                    html_content = embed_drilldowns(result.text)
+                    shared = shared_stylesheet()
+                    if shared:
+                        css, url = shared
+                        html_content, moved = link_stylesheet(html_content, url, css)
+                        if moved:
+                            print(f"🎨 {moved} template CSS rules replaced by the shared stylesheet")
+                    if minification_enabled():
+                        optimized = optimize_html(html_content)
+                        html_content = optimized.html
+                        print(f"🗜️  Minified: {optimized.describe()}")
+                
+                    try:
+                        # Save to the artifact store: identical reports share one file
+                        with span("report.write", bytes=len(html_content)):
+                            artifact = self.artifact_store.put(html_content, kind="report", label=dataset_info['name'])
+                        file_path = artifact.path
+                        filename = os.path.basename(file_path)
+                    
+                        # Track the generated report
+                        report_info = {
+                            "filename": filename,
+                            "path": file_path,
+                            "timestamp": datetime.now(),
+                            "dataset_name": dataset_info['name']
+                        }
+                        self.generated_reports.append(report_info)
+                    
+                        if artifact.deduplicated:
+                            print(f"♻️  Identical report already stored as: {filename}")
+                        else:
+                            print(f"💾 Report saved as: {filename}")
+                        print(f"📁 Full path: {file_path}")
+                    
+                        # Open in default browser
+                        try:
+                            print("🌐 Opening report in your default browser...")
+                            webbrowser.open(f'file://{file_path}')
+                            print("✨ Report opened successfully!")
+                        except Exception as browser_error:
+                            print(f"⚠️  Could not open browser automatically: {browser_error}")
+                            print(f"🌐 Please manually open: {file_path}")
                         
+                    except Exception as e:
+                        # Fallback: Save to temp directory and try to open
+                        print(f"⚠️  Could not save to the artifact store: {e}")
                         try:
-                            # Save to file
-                            file_path = os.path.abspath(filename)
-                            with open(file_path, 'w', encoding='utf-8') as f:
-                                f.write(html_content)
-                            
-                            # Track the generated report
-                            report_info = {
-                                "filename": filename,
-                                "path": file_path,
-                                "timestamp": datetime.now(),
-                                "dataset_name": dataset_info['name']
-                            }
-                            self.generated_reports.append(report_info)
-                            
-                            print(f"💾 Report saved as: {filename}")
-                            print(f"📁 Full path: {file_path}")
-                            
-                            # Open in default browser
+                            # Create temp file
+                            with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as temp_file:
+                                temp_file.write(html_content)
+                                temp_path = temp_file.name
+                        
+                            print(f"💾 Report saved to temporary location: {temp_path}")
+                        
+                            # Try to open temp file
                             try:
                                 print("🌐 Opening report in your default browser...")
-                                webbrowser.open(f'file://{file_path}')
+                                webbrowser.open(f'file://{temp_path}')
                                 print("✨ Report opened successfully!")
                             except Exception as browser_error:
-                                print(f"⚠️  Could not open browser automatically: {browser_error}")
-                                print(f"🌐 Please manually open: {file_path}")
-                                
-                        except Exception as e:
-                            # Fallback: Save to temp directory and try to open
-                            print(f"⚠️  Could not save to current directory: {e}")
-                            try:
-                                # Create temp file
-                                with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as temp_file:
-                                    temp_file.write(html_content)
-                                    temp_path = temp_file.name
-                                
-                                print(f"💾 Report saved to temporary location: {temp_path}")
-                                
-                                # Try to open temp file
-                                try:
-                                    print("🌐 Opening report in your default browser...")
-                                    webbrowser.open(f'file://{temp_path}')
-                                    print("✨ Report opened successfully!")
-                                except Exception as browser_error:
-                                    print(f"⚠️  Could not open browser: {browser_error}")
-                                    print("📄 HTML Content (first 500 chars):")
-                                    print(html_content[:500] + "..." if len(html_content) > 500 else html_content)
-                                    
-                            except Exception as temp_error:
-                                print(f"❌ Could not create temp file: {temp_error}")
+                                print(f"⚠️  Could not open browser: {browser_error}")
                                 print("📄 HTML Content (first 500 chars):")
                                 print(html_content[:500] + "..." if len(html_content) > 500 else html_content)
-                        break
-            else:
-                print(f"❌ Report generation failed with status: {run.status}")
-                if getattr(run, "last_error", None):
-                    print(f"🔍 Error details: {run.last_error}")
+                            
+                        except Exception as temp_error:
+                            print(f"❌ Could not create temp file: {temp_error}")
+                            print("📄 HTML Content (first 500 chars):")
+                            print(html_content[:500] + "..." if len(html_content) > 500 else html_content)
+                else:
+                    print(f"❌ Report generation failed with status: {result.status}")
+                    if result.error:
+                        print(f"🔍 Error details: {result.error}")
                     
-        except Exception as e:
-            print(f"❌ An error occurred: {e}")
+            except Exception as e:
+                print(f"❌ An error occurred: {e}")
         
         print("\n" + "=" * 60)
         input("Press Enter to continue...")
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Pre-aggregated drill-down cube of the Sales/Promotions/Reviews schema.
+
+Every level of an interactive drill-down would otherwise need its own query and its
+own model run. This module aggregates the sale lines of ``misc/drill-down-data.sql``
+once, in a single streaming pass, into a date → product → promotion hierarchy with
+revenue, quantity and order count at every node, and embeds it in the report with a
+small script that drills down client-side without further round trips.
+
+- ``build_cube`` runs the aggregation on the SQL querier backend. A sale line belongs
+  to the promotion running on the sale date whose name or description names the
+  product (the first by id when several match), otherwise to "No promotion".
+- ``encode_cube`` packs it compactly: each dimension value is stored once in a
+  dictionary and nodes are nested arrays ``[value index, revenue, quantity, orders,
+  children]``. Holidays annotate dates and review ratings annotate products.
+- ``build_drilldown_cube`` is the agent's function tool: it stores the cube under a
+  content-derived id and returns totals and top members for the narrative plus a
+  placeholder comment to put in the report.
+- ``embed_drilldowns`` replaces the placeholders of a generated report with the
+  drill-down widget and its embedded cube.
+
+Usage:
+    python drilldown_cube.py --grain day --output drilldown_report.html
+    python drilldown_cube.py --grain month --json cube.json
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+from tools.local_state import get_state_path
+from tools.sql_querier import QueryBackend, SqliteBackend, get_query_backend
+
+LEVELS = ["date", "product", "promotion"]
+MEASURES = ["revenue", "quantity", "orders"]
+GRAINS = ("day", "week", "month")
+NO_PROMOTION = "No promotion"
+_PLACEHOLDER_PATTERN = re.compile(r"<!--\s*DRILLDOWN:([0-9a-f]{16})\s*-->")
+
+_LINES_QUERY = """SELECT s.SaleID, CAST(s.SaleDate AS DATE) AS SaleDay, p.ProductName, si.Quantity, si.LineTotal
+FROM dbo.SaleItems si
+JOIN dbo.Sales s ON s.SaleID = si.SaleID
+JOIN dbo.Products p ON p.ProductID = si.ProductID"""
+_PROMOTIONS_QUERY = "SELECT PromotionID, Name, Description, StartDate, EndDate FROM dbo.Promotions ORDER BY PromotionID"
+_HOLIDAYS_QUERY = "SELECT HolidayDate, Description FROM dbo.HolidayCalendar"
+_REVIEWS_QUERY = """SELECT p.ProductName, AVG(CAST(r.Rating AS FLOAT)) AS Rating, COUNT(*) AS Reviews
+FROM dbo.Reviews r JOIN dbo.Products p ON p.ProductID = r.ProductID
+GROUP BY p.ProductName"""
+
+
+def _rows(backend: QueryBackend, sql: str) -> List[Sequence[Any]]:
+    """Fetch a small lookup table, or nothing if the schema does not have it."""
+    try:
+        _, rows = backend.execute(sql)
+        return list(rows)
+    except Exception:
+        return []
+
+
+def _day(value: Any) -> str:
+    return str(value)[:10]
+
+
+def _bucket(day: str, grain: str) -> str:
+    if grain == "month":
+        return day[:7]
+    if grain == "week":
+        year, week, _ = date.fromisoformat(day).isocalendar()
+        return f"{year}-W{week:02d}"
+    return day
+
+
+class _Node:
+    __slots__ = ("revenue", "quantity", "orders", "children")
+
+    def __init__(self):
+        self.revenue = 0.0
+        self.quantity = 0
+        self.orders = set()
+        self.children: Dict[str, "_Node"] = {}
+
+    def add(self, sale_id: Any, quantity: int, revenue: float) -> None:
+        self.revenue += revenue
+        self.quantity += quantity
+        self.orders.add(sale_id)
+
+
+def build_cube(backend: Optional[QueryBackend] = None, grain: str = "day") -> Dict[str, Any]:
+    """
+    Aggregate the sale lines into the date → product → promotion hierarchy.
+
+    Args:
+        backend: Database to read, the SQL querier backend by default
+        grain: Date level granularity, ``day``, ``week`` (ISO) or ``month``
+
+    Returns:
+        The cube as nested dictionaries (see ``encode_cube`` for the embedded form)
+    """
+    if grain not in GRAINS:
+        raise ValueError(f"Unknown date grain '{grain}' (expected {', '.join(GRAINS)})")
+    backend = backend or get_query_backend()
+    promotions = [
+        (name, f"{name} {description or ''}".casefold(), _day(start), _day(end))
+        for _, name, description, start, end in _rows(backend, _PROMOTIONS_QUERY)
+    ]
+    holidays: Dict[str, List[str]] = defaultdict(list)
+    for holiday, description in _rows(backend, _HOLIDAYS_QUERY):
+        holidays[_bucket(_day(holiday), grain)].append(description)
+    ratings = {name: [round(rating, 2), count] for name, rating, count in _rows(backend, _REVIEWS_QUERY)}
+
+    matches: Dict[tuple, str] = {}
+    root = _Node()
+    _, lines = backend.execute(_LINES_QUERY)
+    for sale_id, sale_day, product, quantity, line_total in lines:
+        day = _day(sale_day)
+        if (day, product) not in matches:
+            matches[(day, product)] = next(
+                (name for name, text, start, end in promotions if start <= day <= end and product.casefold() in text),
+                NO_PROMOTION,
+            )
+        revenue = float(line_total)
+        node = root
+        node.add(sale_id, quantity, revenue)
+        for key in (_bucket(day, grain), product, matches[(day, product)]):
+            node = node.children.setdefault(key, _Node())
+            node.add(sale_id, quantity, revenue)
+
+    def plain(node: _Node) -> Dict[str, Any]:
+        result: Dict[str, Any] = {
+            "revenue": round(node.revenue, 2),
+            "quantity": node.quantity,
+            "orders": len(node.orders),
+        }
+        if node.children:
+            result["children"] = {key: plain(child) for key, child in sorted(node.children.items())}
+        return result
+
+    cube = plain(root)
+    cube.update({
+        "grain": grain,
+        "holidays": {key: "; ".join(values) for key, values in holidays.items()},
+        "ratings": ratings,
+    })
+    return cube
+
+
+def encode_cube(cube: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pack a cube into the compact embedded form.
+
+    Returns:
+        Dictionary with ``levels``, ``measures``, ``dims`` (one value dictionary per
+        level), ``notes`` (holiday by date index, [rating, reviews] by product index)
+        and ``root``, the nested ``[index, revenue, quantity, orders, children]`` nodes
+        (the root's index is null and leaves have no children)
+    """
+    dims: Dict[str, List[str]] = {level: [] for level in LEVELS}
+    indexes: Dict[str, Dict[str, int]] = {level: {} for level in LEVELS}
+
+    def index(level: str, key: str) -> int:
+        if key not in indexes[level]:
+            indexes[level][key] = len(dims[level])
+            dims[level].append(key)
+        return indexes[level][key]
+
+    def pack(node: Dict[str, Any], depth: int) -> List[Any]:
+        packed: List[Any] = [node["revenue"], node["quantity"], node["orders"]]
+        children = node.get("children")
+        if children:
+            ordered = sorted(children.items(), key=lambda item: -item[1]["revenue"]) if depth else children.items()
+            packed.append([[index(LEVELS[depth], key)] + pack(child, depth + 1) for key, child in ordered])
+        return packed
+
+    root = [None] + pack(cube, 0)
+    notes = {
+        "date": {indexes["date"][key]: text for key, text in cube.get("holidays", {}).items() if key in indexes["date"]},
+        "product": {indexes["product"][key]: value for key, value in cube.get("ratings", {}).items()
+                    if key in indexes["product"]},
+    }
+    return {"v": 1, "grain": cube.get("grain"), "levels": LEVELS, "measures": MEASURES,
+            "dims": dims, "notes": notes, "root": root}
+
+
+def cube_id(encoded: Dict[str, Any]) -> str:
+    """Derive the id of an encoded cube from its content."""
+    canonical = json.dumps(encoded, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def _cube_path(identifier: str) -> str:
+    return get_state_path(os.path.join("drilldown", f"{identifier}.json"))
+
+
+def save_cube(encoded: Dict[str, Any]) -> str:
+    """Store an encoded cube for ``embed_drilldowns``; returns its id."""
+    identifier = cube_id(encoded)
+    os.makedirs(os.path.dirname(_cube_path(identifier)), exist_ok=True)
+    with open(_cube_path(identifier), "w", encoding="utf-8") as f:
+        json.dump(encoded, f, separators=(",", ":"))
+    return identifier
+
+
+def load_cube(identifier: str) -> Optional[Dict[str, Any]]:
+    """Load a stored cube, or None if there is none with this id."""
+    try:
+        with open(_cube_path(identifier), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+_WIDGET_STYLE = """<style>
+.drilldown{font-size:.95rem}.drilldown nav{margin:0 0 .75rem;display:block}
+.drilldown nav a{color:var(--brand,#0052cc);cursor:pointer;text-decoration:none}
+.drilldown table{width:100%;border-collapse:collapse}
+.drilldown th,.drilldown td{padding:.45rem .6rem;border-bottom:1px solid #e5e8ef;text-align:right}
+.drilldown th:first-child,.drilldown td:first-child{text-align:left}
+.drilldown tr.drill{cursor:pointer}.drilldown tr.drill:hover{background:#f0f4ff}
+.drilldown .bar{height:.5rem;background:var(--brand,#0052cc);border-radius:3px;min-width:1px}
+.drilldown .note{display:block;font-size:.8rem;color:#666}
+</style>"""
+
+_WIDGET_SCRIPT = """<script>
+(function(){
+  function fmt(v,m){return m==='revenue'?v.toLocaleString(undefined,{style:'currency',currency:'USD'}):v.toLocaleString();}
+  function esc(s){return String(s).replace(/[&<>"]/g,function(c){return {'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;'}[c];});}
+  document.querySelectorAll('.drilldown[data-cube]').forEach(function(box){
+    var cube=JSON.parse(document.getElementById(box.dataset.cube).textContent), path=[];
+    function note(level,i){
+      var n=(cube.notes[level]||{})[i]; if(n===undefined) return '';
+      return '<span class="note">'+(level==='product'?'★ '+n[0]+' ('+n[1]+' reviews)':esc(n))+'</span>';
+    }
+    function render(){
+      var node=cube.root, crumbs=['<a data-depth="0">All</a>'];
+      path.forEach(function(k,d){
+        node=node[4].filter(function(c){return c[0]===k;})[0];
+        crumbs.push('<a data-depth="'+(d+1)+'">'+esc(cube.dims[cube.levels[d]][k])+'</a>');
+      });
+      var level=cube.levels[path.length], rows=node[4]||[], top=Math.max.apply(null,rows.map(function(c){return c[1];}).concat([1]));
+      var out='<nav>'+crumbs.join(' › ')+'</nav><table><thead><tr><th>'+esc(level)+'</th>'+
+        cube.measures.map(function(m){return '<th>'+m+'</th>';}).join('')+'<th></th></tr></thead><tbody>';
+      rows.forEach(function(c){
+        var drill=c.length>4;
+        out+='<tr'+(drill?' class="drill" data-key="'+c[0]+'"':'')+'><td>'+esc(cube.dims[level][c[0]])+note(level,c[0])+'</td>'+
+          cube.measures.map(function(m,j){return '<td>'+fmt(c[j+1],m)+'</td>';}).join('')+
+          '<td style="width:25%"><div class="bar" style="width:'+(100*c[1]/top).toFixed(1)+'%"></div></td></tr>';
+      });
+      out+='</tbody><tfoot><tr><th>Total</th>'+cube.measures.map(function(m,j){return '<th>'+fmt(node[j+1],m)+'</th>';}).join('')+'<th></th></tr></tfoot></table>';
+      box.innerHTML=out;
+    }
+    box.addEventListener('click',function(e){
+      var a=e.target.closest('a[data-depth]'), tr=e.target.closest('tr.drill');
+      if(a){path=path.slice(0,+a.dataset.depth);render();}
+      else if(tr){path.push(+tr.dataset.key);render();}
+    });
+    render();
+  });
+})();
+</script>"""
+
+
+def render_drilldown(encoded: Dict[str, Any], identifier: Optional[str] = None) -> str:
+    """
+    Render the drill-down widget of an encoded cube.
+
+    Args:
+        encoded: Cube returned by ``encode_cube``
+        identifier: Element id suffix, the cube id by default
+
+    Returns:
+        HTML fragment with the widget container, the cube as embedded JSON and the script
+    """
+    identifier = identifier or cube_id(encoded)
+    # "</" inside the JSON would end the script element early
+    data = json.dumps(encoded, separators=(",", ":"), ensure_ascii=False).replace("</", "<\\/")
+    return (
+        f'<div class="drilldown" data-cube="drilldown-cube-{identifier}"></div>\n'
+        f'<script type="application/json" id="drilldown-cube-{identifier}">{data}</script>'
+    )
+
+
+def embed_drilldowns(report_html: str) -> str:
+    """
+    Replace the ``<!-- DRILLDOWN:<id> -->`` placeholders of a report with their widgets.
+
+    The style and script are added once, before ``</body>``. Placeholders of unknown
+    cubes are left as they are.
+
+    Args:
+        report_html: Generated report
+
+    Returns:
+        The report with its drill-down widgets
+    """
+    embedded = False
+
+    def replace(match: re.Match) -> str:
+        nonlocal embedded
+        encoded = load_cube(match.group(1))
+        if encoded is None:
+            return match.group(0)
+        embedded = True
+        return render_drilldown(encoded, match.group(1))
+
+    result = _PLACEHOLDER_PATTERN.sub(replace, report_html)
+    if not embedded:
+        return result
+    assets = f"{_WIDGET_STYLE}\n{_WIDGET_SCRIPT}\n"
+    if "</body>" in result:
+        return result.replace("</body>", assets + "</body>", 1)
+    return result + assets
+
+
+def _top(children: Dict[str, Any], count: int = 5) -> List[List[Any]]:
+    ranked = sorted(children.items(), key=lambda item: -item[1]["revenue"])[:count]
+    return [[key, node["revenue"]] for key, node in ranked]
+
+
+def build_drilldown_cube(date_grain: str = "day") -> str:
+    """
+    Pre-aggregate sales by date, product and promotion for an interactive drill-down.
+
+    Args:
+        date_grain: Date level granularity: day, week or month
+
+    Returns:
+        JSON with the placeholder comment to put where the drill-down belongs in the
+        report, the totals and the top dates, products and promotions by revenue
+    """
+    try:
+        cube = build_cube(grain=date_grain)
+        identifier = save_cube(encode_cube(cube))
+    except Exception as e:
+        return json.dumps({"error": f"Error building the drill-down cube: {e}"})
+
+    products: Dict[str, Dict[str, Any]] = defaultdict(lambda: {"revenue": 0.0})
+    promotions: Dict[str, Dict[str, Any]] = defaultdict(lambda: {"revenue": 0.0})
+    for day in cube.get("children", {}).values():
+        for product, node in day.get("children", {}).items():
+            products[product]["revenue"] += node["revenue"]
+            for promotion, leaf in node.get("children", {}).items():
+                promotions[promotion]["revenue"] += leaf["revenue"]
+    print(f"Drill-down cube {identifier} built")
+    return json.dumps({
+        "placeholder": f"<!-- DRILLDOWN:{identifier} -->",
+        "levels": LEVELS,
+        "totals": {measure: cube[measure] for measure in MEASURES},
+        "top_dates": _top(cube.get("children", {})),
+        "top_products": [[key, round(value, 2)] for key, value in _top(products)],
+        "top_promotions": [[key, round(value, 2)] for key, value in _top(promotions)],
+        "holidays": cube["holidays"],
+    })
+
+
+def main():
+    """Command line entry point: build the cube and write a standalone drill-down report."""
+    parser = argparse.ArgumentParser(description="Build the date → product → promotion drill-down cube")
+    parser.add_argument("--grain", choices=GRAINS, default="day", help="Date level granularity")
+    parser.add_argument("--scripts", nargs="+", default=["drill-down-data.sql"],
+                        help="misc/ scripts seeding a local SQLite copy (ignored with --configured-backend)")
+    parser.add_argument("--configured-backend", action="store_true",
+                        help="Read the database configured by the SQL_QUERIER_* variables")
+    parser.add_argument("--output", help="Write a standalone report with the drill-down to this file")
+    parser.add_argument("--json", help="Write the encoded cube to this file")
+    args = parser.parse_args()
+
+    backend = None if args.configured_backend else SqliteBackend(scripts=args.scripts)
+    encoded = encode_cube(build_cube(backend, args.grain))
+    size = len(json.dumps(encoded, separators=(",", ":")))
+    print(f"🧊 Cube with {', '.join(f'{len(v)} {k}s' for k, v in encoded['dims'].items())} ({size / 1024:.1f} KB)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(encoded, f, separators=(",", ":"))
+        print(f"💾 Cube saved as: {args.json}")
+    if args.output:
+        template_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_template.html")
+        with open(template_path, encoding="utf-8") as f:
+            report = f.read()
+        report = report.replace("Report Title Placeholder", html.escape("Sales drill-down: date › product › promotion"))
+        report = report.replace("<!-- Inject table, chart, or text report here -->",
+                                f"<!-- DRILLDOWN:{save_cube(encoded)} -->")
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(embed_drilldowns(report))
+        print(f"💾 Report saved as: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,656 @@
+#!/usr/bin/env python3
+"""
+Result cache of the report builder's SQL queries.
+
+Report authors iterate on the same queries, and every report run re-executes them.
+``query_database`` looks results up here first, under a key built from:
+
+- the backend identity, so two databases never share entries,
+- the normalized T-SQL: comments removed, whitespace collapsed and keywords and
+  identifiers case-folded outside string literals,
+- the query parameters, as canonical JSON.
+
+Results are stored in a compact binary columnar format (see ``encode_result``):
+integer columns as the narrowest fixed-width array that fits, floats as doubles,
+repetitive text columns dictionary-encoded, a null bitmap per column, and the whole
+entry zlib-compressed. Entries expire after ``SQL_QUERY_CACHE_TTL_MINUTES``, the least
+recently used ones are evicted beyond ``SQL_QUERY_CACHE_MAX_MB``, and results larger
+than ``SQL_QUERY_CACHE_MAX_ENTRY_MB`` or truncated by the querier's caps are not cached.
+
+Every entry records the tables its query reads: every source of its FROM lists,
+JOINs and APPLYs, subqueries and CTE bodies included. A source that cannot be
+resolved to a table (a table-valued function, a variable, OPENJSON...) tags the entry
+with ``ALL_TABLES`` instead. ``invalidate_tables`` drops the entries reading any of
+the given tables, and those tagged ``ALL_TABLES``; the querier only runs reads, so data
+loads call it (or this script) for the tables they change. Set
+``SQL_QUERY_CACHE_BYPASS=1`` to always run the queries.
+
+Usage:
+    python query_cache.py --stats
+    python query_cache.py --invalidate dbo.Sales dbo.SaleItems
+    python query_cache.py --clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import struct
+import sys
+import time
+import zlib
+from array import array
+from contextlib import closing
+from datetime import date, datetime, time as time_of_day
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+from tools.local_state import get_state_path
+from tools.tsql_sqlite import split_statements, strip_comments
+
+DEFAULT_TTL_MINUTES = float(os.environ.get("SQL_QUERY_CACHE_TTL_MINUTES", "60"))
+DEFAULT_MAX_MB = float(os.environ.get("SQL_QUERY_CACHE_MAX_MB", "50"))
+DEFAULT_MAX_ENTRY_MB = float(os.environ.get("SQL_QUERY_CACHE_MAX_ENTRY_MB", "4"))
+
+# Table name recorded for a query with a source that is not a plain table: any invalidation drops it
+ALL_TABLES = "*"
+
+_MAGIC = b"QRC1"
+_LITERAL_PATTERN = re.compile(r"(N?'(?:[^']|'')*')")
+_TOKEN_PATTERN = re.compile(r"\[[^\]]*\]|[@#]*\w+|\S")
+_CTE_PATTERN = re.compile(r"(?:\bwith|,)\s*(\[?\w+\]?)\s*(?:\([^()]*\))?\s*as\s*\(", re.IGNORECASE)
+# Words that end a table source rather than name its alias
+_SOURCE_END_WORDS = {
+    "where", "group", "order", "having", "union", "except", "intersect", "option", "for", "on",
+    "join", "inner", "left", "right", "full", "cross", "outer", "pivot", "unpivot", "tablesample",
+}
+_WRITE_PATTERN = re.compile(
+    r"^\s*(?:with\b.*?\)\s*)?(?:insert\s+(?:into\s+)?|update\s+|delete\s+(?:from\s+)?|merge\s+(?:into\s+)?"
+    r"|truncate\s+table\s+|drop\s+table\s+(?:if\s+exists\s+)?|alter\s+table\s+)((?:\[?\w+\]?\s*\.\s*)?\[?\w+\]?)",
+    re.IGNORECASE | re.DOTALL,
+)
+_READ_PATTERN = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+_SELECT_INTO_PATTERN = re.compile(r"\binto\s+((?:\[?\w+\]?\s*\.\s*)?\[?#?\w+\]?)", re.IGNORECASE)
+
+
+def cache_bypassed() -> bool:
+    """Check the ``SQL_QUERY_CACHE_BYPASS`` environment switch."""
+    return os.environ.get("SQL_QUERY_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Normalize T-SQL so trivially different spellings of a query share an entry.
+
+    Comments are removed, whitespace is collapsed and everything outside string literals
+    is case-folded (keywords and identifiers are case-insensitive in SQL Server's
+    default collation); literals are kept verbatim. Trailing semicolons are dropped.
+    """
+    parts = _LITERAL_PATTERN.split(strip_comments(sql))
+    normalized = []
+    for index, part in enumerate(parts):
+        if index % 2:
+            normalized.append(part)
+        else:
+            text = " ".join(part.split()).casefold()
+            normalized.append(re.sub(r"\s*([(),=<>+*/-])\s*", r"\1", text))
+    return "".join(normalized).strip().rstrip(";").strip()
+
+
+def normalize_table(name: str) -> str:
+    """Normalize a table reference: brackets removed, lower case, ``dbo`` schema by default."""
+    parts = [part.strip().strip("[]").lower() for part in name.split(".")]
+    if len(parts) == 1:
+        parts.insert(0, "dbo")
+    return ".".join(parts[-2:])
+
+
+def _without_literals(sql: str) -> str:
+    return _LITERAL_PATTERN.sub("''", strip_comments(sql))
+
+
+def _is_name(token: str) -> bool:
+    return token.startswith("[") or token[0].isalnum() or token[0] in "_#@"
+
+
+def _skip_parentheses(tokens: List[str], index: int) -> int:
+    """Get the index after the parenthesis closing the one at ``index``."""
+    depth = 0
+    for position in range(index, len(tokens)):
+        depth += {"(": 1, ")": -1}.get(tokens[position], 0)
+        if depth == 0:
+            return position + 1
+    return len(tokens)
+
+
+def _read_source(tokens: List[str], index: int, ctes: Set[str], tables: Set[str]) -> int:
+    """
+    Add the table of the source starting at ``index`` and get the index after its alias.
+
+    A subquery or VALUES list in parentheses is skipped: the sources inside it are
+    found by the scan of ``read_tables``. Parenthesized joins start with a source.
+    """
+    if index >= len(tokens):
+        return index
+    if tokens[index] == "(":
+        if tokens[index + 1:index + 2] and tokens[index + 1].lower() not in ("select", "with", "values"):
+            _read_source(tokens, index + 1, ctes, tables)
+        index = _skip_parentheses(tokens, index)
+    elif _is_name(tokens[index]) and not tokens[index].startswith("@"):
+        parts = [tokens[index]]
+        index += 1
+        while index + 1 < len(tokens) and tokens[index] == "." and _is_name(tokens[index + 1]):
+            parts.append(tokens[index + 1])
+            index += 2
+        if index < len(tokens) and tokens[index] == "(":
+            tables.add(ALL_TABLES)  # Table-valued function: what it reads is unknown
+            index = _skip_parentheses(tokens, index)
+        elif len(parts) > 1 or parts[0].strip("[]").lower() not in ctes:
+            tables.add(normalize_table(".".join(parts)))
+    else:
+        tables.add(ALL_TABLES)  # Table variable or anything else that is not a table name
+        return index + 1
+    if index < len(tokens) and tokens[index].lower() == "with" and tokens[index + 1:index + 2] == ["("]:
+        index = _skip_parentheses(tokens, index + 1)  # Table hints
+    if index < len(tokens) and tokens[index].lower() == "as":
+        index += 1
+    if index < len(tokens) and _is_name(tokens[index]) and tokens[index].lower() not in _SOURCE_END_WORDS:
+        index += 1
+        if index < len(tokens) and tokens[index] == "(":
+            index = _skip_parentheses(tokens, index)  # Column aliases of a derived table
+    return index
+
+
+def read_tables(sql: str) -> Set[str]:
+    """
+    Get the normalized names of the tables a query reads.
+
+    Every source of the FROM lists (comma-separated ones included), JOINs and APPLYs is
+    read, in subqueries and CTE bodies too; CTE names are not tables. A source that is
+    not a table name, like a table-valued function or a table variable, adds
+    ``ALL_TABLES``: the tables it reads are unknown.
+    """
+    text = _without_literals(sql)
+    ctes = {name.strip("[]").lower() for name in _CTE_PATTERN.findall(text)}
+    tokens = _TOKEN_PATTERN.findall(text)
+    tables: Set[str] = set()
+    for index, token in enumerate(tokens):
+        keyword = token.lower()
+        if keyword not in ("from", "join", "apply"):
+            continue
+        position = _read_source(tokens, index + 1, ctes, tables)
+        while keyword == "from" and position < len(tokens) and tokens[position] == ",":
+            position = _read_source(tokens, position + 1, ctes, tables)
+    return tables
+
+
+def written_tables(sql: str) -> Set[str]:
+    """Get the normalized names of the tables the statements of a batch write."""
+    tables = set()
+    for statement in split_statements(_without_literals(sql)):
+        match = _WRITE_PATTERN.match(statement) or (
+            _READ_PATTERN.match(statement) and _SELECT_INTO_PATTERN.search(statement)
+        )
+        if match:
+            tables.add(normalize_table(match.group(1)))
+    return tables
+
+
+def is_cacheable(sql: str) -> bool:
+    """Check that every statement of a batch is a read (SELECT, or WITH ... SELECT, without INTO)."""
+    statements = split_statements(_without_literals(sql))
+    return bool(statements) and not written_tables(sql) and all(
+        _READ_PATTERN.match(statement) for statement in statements
+    )
+
+
+def is_read_query(sql: str) -> bool:
+    """Check that a batch is a single read statement (SELECT, or WITH ... SELECT, without INTO)."""
+    return len(split_statements(_without_literals(sql))) == 1 and is_cacheable(sql)
+
+
+def make_query_key(backend_identity: str, sql: str, parameters: Optional[Sequence[Any]] = None) -> str:
+    """Build the cache key of a query on a backend."""
+    canonical_parameters = json.dumps(list(parameters or []), separators=(",", ":"), default=str)
+    parts = [backend_identity, normalize_sql(sql), canonical_parameters]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+# Binary columnar encoding
+#
+# entry   := zlib(header column*)
+# header  := "QRC1" rows:uint32 columns:uint16
+# column  := name:str type:char nulls:bytes[ceil(rows / 8)] data
+# data    := 'i' width:char values:array            integers in the narrowest array type
+#          | 'f' values:array('d')                  floats
+#          | 'b' values:bytes[ceil(rows / 8)]       booleans as a bitmap
+#          | 'd' count:uint32 str* indexes:array    dictionary-encoded text
+#          | 's' lengths:array('I') utf8:bytes      plain text
+#          | 'n'                                    all null
+# str     := length:uint32 utf8:bytes
+# Arrays are little-endian and hold the non-null values only.
+
+_INT_TYPECODES = [("b", 1 << 7), ("h", 1 << 15), ("i", 1 << 31), ("q", 1 << 63)]
+
+
+def _plain(value: Any) -> Any:
+    """Map driver types to the encodable int, float, bool, str and None."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (date, time_of_day)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    return str(value)
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _bitmap(flags: List[bool]) -> bytes:
+    bits = bytearray((len(flags) + 7) // 8)
+    for index, flag in enumerate(flags):
+        if flag:
+            bits[index >> 3] |= 1 << (index & 7)
+    return bytes(bits)
+
+
+def _read_bitmap(data: bytes, count: int) -> List[bool]:
+    return [bool(data[index >> 3] & (1 << (index & 7))) for index in range(count)]
+
+
+def _pack_str(text: str) -> bytes:
+    encoded = text.encode("utf-8")
+    return struct.pack("<I", len(encoded)) + encoded
+
+
+def _encode_column(values: List[Any]) -> bytes:
+    present = [value for value in values if value is not None]
+    nulls = _bitmap([value is None for value in values])
+    kinds = {type(value) for value in present}
+    if not present:
+        return nulls + b"n"
+    if kinds == {bool}:
+        return nulls + b"b" + _bitmap(present)
+    if kinds == {int}:
+        low, high = min(present), max(present)
+        for typecode, bound in _INT_TYPECODES:
+            if -bound <= low and high < bound:
+                return nulls + b"i" + typecode.encode("ascii") + _little_endian(array(typecode, present))
+        present, kinds = [float(value) for value in present], {float}  # Beyond 64 bits
+    if kinds <= {int, float}:
+        return nulls + b"f" + _little_endian(array("d", [float(value) for value in present]))
+    texts = [value if isinstance(value, str) else json.dumps(value) for value in present]
+    dictionary: Dict[str, int] = {}
+    for text in texts:
+        dictionary.setdefault(text, len(dictionary))
+    if len(dictionary) * 2 <= len(texts):
+        typecode = next(code for code, bound in _INT_TYPECODES if len(dictionary) < bound)
+        body = struct.pack("<I", len(dictionary)) + b"".join(_pack_str(text) for text in dictionary)
+        indexes = array(typecode, [dictionary[text] for text in texts])
+        return nulls + b"d" + typecode.encode("ascii") + body + _little_endian(indexes)
+    encoded = [text.encode("utf-8") for text in texts]
+    return nulls + b"s" + _little_endian(array("I", [len(item) for item in encoded])) + b"".join(encoded)
+
+
+def encode_result(columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> bytes:
+    """
+    Encode a result set in the binary columnar format.
+
+    Args:
+        columns: Column names
+        rows: Rows, each a sequence of values in column order
+
+    Returns:
+        The compressed entry
+    """
+    parts = [_MAGIC, struct.pack("<IH", len(rows), len(columns))]
+    for index, column in enumerate(columns):
+        parts.append(_pack_str(column))
+        parts.append(_encode_column([_plain(row[index]) for row in rows]))
+    return zlib.compress(b"".join(parts), 6)
+
+
+def decode_result(entry: bytes) -> Tuple[List[str], List[Tuple[Any, ...]]]:
+    """
+    Decode an entry written by ``encode_result``.
+
+    Returns:
+        Tuple of (column names, rows); non-text values come back as int, float or bool,
+        and values of other driver types as the text they were stored as
+    """
+    data = zlib.decompress(entry)
+    if data[:4] != _MAGIC:
+        raise ValueError("Not a query cache entry")
+    row_count, column_count = struct.unpack_from("<IH", data, 4)
+    position = 10
+    bitmap_size = (row_count + 7) // 8
+
+    def read_str() -> str:
+        nonlocal position
+        (length,) = struct.unpack_from("<I", data, position)
+        position += 4 + length
+        return data[position - length:position].decode("utf-8")
+
+    def read_array(typecode: str, count: int) -> array:
+        nonlocal position
+        size = array(typecode).itemsize * count
+        position += size
+        return _from_little_endian(typecode, data[position - size:position])
+
+    columns, column_values = [], []
+    for _ in range(column_count):
+        columns.append(read_str())
+        nulls = _read_bitmap(data[position:position + bitmap_size], row_count)
+        position += bitmap_size
+        kind = chr(data[position])
+        position += 1
+        present_count = row_count - sum(nulls)
+        if kind == "n":
+            present: Sequence[Any] = []
+        elif kind == "b":
+            present = _read_bitmap(data[position:position + (present_count + 7) // 8], present_count)
+            position += (present_count + 7) // 8
+        elif kind == "i":
+            typecode = chr(data[position])
+            position += 1
+            present = read_array(typecode, present_count).tolist()
+        elif kind == "f":
+            present = read_array("d", present_count).tolist()
+        elif kind == "d":
+            typecode = chr(data[position])
+            position += 1
+            (size,) = struct.unpack_from("<I", data, position)
+            position += 4
+            dictionary = [read_str() for _ in range(size)]
+            present = [dictionary[index] for index in read_array(typecode, present_count)]
+        elif kind == "s":
+            lengths = read_array("I", present_count)
+            present = []
+            for length in lengths:
+                present.append(data[position:position + length].decode("utf-8"))
+                position += length
+        else:
+            raise ValueError(f"Unknown column type '{kind}' in query cache entry")
+        values = iter(present)
+        column_values.append([None if null else next(values) for null in nulls])
+    return columns, list(zip(*column_values)) if columns else []
+
+
+class ResultCapture:
+    """
+    Pass rows through while keeping a copy for the cache, up to a size bound.
+
+    Wrap the row iterator of a query with ``wrap``; once it has been consumed,
+    ``rows`` holds every row if the result was read to the end within the bound, and
+    is None otherwise.
+    """
+
+    def __init__(self, max_bytes: int = int(DEFAULT_MAX_ENTRY_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.complete = False
+        self._rows: Optional[List[Tuple[Any, ...]]] = []
+
+    @property
+    def rows(self) -> Optional[List[Tuple[Any, ...]]]:
+        return self._rows if self.complete else None
+
+    def wrap(self, rows: Iterator[Sequence[Any]]) -> Iterator[Sequence[Any]]:
+        try:
+            for row in rows:
+                if self._rows is not None:
+                    self.size += sum(len(str(value)) for value in row) + len(row)
+                    if self.size > self.max_bytes:
+                        self._rows = None  # Too large to cache: stop copying
+                    else:
+                        self._rows.append(tuple(row))
+                yield row
+            self.complete = self._rows is not None
+        finally:
+            close = getattr(rows, "close", None)
+            if close is not None:
+                close()
+
+
+class QueryCache:
+    """
+    SQLite-backed store of query results with TTL, LRU size eviction and per-table
+    invalidation.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: float = DEFAULT_TTL_MINUTES * 60,
+        max_bytes: int = int(DEFAULT_MAX_MB * 1024 * 1024),
+    ):
+        self.path = path or os.environ.get("SQL_QUERY_CACHE_PATH") or get_state_path("query_cache.db")
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS results (
+                       key         TEXT PRIMARY KEY,
+                       query       TEXT NOT NULL,
+                       data        BLOB NOT NULL,
+                       row_count   INTEGER NOT NULL,
+                       size        INTEGER NOT NULL,
+                       created_at  REAL NOT NULL,
+                       last_access REAL NOT NULL,
+                       hits        INTEGER NOT NULL DEFAULT 0
+                   )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_results_access ON results (last_access)")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS result_tables (
+                       key        TEXT NOT NULL,
+                       table_name TEXT NOT NULL,
+                       PRIMARY KEY (table_name, key)
+                   )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS counters (
+                       name  TEXT PRIMARY KEY,
+                       value INTEGER NOT NULL DEFAULT 0
+                   )"""
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _count(self, conn: sqlite3.Connection, name: str, amount: int = 1) -> None:
+        conn.execute("INSERT OR IGNORE INTO counters (name) VALUES (?)", (name,))
+        conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (amount, name))
+
+    def _delete(self, conn: sqlite3.Connection, keys: Iterable[str]) -> int:
+        removed = 0
+        for key in keys:
+            removed += conn.execute("DELETE FROM results WHERE key = ?", (key,)).rowcount
+            conn.execute("DELETE FROM result_tables WHERE key = ?", (key,))
+        return removed
+
+    def get(self, key: str) -> Optional[Tuple[List[str], List[Tuple[Any, ...]]]]:
+        """
+        Look up a result.
+
+        Args:
+            key: Key built by ``make_query_key``
+
+        Returns:
+            Tuple of (column names, rows), or None if it is missing or expired
+        """
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT data, created_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._delete(conn, [key])
+                row = None
+            self._count(conn, "hits" if row is not None else "misses")
+            if row is None:
+                return None
+            conn.execute("UPDATE results SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        return decode_result(row[0])
+
+    def put(self, key: str, sql: str, columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> None:
+        """
+        Store a result and evict the least recently used entries beyond the size bound.
+
+        Args:
+            key: Key built by ``make_query_key``
+            sql: Query text, used to find the tables it reads
+            columns: Column names
+            rows: Every row of the result
+        """
+        now = time.time()
+        data = encode_result(columns, rows)
+        with closing(self._connect()) as conn, conn:
+            self._delete(conn, [key])
+            conn.execute(
+                "INSERT INTO results (key, query, data, row_count, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, normalize_sql(sql), data, len(rows), len(data), now, now),
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO result_tables (key, table_name) VALUES (?, ?)",
+                [(key, table) for table in read_tables(sql)],
+            )
+            expired = [k for (k,) in conn.execute(
+                "SELECT key FROM results WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).fetchall()]
+            self._delete(conn, expired)
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total > self.max_bytes:
+                evicted = []
+                for old_key, old_size in conn.execute("SELECT key, size FROM results ORDER BY last_access").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    evicted.append(old_key)
+                    total -= old_size
+                self._delete(conn, evicted)
+
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        """
+        Drop the entries whose queries read any of the given tables, and the entries of
+        queries whose tables are unknown (``ALL_TABLES``).
+
+        Args:
+            tables: Table names, with or without schema and brackets (``dbo.Sales``, ``[Sales]``)
+
+        Returns:
+            Number of entries removed
+        """
+        names = sorted({normalize_table(table) for table in tables})
+        if not names:
+            return 0
+        with closing(self._connect()) as conn, conn:
+            placeholders = ",".join("?" * len(names))
+            keys = [key for (key,) in conn.execute(
+                f"SELECT DISTINCT key FROM result_tables WHERE table_name IN ({placeholders}, ?)",
+                names + [ALL_TABLES],
+            ).fetchall()]
+            removed = self._delete(conn, keys)
+            self._count(conn, "invalidations", removed)
+        return removed
+
+    def clear(self) -> int:
+        """Delete every entry and reset the statistics; returns the number of entries removed."""
+        with closing(self._connect()) as conn, conn:
+            removed = conn.execute("DELETE FROM results").rowcount
+            conn.execute("DELETE FROM result_tables")
+            conn.execute("DELETE FROM counters")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the cache statistics.
+
+        Returns:
+            Dictionary with entries, rows, bytes, hits, misses, hit_rate, invalidations
+            and the number of entries per table
+        """
+        with closing(self._connect()) as conn, conn:
+            entries, rows, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(row_count), 0), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            tables = dict(conn.execute(
+                "SELECT table_name, COUNT(*) FROM result_tables GROUP BY table_name ORDER BY table_name"
+            ).fetchall())
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "rows": rows,
+            "bytes": size,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "invalidations": counters.get("invalidations", 0),
+            "tables": tables,
+        }
+
+
+_query_cache = None
+
+
+def get_query_cache() -> QueryCache:
+    """Get the process-wide query cache."""
+    global _query_cache
+    if _query_cache is None:
+        _query_cache = QueryCache()
+    return _query_cache
+
+
+def invalidate_tables(*tables: str) -> int:
+    """Drop the cached results reading any of the given tables, e.g. ``invalidate_tables("dbo.Sales")``."""
+    return get_query_cache().invalidate_tables(tables)
+
+
+def main():
+    """Command line entry point for inspecting and invalidating the cache."""
+    parser = argparse.ArgumentParser(description="Inspect the report builder's SQL query cache")
+    parser.add_argument("--stats", action="store_true", help="Show entries, hit rate and cached tables")
+    parser.add_argument("--invalidate", nargs="+", metavar="TABLE", help="Drop the results reading these tables")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached result")
+    parser.add_argument("--cache", help="Path of the cache database")
+    args = parser.parse_args()
+
+    cache = QueryCache(args.cache)
+    if args.clear:
+        print(f"🗑️  Removed {cache.clear()} cached query results.")
+        return
+    if args.invalidate:
+        print(f"🧹 Invalidated {cache.invalidate_tables(args.invalidate)} cached query results.")
+        return
+    stats = cache.stats()
+    print(f"🗄️  {stats['entries']} cached query results, {stats['rows']} rows, {stats['bytes'] / 1024:.1f} KB")
+    print(f"   {stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), "
+          f"{stats['invalidations']} invalidated")
+    for table, entries in stats["tables"].items():
+        print(f"   {'(unknown tables)' if table == ALL_TABLES else table}: {entries} results")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Parallel section fan-out of multi-part reports.
+
+A dataset such as the operations report (``production_data``, ``supply_chain``,
+``safety_metrics``) is otherwise generated in one long serial run. With
+``REPORT_FANOUT=1`` the report builder splits it into independent sections and
+generates each section's HTML fragment in its own run, all runs concurrently, so the
+wall-clock time is roughly that of the slowest section:
+
+- ``split_sections``: every top-level entry holding a list or an object is a section;
+  top-level scalars (a report date, a currency) are shared context given to every
+  section
+- each run gets run-level ``additional_instructions`` asking for a single fragment
+  (no template, no ``<html>``/``<head>``, element ids prefixed by the section), so the
+  agent definition is unchanged and every section is cached on its own by ``run_agent``
+- ``assemble_report`` puts the fragments in dataset order into the template's report
+  container locally; a section whose run failed gets a short notice instead
+- with ``MODEL_ROUTING=1`` every section is routed on its own data: a dataset with many
+  sections would go to the advanced deployment as a whole, while each section may be
+  simple enough for the fast one
+
+Datasets with fewer than two sections are generated in a single run as before.
+"""
+
+import html
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.model_router import RoutingDecision, record_routing, route_request, routing_enabled
+from tools.run_helper import AgentRunResult, run_agent
+from tools.template_loader import load_html_template
+
+DEFAULT_MAX_WORKERS = 4
+_FENCE_PATTERN = re.compile(r"^```[a-zA-Z]*\s*(.*?)\s*```$", re.DOTALL)
+_CONTAINER_OPEN_PATTERN = re.compile(r"<section\b[^>]*\bid=[\"']report-container[\"'][^>]*>", re.IGNORECASE)
+_SECTION_TAG_PATTERN = re.compile(r"<(/?)section\b[^>]*>", re.IGNORECASE)
+_BODY_PATTERN = re.compile(r"<body\b[^>]*>(.*)</body>", re.IGNORECASE | re.DOTALL)
+_CONTAINER_HEADING_PATTERN = re.compile(r"^\s*<h[12]\b[^>]*>.*?</h[12]>", re.IGNORECASE | re.DOTALL)
+_PLACEHOLDER_COMMENT = "<!-- Inject table, chart, or text report here -->"
+
+SECTION_INSTRUCTIONS = """You are generating ONE section of a larger report, not the whole report.
+Do not call load_html_template: the page template, its header and its styles are added afterwards.
+Reply with ONLY an HTML fragment: a single <section class="report-section" id="section-{slug}"> element
+starting with an <h3> heading for the "{name}" section, followed by its table, chart or text.
+Do not write <html>, <head> or <body> tags. Prefix every element id you create with "{slug}-".
+Put any <style> or <script> the section needs inside that element; scripts loaded from a CDN may be
+included in every section (duplicates are removed)."""
+
+
+@dataclass
+class SectionResult:
+    """Outcome of one section run."""
+
+    name: str
+    fragment: Optional[str]
+    result: AgentRunResult
+    decision: Optional[RoutingDecision] = None
+
+
+@dataclass
+class FanOutResult:
+    """Outcome of a fanned-out report."""
+
+    html: Optional[str]
+    sections: List[SectionResult] = field(default_factory=list)
+    wall_seconds: float = 0.0
+
+    @property
+    def completed(self) -> bool:
+        return self.html is not None
+
+    @property
+    def run_seconds(self) -> float:
+        """Sum of the section run times, i.e. the time a serial generation would have taken."""
+        return sum(section.result.timings.get("total", 0.0) for section in self.sections)
+
+
+def fanout_enabled() -> bool:
+    """Check the ``REPORT_FANOUT`` environment switch (off by default)."""
+    return os.environ.get("REPORT_FANOUT", "0").lower() in ("1", "true", "yes")
+
+
+def section_slug(name: str) -> str:
+    """Identifier-safe form of a section name."""
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "section"
+
+
+def split_sections(dataset: Any) -> Tuple[List[Tuple[str, Any]], Dict[str, Any]]:
+    """
+    Split a dataset into its independent sections.
+
+    Args:
+        dataset: JSON dataset
+
+    Returns:
+        Tuple of ((name, data) sections in dataset order, shared scalar context)
+    """
+    if not isinstance(dataset, dict):
+        return [], {}
+    sections = [(name, value) for name, value in dataset.items() if isinstance(value, (list, dict))]
+    context = {name: value for name, value in dataset.items() if not isinstance(value, (list, dict))}
+    return sections, context
+
+
+def _container_content(text: str) -> Optional[Tuple[int, int]]:
+    """Start and end of the report container's content, nested sections included."""
+    opening = _CONTAINER_OPEN_PATTERN.search(text)
+    if not opening:
+        return None
+    depth = 1
+    for tag in _SECTION_TAG_PATTERN.finditer(text, opening.end()):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            return opening.end(), tag.start()
+    return None
+
+
+def extract_fragment(text: str) -> str:
+    """
+    Get the section fragment out of a reply.
+
+    A fenced reply is unwrapped, and from a whole document only the content of the
+    report container (or of the body) is kept.
+    """
+    text = text.strip()
+    fenced = _FENCE_PATTERN.match(text)
+    if fenced:
+        text = fenced.group(1)
+    container = _container_content(text)
+    if container:
+        return text[container[0]:container[1]].strip()
+    body = _BODY_PATTERN.search(text)
+    return body.group(1).strip() if body else text
+
+
+def section_notice(name: str, error: Optional[str]) -> str:
+    """Placeholder fragment of a section that could not be generated."""
+    return (f'<section class="report-section" id="section-{section_slug(name)}"><h3>{html.escape(name)}</h3>'
+            f'<p>This section could not be generated{f": {html.escape(error)}" if error else "."}</p></section>')
+
+
+def assemble_report(title: str, fragments: List[str], template: Optional[str] = None) -> str:
+    """
+    Put section fragments, in order, into the report template.
+
+    Args:
+        title: Report title, replacing the template's title placeholder
+        fragments: Section fragments in display order
+        template: Report template (loaded with ``load_html_template`` by default)
+
+    Returns:
+        The complete HTML document
+    """
+    template = template if template is not None else load_html_template()
+    report = template.replace("Report Title Placeholder", html.escape(title))
+    content = "\n".join(fragments)
+    if _PLACEHOLDER_COMMENT in report:
+        return report.replace(_PLACEHOLDER_COMMENT, content, 1)
+    container = _container_content(report)
+    if container:
+        heading = _CONTAINER_HEADING_PATTERN.match(report[container[0]:container[1]])
+        inner = (heading.group(0) if heading else "") + content
+        return report[:container[0]] + inner + report[container[1]:]
+    return report.replace("</body>", content + "</body>", 1)
+
+
+def generate_sections(client, agent, prompt: str, sections: List[Tuple[str, Any]], context: Dict[str, Any],
+                      max_workers: int = DEFAULT_MAX_WORKERS, route: Optional[bool] = None,
+                      **run_options) -> List[SectionResult]:
+    """
+    Generate the fragments of report sections in concurrent runs.
+
+    Args:
+        client: AgentsClient
+        agent: Report builder agent
+        prompt: Request of the whole report
+        sections: (name, data) sections
+        context: Shared scalar context added to every section's data
+        max_workers: Concurrent runs
+        route: Route every section to the fast or advanced deployment on its own data
+            (``MODEL_ROUTING`` by default); the decisions are logged with the section runs
+        **run_options: Passed on to ``run_agent`` (ledger, use_cache, model...)
+
+    Returns:
+        The section results in the order of ``sections``
+    """
+    if route is None:
+        route = routing_enabled()
+
+    def generate(section: Tuple[str, Any]) -> SectionResult:
+        name, data = section
+        instructions = SECTION_INSTRUCTIONS.format(name=name, slug=section_slug(name))
+        section_prompt = f"{prompt}\n\nThis run covers only the \"{name}\" section of the report."
+        section_dataset = {**context, name: data}
+        decision = route_request(section_prompt, section_dataset) if route else None
+        options = {**run_options, "model": decision.model} if decision else run_options
+        result = run_agent(client, agent, section_prompt, dataset=section_dataset,
+                           additional_instructions=instructions, **options)
+        if decision:
+            record_routing(decision, result, getattr(agent, "name", None))
+        fragment = extract_fragment(result.text) if result.completed and result.text else None
+        return SectionResult(name, fragment, result, decision)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sections)))) as executor:
+        return list(executor.map(generate, sections))
+
+
+def generate_report_fanout(client, agent, prompt: str, dataset: Any, title: str,
+                           max_workers: Optional[int] = None, **run_options) -> Optional[FanOutResult]:
+    """
+    Generate a multi-section report with one concurrent run per section.
+
+    Args:
+        client: AgentsClient
+        agent: Report builder agent
+        prompt: Report request
+        dataset: JSON dataset
+        title: Report title
+        max_workers: Concurrent runs (``REPORT_FANOUT_WORKERS``, 4 by default)
+        **run_options: Passed on to ``run_agent``
+
+    Returns:
+        The assembled report with the section results, or None when the dataset has
+        fewer than two sections (generate it in a single run instead) or no section
+        could be generated
+    """
+    sections, context = split_sections(dataset)
+    if len(sections) < 2:
+        return None
+    max_workers = max_workers or int(os.environ.get("REPORT_FANOUT_WORKERS", DEFAULT_MAX_WORKERS))
+    start = time.perf_counter()
+    results = generate_sections(client, agent, prompt, sections, context, max_workers, **run_options)
+    wall_seconds = time.perf_counter() - start
+    if not any(section.fragment for section in results):
+        return FanOutResult(None, results, wall_seconds)
+    fragments = [section.fragment or section_notice(section.name, section.result.error) for section in results]
+    return FanOutResult(assemble_report(title, fragments), results, wall_seconds)
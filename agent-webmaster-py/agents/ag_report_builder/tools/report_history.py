@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Incremental regeneration of multi-section reports.
+
+Dashboards are regenerated daily when only the latest month was appended to their
+dataset, and every regeneration used to rebuild the whole document. With
+``REPORT_INCREMENTAL=1`` the report builder keeps, per report id, the dataset and the
+section fragments of the last report in the state folder, diffs the new dataset
+against it and only pays for the sections whose data changed:
+
+- ``diff_datasets`` compares the sections of ``split_sections`` structurally: rows of
+  a list are compared by position (rows appended after an unchanged prefix are told
+  apart), keys of an object by name, and sections are added or removed by name
+- an unchanged section reuses its stored fragment
+- a section that only gained rows and whose fragment is a plain table (no chart, and
+  one body row per stored row) gets the new rows rendered locally, in the formatting
+  of the existing cells
+- any other changed section is regenerated with the section runs of
+  ``report_fanout``, and the fragments are assembled into the current template
+
+A report is identified by ``make_report_id``: its title, its prompt and the names of
+its sections, so two datasets shown under the same title keep separate histories
+while a dataset whose rows change keeps its own.
+
+The whole report is regenerated when there is no history for the report id, when the
+prompt, title or shared context (the top-level scalars every section sees) changed,
+or when more than ``REPORT_INCREMENTAL_MAX_CHANGE`` of the dataset's rows and keys
+changed (0.5 by default). Datasets with fewer than two sections are generated in a
+single run as before.
+
+Usage:
+    python report_history.py --list
+    python report_history.py --diff <report id from --list> new_data.json
+    python report_history.py --forget <report id from --list>
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+from tools.local_state import get_state_path
+from tools.report_fanout import (DEFAULT_MAX_WORKERS, FanOutResult, assemble_report, generate_sections,
+                                 section_notice, section_slug, split_sections)
+
+HISTORY_DIR = "report_history"
+DEFAULT_MAX_CHANGE = 0.5
+UNCHANGED, APPENDED, CHANGED, ADDED, REMOVED = "unchanged", "appended", "changed", "added", "removed"
+FULL, PARTIAL = "full", "partial"
+_TABLE_PATTERN = re.compile(r"<table\b", re.IGNORECASE)
+_TBODY_PATTERN = re.compile(r"(<tbody\b[^>]*>)(.*?)(</tbody\s*>)", re.IGNORECASE | re.DOTALL)
+_ROW_PATTERN = re.compile(r"<tr\b[^>]*>(.*?)</tr\s*>", re.IGNORECASE | re.DOTALL)
+_CELL_PATTERN = re.compile(r"<t([dh])\b([^>]*)>(.*?)</t[dh]\s*>", re.IGNORECASE | re.DOTALL)
+_TAG_PATTERN = re.compile(r"<[^>]+>")
+# A fragment holding any of these draws its data somewhere else than in the table rows
+_CHART_PATTERN = re.compile(r"<(script|canvas|svg|iframe)\b|<!--\s*DRILLDOWN:", re.IGNORECASE)
+
+
+@dataclass
+class SectionDiff:
+    """How one section of the dataset changed."""
+
+    name: str
+    status: str
+    changed: int = 0
+    total: int = 0
+    appended: int = 0
+
+
+@dataclass
+class DatasetDiff:
+    """Structural difference between two datasets."""
+
+    sections: List[SectionDiff] = field(default_factory=list)
+    context_changed: bool = False
+
+    @property
+    def changed(self) -> int:
+        return sum(section.changed for section in self.sections)
+
+    @property
+    def total(self) -> int:
+        return sum(section.total for section in self.sections)
+
+    @property
+    def changed_ratio(self) -> float:
+        """Share of the rows and keys of the datasets that were added, removed or modified."""
+        return self.changed / self.total if self.total else 0.0
+
+    def by_name(self) -> Dict[str, SectionDiff]:
+        return {section.name: section for section in self.sections}
+
+
+@dataclass
+class IncrementalResult(FanOutResult):
+    """Outcome of an incremental report: ``sections`` holds the regenerated sections only."""
+
+    mode: str = FULL
+    reused: List[str] = field(default_factory=list)
+    patched: List[str] = field(default_factory=list)
+    diff: Optional[DatasetDiff] = None
+    reasons: List[str] = field(default_factory=list)
+
+
+def incremental_enabled() -> bool:
+    """Check the ``REPORT_INCREMENTAL`` environment switch (off by default)."""
+    return os.environ.get("REPORT_INCREMENTAL", "0").lower() in ("1", "true", "yes")
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _size(value: Any) -> int:
+    return len(value) if isinstance(value, (list, dict)) else 1
+
+
+def diff_section(name: str, old: Any, new: Any) -> SectionDiff:
+    """
+    Compare the data of a section in two datasets.
+
+    Args:
+        name: Section name
+        old: Previous data (None when the section is new)
+        new: Current data (None when the section was removed)
+
+    Returns:
+        The status of the section with its changed and total rows (lists) or keys (objects)
+    """
+    if old is None:
+        return SectionDiff(name, ADDED, _size(new), _size(new))
+    if new is None:
+        return SectionDiff(name, REMOVED, _size(old), _size(old))
+    if isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        modified = sum(1 for i in range(common) if _canonical(old[i]) != _canonical(new[i]))
+        changed = modified + abs(len(new) - len(old))
+        total = max(len(old), len(new))
+        if not changed:
+            return SectionDiff(name, UNCHANGED, 0, total)
+        if not modified and len(new) > len(old):
+            return SectionDiff(name, APPENDED, changed, total, appended=len(new) - len(old))
+        return SectionDiff(name, CHANGED, changed, total)
+    if isinstance(old, dict) and isinstance(new, dict):
+        keys = set(old) | set(new)
+        changed = sum(1 for key in keys if key not in old or key not in new
+                      or _canonical(old[key]) != _canonical(new[key]))
+        return SectionDiff(name, CHANGED if changed else UNCHANGED, changed, len(keys))
+    if _canonical(old) == _canonical(new):
+        return SectionDiff(name, UNCHANGED, 0, _size(new))
+    return SectionDiff(name, CHANGED, max(_size(old), _size(new)), max(_size(old), _size(new)))
+
+
+def diff_datasets(old: Any, new: Any) -> DatasetDiff:
+    """
+    Compare two datasets section by section.
+
+    Args:
+        old: Previous JSON dataset
+        new: Current JSON dataset
+
+    Returns:
+        The section differences in the order of the current dataset, removed sections last
+    """
+    old_sections, old_context = split_sections(old)
+    new_sections, new_context = split_sections(new)
+    previous = dict(old_sections)
+    current = dict(new_sections)
+    sections = [diff_section(name, previous.get(name), data) for name, data in new_sections]
+    sections += [diff_section(name, data, None) for name, data in old_sections if name not in current]
+    return DatasetDiff(sections, _canonical(old_context) != _canonical(new_context))
+
+
+def make_report_id(title: str, prompt: str, dataset: Any) -> str:
+    """
+    Identify a report by what it is rather than by its data.
+
+    Args:
+        title: Report title
+        prompt: Report request
+        dataset: JSON dataset; only the names of its sections and shared context count
+
+    Returns:
+        The slug of the title followed by a hash of the title, prompt and dataset structure
+    """
+    sections, context = split_sections(dataset)
+    structure = {"title": title, "prompt": prompt, "sections": [name for name, _ in sections],
+                 "context": sorted(context)}
+    digest = hashlib.sha256(_canonical(structure).encode("utf-8")).hexdigest()[:12]
+    return f"{section_slug(title)}-{digest}"
+
+
+def _history_path(report_id: str) -> str:
+    return get_state_path(os.path.join(HISTORY_DIR, f"{section_slug(report_id)}.json"))
+
+
+def load_report(report_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Load the last report stored for a report id.
+
+    Returns:
+        The stored prompt, title, dataset, section fragments (by name, None for a
+        section that could not be generated) and HTML, or None if there is none
+    """
+    try:
+        with open(_history_path(report_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_report(report_id: str, prompt: str, title: str, dataset: Any,
+                fragments: Dict[str, Optional[str]], report_html: str) -> None:
+    """Store a report and the dataset it was built from as the base of the next regeneration."""
+    path = _history_path(report_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    entry = {
+        "time": time.time(),
+        "prompt": prompt,
+        "title": title,
+        "dataset": dataset,
+        "fragments": fragments,
+        "html": report_html,
+    }
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(entry, f, separators=(",", ":"), default=str)
+    os.replace(f"{path}.tmp", path)
+
+
+def forget_report(report_id: str) -> bool:
+    """Drop the history of a report id so its next report is generated in full."""
+    path = _history_path(report_id)
+    if not os.path.exists(path):
+        return False
+    os.remove(path)
+    return True
+
+
+def _cell_text(cell: str) -> str:
+    return html.unescape(_TAG_PATTERN.sub("", cell)).strip()
+
+
+def _formats(value: Any) -> List[str]:
+    """Ways a value may have been written in a table cell."""
+    if isinstance(value, bool) or value is None:
+        return [str(value)]
+    if isinstance(value, int):
+        return [str(value), f"{value:,}"]
+    if isinstance(value, float):
+        return [str(value), f"{value:,}", f"{value:.2f}", f"{value:,.2f}", f"{value:.1f}", f"{value:,.1f}",
+                f"{value:.0f}", f"{value:,.0f}"]
+    return [str(value)]
+
+
+def patch_table(fragment: str, old_rows: List[Any], new_rows: List[Any]) -> Optional[str]:
+    """
+    Render appended rows into the table of a section fragment locally.
+
+    The fragment must be a single table without a chart, whose body has one row per
+    previous record and one cell per field, so that the previous records can be
+    matched to its cells. The format of every column (thousands separators, decimals)
+    is taken from the cells already there, and the new rows copy the attributes of the
+    last row's cells.
+
+    Args:
+        fragment: Stored section fragment
+        old_rows: Records the fragment was generated from
+        new_rows: Current records, starting with ``old_rows``
+
+    Returns:
+        The fragment with the new rows, or None when the table cannot be matched
+    """
+    if not old_rows or _CHART_PATTERN.search(fragment) or len(_TABLE_PATTERN.findall(fragment)) != 1:
+        return None
+    if not all(isinstance(row, dict) for row in new_rows):
+        return None
+    columns = list(old_rows[0])
+    if any(list(row) != columns for row in new_rows):
+        return None
+    bodies = list(_TBODY_PATTERN.finditer(fragment))
+    if len(bodies) != 1:
+        return None
+    body = bodies[0]
+    rows = [_CELL_PATTERN.findall(row) for row in _ROW_PATTERN.findall(body.group(2))]
+    if len(rows) != len(old_rows) or any(len(cells) != len(columns) for cells in rows):
+        return None
+
+    # Pick, per column, the first format that reproduces every existing cell
+    formats = []
+    for index, column in enumerate(columns):
+        texts = [_cell_text(cells[index][2]) for cells in rows]
+        candidates = range(len(_formats(old_rows[0][column])))
+        chosen = next((candidate for candidate in candidates
+                       if all(candidate < len(_formats(record[column]))
+                              and _formats(record[column])[candidate] == text
+                              for record, text in zip(old_rows, texts))), None)
+        if chosen is None:
+            return None
+        formats.append(chosen)
+
+    row_match = list(_ROW_PATTERN.finditer(body.group(2)))[-1]
+    row_open = row_match.group(0)[:row_match.group(0).index(">") + 1]
+    last_cells = rows[-1]
+    added = []
+    for record in new_rows[len(old_rows):]:
+        cells = []
+        for index, column in enumerate(columns):
+            kind, attributes, _ = last_cells[index]
+            candidates = _formats(record[column])
+            text = candidates[formats[index]] if formats[index] < len(candidates) else str(record[column])
+            cells.append(f"<t{kind}{attributes}>{html.escape(text)}</t{kind}>")
+        added.append(f"{row_open}{''.join(cells)}</tr>")
+    patched_body = body.group(1) + body.group(2).rstrip() + "\n" + "\n".join(added) + "\n" + body.group(3)
+    return fragment[:body.start()] + patched_body + fragment[body.end():]
+
+
+def _full_reasons(previous: Optional[Dict[str, Any]], diff: Optional[DatasetDiff], prompt: str, title: str,
+                  max_change: float) -> List[str]:
+    if previous is None:
+        return ["no previous report"]
+    reasons = []
+    if previous.get("prompt") != prompt:
+        reasons.append("the prompt changed")
+    if previous.get("title") != title:
+        reasons.append("the title changed")
+    if diff.context_changed:
+        reasons.append("the shared context changed")
+    if diff.changed_ratio > max_change:
+        reasons.append(f"{diff.changed_ratio:.0%} of the dataset changed (> {max_change:.0%})")
+    return reasons
+
+
+def regenerate_report(client, agent, report_id: str, prompt: str, dataset: Any, title: str,
+                      max_workers: Optional[int] = None, max_change: Optional[float] = None,
+                      **run_options) -> Optional[IncrementalResult]:
+    """
+    Generate a multi-section report, regenerating only the sections whose data changed.
+
+    Args:
+        client: AgentsClient
+        agent: Report builder agent
+        report_id: Identifier of the report whose history is used and updated
+        prompt: Report request
+        dataset: JSON dataset
+        title: Report title
+        max_workers: Concurrent runs (``REPORT_FANOUT_WORKERS``, 4 by default)
+        max_change: Changed share of the dataset above which the whole report is
+            regenerated (``REPORT_INCREMENTAL_MAX_CHANGE``, 0.5 by default)
+        **run_options: Passed on to ``run_agent``
+
+    Returns:
+        The assembled report, the regenerated sections and what was reused or patched,
+        or None when the dataset has fewer than two sections (generate it in a single
+        run instead)
+    """
+    sections, context = split_sections(dataset)
+    if len(sections) < 2:
+        return None
+    max_workers = max_workers or int(os.environ.get("REPORT_FANOUT_WORKERS", DEFAULT_MAX_WORKERS))
+    if max_change is None:
+        max_change = float(os.environ.get("REPORT_INCREMENTAL_MAX_CHANGE", DEFAULT_MAX_CHANGE))
+    start = time.perf_counter()
+
+    previous = load_report(report_id)
+    diff = diff_datasets(previous["dataset"], dataset) if previous else None
+    reasons = _full_reasons(previous, diff, prompt, title, max_change)
+    stored = previous.get("fragments", {}) if previous and not reasons else {}
+    old_data = dict(split_sections(previous["dataset"])[0]) if previous else {}
+    changes = diff.by_name() if diff else {}
+
+    fragments: Dict[str, Optional[str]] = {}
+    reused, patched, pending = [], [], []
+    for name, data in sections:
+        fragment, change = stored.get(name), changes.get(name)
+        if fragment and change and change.status == UNCHANGED:
+            fragments[name] = fragment
+            reused.append(name)
+            continue
+        if fragment and change and change.status == APPENDED:
+            fragments[name] = patch_table(fragment, old_data[name], data)
+            if fragments[name]:
+                patched.append(name)
+                continue
+        pending.append((name, data))
+
+    results = generate_sections(client, agent, prompt, pending, context, max_workers, **run_options) if pending else []
+    for section in results:
+        fragments[section.name] = section.fragment
+    wall_seconds = time.perf_counter() - start
+    if reasons or len(pending) == len(sections):
+        mode = FULL
+    else:
+        mode = PARTIAL if pending or patched else UNCHANGED
+    if not any(fragments.values()):
+        return IncrementalResult(None, results, wall_seconds, mode, reused, patched, diff, reasons)
+
+    notices = {section.name: section_notice(section.name, section.result.error) for section in results}
+    report_html = assemble_report(title, [fragments[name] or notices[name] for name, _ in sections])
+    # Sections that failed are kept without a fragment so that the next report regenerates them
+    save_report(report_id, prompt, title, dataset, fragments, report_html)
+    return IncrementalResult(report_html, results, wall_seconds, mode, reused, patched, diff, reasons)
+
+
+def main():
+    """Command line entry point: list the stored reports, diff a dataset or forget a report."""
+    parser = argparse.ArgumentParser(description="Inspect the history used for incremental report regeneration")
+    parser.add_argument("--list", action="store_true", help="List the stored reports")
+    parser.add_argument("--diff", nargs=2, metavar=("REPORT_ID", "DATASET"),
+                        help="Compare a JSON dataset with the one of the stored report")
+    parser.add_argument("--forget", metavar="REPORT_ID", help="Drop the history of a report")
+    args = parser.parse_args()
+
+    if args.forget:
+        print(f"🗑️  {args.forget} forgotten" if forget_report(args.forget) else f"📭 No history for {args.forget}")
+    if args.diff:
+        report_id, dataset_path = args.diff
+        previous = load_report(report_id)
+        if previous is None:
+            print(f"📭 No history for {report_id}: the report would be generated in full")
+            return
+        with open(dataset_path, encoding="utf-8") as f:
+            dataset = json.load(f)
+        diff = diff_datasets(previous["dataset"], dataset)
+        max_change = float(os.environ.get("REPORT_INCREMENTAL_MAX_CHANGE", DEFAULT_MAX_CHANGE))
+        print(f"🔍 {diff.changed}/{diff.total} rows and keys changed ({diff.changed_ratio:.1%})"
+              f"{', shared context changed' if diff.context_changed else ''}")
+        for section in diff.sections:
+            detail = f" (+{section.appended} rows)" if section.appended else ""
+            print(f"   {section.status:<9} {section.name}: {section.changed}/{section.total}{detail}")
+        reasons = _full_reasons(previous, diff, previous.get("prompt"), previous.get("title"), max_change)
+        print(f"🔁 Full regeneration: {'; '.join(reasons)}" if reasons else "🧩 Incremental regeneration")
+    if args.list or not (args.forget or args.diff):
+        directory = get_state_path(HISTORY_DIR)
+        names = sorted(name for name in os.listdir(directory) if name.endswith(".json")) if os.path.isdir(directory) else []
+        if not names:
+            print("📭 No reports stored yet.")
+        for name in names:
+            report_id = name[:-len(".json")]
+            entry = load_report(report_id)
+            if entry is None:
+                continue
+            generated = sum(1 for fragment in entry["fragments"].values() if fragment)
+            stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["time"]))
+            print(f"📄 {report_id:<32} {stamp}  {generated}/{len(entry['fragments'])} sections  "
+                  f"{len(entry['html'].encode('utf-8')) / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Shared, content-hashed stylesheet of the report template.
+
+Every report built from ``report_template.html`` inlines the same design tokens and
+CSS, so each published report re-ships identical bytes that browsers cannot cache.
+With ``REPORT_SHARED_STYLESHEET=1`` the template CSS is minified and published once
+through FxReportUploader as ``styles_<sha256>.css`` (served with an immutable cache
+policy), and reports link to it instead:
+
+- ``load_html_template`` hands the agent a template whose ``<style>`` block is
+  replaced by the ``<link>``
+- ``link_stylesheet`` removes template rules the model inlined anyway from a
+  generated report and links the stylesheet in their place; rules the model added
+  stay inline after the link, so the cascade is unchanged
+
+The name of the stylesheet is its content hash, so editing the template publishes a
+new version while reports already published keep the one they were built with. The
+URL of every published version is remembered in the state folder, and
+``REPORT_STYLESHEET_URL`` skips publishing for a stylesheet hosted elsewhere (a CDN).
+When publishing fails, reports keep their inline CSS.
+
+Usage:
+    python report_stylesheet.py --publish
+    python report_stylesheet.py --css report.css
+    python report_stylesheet.py --apply report.html
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import threading
+from typing import Dict, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+from tools.html_optimizer import css_statements, minify_css
+from tools.local_state import get_state_path
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_template.html")
+STATE_FILENAME = "report_stylesheet.json"
+_STYLE_PATTERN = re.compile(r"<style\b[^>]*>(.*?)</style\s*>", re.IGNORECASE | re.DOTALL)
+
+_publish_lock = threading.Lock()
+_shared_stylesheet: Optional[Tuple[str, Optional[str]]] = None  # (css, url)
+
+
+def shared_stylesheet_enabled() -> bool:
+    """Check the ``REPORT_SHARED_STYLESHEET`` environment switch (off by default)."""
+    return os.environ.get("REPORT_SHARED_STYLESHEET", "0").lower() in ("1", "true", "yes")
+
+
+def template_stylesheet(template_path: str = TEMPLATE_PATH) -> str:
+    """Return the minified CSS of the template's style blocks."""
+    with open(template_path, encoding="utf-8") as f:
+        template = f.read()
+    return minify_css("\n".join(_STYLE_PATTERN.findall(template)))
+
+
+def stylesheet_version(css: str) -> str:
+    """Content hash identifying a version of the stylesheet."""
+    return hashlib.sha256(css.encode("utf-8")).hexdigest()
+
+
+def _load_published() -> Dict[str, str]:
+    try:
+        with open(get_state_path(STATE_FILENAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def publish_stylesheet(css: str, client=None) -> Optional[str]:
+    """
+    Publish a stylesheet unless this version already was.
+
+    Args:
+        css: Style sheet text
+        client: ``PublisherClient`` to upload with (a single-connection one by default)
+
+    Returns:
+        URL of the stylesheet, or None if it could not be published
+    """
+    override = os.environ.get("REPORT_STYLESHEET_URL")
+    if override:
+        return override
+    version = stylesheet_version(css)
+    with _publish_lock:
+        published = _load_published()
+        if version in published:
+            return published[version]
+        from tools.publisher_client import PublisherClient
+        owned = client is None
+        client = client or PublisherClient(max_connections=1)
+        try:
+            result = client.upload_stylesheet(css)
+        finally:
+            if owned:
+                client.close()
+        if not result.ok:
+            return None
+        published[version] = result.url
+        path = get_state_path(STATE_FILENAME)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(published, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+        return result.url
+
+
+def shared_stylesheet() -> Optional[Tuple[str, str]]:
+    """
+    Return the template CSS and its published URL when the shared stylesheet is enabled.
+
+    The template is read and the stylesheet published at most once per process.
+    """
+    global _shared_stylesheet
+    if not shared_stylesheet_enabled():
+        return None
+    if _shared_stylesheet is None:
+        css = template_stylesheet()
+        _shared_stylesheet = (css, publish_stylesheet(css))
+    css, url = _shared_stylesheet
+    return (css, url) if url else None
+
+
+def link_stylesheet(report_html: str, url: str, css: str) -> Tuple[str, int]:
+    """
+    Replace the inline copies of a shared stylesheet's rules with a link to it.
+
+    Args:
+        report_html: Complete HTML document
+        url: URL of the shared stylesheet
+        css: Minified text of the shared stylesheet
+
+    Returns:
+        Tuple of (document, number of inline rules removed)
+    """
+    shared = set(css_statements(css))
+    link = f'<link rel="stylesheet" href="{html.escape(url, quote=True)}">'
+    linked = url in report_html
+    removed = 0
+
+    def strip_shared_rules(match: re.Match) -> str:
+        nonlocal linked, removed
+        statements = css_statements(minify_css(match.group(1)))
+        kept = [statement for statement in statements if statement not in shared]
+        if len(kept) == len(statements):
+            return match.group(0)
+        removed += len(statements) - len(kept)
+        prefix = "" if linked else link
+        linked = True
+        if not kept:
+            return prefix
+        open_tag = match.group(0)[:match.group(0).index(">") + 1]
+        return f"{prefix}{open_tag}{''.join(kept)}</style>"
+
+    return _STYLE_PATTERN.sub(strip_shared_rules, report_html), removed
+
+
+def main():
+    """Command line entry point: publish the stylesheet or link reports to it."""
+    parser = argparse.ArgumentParser(description="Publish the report template CSS as a shared stylesheet")
+    parser.add_argument("--publish", action="store_true", help="Publish the stylesheet and print its URL")
+    parser.add_argument("--css", help="Write the minified stylesheet to this file")
+    parser.add_argument("--apply", nargs="+", help="Link these report files to the published stylesheet (in place)")
+    args = parser.parse_args()
+
+    css = template_stylesheet()
+    print(f"🎨 Template stylesheet {stylesheet_version(css)[:12]}: {len(css.encode('utf-8')) / 1024:.1f} KB")
+    if args.css:
+        with open(args.css, "w", encoding="utf-8") as f:
+            f.write(css)
+        print(f"💾 Written to {args.css}")
+    if not (args.publish or args.apply):
+        return
+    url = publish_stylesheet(css)
+    if not url:
+        print("❌ The stylesheet could not be published")
+        sys.exit(1)
+    print(f"✅ Published: {url}")
+    for path in args.apply or []:
+        with open(path, encoding="utf-8") as f:
+            report_html, removed = link_stylesheet(f.read(), url, css)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(report_html)
+        print(f"🔗 {os.path.basename(path)}: {removed} inline rules replaced by the shared stylesheet")
+
+
+if __name__ == "__main__":
+    main()
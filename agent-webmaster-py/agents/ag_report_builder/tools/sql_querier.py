@@ -0,0 +1,492 @@
+"""
+SQL querier function tool for the report builder.
+
+``query_database`` runs a T-SQL query on a pluggable backend and hands the model a
+bounded summary of the result instead of the raw result set:
+
+- rows are consumed one at a time from the backend (a database cursor, or the
+  FxSqlQuerier response parsed incrementally while it downloads), so memory stays flat
+  whatever the size of the result
+- reading stops at ``SQL_QUERIER_MAX_ROWS`` rows or ``SQL_QUERIER_MAX_BYTES`` bytes
+  of row data, and the summary says the result was truncated
+- small results are returned whole; larger ones as per-column statistics (count,
+  nulls, min, max, sum, mean, distinct values, most frequent values), the first rows
+  and a uniform random sample of ``SQL_QUERIER_SAMPLE_ROWS`` rows
+
+Backends (``SQL_QUERIER_BACKEND``, or the first one configured):
+
+- ``odbc``: SQL Server through ``pyodbc`` with ``SQLQUERIER_CONNECTION_STRING`` (the
+  same variable as the FxSqlQuerier function)
+- ``function``: the FxSqlQuerier function at ``SQL_QUERIER_URL`` (full URL with code)
+- ``sqlite``: a local SQLite database, ``SQL_QUERIER_SQLITE_PATH`` or an in-memory
+  copy seeded from the ``misc/`` scripts in ``SQL_QUERIER_SQLITE_SCRIPTS`` (see
+  ``tools.tsql_sqlite``), for tests and offline runs
+
+``set_query_backend`` replaces the backend, e.g. with a SQLite database in tests.
+
+Only a single SELECT (or WITH ... SELECT) statement is run: any other batch is
+rejected with an ``error`` result before it reaches the backend. Results are cached
+by ``tools.query_cache``.
+"""
+
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import urllib.request
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from tools.query_cache import ResultCapture, cache_bypassed, get_query_cache, is_read_query, make_query_key
+from tools.tsql_sqlite import connect, load_scripts, split_statements, translate
+
+MAX_ROWS = int(os.environ.get("SQL_QUERIER_MAX_ROWS", "100000"))
+MAX_BYTES = int(os.environ.get("SQL_QUERIER_MAX_BYTES", str(50 * 1024 * 1024)))
+SAMPLE_ROWS = int(os.environ.get("SQL_QUERIER_SAMPLE_ROWS", "50"))
+HEAD_ROWS = 10
+MAX_DISTINCT = 1000  # Distinct values tracked per column before counting stops
+TOP_VALUES = 5
+
+
+class QueryBackend:
+    """A database that runs a query and streams its rows."""
+
+    name = "backend"
+
+    @property
+    def identity(self) -> str:
+        """Identify the database, so query results of different databases are cached apart."""
+        return self.name
+
+    def execute(self, sql: str, parameters: Optional[Sequence[Any]] = None) -> Tuple[List[str], Iterator[Sequence[Any]]]:
+        """
+        Run a query.
+
+        Args:
+            sql: T-SQL query, with ``?`` placeholders for the parameters
+            parameters: Values of the placeholders
+
+        Returns:
+            Tuple of (column names, iterator over the rows); closing the iterator
+            early must release the underlying cursor or response
+        """
+        raise NotImplementedError
+
+
+class SqliteBackend(QueryBackend):
+    """
+    SQLite database queried with translated T-SQL.
+
+    Args:
+        path: Database file, or None for an in-memory copy seeded from the scripts
+        scripts: T-SQL scripts seeding the in-memory database
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: Optional[str] = None, scripts: Sequence[str] = ("db_structure.sql", "tech_sample_seed.sql")):
+        self.path = path
+        self.scripts = tuple(scripts)
+        self._connection = connect(path or ":memory:", check_same_thread=False)
+        if path is None:
+            load_scripts(self._connection, scripts)
+        self._lock = threading.Lock()
+
+    @property
+    def identity(self) -> str:
+        # In-memory copies seeded from the same scripts hold the same data
+        return f"sqlite:{os.path.abspath(self.path) if self.path else 'seed:' + ','.join(self.scripts)}"
+
+    def execute(self, sql: str, parameters: Optional[Sequence[Any]] = None) -> Tuple[List[str], Iterator[Sequence[Any]]]:
+        statements = split_statements(translate(sql))
+        if not statements:
+            raise ValueError("The query is empty")
+        self._lock.acquire()
+        try:
+            for statement in statements[:-1]:
+                self._connection.execute(statement)
+            cursor = self._connection.execute(statements[-1], tuple(parameters or ()))
+        except Exception:
+            self._lock.release()
+            raise
+        columns = [column[0] for column in cursor.description or []]
+
+        def _rows():
+            try:
+                while True:
+                    batch = cursor.fetchmany(500)
+                    if not batch:
+                        return
+                    yield from batch
+            finally:
+                cursor.close()
+                self._lock.release()
+
+        return columns, _rows()
+
+
+class OdbcBackend(QueryBackend):
+    """
+    SQL Server through ``pyodbc`` (an optional dependency).
+
+    Args:
+        connection_string: ODBC connection string
+    """
+
+    name = "odbc"
+
+    def __init__(self, connection_string: str):
+        try:
+            import pyodbc
+        except ImportError as e:
+            raise ImportError("The odbc SQL querier backend needs the 'pyodbc' package") from e
+        self._pyodbc = pyodbc
+        self.connection_string = connection_string
+
+    @property
+    def identity(self) -> str:
+        # Hashed so the credentials of the connection string never reach the cache
+        return "odbc:" + hashlib.sha256(self.connection_string.encode("utf-8")).hexdigest()
+
+    def execute(self, sql: str, parameters: Optional[Sequence[Any]] = None) -> Tuple[List[str], Iterator[Sequence[Any]]]:
+        connection = self._pyodbc.connect(self.connection_string)
+        cursor = connection.cursor()
+        try:
+            cursor.execute(sql, *(parameters or ()))
+            while cursor.description is None and cursor.nextset():
+                pass  # Skip the row counts of leading statements
+        except Exception:
+            connection.close()
+            raise
+        columns = [column[0] for column in cursor.description or []]
+
+        def _rows():
+            try:
+                while True:
+                    batch = cursor.fetchmany(500)
+                    if not batch:
+                        return
+                    yield from batch
+            finally:
+                connection.close()
+
+        return columns, _rows()
+
+
+def _iter_json_array(chunks: Iterator[str]) -> Iterator[Any]:
+    """Decode the items of a JSON array as its text arrives, holding one item at a time."""
+    decoder = json.JSONDecoder()
+    buffer, started = "", False
+    for chunk in chunks:
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if not started:
+                if position >= len(buffer):
+                    break
+                if buffer[position] != "[":
+                    raise ValueError(f"Expected a JSON array, got: {buffer[position:position + 200]}")
+                started = True
+                position += 1
+                continue
+            if position >= len(buffer) or buffer[position] == "]":
+                break
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break  # Item not complete yet
+            yield item
+        buffer = buffer[position:]
+
+
+class FunctionBackend(QueryBackend):
+    """
+    The FxSqlQuerier Azure Function, its JSON response parsed while it downloads.
+
+    Args:
+        url: Function URL including the ``code`` query parameter
+        timeout: Request timeout in seconds
+    """
+
+    name = "function"
+
+    def __init__(self, url: str, timeout: float = 120):
+        self.url = url
+        self.timeout = timeout
+
+    @property
+    def identity(self) -> str:
+        return "function:" + self.url.split("?", 1)[0]
+
+    def execute(self, sql: str, parameters: Optional[Sequence[Any]] = None) -> Tuple[List[str], Iterator[Sequence[Any]]]:
+        if parameters:
+            raise ValueError("The FxSqlQuerier function does not take query parameters")
+        request = urllib.request.Request(
+            self.url, data=sql.encode("utf-8"), headers={"Content-Type": "text/plain"}, method="POST"
+        )
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"FxSqlQuerier returned HTTP {e.code}: {e.read().decode('utf-8', errors='replace')}") from e
+
+        def _chunks():
+            while True:
+                chunk = response.read(64 * 1024)
+                if not chunk:
+                    return
+                yield chunk.decode("utf-8", errors="replace")
+
+        items = _iter_json_array(_chunks())
+        try:
+            first = next(items, None)
+        except Exception:
+            response.close()
+            raise
+        columns = list(first.keys()) if isinstance(first, dict) else []
+
+        def _rows():
+            try:
+                if first is None:
+                    return
+                yield tuple(first.get(column) for column in columns)
+                for item in items:
+                    yield tuple(item.get(column) for column in columns)
+            finally:
+                response.close()
+
+        return columns, _rows()
+
+
+class _ColumnStats:
+    """Running statistics of one column, in constant memory."""
+
+    def __init__(self):
+        self.count = 0
+        self.nulls = 0
+        self.numeric_count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.values: Counter = Counter()
+        self.distinct_overflow = False
+
+    def add(self, value: Any) -> None:
+        self.count += 1
+        if value is None:
+            self.nulls += 1
+            return
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.numeric_count += 1
+            self.total += value
+        try:
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+        except TypeError:
+            pass  # Mixed types: min and max stay on the first type seen
+        key = value if isinstance(value, (str, int, float, bool)) else str(value)
+        if key in self.values or len(self.values) < MAX_DISTINCT:
+            self.values[key] += 1
+        else:
+            self.distinct_overflow = True
+
+    def summary(self) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {"nulls": self.nulls}
+        if self.minimum is not None:
+            summary["min"] = _json_value(self.minimum)
+            summary["max"] = _json_value(self.maximum)
+        if self.numeric_count and self.numeric_count == self.count - self.nulls:
+            summary["sum"] = round(self.total, 4)
+            summary["mean"] = round(self.total / self.numeric_count, 4)
+        summary["distinct"] = f"{MAX_DISTINCT}+" if self.distinct_overflow else len(self.values)
+        if not self.distinct_overflow or self.numeric_count == 0:
+            summary["top_values"] = [[_json_value(value), count] for value, count in self.values.most_common(TOP_VALUES)]
+        return summary
+
+
+def _json_value(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, bytes):
+        return value.hex()
+    try:
+        return float(value) if type(value).__name__ == "Decimal" else str(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+class ResultSummarizer:
+    """
+    Consume a row stream into a bounded summary.
+
+    Args:
+        columns: Column names
+        max_rows: Rows read before the result is truncated
+        max_bytes: Bytes of row data read before the result is truncated
+        sample_rows: Rows returned whole, and size of the random sample of larger results
+        seed: Seed of the sampling
+    """
+
+    def __init__(self, columns: List[str], max_rows: int = MAX_ROWS, max_bytes: int = MAX_BYTES,
+                 sample_rows: int = SAMPLE_ROWS, seed: int = 0):
+        self.columns = columns
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.sample_rows = sample_rows
+        self.row_count = 0
+        self.byte_count = 0
+        self.truncated_reason: Optional[str] = None
+        self.head: List[Sequence[Any]] = []
+        self.sample: List[Sequence[Any]] = []
+        self.stats = [_ColumnStats() for _ in columns]
+        self._rng = random.Random(seed)
+
+    def add(self, row: Sequence[Any]) -> bool:
+        """Add a row; returns False once a cap is reached and reading must stop."""
+        if self.row_count >= self.max_rows:
+            self.truncated_reason = f"row cap of {self.max_rows} rows"
+            return False
+        size = sum(len(str(value)) for value in row) + len(row)
+        if self.byte_count + size > self.max_bytes:
+            self.truncated_reason = f"byte cap of {self.max_bytes} bytes"
+            return False
+        self.row_count += 1
+        self.byte_count += size
+        for column_stats, value in zip(self.stats, row):
+            column_stats.add(value)
+        if len(self.head) < HEAD_ROWS:
+            self.head.append(row)
+        # Reservoir sampling keeps a uniform sample of every row seen so far
+        if len(self.sample) < self.sample_rows:
+            self.sample.append(row)
+        else:
+            index = self._rng.randrange(self.row_count)
+            if index < self.sample_rows:
+                self.sample[index] = row
+        return True
+
+    def _records(self, rows: List[Sequence[Any]]) -> List[Dict[str, Any]]:
+        return [{column: _json_value(value) for column, value in zip(self.columns, row)} for row in rows]
+
+    def result(self) -> Dict[str, Any]:
+        """Get the summary handed to the model."""
+        result: Dict[str, Any] = {
+            "columns": self.columns,
+            "row_count": self.row_count,
+            "truncated": self.truncated_reason is not None,
+        }
+        if self.truncated_reason:
+            result["truncated_reason"] = (
+                f"Stopped reading at the {self.truncated_reason}; aggregate in SQL (GROUP BY, TOP) for exact figures"
+            )
+        if self.row_count <= self.sample_rows and not self.truncated_reason:
+            result["rows"] = self._records(self.sample)
+            return result
+        result["column_stats"] = {column: stats.summary() for column, stats in zip(self.columns, self.stats)}
+        result["first_rows"] = self._records(self.head)
+        result["sample_rows"] = self._records(self.sample)
+        return result
+
+
+def summarize_rows(columns: List[str], rows: Iterator[Sequence[Any]], **caps) -> Dict[str, Any]:
+    """
+    Stream rows into a ``ResultSummarizer``, closing the row iterator at a cap.
+
+    Args:
+        columns: Column names
+        rows: Row iterator from ``QueryBackend.execute``
+        **caps: ``max_rows``, ``max_bytes``, ``sample_rows`` overrides
+
+    Returns:
+        The summary dictionary
+    """
+    summarizer = ResultSummarizer(columns, **caps)
+    try:
+        for row in rows:
+            if not summarizer.add(row):
+                break
+    finally:
+        close = getattr(rows, "close", None)
+        if close is not None:
+            close()
+    return summarizer.result()
+
+
+_backend: Optional[QueryBackend] = None
+_backend_lock = threading.Lock()
+
+
+def set_query_backend(backend: Optional[QueryBackend]) -> None:
+    """Replace the backend used by ``query_database`` (None restores the configured one)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def get_query_backend() -> QueryBackend:
+    """Get the backend configured by the ``SQL_QUERIER_*`` variables."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            kind = os.environ.get("SQL_QUERIER_BACKEND", "").lower()
+            if not kind:
+                if os.environ.get("SQLQUERIER_CONNECTION_STRING"):
+                    kind = "odbc"
+                elif os.environ.get("SQL_QUERIER_URL"):
+                    kind = "function"
+                else:
+                    kind = "sqlite"
+            if kind == "odbc":
+                _backend = OdbcBackend(os.environ["SQLQUERIER_CONNECTION_STRING"])
+            elif kind == "function":
+                _backend = FunctionBackend(os.environ["SQL_QUERIER_URL"])
+            elif kind == "sqlite":
+                scripts = os.environ.get("SQL_QUERIER_SQLITE_SCRIPTS", "db_structure.sql,tech_sample_seed.sql")
+                _backend = SqliteBackend(
+                    os.environ.get("SQL_QUERIER_SQLITE_PATH") or None,
+                    [script.strip() for script in scripts.split(",") if script.strip()],
+                )
+            else:
+                raise ValueError(f"Unknown SQL_QUERIER_BACKEND '{kind}' (expected odbc, function or sqlite)")
+        return _backend
+
+
+def query_database(sql: str, parameters: Optional[List[Any]] = None) -> str:
+    """
+    Run a read-only T-SQL query on the sales database and summarize the result.
+
+    Args:
+        sql: T-SQL SELECT query (tables dbo.Products, dbo.Sales, dbo.SaleItems), with ``?``
+            placeholders for the parameters
+        parameters: Values of the placeholders
+
+    Returns:
+        JSON with the columns and row count, plus all rows for small results, or column
+        statistics, the first rows and a random sample for larger ones; an ``error``
+        key if the query failed or is not a single SELECT statement
+    """
+    if not is_read_query(sql):
+        return json.dumps({"error": "Only a single read-only SELECT (or WITH ... SELECT) statement is allowed"})
+    try:
+        backend = get_query_backend()
+        cache = None if cache_bypassed() else get_query_cache()
+        key = make_query_key(backend.identity, sql, parameters) if cache else None
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            summary = summarize_rows(cached[0], iter(cached[1]))
+            summary["cached"] = True
+        else:
+            columns, rows = backend.execute(sql, parameters)
+            capture = ResultCapture()
+            summary = summarize_rows(columns, capture.wrap(rows) if cache else rows)
+            if cache and capture.rows is not None and not summary["truncated"]:
+                cache.put(key, sql, columns, capture.rows)
+    except (sqlite3.Error, RuntimeError, ValueError, OSError) as e:
+        return json.dumps({"error": f"Error executing SQL query: {e}"})
+    print(f"Query returned {summary['row_count']} rows{' (cached)' if summary.get('cached') else ''}")
+    return json.dumps(summary, default=str)
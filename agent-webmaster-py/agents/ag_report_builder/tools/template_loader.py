@@ -1,9 +1,14 @@
 import os
 from typing import Optional
 
+from tools.report_stylesheet import link_stylesheet, shared_stylesheet
+
 def load_html_template(template_name: str = "report_template.html") -> Optional[str]:
     """
     Load HTML template content from the tools folder.
+
+    When the shared stylesheet is enabled, the report template links to it instead of
+    inlining its CSS.
     
     Args:
         template_name: Name of the template file to load
@@ -27,7 +32,13 @@ def load_html_template(template_name: str = "report_template.html") -> Optional[
         print("Template loaded successfully")
         # Read and return the template content
         with open(template_path, 'r', encoding='utf-8') as f:
-            return f.read()
+            content = f.read()
+
+        shared = shared_stylesheet() if template_name == "report_template.html" else None
+        if shared:
+            css, url = shared
+            content, _ = link_stylesheet(content, url, css)
+        return content
             
     except FileNotFoundError:
         raise
@@ -0,0 +1,110 @@
+"""Tests of the drill-down cube: aggregation, compact encoding and report embedding."""
+
+import json
+
+import pytest
+
+from tools import sql_querier
+from tools.drilldown_cube import (
+    NO_PROMOTION,
+    build_cube,
+    build_drilldown_cube,
+    cube_id,
+    embed_drilldowns,
+    encode_cube,
+    load_cube,
+    save_cube,
+)
+from tools.sql_querier import SqliteBackend
+from tools.tsql_sqlite import connect
+
+_SCHEMA = """
+CREATE TABLE Products (ProductID INTEGER PRIMARY KEY, ProductName TEXT);
+CREATE TABLE Sales (SaleID INTEGER PRIMARY KEY, SaleDate TEXT);
+CREATE TABLE SaleItems (SaleID INTEGER, ProductID INTEGER, Quantity INTEGER, LineTotal REAL);
+CREATE TABLE Promotions (PromotionID INTEGER PRIMARY KEY, Name TEXT, Description TEXT, StartDate TEXT, EndDate TEXT);
+CREATE TABLE HolidayCalendar (HolidayDate TEXT, Description TEXT);
+CREATE TABLE Reviews (ProductID INTEGER, Rating INTEGER);
+INSERT INTO Products VALUES (1, 'Laptop'), (2, 'Mouse');
+INSERT INTO Sales VALUES (1, '2024-05-01 10:00:00'), (2, '2024-05-01 15:00:00'), (3, '2024-05-09 09:00:00');
+INSERT INTO SaleItems VALUES (1, 1, 1, 1000), (1, 2, 2, 40), (2, 2, 1, 20), (3, 1, 2, 1800);
+INSERT INTO Promotions VALUES (1, 'Spring deals', 'Mouse bundle', '2024-04-01', '2024-05-31'),
+                              (2, 'Laptop week', NULL, '2024-05-06', '2024-05-12');
+INSERT INTO HolidayCalendar VALUES ('2024-05-01', 'Labour Day');
+INSERT INTO Reviews VALUES (1, 5), (1, 4), (2, 3);
+"""
+
+
+@pytest.fixture(scope="module")
+def backend(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("drilldown") / "sales.db")
+    connection = connect(path)
+    connection.executescript(_SCHEMA)
+    connection.close()
+    return SqliteBackend(path)
+
+
+def test_sale_lines_are_aggregated_by_date_product_and_promotion(backend):
+    cube = build_cube(backend)
+
+    assert (cube["revenue"], cube["quantity"], cube["orders"]) == (2860.0, 6, 3)
+    may_first = cube["children"]["2024-05-01"]
+    assert (may_first["revenue"], may_first["orders"]) == (1060.0, 2)
+    assert may_first["children"]["Mouse"] == {
+        "revenue": 60.0, "quantity": 3, "orders": 2,
+        "children": {"Spring deals": {"revenue": 60.0, "quantity": 3, "orders": 2}},
+    }
+    assert list(may_first["children"]["Laptop"]["children"]) == [NO_PROMOTION]
+    assert list(cube["children"]["2024-05-09"]["children"]["Laptop"]["children"]) == ["Laptop week"]
+    assert cube["holidays"] == {"2024-05-01": "Labour Day"}
+    assert cube["ratings"] == {"Laptop": [4.5, 2], "Mouse": [3.0, 1]}
+
+
+@pytest.mark.parametrize("grain, keys", [("week", ["2024-W18", "2024-W19"]), ("month", ["2024-05"])])
+def test_dates_are_bucketed_by_grain(backend, grain, keys):
+    cube = build_cube(backend, grain)
+    assert list(cube["children"]) == keys
+    assert cube["revenue"] == 2860.0
+
+
+def test_unknown_grain_is_rejected(backend):
+    with pytest.raises(ValueError, match="Unknown date grain 'year'"):
+        build_cube(backend, "year")
+
+
+def test_encoded_cube_stores_each_value_once(backend):
+    encoded = encode_cube(build_cube(backend))
+
+    assert encoded["dims"]["date"] == ["2024-05-01", "2024-05-09"]
+    assert sorted(encoded["dims"]["product"]) == ["Laptop", "Mouse"]
+    assert encoded["root"][:4] == [None, 2860.0, 6, 3]
+    first_day = encoded["root"][4][0]
+    # Products of a date are ordered by revenue, largest first
+    assert [encoded["dims"]["product"][child[0]] for child in first_day[4]] == ["Laptop", "Mouse"]
+    assert encoded["notes"]["date"] == {0: "Labour Day"}
+    assert cube_id(encoded) == cube_id(json.loads(json.dumps(encoded, sort_keys=True)))
+
+
+def test_placeholders_are_replaced_with_the_widget(backend):
+    encoded = encode_cube(build_cube(backend))
+    identifier = save_cube(encoded)
+    assert load_cube(identifier) == json.loads(json.dumps(encoded))
+    assert load_cube("0" * 16) is None
+
+    report = (f"<html><body><!-- DRILLDOWN:{identifier} -->\n<!-- DRILLDOWN:{'0' * 16} --></body></html>")
+    embedded = embed_drilldowns(report)
+    assert f'data-cube="drilldown-cube-{identifier}"' in embedded
+    assert f"<!-- DRILLDOWN:{'0' * 16} -->" in embedded
+    assert embedded.count("<style>") == 1 and embedded.index("<script>\n(function") < embedded.index("</body>")
+    assert embed_drilldowns("<html><body></body></html>") == "<html><body></body></html>"
+
+
+def test_function_tool_returns_the_placeholder_and_top_members(backend, monkeypatch):
+    monkeypatch.setattr(sql_querier, "_backend", backend)
+    result = json.loads(build_drilldown_cube("month"))
+
+    assert result["placeholder"].startswith("<!-- DRILLDOWN:")
+    assert result["totals"] == {"revenue": 2860.0, "quantity": 6, "orders": 3}
+    assert result["top_products"] == [["Laptop", 2800.0], ["Mouse", 60.0]]
+    assert result["top_promotions"][0] == ["Laptop week", 1800.0]
+    assert "error" in json.loads(build_drilldown_cube("year"))
@@ -0,0 +1,192 @@
+"""Tests of the SQL query cache: keys, table extraction, the columnar codec and the store."""
+
+import json
+
+import pytest
+
+from tools import query_cache
+from tools.query_cache import (
+    ALL_TABLES,
+    QueryCache,
+    ResultCapture,
+    decode_result,
+    encode_result,
+    is_cacheable,
+    is_read_query,
+    make_query_key,
+    normalize_sql,
+    read_tables,
+    written_tables,
+)
+from tools.sql_querier import SqliteBackend, query_database, set_query_backend
+
+COLUMNS = ["id", "region"]
+ROWS = [(1, "North"), (2, "South")]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return QueryCache(str(tmp_path / "query_cache.db"))
+
+
+# --- Keys and classification ---
+
+def test_normalize_sql_ignores_spelling_but_keeps_literals():
+    assert normalize_sql("SELECT  *\nFROM Sales -- all rows\nWHERE Region = 'North';") == \
+        normalize_sql("select * from sales where region='North'")
+    assert normalize_sql("SELECT * FROM Sales WHERE Region = 'North'") != \
+        normalize_sql("SELECT * FROM Sales WHERE Region = 'NORTH'")
+
+
+def test_make_query_key_depends_on_backend_and_parameters():
+    key = make_query_key("sqlite:a", "SELECT * FROM t WHERE id = ?", [1])
+    assert key == make_query_key("sqlite:a", "select * from t where id=?", [1])
+    assert key != make_query_key("sqlite:b", "SELECT * FROM t WHERE id = ?", [1])
+    assert key != make_query_key("sqlite:a", "SELECT * FROM t WHERE id = ?", [2])
+
+
+def test_read_and_written_tables():
+    assert read_tables("SELECT * FROM [dbo].[Sales] s JOIN Regions r ON s.r = r.id") == {"dbo.sales", "dbo.regions"}
+    assert read_tables("SELECT 'FROM Secret' AS text FROM Sales") == {"dbo.sales"}
+    assert written_tables("UPDATE Sales SET x = 1; INSERT INTO audit.Log VALUES (1)") == {"dbo.sales", "audit.log"}
+    assert written_tables("SELECT * INTO #tmp FROM Sales") == {"dbo.#tmp"}
+    assert written_tables("SELECT 'UPDATE Sales SET x = 1' AS text") == set()
+
+
+@pytest.mark.parametrize("sql, tables", [
+    ("SELECT * FROM Sales s, dbo.Regions AS r, audit.Log WHERE s.r = r.id", {"dbo.sales", "dbo.regions", "audit.log"}),
+    ("SELECT * FROM Sales WITH (NOLOCK),\n Regions ORDER BY 1", {"dbo.sales", "dbo.regions"}),
+    ("SELECT * FROM (SELECT id FROM Orders) o, Customers c WHERE o.id IN (SELECT id FROM Returns)",
+     {"dbo.orders", "dbo.customers", "dbo.returns"}),
+    ("SELECT * FROM Sales s JOIN (Regions r LEFT JOIN Zones z ON r.z = z.id) ON s.r = r.id",
+     {"dbo.sales", "dbo.regions", "dbo.zones"}),
+    ("WITH recent AS (SELECT * FROM Sales), r2(x) AS (SELECT 1 FROM Regions) SELECT * FROM recent, r2",
+     {"dbo.sales", "dbo.regions"}),
+    ("SELECT * FROM (VALUES (1), (2)) AS v(x), Sales", {"dbo.sales"}),
+    ("SELECT 1", set()),
+    ("SELECT * FROM dbo.SalesFor(2024) f", {ALL_TABLES}),
+    ("SELECT * FROM Sales s CROSS APPLY OPENJSON(s.Tags) t", {"dbo.sales", ALL_TABLES}),
+    ("SELECT * FROM @recent", {ALL_TABLES}),
+])
+def test_read_tables_covers_from_lists_and_subqueries(sql, tables):
+    assert read_tables(sql) == tables
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM Sales", True),
+    ("WITH t AS (SELECT 1 AS x) SELECT x FROM t", True),
+    ("SELECT 1; SELECT 2", True),
+    ("UPDATE Sales SET x = 1", False),
+    ("SELECT * INTO Copy FROM Sales", False),
+    ("", False),
+])
+def test_is_cacheable(sql, expected):
+    assert is_cacheable(sql) is expected
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM Sales", True),
+    ("WITH t AS (SELECT 1 AS x) SELECT x FROM t", True),
+    ("SELECT 'a;b' AS text;", True),
+    ("UPDATE Sales SET x = 1", False),
+    ("SELECT 1; SELECT 2", False),
+    ("SELECT 1; DROP TABLE Sales", False),
+    ("WITH t AS (SELECT 1 AS x) DELETE FROM Sales", False),
+    ("SELECT * INTO Copy FROM Sales", False),
+    ("", False),
+])
+def test_is_read_query(sql, expected):
+    assert is_read_query(sql) is expected
+
+
+# --- Columnar result codec ---
+
+def test_result_codec_round_trip():
+    columns = ["id", "name", "amount", "active", "note"]
+    rows = [(1, "North", 12.5, True, None), (2, "Süd", -3.0, False, "x"), (None, "", 0.0, None, "y")]
+    assert decode_result(encode_result(columns, rows)) == (columns, rows)
+
+
+def test_result_codec_empty_and_large_integers():
+    assert decode_result(encode_result(["a"], [])) == (["a"], [])
+    rows = [(2 ** 40,), (-(2 ** 40),)]
+    assert decode_result(encode_result(["big"], rows)) == (["big"], rows)
+
+
+def test_result_capture_gives_up_on_large_results():
+    capture = ResultCapture(max_bytes=20)
+    assert list(capture.wrap(iter(ROWS))) == ROWS
+    assert capture.rows == ROWS
+
+    capture = ResultCapture(max_bytes=10)
+    assert list(capture.wrap(iter(ROWS))) == ROWS
+    assert capture.rows is None
+
+
+# --- Store ---
+
+def test_put_get_and_stats(cache):
+    assert cache.get("key") is None
+    cache.put("key", "SELECT id, region FROM Sales", COLUMNS, ROWS)
+    assert cache.get("key") == (COLUMNS, ROWS)
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["rows"], stats["hits"], stats["misses"]) == (1, 2, 1, 1)
+    assert stats["hit_rate"] == 0.5
+    assert stats["tables"] == {"dbo.sales": 1}
+
+
+def test_entries_expire(tmp_path):
+    cache = QueryCache(str(tmp_path / "query_cache.db"), ttl_seconds=-1)
+    cache.put("key", "SELECT * FROM Sales", COLUMNS, ROWS)
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    size = len(encode_result(COLUMNS, ROWS))
+    cache.max_bytes = 2 * size
+    cache.put("a", "SELECT * FROM Sales", COLUMNS, ROWS)
+    cache.put("b", "SELECT * FROM Sales", COLUMNS, ROWS)
+    cache.get("a")
+    cache.put("c", "SELECT * FROM Sales", COLUMNS, ROWS)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_invalidation_drops_the_entries_reading_a_table(cache):
+    cache.put("sales", "SELECT * FROM Sales", COLUMNS, ROWS)
+    cache.put("join", "SELECT * FROM Products p JOIN dbo.SaleItems i ON p.id = i.product", COLUMNS, ROWS)
+    assert cache.invalidate_tables(["[dbo].[SaleItems]"]) == 1
+    assert cache.get("join") is None and cache.get("sales") is not None
+    assert cache.invalidate_tables([]) == 0
+    assert cache.stats()["invalidations"] == 1
+    assert cache.clear() == 1
+
+
+def test_entries_reading_unknown_tables_are_dropped_by_any_invalidation(cache):
+    cache.put("comma", "SELECT * FROM Products p, dbo.SaleItems i WHERE p.id = i.product", COLUMNS, ROWS)
+    cache.put("function", "SELECT * FROM dbo.TopProducts(10)", COLUMNS, ROWS)
+    cache.put("regions", "SELECT * FROM Regions", COLUMNS, ROWS)
+    assert cache.stats()["tables"] == {ALL_TABLES: 1, "dbo.products": 1, "dbo.regions": 1, "dbo.saleitems": 1}
+
+    assert cache.invalidate_tables(["SaleItems"]) == 2
+    assert cache.get("comma") is None and cache.get("function") is None
+    assert cache.get("regions") is not None
+
+
+def test_query_database_serves_repeated_queries_from_the_cache(cache, monkeypatch):
+    monkeypatch.setattr(query_cache, "_query_cache", cache)
+    set_query_backend(SqliteBackend())
+    try:
+        sql = "SELECT ProductID FROM dbo.Products WHERE ProductID <= ? ORDER BY ProductID"
+        first = json.loads(query_database(sql, [3]))
+        second = json.loads(query_database(sql.lower(), [3]))
+        assert "cached" not in first and second.pop("cached") is True
+        assert second == first
+        assert "cached" not in json.loads(query_database(sql, [2]))
+
+        assert cache.invalidate_tables(["dbo.Products"]) == 2
+        assert "cached" not in json.loads(query_database(sql, [3]))
+    finally:
+        set_query_backend(None)
@@ -0,0 +1,115 @@
+"""Tests of the section fan-out: splitting, fragment extraction, assembly and concurrent runs."""
+
+import dataclasses
+import re
+
+import pytest
+
+import tools.report_fanout as report_fanout
+from tools.fake_agents_client import AgentScript, FakeAgentsClient, Latency
+from tools.model_router import ADVANCED, FAST, load_routing_log, route_request
+from tools.report_fanout import (
+    assemble_report,
+    extract_fragment,
+    generate_report_fanout,
+    generate_sections,
+    split_sections,
+)
+from tools.run_helper import run_agent
+from tools.thread_reaper import ThreadLedger
+
+TEMPLATE = ('<html><head><title>Report Title Placeholder</title></head><body>'
+            '<section id="report-container"><h1>Report</h1><section>old</section></section></body></html>')
+DATASET = {"title": "Q1", "region": "North", "sales": [{"m": 1}], "costs": [{"m": 2}], "totals": {"sum": 1}}
+
+
+def _section_reply(prompt):
+    name = re.search(r'covers only the "(\w+)" section', prompt).group(1)
+    return f'```html\n<section class="report-section" id="section-{name}"><h3>{name}</h3></section>\n```'
+
+
+def test_split_sections_keeps_scalars_as_shared_context():
+    sections, context = split_sections(DATASET)
+    assert sections == [("sales", [{"m": 1}]), ("costs", [{"m": 2}]), ("totals", {"sum": 1})]
+    assert context == {"title": "Q1", "region": "North"}
+    assert split_sections([1, 2]) == ([], {})
+
+
+@pytest.mark.parametrize("reply, fragment", [
+    ("<section>a</section>", "<section>a</section>"),
+    ("```html\n<section>a</section>\n```", "<section>a</section>"),
+    ('<html><body><section id="report-container"><h1>R</h1><section>a</section></section></body></html>',
+     "<h1>R</h1><section>a</section>"),
+    ("<html><body><p>a</p></body></html>", "<p>a</p>"),
+])
+def test_extract_fragment(reply, fragment):
+    assert extract_fragment(reply) == fragment
+
+
+def test_assemble_report_fills_the_container():
+    report = assemble_report("Sales & Costs", ["<section>a</section>", "<section>b</section>"], TEMPLATE)
+    assert "<title>Sales &amp; Costs</title>" in report
+    assert '<section id="report-container"><h1>Report</h1><section>a</section>\n<section>b</section></section>' in report
+    assert "old" not in report
+
+
+def _failing(*names):
+    """run_agent whose runs of the given sections fail."""
+    def run(client, agent, prompt, **options):
+        result = run_agent(client, agent, prompt, **options)
+        if any(f'covers only the "{name}" section' in prompt for name in names):
+            return dataclasses.replace(result, status="failed", text=None, error="boom")
+        return result
+    return run
+
+
+def test_sections_are_generated_concurrently_and_assembled_in_order(tmp_path, monkeypatch):
+    monkeypatch.setenv("RUN_POLL_INTERVAL_SCALE", "0.1")
+    script = AgentScript(reply=_section_reply, queue_latency=Latency(0), thinking_latency=Latency(0.3))
+    client = FakeAgentsClient(scripts={"ag-report-builder": script})
+    agent = client.create_agent(model="gpt-4", name="ag-report-builder", instructions="Build a report")
+    ledger = ThreadLedger(str(tmp_path / "threads.db"))
+    monkeypatch.setattr(report_fanout, "load_html_template", lambda: TEMPLATE)
+    monkeypatch.setattr(report_fanout, "run_agent", _failing("costs"))
+
+    result = generate_report_fanout(client, agent, "Quarterly report", DATASET, "Q1", ledger=ledger, use_cache=False)
+
+    assert result.completed
+    assert [section.name for section in result.sections] == ["sales", "costs", "totals"]
+    assert result.html.index('id="section-sales"') < result.html.index('id="section-costs"') \
+        < result.html.index('id="section-totals"')
+    assert "This section could not be generated: boom" in result.html
+    # The three runs overlapped: the wall-clock time is well below their sum
+    assert result.wall_seconds < result.run_seconds * 0.8
+
+
+def test_single_section_and_failed_fanouts(tmp_path, monkeypatch):
+    client = FakeAgentsClient(time_scale=0)
+    agent = client.create_agent(model="gpt-4", name="sections")
+    ledger = ThreadLedger(str(tmp_path / "threads.db"))
+
+    assert generate_report_fanout(client, agent, "Report", {"sales": [1]}, "T", ledger=ledger) is None
+    monkeypatch.setattr(report_fanout, "run_agent", _failing("sales", "costs", "totals"))
+    result = generate_report_fanout(client, agent, "Report", DATASET, "T", ledger=ledger, use_cache=False)
+    assert not result.completed and result.html is None and len(result.sections) == 3
+
+
+def test_each_section_is_routed_on_its_own_data(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_STATE_DIR", str(tmp_path))
+    monkeypatch.setenv("MODEL_DEPLOYMENT_NAME", "gpt-fast")
+    monkeypatch.setenv("ADVANCED_MODEL_DEPLOYMENT_NAME", "gpt-advanced")
+    monkeypatch.setenv("MODEL_ROUTER_MAX_SECTIONS", "1")
+    client = FakeAgentsClient(time_scale=0)
+    agent = client.create_agent(model="gpt-advanced", name="sections")
+    ledger = ThreadLedger(str(tmp_path / "threads.db"))
+    sections, context = split_sections(DATASET)
+
+    results = generate_sections(client, agent, "Quarterly table", sections, context, route=True,
+                                ledger=ledger, use_cache=False)
+
+    # The whole dataset has three sections, more than the fast model takes; each section has one
+    assert route_request("Quarterly table", DATASET).tier == ADVANCED
+    assert [section.decision.tier for section in results] == [FAST] * 3
+    assert {client.runs.get(thread_id=section.result.thread_id, run_id=section.result.run_id).model
+            for section in results} == {"gpt-fast"}
+    assert len(load_routing_log()) == 3
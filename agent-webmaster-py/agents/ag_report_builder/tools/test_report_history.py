@@ -0,0 +1,101 @@
+"""Tests of incremental report regeneration: dataset diffs, table patches and reused sections."""
+
+import re
+
+import pytest
+
+import tools.report_fanout as report_fanout
+from tools.fake_agents_client import AgentScript, FakeAgentsClient, Latency
+from tools.report_history import (
+    APPENDED,
+    CHANGED,
+    FULL,
+    PARTIAL,
+    REMOVED,
+    UNCHANGED,
+    diff_datasets,
+    forget_report,
+    load_report,
+    make_report_id,
+    patch_table,
+    regenerate_report,
+)
+from tools.thread_reaper import ThreadLedger
+
+TEMPLATE = ('<html><head><title>Report Title Placeholder</title></head><body>'
+            '<section id="report-container"><h1>Report</h1></section></body></html>')
+
+
+def _section_reply(prompt):
+    name = re.search(r'covers only the "(\w+)" section', prompt).group(1)
+    return f'<section class="report-section" id="section-{name}"><canvas></canvas></section>'
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_STATE_DIR", str(tmp_path))
+    monkeypatch.delenv("REPORT_INCREMENTAL_MAX_CHANGE", raising=False)
+
+
+def test_diff_datasets():
+    old = {"title": "Q1", "sales": [1, 2], "costs": [1], "notes": {"a": 1}, "gone": [1]}
+    new = {"title": "Q1", "sales": [1, 2, 3], "costs": [9], "notes": {"a": 1}}
+    diff = diff_datasets(old, new)
+    statuses = {section.name: section.status for section in diff.sections}
+    assert statuses == {"sales": APPENDED, "costs": CHANGED, "notes": UNCHANGED, "gone": REMOVED}
+    assert diff.by_name()["sales"].appended == 1
+    assert not diff.context_changed
+    assert diff.changed == 3 and diff.total == 6
+    assert diff_datasets(old, dict(new, title="Q2")).context_changed
+
+
+def test_report_id_follows_the_structure_not_the_rows():
+    dataset = {"title": "Q1", "sales": [{"m": 1}], "costs": [{"m": 2}]}
+    report_id = make_report_id("Custom Dataset Report", "Summarize", dataset)
+    assert report_id.startswith("custom-dataset-report-")
+    assert make_report_id("Custom Dataset Report", "Summarize", dict(dataset, sales=[{"m": 3}] * 5)) == report_id
+    assert make_report_id("Custom Dataset Report", "Summarize", {"title": "Q1", "orders": [{"m": 1}]}) != report_id
+    assert make_report_id("Custom Dataset Report", "Chart it", dataset) != report_id
+
+
+def test_patch_table_appends_rows_in_the_existing_formats():
+    old_rows = [{"region": "North", "amount": 1234.5}, {"region": "South", "amount": 99.0}]
+    new_rows = old_rows + [{"region": "West & East", "amount": 5000.25}]
+    fragment = ('<section><table><thead><tr><th>Region</th><th>Amount</th></tr></thead><tbody>\n'
+                '<tr><td>North</td><td class="num">1,234.50</td></tr>\n'
+                '<tr><td>South</td><td class="num">99.00</td></tr>\n'
+                '</tbody></table></section>')
+    patched = patch_table(fragment, old_rows, new_rows)
+    assert patched is not None
+    assert '<tr><td>West &amp; East</td><td class="num">5,000.25</td></tr>\n</tbody>' in patched
+    assert patch_table(fragment.replace("</table>", "</table><canvas></canvas>"), old_rows, new_rows) is None
+    assert patch_table(fragment, old_rows[:1], new_rows) is None
+
+
+def test_only_changed_sections_are_regenerated(tmp_path, monkeypatch):
+    script = AgentScript(reply=_section_reply, queue_latency=Latency(0), thinking_latency=Latency(0))
+    client = FakeAgentsClient(time_scale=0, scripts={"ag-report-builder": script})
+    agent = client.create_agent(model="gpt-4", name="ag-report-builder", instructions="Build a report")
+    ledger = ThreadLedger(str(tmp_path / "threads.db"))
+    monkeypatch.setattr(report_fanout, "load_html_template", lambda: TEMPLATE)
+    dataset = {"title": "Q1", "sales": [{"m": i} for i in range(8)], "costs": [{"m": i} for i in range(8)],
+               "totals": {"sum": 1}}
+
+    def regenerate(data):
+        return regenerate_report(client, agent, "sales", "Quarterly report", data, "Q1",
+                                 ledger=ledger, use_cache=False)
+
+    first = regenerate(dataset)
+    assert first.mode == FULL and first.reasons == ["no previous report"] and len(first.sections) == 3
+    assert set(load_report("sales")["fragments"]) == {"sales", "costs", "totals"}
+
+    unchanged = regenerate(dataset)
+    assert unchanged.mode == UNCHANGED and unchanged.sections == []
+    assert unchanged.reused == ["sales", "costs", "totals"] and unchanged.html == first.html
+
+    partial = regenerate(dict(dataset, totals={"sum": 2}))
+    assert partial.mode == PARTIAL and [section.name for section in partial.sections] == ["totals"]
+    assert partial.reused == ["sales", "costs"]
+
+    assert forget_report("sales") and not forget_report("sales")
+    assert regenerate(dataset).mode == FULL
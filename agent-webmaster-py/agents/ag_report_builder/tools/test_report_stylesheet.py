@@ -0,0 +1,82 @@
+"""Tests of the shared report stylesheet: publishing once per version and linking reports to it."""
+
+import pytest
+
+from tools.publisher_client import PublishResult
+from tools.report_stylesheet import (
+    link_stylesheet,
+    publish_stylesheet,
+    stylesheet_version,
+    template_stylesheet,
+)
+from tools.template_loader import load_html_template
+
+CSS = ".a{color:red}.b{margin:0}"
+URL = "https://example.com/reports/styles_1.css"
+
+
+class _Client:
+    """Publisher double recording the uploaded stylesheets."""
+
+    def __init__(self, ok=True):
+        self.ok = ok
+        self.uploads = []
+
+    def upload_stylesheet(self, css):
+        self.uploads.append(css)
+        url = f"https://example.com/reports/styles_{len(self.uploads)}.css" if self.ok else None
+        return PublishResult(url, 200 if self.ok else 500, 1, 0.01)
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_STATE_DIR", str(tmp_path))
+    monkeypatch.delenv("REPORT_STYLESHEET_URL", raising=False)
+
+
+def test_template_stylesheet_is_minified():
+    css = template_stylesheet()
+    assert css and "\n" not in css and "/*" not in css
+    assert stylesheet_version(css) == stylesheet_version(template_stylesheet())
+
+
+def test_each_version_is_published_once():
+    client = _Client()
+    assert publish_stylesheet(CSS, client) == URL
+    assert publish_stylesheet(CSS, client) == URL
+    assert publish_stylesheet(CSS + ".c{top:0}", client) == "https://example.com/reports/styles_2.css"
+    assert len(client.uploads) == 2
+
+
+def test_failed_and_overridden_publishing(monkeypatch):
+    assert publish_stylesheet(CSS, _Client(ok=False)) is None
+
+    monkeypatch.setenv("REPORT_STYLESHEET_URL", "https://cdn.example.com/report.css")
+    client = _Client()
+    assert publish_stylesheet(CSS, client) == "https://cdn.example.com/report.css"
+    assert client.uploads == []
+
+
+def test_inline_copies_of_shared_rules_are_replaced_by_the_link():
+    report = ("<html><head><style>\n.a { color: red; }\n.b { margin: 0; }\n</style>"
+              "<style>.b { margin: 0; } .model { top: 0; }</style><style>.other{left:0}</style></head></html>")
+    linked, removed = link_stylesheet(report, URL, CSS)
+
+    assert removed == 3
+    assert linked == (f'<html><head><link rel="stylesheet" href="{URL}">'
+                      "<style>.model{top:0}</style><style>.other{left:0}</style></head></html>")
+    assert link_stylesheet(linked, URL, CSS) == (linked, 0)
+
+
+def test_template_loader_links_the_shared_stylesheet(monkeypatch):
+    import tools.report_stylesheet as report_stylesheet
+
+    monkeypatch.setattr(report_stylesheet, "_shared_stylesheet", None)
+    monkeypatch.delenv("REPORT_SHARED_STYLESHEET", raising=False)
+    monkeypatch.setenv("REPORT_STYLESHEET_URL", URL)
+    assert "<style>" in load_html_template("report_template.html")
+
+    monkeypatch.setenv("REPORT_SHARED_STYLESHEET", "1")
+    template = load_html_template("report_template.html")
+    assert f'<link rel="stylesheet" href="{URL}">' in template
+    assert "<style>" not in template
@@ -0,0 +1,115 @@
+"""Tests of the report builder's SQL querier: streaming, caps and summaries."""
+
+import json
+
+import pytest
+
+from tools.sql_querier import (
+    HEAD_ROWS,
+    SqliteBackend,
+    _iter_json_array,
+    query_database,
+    set_query_backend,
+    summarize_rows,
+)
+
+
+@pytest.fixture(scope="module")
+def backend():
+    return SqliteBackend()
+
+
+@pytest.fixture
+def seeded(backend):
+    set_query_backend(backend)
+    yield backend
+    set_query_backend(None)
+
+
+class _Rows:
+    """Row iterator remembering how many rows were read and whether it was closed."""
+
+    def __init__(self, count):
+        self.read = 0
+        self.closed = False
+        self._count = count
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.read >= self._count:
+            raise StopIteration
+        self.read += 1
+        return (self.read, f"name {self.read}")
+
+    def close(self):
+        self.closed = True
+
+
+def test_small_results_are_returned_whole(seeded):
+    result = json.loads(query_database("SELECT TOP 3 ProductID FROM dbo.Products ORDER BY ProductID"))
+    assert result == {"columns": ["ProductID"], "row_count": 3, "truncated": False,
+                      "rows": [{"ProductID": 1}, {"ProductID": 2}, {"ProductID": 3}]}
+
+
+def test_large_results_are_summarized():
+    rows = _Rows(500)
+    result = summarize_rows(["id", "name"], rows, sample_rows=20)
+
+    assert result["row_count"] == 500 and not result["truncated"]
+    assert "rows" not in result
+    assert result["column_stats"]["id"] == {"nulls": 0, "min": 1, "max": 500, "sum": 125250.0, "mean": 250.5,
+                                            "distinct": 500, "top_values": [[1, 1], [2, 1], [3, 1], [4, 1], [5, 1]]}
+    assert [row["id"] for row in result["first_rows"]] == list(range(1, HEAD_ROWS + 1))
+    assert len(result["sample_rows"]) == 20
+    assert rows.closed
+
+
+def test_reading_stops_at_the_row_cap():
+    rows = _Rows(1000)
+    result = summarize_rows(["id", "name"], rows, max_rows=100, sample_rows=10)
+
+    assert result["row_count"] == 100
+    assert result["truncated"]
+    assert "row cap of 100 rows" in result["truncated_reason"]
+    assert rows.read == 101  # The row past the cap is read, then the stream is closed
+    assert rows.closed
+
+
+def test_reading_stops_at_the_byte_cap():
+    rows = _Rows(1000)
+    # Rows 1..9 take 1 + 6 + 2 = 9 bytes each
+    result = summarize_rows(["id", "name"], rows, max_bytes=90, sample_rows=10)
+
+    assert result["row_count"] == 9
+    assert "byte cap of 90 bytes" in result["truncated_reason"]
+    assert rows.closed
+
+
+def test_caps_apply_to_the_sqlite_backend(backend):
+    columns, rows = backend.execute("SELECT p.ProductID, s.SaleID FROM dbo.Products p CROSS JOIN dbo.Sales s")
+    result = summarize_rows(columns, rows, max_rows=5, sample_rows=2)
+    assert result["row_count"] == 5 and result["truncated"]
+
+    # Closing the stream early released the connection for the next query
+    columns, rows = backend.execute("SELECT COUNT(*) AS n FROM dbo.Products")
+    assert summarize_rows(columns, rows)["rows"][0]["n"] > 0
+
+
+def test_errors_are_returned_to_the_model(seeded):
+    result = json.loads(query_database("SELECT * FROM dbo.Missing"))
+    assert result["error"].startswith("Error executing SQL query: ")
+
+
+def test_only_a_single_select_reaches_the_backend(seeded):
+    for sql in ("DELETE FROM dbo.Products", "SELECT 1; DROP TABLE dbo.Products"):
+        assert json.loads(query_database(sql))["error"].startswith("Only a single read-only SELECT")
+    assert json.loads(query_database("SELECT COUNT(*) AS n FROM dbo.Products"))["rows"][0]["n"] > 0
+
+
+def test_json_array_items_are_decoded_across_chunks():
+    chunks = iter(['[{"a": 1}, {"a"', ': 2},', ' {"a": "x]"}', "]"])
+    assert list(_iter_json_array(chunks)) == [{"a": 1}, {"a": 2}, {"a": "x]"}]
+    with pytest.raises(ValueError, match="Expected a JSON array"):
+        list(_iter_json_array(iter(['{"error": true}'])))
@@ -48,6 +48,10 @@ from azure.ai.agents import AgentsClient
 from azure.ai.agents.models import ConnectedAgentTool, OpenApiTool, OpenApiAnonymousAuthDetails
 from azure.identity import DefaultAzureCredential
 from dotenv import load_dotenv
+from tools.card_contract import apply_card_schema
+from tools.fake_agents_client import fake_client_enabled, get_fake_agents_client
+from tools.session_cassette import get_replay_agents_client, record_session, replay_enabled
+from tools.tracing import span
 from tools.openapi_azurefx_configurator import parse_azure_function_url_and_modify_spec
 import os
 import sys
@@ -70,10 +74,18 @@ def _get_agents_client():
     global _agents_client
     if _agents_client is None:
         load_dotenv()  # Load environment variables from .env file
-        _agents_client = AgentsClient(
-            endpoint=os.environ.get("PROJECT_ENDPOINT"),
-            credential=DefaultAzureCredential()
-        )
+        with span("client.init"):
+            if fake_client_enabled():
+                # Offline mode: scripted runs instead of the Foundry project
+                _agents_client = get_fake_agents_client()
+            elif replay_enabled():
+                # Offline mode: the runs of a recorded session
+                _agents_client = get_replay_agents_client()
+            else:
+                _agents_client = record_session(AgentsClient(
+                    endpoint=os.environ.get("PROJECT_ENDPOINT"),
+                    credential=DefaultAzureCredential()
+                ))
     return _agents_client
 
 
@@ -81,7 +93,7 @@ def _create_web_gen_agent():
     """
     Create or retrieve the web generation agent in Azure AI Foundry.
     This agent orchestrates the creation and publishing of business cards as web pages.
-    - Checks if the agent already exists (by name).
+    - Checks if the agent already exists (by name); if so, updates its tools.
     - If not, creates a new agent with two tools:
         1. ConnectedAgentTool: Uses the card generator agent to generate card data.
         2. OpenApiTool: Uses an Azure Function to fill and publish HTML templates.
@@ -96,13 +108,6 @@ def _create_web_gen_agent():
     client = _get_agents_client()
     agent_name = "ag-web-gen"
 
-    # Check if agent already exists in the Foundry project
-    agents = list(client.list_agents())
-    for agent in agents:
-        if agent.name == agent_name:
-            _web_gen_agent = agent
-            return _web_gen_agent
-
     # Tool 1: ConnectedAgentTool for the card generator agent
     card_generator_agent = ag_card_generator.instance
     card_generator_tool = ConnectedAgentTool(
@@ -113,7 +118,9 @@ def _create_web_gen_agent():
 
     # Tool 2: OpenApiTool for the HTML template filler Azure Function
     openapi_spec_path = os.path.join(os.path.dirname(__file__), "tools", "html_template_filler_openapi_spec.json")
-    openapi_spec = parse_azure_function_url_and_modify_spec(openapi_spec_path)
+    # The card goes from the card generator to the function inside the service, without any local
+    # validation: the tool's request schema carries the card contract (date pattern, no extra fields)
+    openapi_spec = apply_card_schema(parse_azure_function_url_and_modify_spec(openapi_spec_path))
     azure_function_tool = OpenApiTool(
         name="html_template_filler",
         description="Fills HTML template with JSON card data and publishes it to the web, returning the final URL",
@@ -125,6 +132,15 @@ def _create_web_gen_agent():
     instructions = """You are an agent that receives requests for publishing personal cards. These cards contain title, name, city, profession, message and date. For this publishing, it is required that an html template be filled with the person's information in json format. After this, the resulting html is published in a given URL. That URL will be the only response you give to your users."""
     # Combine all tools
     all_tools = card_generator_tool.definitions + azure_function_tool.definitions
+
+    # Check if agent already exists in the Foundry project
+    with span("agent.resolve", agent=agent_name):
+        existing_agent = next((a for a in client.list_agents() if a.name == agent_name), None)
+    if existing_agent:
+        # Update the tools on the existing agent, so its template filler gets the card contract
+        _web_gen_agent = client.update_agent(agent_id=existing_agent.id, tools=all_tools)
+        return _web_gen_agent
+
     # Create the web generation agent with the connected tools
     _web_gen_agent = client.create_agent(
         model=os.environ.get("MODEL_DEPLOYMENT_NAME"),
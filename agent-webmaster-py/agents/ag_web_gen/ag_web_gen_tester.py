@@ -57,6 +57,7 @@ def display_environment_info():
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from agents.ag_web_gen import ag_web_gen
+from tools.run_helper import format_timings, run_agent
 
 
 
@@ -86,45 +87,29 @@ def test_web_gen_agent():
     print(f"\n🎯 Processing: {user_prompt}")
     print("-" * 30)
     
-    # 🎯 Create conversation and run
-    thread = client.threads.create()
-    
-    client.messages.create(
-        thread_id=thread.id,
-        role="user",
-        content=user_prompt
-    )
-    
-    # Start the agent run
+    # 🎯 Create conversation, run and fetch the reply
     print("⏳ Running agent...")
-    run = client.runs.create_and_process(
-        thread_id=thread.id,
-        agent_id=agent.id
-    )
+    result = run_agent(client, agent, user_prompt)
     
     # Check results
-    print(f"🏁 Run status: {run.status}")
-    
-    if run.status == "completed":
-        messages = client.messages.list(thread_id=thread.id)
-        messages_list = list(messages)  # Convert to list first
-        
+    print(f"🏁 Run status: {result.status}")
+    print(f"⏱️  {format_timings(result.timings)}")
+    # A reply served from the result cache had no run to poll
+    if result.cached:
+        print("⚡ Reply served from the result cache")
+    elif result.poll_stats is not None:
+        print(f"🔁 Status polls: {result.poll_stats.polls}")
+    if result.hedge and result.hedge.hedged:
+        print(f"🏎️  Hedged after {result.hedge.threshold_seconds:.1f}s - winner: {result.hedge.winner}")
+    
+    if result.completed:
         print("\n📝 Agent Response:")
         print("-" * 30)
-        for msg in reversed(messages_list):  # Now we can reverse
-            if msg.role == "assistant":
-                # Extract the actual text content from the message
-                if hasattr(msg.content, '__iter__') and len(msg.content) > 0:
-                    response = msg.content[0].text.value
-                else:
-                    response = str(msg.content)
-                
-                print(response)
-                break
+        print(result.text)
     else:
-        print(f"❌ Run failed with status: {run.status}")
-        if hasattr(run, 'last_error') and run.last_error:
-            print(f"Error: {run.last_error}")
+        print(f"❌ Run failed with status: {result.status}")
+        if result.error:
+            print(f"Error: {result.error}")
 
 if __name__ == "__main__":
     test_web_gen_agent()
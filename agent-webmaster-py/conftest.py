@@ -0,0 +1,19 @@
+"""
+Shared pytest setup.
+
+The tools are imported the way the agents import them (``from tools.x import ...``, the
+report builder's own ``tools`` folder included), the ledgers, caches and stats written
+while testing go to a temporary state folder instead of the real one, and traces are
+only exported by the tests that ask for them.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "agents", "ag_report_builder"))
+
+os.environ["AGENT_STATE_DIR"] = tempfile.mkdtemp(prefix="agent-tests-")
+os.environ.pop("TRACE_EXPORT_PATH", None)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store of generated reports and cards.
+
+Naming outputs by timestamp makes concurrent publishes collide and overwrite each
+other, and stores every identical report again. The store names each artifact by the
+SHA-256 of its content instead:
+
+- ``objects/<first two hex digits>/<hash>.<ext>`` holds the content, written to a
+  temporary file and renamed into place, so concurrent writers never see or leave a
+  partial file and a burst of identical writes ends with one object,
+- ``.gz`` and, when the optional ``brotli`` package is installed, ``.br`` variants are
+  written next to it at maximum compression, ready to serve to clients accepting them,
+- ``index.db`` (SQLite) records kind, label, content type, sizes and put counts for
+  lookups by hash, hash prefix, kind or label without touching the objects.
+
+Storing content that is already present only bumps its put count, so identical
+reports cost nothing extra to store or serve. The store lives in
+``<state dir>/artifacts`` unless ``ARTIFACT_STORE_DIR`` is set.
+
+Usage:
+    python artifact_store.py --stats
+    python artifact_store.py --list --kind report
+    python artifact_store.py --put report.html --kind report
+"""
+
+import argparse
+import gzip
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.local_state import get_state_path
+
+try:
+    import brotli
+except ImportError:  # Optional: only the gzip variant is written without it
+    brotli = None
+
+_EXTENSIONS = {"text/html": ".html", "application/json": ".json", "text/css": ".css",
+               "application/javascript": ".js", "text/plain": ".txt"}
+
+
+@dataclass
+class Artifact:
+    """A stored artifact and the paths of its variants."""
+
+    hash: str
+    kind: str
+    label: Optional[str]
+    content_type: str
+    size: int
+    path: str
+    gzip_path: Optional[str]
+    brotli_path: Optional[str]
+    created_at: float
+    puts: int
+    deduplicated: bool = False
+
+
+def content_hash(content: Union[str, bytes]) -> str:
+    """Get the SHA-256 hex digest naming a content."""
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """Write a file through a temporary file in the same folder and rename it into place."""
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(handle, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+class ArtifactStore:
+    """
+    Content-addressed artifact store with precompressed variants and a SQLite index.
+
+    Args:
+        root: Folder of the store, ``ARTIFACT_STORE_DIR`` or ``<state dir>/artifacts`` by default
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.environ.get("ARTIFACT_STORE_DIR") or get_state_path("artifacts")
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS artifacts (
+                       hash         TEXT PRIMARY KEY,
+                       kind         TEXT NOT NULL,
+                       label        TEXT,
+                       content_type TEXT NOT NULL,
+                       extension    TEXT NOT NULL,
+                       size         INTEGER NOT NULL,
+                       gzip_size    INTEGER,
+                       brotli_size  INTEGER,
+                       created_at   REAL NOT NULL,
+                       last_put     REAL NOT NULL,
+                       puts         INTEGER NOT NULL DEFAULT 1
+                   )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_artifacts_kind ON artifacts (kind, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_artifacts_label ON artifacts (label)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(os.path.join(self.root, "index.db"), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def object_path(self, digest: str, extension: str = ".html") -> str:
+        """Get the path of an object's content (variants add ``.gz`` or ``.br``)."""
+        return os.path.join(self.root, "objects", digest[:2], digest + extension)
+
+    def _artifact(self, row: Tuple[Any, ...], deduplicated: bool = False) -> Artifact:
+        digest, kind, label, content_type, extension, size, gzip_size, brotli_size, created_at, puts = row
+        path = self.object_path(digest, extension)
+        return Artifact(
+            hash=digest, kind=kind, label=label, content_type=content_type, size=size, path=path,
+            gzip_path=path + ".gz" if gzip_size is not None else None,
+            brotli_path=path + ".br" if brotli_size is not None else None,
+            created_at=created_at, puts=puts, deduplicated=deduplicated,
+        )
+
+    _COLUMNS = "hash, kind, label, content_type, extension, size, gzip_size, brotli_size, created_at, puts"
+
+    def put(self, content: Union[str, bytes], kind: str = "report", label: Optional[str] = None,
+            content_type: str = "text/html") -> Artifact:
+        """
+        Store a content under its hash, with its compressed variants.
+
+        Args:
+            content: Artifact content (text is stored as UTF-8)
+            kind: Artifact kind, e.g. ``report`` or ``card``
+            label: Free-form label for lookups, e.g. the dataset name
+            content_type: MIME type, also selecting the file extension
+
+        Returns:
+            The stored artifact; ``deduplicated`` is True if the content was already stored
+        """
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        digest = hashlib.sha256(data).hexdigest()
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {self._COLUMNS} FROM artifacts WHERE hash = ?", (digest,)).fetchone()
+            if row is not None and os.path.exists(self.object_path(digest, row[4])):
+                conn.execute("UPDATE artifacts SET puts = puts + 1, last_put = ? WHERE hash = ?", (now, digest))
+                return self._artifact(row[:-1] + (row[-1] + 1,), deduplicated=True)
+
+        extension = _EXTENSIONS.get(content_type, ".bin")
+        path = self.object_path(digest, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # mtime=0 keeps the gzip bytes a pure function of the content
+        gzip_data = gzip.compress(data, compresslevel=9, mtime=0)
+        _write_atomic(path + ".gz", gzip_data)
+        brotli_size = None
+        if brotli is not None:
+            brotli_data = brotli.compress(data, quality=11)
+            _write_atomic(path + ".br", brotli_data)
+            brotli_size = len(brotli_data)
+        # The plain object goes last: its presence marks the artifact complete
+        _write_atomic(path, data)
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO artifacts (hash, kind, label, content_type, extension, size, gzip_size, brotli_size, "
+                "created_at, last_put) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(hash) DO UPDATE SET puts = puts + 1, last_put = excluded.last_put",
+                (digest, kind, label, content_type, extension, len(data), len(gzip_data), brotli_size, now, now),
+            )
+            row = conn.execute(f"SELECT {self._COLUMNS} FROM artifacts WHERE hash = ?", (digest,)).fetchone()
+        return self._artifact(row)
+
+    def get(self, digest: str) -> Optional[Artifact]:
+        """
+        Look up an artifact by hash or unique hash prefix.
+
+        Returns:
+            The artifact, or None if it is missing or the prefix is ambiguous
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {self._COLUMNS} FROM artifacts WHERE hash >= ? AND hash < ? LIMIT 2",
+                (digest, digest + "g"),
+            ).fetchall()
+        return self._artifact(rows[0]) if len(rows) == 1 else None
+
+    def find(self, kind: Optional[str] = None, label: Optional[str] = None, limit: int = 20) -> List[Artifact]:
+        """List the newest artifacts, optionally of one kind or label."""
+        conditions, parameters = [], []
+        if kind:
+            conditions.append("kind = ?")
+            parameters.append(kind)
+        if label:
+            conditions.append("label = ?")
+            parameters.append(label)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {self._COLUMNS} FROM artifacts {where} ORDER BY created_at DESC LIMIT ?",
+                parameters + [limit],
+            ).fetchall()
+        return [self._artifact(row) for row in rows]
+
+    def best_variant(self, artifact: Artifact, accept_encoding: str = "") -> Tuple[str, Optional[str]]:
+        """
+        Pick the smallest variant a client accepts.
+
+        Args:
+            artifact: Stored artifact
+            accept_encoding: The client's ``Accept-Encoding`` header
+
+        Returns:
+            Tuple of (file path, ``Content-Encoding`` value or None for the plain content)
+        """
+        accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+        if "br" in accepted and artifact.brotli_path and os.path.exists(artifact.brotli_path):
+            return artifact.brotli_path, "br"
+        if "gzip" in accepted and artifact.gzip_path and os.path.exists(artifact.gzip_path):
+            return artifact.gzip_path, "gzip"
+        return artifact.path, None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the store statistics.
+
+        Returns:
+            Dictionary with artifacts, puts, bytes, gzip_bytes, brotli_bytes, the bytes
+            saved by deduplication and the artifacts per kind
+        """
+        with self._connect() as conn:
+            artifacts, puts, size, gzip_size, brotli_size, saved = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(puts), 0), COALESCE(SUM(size), 0), COALESCE(SUM(gzip_size), 0), "
+                "COALESCE(SUM(brotli_size), 0), COALESCE(SUM(size * (puts - 1)), 0) FROM artifacts"
+            ).fetchone()
+            kinds = dict(conn.execute("SELECT kind, COUNT(*) FROM artifacts GROUP BY kind").fetchall())
+        return {"artifacts": artifacts, "puts": puts, "bytes": size, "gzip_bytes": gzip_size,
+                "brotli_bytes": brotli_size, "deduplicated_bytes": saved, "kinds": kinds}
+
+
+_artifact_store = None
+
+
+def get_artifact_store() -> ArtifactStore:
+    """Get the process-wide artifact store."""
+    global _artifact_store
+    if _artifact_store is None:
+        _artifact_store = ArtifactStore()
+    return _artifact_store
+
+
+def main():
+    """Command line entry point for storing and inspecting artifacts."""
+    parser = argparse.ArgumentParser(description="Inspect the content-addressed artifact store")
+    parser.add_argument("--stats", action="store_true", help="Show artifact counts and sizes")
+    parser.add_argument("--list", action="store_true", help="List the newest artifacts")
+    parser.add_argument("--put", metavar="FILE", help="Store a file")
+    parser.add_argument("--kind", help="Artifact kind to store or list (report, card)")
+    parser.add_argument("--label", help="Label to store or list")
+    parser.add_argument("--root", help="Folder of the store")
+    args = parser.parse_args()
+
+    store = ArtifactStore(args.root)
+    if args.put:
+        with open(args.put, "rb") as f:
+            artifact = store.put(f.read(), kind=args.kind or "report", label=args.label or os.path.basename(args.put))
+        state = "already stored" if artifact.deduplicated else "stored"
+        print(f"📦 {artifact.hash[:12]} {state}: {artifact.path}")
+        return
+    if args.list:
+        for artifact in store.find(args.kind, args.label, limit=50):
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(artifact.created_at))
+            print(f"{artifact.hash[:12]}  {created}  {artifact.kind:<7} {artifact.size / 1024:>8.1f} KB  "
+                  f"x{artifact.puts}  {artifact.label or ''}")
+        return
+    stats = store.stats()
+    print(f"📦 {stats['artifacts']} artifacts from {stats['puts']} puts, {stats['bytes'] / 1024:.1f} KB "
+          f"({stats['gzip_bytes'] / 1024:.1f} KB gzip, {stats['brotli_bytes'] / 1024:.1f} KB brotli)")
+    print(f"   {stats['deduplicated_bytes'] / 1024:.1f} KB not stored again thanks to deduplication")
+    for kind, count in stats["kinds"].items():
+        print(f"   {kind}: {count}")
+
+
+if __name__ == "__main__":
+    main()
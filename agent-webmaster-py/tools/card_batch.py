@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Offline bulk rendering of business cards from a roster.
+
+Generating one card through ``ag_web_gen`` costs a model run and a function call per
+person. When the card data is already known (an onboarding roster), this tool fills
+``misc/business_card_template.html`` locally instead:
+
+- the roster is a CSV file with a header row or a JSONL file with one object per line;
+  columns outside the card contract are ignored, and ``--title`` and ``--date`` fill
+  the fields the roster does not have
+- every row is checked against the card generator's JSON contract
+  (``tools.card_contract``); invalid rows are reported in the manifest, not rendered
+- rows are rendered in chunks across a process pool. The template is split once per
+  worker into literal parts and placeholders, so a card is a single join of escaped
+  values, and each worker writes its own files
+- a card is named after the hash of its data (``card_<id>.html``), so a card keeps its
+  file name across runs, and duplicate rows are dropped before they are sent to the
+  workers, so each card is rendered and written once
+
+The output folder receives the cards and a ``manifest.json`` listing every card with
+its roster line, size, source data and the hash of the template it was rendered with,
+plus the rejected rows and their problems.
+
+When the template changes, ``--rebuild`` re-renders from the stored data only the
+cards of a folder whose template hash differs (or whose file is missing), in
+parallel and without any model call; a card keeps its file name.
+
+Unlike FxTemplateFiller, values are HTML-escaped, since roster data is not written
+with the template in mind.
+
+Usage:
+    python tools/card_batch.py roster.csv --output cards
+    python tools/card_batch.py roster.jsonl --output cards --workers 8 --date 2025-01-15
+    python tools/card_batch.py --rebuild cards
+    python tools/card_batch.py --benchmark 50000
+"""
+
+import argparse
+import csv
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.card_contract import load_card_contract, validate_card
+from tools.tsql_sqlite import MISC_DIR
+
+TEMPLATE_PATH = os.path.join(MISC_DIR, "business_card_template.html")
+MANIFEST_NAME = "manifest.json"
+_PLACEHOLDER_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+
+# Per-worker state, set by _init_worker
+_worker_parts: List[str] = []
+_worker_fields: List[str] = []
+_worker_output = ""
+_worker_template_hash = ""
+
+
+@dataclass
+class BatchResult:
+    """Outcome of a bulk rendering."""
+
+    rendered: int
+    duplicates: int
+    rejected: List[Dict[str, Any]]
+    seconds: float
+    manifest_path: str
+    total_bytes: int = 0
+    up_to_date: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def per_minute(self) -> float:
+        return self.rendered * 60 / self.seconds if self.seconds else 0.0
+
+
+def compile_template(template: str) -> List[str]:
+    """Split a template into literal parts (even indexes) and placeholder names (odd indexes)."""
+    return _PLACEHOLDER_PATTERN.split(template)
+
+
+def render_card(parts: List[str], card: Dict[str, str]) -> str:
+    """Fill a compiled template; placeholders without a value are left as they are."""
+    return "".join(
+        part if index % 2 == 0 else html.escape(card[part]) if part in card else "{{" + part + "}}"
+        for index, part in enumerate(parts)
+    )
+
+
+def card_id(card: Dict[str, str]) -> str:
+    """Stable identifier of a card, derived from its data."""
+    canonical = json.dumps(card, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def read_roster(path: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Stream the rows of a CSV (with header) or JSONL roster.
+
+    Yields:
+        Tuples of (line number, row); a JSONL line that is not valid JSON is yielded
+        as its error message
+    """
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield number, json.loads(line)
+                except ValueError as e:
+                    yield number, f"invalid JSON: {e}"
+        else:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+
+
+def template_hash(template_path: str) -> str:
+    """Hash of a template, recorded with every card rendered from it."""
+    with open(template_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _init_worker(template_path: str, fields: List[str], output_dir: str) -> None:
+    global _worker_parts, _worker_fields, _worker_output, _worker_template_hash
+    with open(template_path, encoding="utf-8") as f:
+        _worker_parts = compile_template(f.read())
+    _worker_fields = fields
+    _worker_output = output_dir
+    _worker_template_hash = template_hash(template_path)
+
+
+def _render_chunk(chunk: List[Tuple[int, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    cards, rejected = [], []
+    for line, card in chunk:
+        errors = [card] if isinstance(card, str) else validate_card(card, _worker_fields)
+        if errors:
+            rejected.append({"line": line, "errors": errors})
+            continue
+        identifier = card_id(card)
+        data = render_card(_worker_parts, card).encode("utf-8")
+        name = f"card_{identifier}.html"
+        path = os.path.join(_worker_output, name)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+        cards.append({"id": identifier, "file": name, "line": line, "bytes": len(data),
+                      "template_hash": _worker_template_hash, "data": card})
+    return cards, rejected
+
+
+def _prepare(rows: Iterable[Tuple[int, Any]], fields: List[str],
+             defaults: Dict[str, str]) -> Iterator[Tuple[int, Any]]:
+    for line, row in rows:
+        if isinstance(row, dict):
+            # Roster columns outside the contract are ignored; missing values take the defaults
+            row = {name: defaults[name] if row.get(name) in (None, "") and name in defaults else row[name]
+                   for name in fields if name in row or name in defaults}
+        yield line, row
+
+
+class _Deduplicator:
+    """Drops the rows of cards already seen, before they are sent to the workers."""
+
+    def __init__(self):
+        self.seen: Set[str] = set()
+        self.duplicates = 0
+
+    def __call__(self, rows: Iterable[Tuple[int, Any]]) -> Iterator[Tuple[int, Any]]:
+        for line, row in rows:
+            if isinstance(row, dict):
+                identifier = card_id(row)
+                if identifier in self.seen:
+                    self.duplicates += 1
+                    continue
+                self.seen.add(identifier)
+            yield line, row
+
+
+def _chunks(rows: Iterable[Tuple[int, Any]], size: int) -> Iterator[List[Tuple[int, Any]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _render_chunks(chunks: Iterable[List[Tuple[int, Any]]], template_path: str, fields: List[str],
+                   output_dir: str, workers: Optional[int]) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    initargs = (template_path, fields, output_dir)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(*initargs)
+        yield from map(_render_chunk, chunks)
+        return
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+        yield from pool.imap(_render_chunk, chunks)
+
+
+def _write_manifest(output_dir: str, template_path: str, cards: List[Dict[str, Any]],
+                    rejected: List[Dict[str, Any]]) -> str:
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {
+        "template": os.path.basename(template_path),
+        "template_hash": template_hash(template_path),
+        "rendered_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cards": cards,
+        "rejected": rejected,
+    }
+    with open(f"{manifest_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    return manifest_path
+
+
+def render_roster(rows: Iterable[Tuple[int, Any]], output_dir: str, template_path: str = TEMPLATE_PATH,
+                  workers: Optional[int] = None, chunk_size: int = 500,
+                  defaults: Optional[Dict[str, str]] = None) -> BatchResult:
+    """
+    Validate and render roster rows into a static folder with a manifest.
+
+    Args:
+        rows: (line number, row) tuples, e.g. from ``read_roster``
+        output_dir: Folder of the cards and the manifest
+        template_path: Business card template
+        workers: Worker processes (defaults to the CPU count; 1 renders in this process)
+        chunk_size: Rows per task sent to a worker
+        defaults: Values of the fields missing from the rows
+
+    Returns:
+        The counts, the rejected rows and the manifest path
+    """
+    _, fields = load_card_contract()
+    os.makedirs(output_dir, exist_ok=True)
+    deduplicate = _Deduplicator()
+    chunks = _chunks(deduplicate(_prepare(rows, fields, defaults or {})), chunk_size)
+
+    start = time.perf_counter()
+    cards: List[Dict[str, Any]] = []
+    rejected: List[Dict[str, Any]] = []
+    for chunk_cards, chunk_rejected in _render_chunks(chunks, template_path, fields, output_dir, workers):
+        rejected.extend(chunk_rejected)
+        cards.extend(chunk_cards)
+    seconds = time.perf_counter() - start
+
+    return BatchResult(
+        rendered=len(cards),
+        duplicates=deduplicate.duplicates,
+        rejected=rejected,
+        seconds=seconds,
+        manifest_path=_write_manifest(output_dir, template_path, cards, rejected),
+        total_bytes=sum(card["bytes"] for card in cards),
+    )
+
+
+def rebuild_cards(output_dir: str, template_path: str = TEMPLATE_PATH, workers: Optional[int] = None,
+                  chunk_size: int = 500, force: bool = False) -> BatchResult:
+    """
+    Re-render the cards of a folder rendered with another version of the template.
+
+    Cards are rendered again from the data stored in the manifest, keeping their file
+    names; cards already rendered with the current template are left untouched.
+
+    Args:
+        output_dir: Folder of the cards and the manifest
+        template_path: Business card template
+        workers: Worker processes (defaults to the CPU count; 1 renders in this process)
+        chunk_size: Cards per task sent to a worker
+        force: Re-render every card
+
+    Returns:
+        The counts, with the cards up to date and the ones that could not be rebuilt
+    """
+    with open(os.path.join(output_dir, MANIFEST_NAME), encoding="utf-8") as f:
+        manifest = json.load(f)
+    _, fields = load_card_contract()
+    current = template_hash(template_path)
+    cards: List[Dict[str, Any]] = manifest.get("cards", [])
+    positions = {card["id"]: index for index, card in enumerate(cards)}
+
+    stale, errors = [], []
+    for card in cards:
+        if not force and card.get("template_hash") == current and os.path.exists(os.path.join(output_dir, card["file"])):
+            continue
+        if "data" not in card:
+            errors.append(f"{card['file']}: no source data in the manifest")
+            continue
+        stale.append((card.get("line", 0), card["data"]))
+
+    start = time.perf_counter()
+    rebuilt, total_bytes, rejected = 0, 0, []
+    for chunk_cards, chunk_rejected in _render_chunks(_chunks(stale, chunk_size), template_path, fields,
+                                                      output_dir, workers):
+        rejected.extend(chunk_rejected)  # Only if the contract changed since the cards were rendered
+        for card in chunk_cards:
+            cards[positions[card["id"]]] = card
+            rebuilt += 1
+            total_bytes += card["bytes"]
+    seconds = time.perf_counter() - start
+
+    return BatchResult(
+        rendered=rebuilt,
+        duplicates=0,
+        rejected=rejected,
+        seconds=seconds,
+        manifest_path=_write_manifest(output_dir, template_path, cards, manifest.get("rejected", [])),
+        total_bytes=total_bytes,
+        up_to_date=len(cards) - len(stale) - len(errors),
+        errors=errors,
+    )
+
+
+def _synthetic_roster(count: int) -> Iterator[Tuple[int, Dict[str, str]]]:
+    cities = ["Lisbon", "Nairobi", "Osaka", "Toronto", "Lima", "Oslo", "Pune", "Cairo"]
+    professions = ["Data Engineer", "Nurse", "Architect", "Sales Manager", "Chef", "Teacher"]
+    for number in range(count):
+        yield number + 2, {
+            "name": f"Employee {number:06d}",
+            "city": cities[number % len(cities)],
+            "profession": professions[number % len(professions)],
+            "message": f"Welcome aboard! Looking forward to working with you, employee #{number}.",
+        }
+
+
+def main():
+    """Command line entry point: render a roster or benchmark the renderer."""
+    parser = argparse.ArgumentParser(description="Render business cards from a CSV or JSONL roster")
+    parser.add_argument("roster", nargs="?", help="CSV (with header) or JSONL roster")
+    parser.add_argument("--rebuild", metavar="FOLDER", help="Re-render the cards of FOLDER rendered with an older template")
+    parser.add_argument("--force", action="store_true", help="With --rebuild, re-render every card")
+    parser.add_argument("--output", help="Output folder (defaults to <roster name>_cards)")
+    parser.add_argument("--template", default=TEMPLATE_PATH, help="Business card template")
+    parser.add_argument("--workers", type=int, help="Worker processes (defaults to the CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Rows per worker task")
+    parser.add_argument("--title", default="Business Card", help="Title of the rows without one")
+    parser.add_argument("--date", default=date.today().isoformat(), help="Date of the rows without one (YYYY-MM-DD)")
+    parser.add_argument("--benchmark", type=int, metavar="COUNT", help="Render COUNT synthetic cards to a temporary folder")
+    args = parser.parse_args()
+    if not (args.roster or args.benchmark or args.rebuild):
+        parser.error("a roster, --rebuild or --benchmark is required")
+
+    if args.rebuild:
+        print(f"🔄 Rebuilding {args.rebuild}")
+        result = rebuild_cards(args.rebuild, args.template, args.workers, args.chunk_size, args.force)
+        print(f"✅ {result.rendered} cards re-rendered in {result.seconds:.2f}s, {result.up_to_date} already up to date")
+        for error in result.errors[:5]:
+            print(f"⚠️  {error}")
+        if len(result.errors) > 5:
+            print(f"⚠️  ... and {len(result.errors) - 5} more cards could not be rebuilt")
+        if result.rejected:
+            print(f"⚠️  {len(result.rejected)} stored cards no longer match the card contract")
+        print(f"📋 Manifest: {result.manifest_path}")
+        return
+
+    defaults = {"title": args.title, "date": args.date}
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.benchmark:
+            rows, output_dir = _synthetic_roster(args.benchmark), args.output or scratch
+            print(f"🏁 Rendering {args.benchmark} synthetic cards")
+        else:
+            rows = read_roster(args.roster)
+            output_dir = args.output or f"{os.path.splitext(args.roster)[0]}_cards"
+            print(f"📇 Rendering {args.roster}")
+        result = render_roster(rows, output_dir, args.template, args.workers, args.chunk_size, defaults)
+
+    print(f"✅ {result.rendered} cards ({result.total_bytes / 1024 / 1024:.1f} MB) in {result.seconds:.2f}s "
+          f"- {result.per_minute:,.0f} cards/minute")
+    if result.duplicates:
+        print(f"♻️  {result.duplicates} duplicate rows skipped (rendered once)")
+    if result.rejected:
+        print(f"⚠️  {len(result.rejected)} rows rejected, e.g. line {result.rejected[0]['line']}: "
+              f"{'; '.join(result.rejected[0]['errors'])}")
+    if not args.benchmark or args.output:
+        print(f"📋 Manifest: {result.manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
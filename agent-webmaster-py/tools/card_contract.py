@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+The business card JSON contract shared by the card generator, FxTemplateFiller and
+the offline card tools.
+
+The fields and the ones required come from the template filler's OpenAPI spec (the
+contract the ``ag_web_gen`` agent calls); ``date`` must be an ISO ``YYYY-MM-DD``
+date, as the card generator's instructions ask.
+
+- ``card_json_schema`` is the JSON schema of the card generator's response format:
+  every field is required and no other property is allowed. The agents SDK has no
+  strict flag for it, so replies are still checked
+- ``parse_card`` validates a reply locally before it is published (with ``orjson``
+  when it is installed). A reply that still wraps the object in a code fence or
+  text is repaired instead of costing another conversation turn
+- every check is counted in a local SQLite database: replies valid as returned,
+  repaired (a retry saved) and rejected (a failed publish avoided)
+
+Limitation: in the ``ag_web_gen`` pipeline the card goes from the connected card
+generator to the template filler's OpenAPI tool inside the Foundry service, so no
+local code sees it before it is published and ``parse_card`` cannot run there. That
+path gets the contract through ``apply_card_schema``, which puts the same constraints
+(date pattern, non-empty fields, no other property) in the OpenAPI tool's request
+schema. ``parse_card`` and ``validate_card`` guard the paths that publish from this
+process: ``PublisherClient.publish_card``, the card generator tester and the offline
+card tools.
+
+Usage:
+    python tools/card_contract.py card.json
+    python tools/card_contract.py --stats
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+from contextlib import closing
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library parser is used instead
+    orjson = None
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.local_state import get_state_path
+
+_AGENT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_FILLER_SPEC = os.path.join(_AGENT_ROOT, "agents", "ag_web_gen", "tools", "html_template_filler_openapi_spec.json")
+DATE_FORMAT = "%Y-%m-%d"
+DATE_PATTERN = r"^[0-9]{4}-[0-9]{2}-[0-9]{2}$"
+STATS_FILENAME = "card_validation.db"
+_DATE_REGEX = re.compile(DATE_PATTERN)
+_FENCE_PATTERN = re.compile(r"^```[a-zA-Z]*\s*(.*?)\s*```$", re.DOTALL)
+
+
+def load_card_contract(spec_path: str = TEMPLATE_FILLER_SPEC) -> Tuple[str, List[str]]:
+    """
+    Read the template filler contract from its OpenAPI spec.
+
+    Returns:
+        Tuple of (path, required card fields)
+    """
+    with open(spec_path, encoding="utf-8") as f:
+        spec = json.load(f)
+    path, definition = next(iter(spec["paths"].items()))
+    schema = definition["post"]["requestBody"]["content"]["application/json"]["schema"]
+    return path.split("?", 1)[0], list(schema.get("required", []))
+
+
+def validate_card(card: Any, fields: List[str]) -> List[str]:
+    """
+    Check a card against the contract.
+
+    Args:
+        card: Decoded card JSON
+        fields: Card fields, as returned by ``load_card_contract``
+
+    Returns:
+        The problems found, empty when the card is valid
+    """
+    if not isinstance(card, dict):
+        return [f"expected a JSON object, got {type(card).__name__}"]
+    errors = [f"missing field '{field}'" for field in fields if field not in card]
+    errors += [f"unexpected field '{field}'" for field in card if field not in fields]
+    for field, value in card.items():
+        if not isinstance(value, str):
+            errors.append(f"field '{field}' must be a string")
+        elif not value.strip():
+            errors.append(f"field '{field}' is empty")
+    date = card.get("date")
+    if isinstance(date, str) and date.strip():
+        # The schema's pattern first (strptime also accepts "2024-5-1"), then a real calendar date
+        valid_date = _DATE_REGEX.match(date) is not None
+        if valid_date:
+            try:
+                datetime.strptime(date, DATE_FORMAT)
+            except ValueError:
+                valid_date = False
+        if not valid_date:
+            errors.append(f"field 'date' must be a YYYY-MM-DD date, got '{date}'")
+    return errors
+
+
+def card_json_schema(fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    JSON schema of a card, for the card generator's response format.
+
+    Args:
+        fields: Card fields (defaults to the contract's)
+
+    Returns:
+        Schema with every field required, string-typed and no other property allowed
+    """
+    if fields is None:
+        _, fields = load_card_contract()
+    properties = {field: {"type": "string"} for field in fields}
+    if "date" in properties:
+        properties["date"] = {"type": "string", "pattern": DATE_PATTERN, "description": "YYYY-MM-DD"}
+    return {"type": "object", "properties": properties, "required": list(fields), "additionalProperties": False}
+
+
+def apply_card_schema(openapi_spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Put the card contract's constraints in the request schema of a template filler spec.
+
+    The card sent by the ``ag_web_gen`` agent never goes through this process, so the
+    OpenAPI tool definition is where the contract can reach it: every field becomes a
+    non-empty string, the date gets the YYYY-MM-DD pattern and no other property is
+    allowed. The descriptions of the spec are kept.
+
+    Args:
+        openapi_spec: Template filler OpenAPI spec, modified in place
+
+    Returns:
+        The spec
+    """
+    for definition in openapi_spec.get("paths", {}).values():
+        schema = definition["post"]["requestBody"]["content"]["application/json"]["schema"]
+        contract = card_json_schema(list(schema.get("required", [])))
+        for field, constraints in contract["properties"].items():
+            schema.setdefault("properties", {}).setdefault(field, {}).update(
+                {key: value for key, value in constraints.items() if key != "description"}, minLength=1
+            )
+        schema["additionalProperties"] = False
+    return openapi_spec
+
+
+def _loads(text: str) -> Any:
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def parse_card(text: str, fields: Optional[List[str]] = None) -> Tuple[Optional[Dict[str, str]], List[str]]:
+    """
+    Parse and validate a card generator reply, and count the outcome.
+
+    Args:
+        text: The reply
+        fields: Card fields (defaults to the contract's)
+
+    Returns:
+        Tuple of (card, problems): the card is None when the reply cannot be used
+    """
+    if fields is None:
+        _, fields = load_card_contract()
+    stripped = text.strip()
+    repaired = False
+    try:
+        card = _loads(stripped)
+    except ValueError:
+        # A fenced object, or an object surrounded by text, is recovered locally
+        fenced = _FENCE_PATTERN.match(stripped)
+        candidate = fenced.group(1) if fenced else stripped[stripped.find("{"):stripped.rfind("}") + 1]
+        try:
+            card = _loads(candidate)
+            repaired = True
+        except ValueError as e:
+            _record("rejected")
+            return None, [f"invalid JSON: {e}"]
+    errors = validate_card(card, fields)
+    if errors:
+        _record("rejected")
+        return None, errors
+    _record("repaired" if repaired else "valid")
+    return card, []
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(get_state_path(STATS_FILENAME), timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)")
+    return conn
+
+
+def _record(outcome: str) -> None:
+    with closing(_connect()) as conn, conn:
+        conn.execute("INSERT OR IGNORE INTO counters (name) VALUES (?)", (outcome,))
+        conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (outcome,))
+
+
+def validation_stats() -> Dict[str, int]:
+    """Counts of the replies checked by ``parse_card``: valid, repaired and rejected."""
+    with closing(_connect()) as conn:
+        return dict(conn.execute("SELECT name, value FROM counters").fetchall())
+
+
+def reset_validation_stats() -> None:
+    """Forget the counts of ``validation_stats``."""
+    with closing(_connect()) as conn, conn:
+        conn.execute("DELETE FROM counters")
+
+
+def main():
+    """Command line entry point: validate card files or show the validation metrics."""
+    parser = argparse.ArgumentParser(description="Validate card JSON against the card contract")
+    parser.add_argument("files", nargs="*", help="Card generator replies to validate")
+    parser.add_argument("--stats", action="store_true", help="Show the validation metrics")
+    parser.add_argument("--reset", action="store_true", help="Reset the validation metrics")
+    args = parser.parse_args()
+
+    for path in args.files:
+        with open(path, encoding="utf-8") as f:
+            card, errors = parse_card(f.read())
+        if card is None:
+            print(f"❌ {path}: {'; '.join(errors)}")
+        else:
+            print(f"✅ {path}: {card.get('name', '')}")
+    if args.reset:
+        reset_validation_stats()
+        print("🗑️  Validation metrics reset")
+    if args.stats:
+        stats = validation_stats()
+        valid, repaired, rejected = (stats.get(key, 0) for key in ("valid", "repaired", "rejected"))
+        total = valid + repaired + rejected
+        print(f"📊 {total} replies checked{' (orjson)' if orjson is not None else ''}")
+        if total:
+            print(f"   ✅ valid as returned: {valid} ({valid / total:.1%})")
+            print(f"   🔧 repaired locally (retries saved): {repaired} ({repaired / total:.1%})")
+            print(f"   ❌ rejected before publishing: {rejected} ({rejected / total:.1%})")
+
+
+if __name__ == "__main__":
+    main()
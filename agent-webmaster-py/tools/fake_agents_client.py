@@ -0,0 +1,592 @@
+"""
+In-process stand-in for ``AgentsClient``.
+
+Implements the subset of the client used by this project - ``list_agents``,
+``create_agent``, ``update_agent``, ``enable_auto_function_calls``, threads, messages,
+runs and run steps - and returns the SDK's own models (``ThreadRun``, ``RunStep``,
+``ThreadMessage``), so the orchestration code runs unchanged without a Foundry project.
+
+Runs follow a scripted timeline per agent: a queue delay, model "thinking" segments,
+tool calls (server-side OpenAPI / connected agent calls, or local function calls that
+put the run in ``requires_action`` until the outputs are submitted) and the reply.
+Every delay is drawn from a log-normal ``Latency`` (median and p95) with a seeded
+random generator, and the state is computed from the clock when polled, so hundreds of
+concurrent runs cost no threads. ``time_scale`` speeds the timeline up or slows it down.
+
+Set ``FAKE_AGENTS_CLIENT=1`` to make the agent modules use the shared fake client, e.g.
+to click through the Streamlit app or the testers offline.
+"""
+
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from azure.ai.agents.models import (
+    Agent,
+    AgentThread,
+    FunctionTool,
+    ListSortOrder,
+    RunStep,
+    ThreadMessage,
+    ThreadRun,
+    ToolSet,
+)
+from azure.core.exceptions import ResourceNotFoundError
+
+
+@dataclass
+class Latency:
+    """Log-normal delay given by its median and 95th percentile, in seconds."""
+
+    median_seconds: float
+    p95_seconds: Optional[float] = None  # None for a constant delay
+
+    def sample(self, rng: random.Random, scale: float = 1.0) -> float:
+        if self.median_seconds <= 0:
+            return 0.0
+        if not self.p95_seconds or self.p95_seconds <= self.median_seconds:
+            return self.median_seconds * scale
+        sigma = math.log(self.p95_seconds / self.median_seconds) / 1.645
+        return rng.lognormvariate(math.log(self.median_seconds), sigma) * scale
+
+
+@dataclass
+class ScriptedToolCall:
+    """A tool call the fake model makes during a run."""
+
+    type: str  # "function" (executed by the client), "openapi" or "connected_agent"
+    name: str
+    arguments: Dict[str, Any] = field(default_factory=dict)
+    output: str = "{}"
+    latency: Latency = field(default_factory=lambda: Latency(0.5, 1.5))
+
+
+@dataclass
+class AgentScript:
+    """How the fake service answers one agent."""
+
+    reply: Union[str, Callable[[str], str]]
+    tool_calls: List[ScriptedToolCall] = field(default_factory=list)
+    queue_latency: Latency = field(default_factory=lambda: Latency(0.2, 1.0))
+    thinking_latency: Latency = field(default_factory=lambda: Latency(0.8, 2.5))
+    rate_limit_probability: float = 0.0
+
+
+_CARD_NAMES = ["Sarah Chen", "Walter Okafor", "Lucia Moreno", "Kenji Watanabe", "Amira Haddad"]
+_CARD_CITIES = ["Singapore", "Lagos", "Madrid", "Osaka", "Beirut"]
+
+
+def _fake_card(prompt: str) -> str:
+    index = len(prompt) % len(_CARD_NAMES)
+    return json.dumps({
+        "title": "Professional Card",
+        "name": _CARD_NAMES[index],
+        "city": _CARD_CITIES[index],
+        "profession": "Software Engineer",
+        "message": "Building reliable software, one card at a time.",
+        "date": time.strftime("%Y-%m-%d"),
+    })
+
+
+def _fake_published_card(prompt: str) -> str:
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    url = f"https://fakestorage.blob.core.windows.net/cards/filled_template_{digest}.html"
+    return f"Your card has been published: [Open card]({url})"
+
+
+def _fake_report(prompt: str) -> str:
+    title = prompt.splitlines()[0][:80] if prompt else "Report"
+    rows = "".join(f"<tr><td>Item {i}</td><td>{i * 1250}</td></tr>" for i in range(1, 13))
+    return (
+        "<!DOCTYPE html><html><head><title>" + title + "</title></head><body>"
+        "<section class=\"report-card\" id=\"report-container\"><h1>" + title + "</h1>"
+        "<table><tr><th>Item</th><th>Value</th></tr>" + rows + "</table></section></body></html>"
+    )
+
+
+DEFAULT_AGENT_SCRIPTS: Dict[str, AgentScript] = {
+    "ag-card-generator": AgentScript(
+        reply=_fake_card,
+        thinking_latency=Latency(1.2, 3.0),
+    ),
+    "ag-web-gen": AgentScript(
+        reply=_fake_published_card,
+        tool_calls=[
+            ScriptedToolCall("connected_agent", "card_generator", latency=Latency(2.5, 6.0)),
+            ScriptedToolCall("openapi", "html_template_filler_FxTemplateFiller", latency=Latency(0.8, 2.0)),
+        ],
+    ),
+    "ag-report-builder": AgentScript(
+        reply=_fake_report,
+        tool_calls=[ScriptedToolCall("function", "load_html_template", {"template_name": "report_template.html"})],
+        queue_latency=Latency(0.5, 2.0),
+        thinking_latency=Latency(12.0, 35.0),
+    ),
+}
+
+
+class _RunState:
+    """Timeline and bookkeeping of one fake run."""
+
+    def __init__(self, run_id, thread_id, agent, script, prompt, phases, created_at, queued_until, rate_limited):
+        self.id = run_id
+        self.thread_id = thread_id
+        self.agent = agent
+        self.script = script
+        self.prompt = prompt
+        self.phases = phases  # [("think", seconds) | ("tool", seconds, ScriptedToolCall)]
+        self.created_at = created_at
+        self.queued_until = queued_until
+        self.rate_limited = rate_limited
+        self.status = "queued"
+        self.started_at = None
+        self.finished_at = None
+        self.cursor = 0
+        self.phase_started_at = None
+        self.pending_call_id = None
+        self.submitted_at = None
+        self.steps: List[Dict[str, Any]] = []
+        self.last_error = None
+        self.usage = None
+
+
+def _epoch(value: Optional[float]) -> Optional[int]:
+    return int(value) if value is not None else None
+
+
+class _FakeThreads:
+    def __init__(self, client: "FakeAgentsClient"):
+        self._client = client
+
+    def create(self, messages=None, **kwargs) -> AgentThread:
+        client = self._client
+        client._count("threads.create")
+        thread_id = f"thread_{uuid.uuid4().hex[:24]}"
+        now = time.time()
+        with client._lock:
+            client._threads[thread_id] = {"created_at": now, "messages": []}
+            for message in messages or []:
+                client._add_message(thread_id, getattr(message, "role", None) or message["role"],
+                                    getattr(message, "content", None) or message["content"])
+        return AgentThread({"id": thread_id, "object": "thread", "created_at": int(now),
+                            "tool_resources": None, "metadata": {}})
+
+    def get(self, thread_id: str) -> AgentThread:
+        client = self._client
+        client._count("threads.get")
+        thread = client._thread(thread_id)
+        return AgentThread({"id": thread_id, "object": "thread", "created_at": int(thread["created_at"]),
+                            "tool_resources": None, "metadata": {}})
+
+    def delete(self, thread_id: str) -> None:
+        client = self._client
+        client._count("threads.delete")
+        with client._lock:
+            if client._threads.pop(thread_id, None) is None:
+                raise ResourceNotFoundError(f"No thread found with id '{thread_id}'.")
+
+
+class _FakeMessages:
+    def __init__(self, client: "FakeAgentsClient"):
+        self._client = client
+
+    def create(self, thread_id: str, role, content: str, **kwargs) -> ThreadMessage:
+        client = self._client
+        client._count("messages.create")
+        client._thread(thread_id)
+        with client._lock:
+            return ThreadMessage(client._add_message(thread_id, role, content))
+
+    def list(self, thread_id: str, run_id: Optional[str] = None, limit: Optional[int] = None,
+             order=ListSortOrder.DESCENDING, **kwargs) -> List[ThreadMessage]:
+        client = self._client
+        client._count("messages.list")
+        with client._lock:
+            messages = [m for m in client._thread(thread_id)["messages"] if run_id is None or m["run_id"] == run_id]
+        if getattr(order, "value", order) == "desc":
+            messages = list(reversed(messages))
+        return [ThreadMessage(message) for message in messages[:limit]]
+
+
+class _FakeRuns:
+    def __init__(self, client: "FakeAgentsClient"):
+        self._client = client
+        self._function_tool = None  # Set by enable_auto_function_calls, like the real client
+
+    def create(self, thread_id: str, agent_id: str, model: Optional[str] = None,
+               additional_instructions: Optional[str] = None, **kwargs) -> ThreadRun:
+        client = self._client
+        client._count("runs.create")
+        return client._start_run(thread_id, agent_id, model, additional_instructions)
+
+    def get(self, thread_id: str, run_id: str, **kwargs) -> ThreadRun:
+        client = self._client
+        client._count("runs.get")
+        return client._run_model(client._advance(run_id))
+
+    def cancel(self, thread_id: str, run_id: str, **kwargs) -> ThreadRun:
+        client = self._client
+        client._count("runs.cancel")
+        state = client._advance(run_id)
+        with client._lock:
+            if state.status in ("queued", "in_progress", "requires_action"):
+                state.status = "cancelled"
+                state.finished_at = time.time()
+        return client._run_model(state)
+
+    def submit_tool_outputs(self, thread_id: str, run_id: str, tool_outputs, **kwargs) -> ThreadRun:
+        client = self._client
+        client._count("runs.submit_tool_outputs")
+        state = client._advance(run_id)
+        with client._lock:
+            if state.status != "requires_action":
+                raise ValueError(f"Run {run_id} is not waiting for tool outputs (status: {state.status})")
+            state.submitted_at = time.time()
+            state.status = "in_progress"
+        return client._run_model(client._advance(run_id))
+
+    def create_and_process(self, thread_id: str, agent_id: str, polling_interval: int = 1, **kwargs) -> ThreadRun:
+        """Create a run and poll it every ``polling_interval`` seconds, like the SDK."""
+        run = self.create(thread_id=thread_id, agent_id=agent_id, **kwargs)
+        while run.status in ("queued", "in_progress", "requires_action"):
+            time.sleep(polling_interval)
+            run = self.get(thread_id=thread_id, run_id=run.id)
+            if run.status == "requires_action" and self._function_tool is not None:
+                toolset = ToolSet()
+                toolset.add(self._function_tool)
+                outputs = toolset.execute_tool_calls(run.required_action.submit_tool_outputs.tool_calls)
+                run = self.submit_tool_outputs(thread_id=thread_id, run_id=run.id, tool_outputs=outputs)
+        return run
+
+
+class _FakeRunSteps:
+    def __init__(self, client: "FakeAgentsClient"):
+        self._client = client
+
+    def list(self, thread_id: str, run_id: str, **kwargs) -> List[RunStep]:
+        client = self._client
+        client._count("run_steps.list")
+        state = client._advance(run_id)
+        with client._lock:
+            return [RunStep(dict(step)) for step in state.steps]
+
+
+class FakeAgentsClient:
+    """
+    Offline ``AgentsClient`` with scripted, latency-modelled runs.
+
+    Args:
+        scripts: Script per agent name (defaults to ``DEFAULT_AGENT_SCRIPTS``)
+        seed: Seed of the latency random generator, for reproducible runs
+        time_scale: Factor applied to every latency (0 makes runs complete instantly)
+    """
+
+    def __init__(self, scripts: Optional[Dict[str, AgentScript]] = None, seed: int = 0, time_scale: float = 1.0):
+        self.scripts = dict(DEFAULT_AGENT_SCRIPTS if scripts is None else scripts)
+        self.time_scale = time_scale
+        self.call_counts: Counter = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self._agents: Dict[str, Dict[str, Any]] = {}
+        self._threads: Dict[str, Dict[str, Any]] = {}
+        self._runs: Dict[str, _RunState] = {}
+        self.threads = _FakeThreads(self)
+        self.messages = _FakeMessages(self)
+        self.runs = _FakeRuns(self)
+        self.run_steps = _FakeRunSteps(self)
+
+    # Agents
+
+    def list_agents(self, **kwargs) -> List[Agent]:
+        self._count("list_agents")
+        with self._lock:
+            return [Agent(dict(agent)) for agent in self._agents.values()]
+
+    def get_agent(self, agent_id: str) -> Agent:
+        self._count("get_agent")
+        with self._lock:
+            if agent_id not in self._agents:
+                raise ResourceNotFoundError(f"No agent found with id '{agent_id}'.")
+            return Agent(dict(self._agents[agent_id]))
+
+    def create_agent(self, model: str, name: Optional[str] = None, description: Optional[str] = None,
+                     instructions: Optional[str] = None, tools=None, **kwargs) -> Agent:
+        self._count("create_agent")
+        agent_id = f"asst_{uuid.uuid4().hex[:24]}"
+        agent = {
+            "id": agent_id,
+            "object": "assistant",
+            "created_at": int(time.time()),
+            "name": name,
+            "description": description,
+            "model": model,
+            "instructions": instructions,
+            "tools": [self._as_dict(tool) for tool in tools or []],
+            "metadata": {},
+        }
+        if kwargs.get("response_format") is not None:
+            agent["response_format"] = self._as_dict(kwargs["response_format"])
+        with self._lock:
+            self._agents[agent_id] = agent
+        return Agent(dict(agent))
+
+    def update_agent(self, agent_id: str, **kwargs) -> Agent:
+        self._count("update_agent")
+        with self._lock:
+            if agent_id not in self._agents:
+                raise ResourceNotFoundError(f"No agent found with id '{agent_id}'.")
+            agent = self._agents[agent_id]
+            for key, value in kwargs.items():
+                if value is not None:
+                    agent[key] = [self._as_dict(tool) for tool in value] if key == "tools" else self._as_dict(value)
+            return Agent(dict(agent))
+
+    def delete_agent(self, agent_id: str) -> None:
+        self._count("delete_agent")
+        with self._lock:
+            self._agents.pop(agent_id, None)
+
+    def enable_auto_function_calls(self, tools, max_retry: int = 10) -> None:
+        """Register the local functions executed for ``requires_action`` runs."""
+        if isinstance(tools, FunctionTool):
+            self.runs._function_tool = tools
+        elif isinstance(tools, ToolSet):
+            self.runs._function_tool = tools.get_tool(FunctionTool)
+        else:
+            self.runs._function_tool = FunctionTool(tools)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_details):
+        self.close()
+
+    # Benchmark helpers
+
+    def simulated_seconds(self, run_id: str) -> Optional[float]:
+        """Get the exact service-side duration (queue included) of a finished run."""
+        with self._lock:
+            state = self._runs.get(run_id)
+            if state is None or state.finished_at is None:
+                return None
+            return state.finished_at - state.created_at
+
+    # Internals
+
+    @staticmethod
+    def _as_dict(value: Any) -> Any:
+        if hasattr(value, "as_dict"):
+            return value.as_dict()
+        if hasattr(value, "definitions"):
+            return [definition.as_dict() for definition in value.definitions]
+        return value
+
+    def _count(self, operation: str) -> None:
+        with self._lock:
+            self.call_counts[operation] += 1
+
+    def _thread(self, thread_id: str) -> Dict[str, Any]:
+        with self._lock:
+            if thread_id not in self._threads:
+                raise ResourceNotFoundError(f"No thread found with id '{thread_id}'.")
+            return self._threads[thread_id]
+
+    def _add_message(self, thread_id: str, role, content: str, run_id=None, agent_id=None) -> Dict[str, Any]:
+        message = {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "object": "thread.message",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "status": "completed",
+            "role": getattr(role, "value", role),
+            "content": [{"type": "text", "text": {"value": content, "annotations": []}}],
+            "agent_id": agent_id,
+            "run_id": run_id,
+            "attachments": [],
+            "metadata": {},
+        }
+        self._threads[thread_id]["messages"].append(message)
+        return message
+
+    def _start_run(self, thread_id: str, agent_id: str, model: Optional[str], additional_instructions) -> ThreadRun:
+        thread = self._thread(thread_id)
+        with self._lock:
+            if agent_id not in self._agents:
+                raise ResourceNotFoundError(f"No agent found with id '{agent_id}'.")
+            agent = dict(self._agents[agent_id])
+            if model:
+                agent["model"] = model
+            script = self.scripts.get(agent["name"]) or AgentScript(reply="OK")
+            prompt = next((m["content"][0]["text"]["value"] for m in reversed(thread["messages"])
+                           if m["role"] == "user"), "")
+            now = time.time()
+            phases = []
+            for tool_call in script.tool_calls:
+                phases.append(("think", script.thinking_latency.sample(self._rng, self.time_scale) / 2))
+                phases.append(("tool", tool_call.latency.sample(self._rng, self.time_scale), tool_call))
+            phases.append(("think", script.thinking_latency.sample(self._rng, self.time_scale)))
+            state = _RunState(
+                run_id=f"run_{uuid.uuid4().hex[:24]}",
+                thread_id=thread_id,
+                agent=agent,
+                script=script,
+                prompt=prompt + (additional_instructions or ""),
+                phases=phases,
+                created_at=now,
+                queued_until=now + script.queue_latency.sample(self._rng, self.time_scale),
+                rate_limited=self._rng.random() < script.rate_limit_probability,
+            )
+            self._runs[state.id] = state
+        return self._run_model(state)
+
+    def _add_step(self, state: _RunState, step_type: str, started: float, finished: float,
+                  tool_call: Optional[ScriptedToolCall] = None, call_id: Optional[str] = None,
+                  message_id: Optional[str] = None, tokens: int = 0) -> None:
+        if step_type == "tool_calls":
+            details = {"type": "tool_calls", "tool_calls": [{
+                "id": call_id or f"call_{uuid.uuid4().hex[:24]}",
+                "type": tool_call.type,
+                tool_call.type: {"name": tool_call.name, "arguments": json.dumps(tool_call.arguments),
+                                 "output": tool_call.output},
+            }]}
+        else:
+            details = {"type": "message_creation", "message_creation": {"message_id": message_id}}
+        state.steps.append({
+            "id": f"step_{uuid.uuid4().hex[:24]}",
+            "object": "thread.run.step",
+            "type": step_type,
+            "agent_id": state.agent["id"],
+            "thread_id": state.thread_id,
+            "run_id": state.id,
+            "status": "completed",
+            "step_details": details,
+            "created_at": _epoch(started),
+            "completed_at": _epoch(finished),
+            "usage": {"prompt_tokens": tokens, "completion_tokens": tokens // 10, "total_tokens": tokens + tokens // 10},
+            "metadata": {},
+        })
+
+    def _advance(self, run_id: str) -> _RunState:
+        """Move a run along its timeline up to the current time."""
+        now = time.time()
+        with self._lock:
+            state = self._runs.get(run_id)
+            if state is None:
+                raise ResourceNotFoundError(f"No run found with id '{run_id}'.")
+            if state.status in ("completed", "failed", "cancelled", "expired"):
+                return state
+            if state.status == "queued":
+                if now < state.queued_until:
+                    return state
+                state.started_at = state.phase_started_at = state.queued_until
+                if state.rate_limited:
+                    state.status = "failed"
+                    state.finished_at = state.queued_until
+                    state.last_error = {
+                        "code": "rate_limit_exceeded",
+                        "message": "Rate limit is exceeded. Try again in 2 seconds.",
+                    }
+                    return state
+                state.status = "in_progress"
+
+            prompt_tokens = (len(state.prompt) + len(state.agent.get("instructions") or "")) // 4
+            while state.cursor < len(state.phases):
+                phase = state.phases[state.cursor]
+                if phase[0] == "tool" and phase[2].type == "function":
+                    if state.submitted_at is None:
+                        if state.status != "requires_action":
+                            state.status = "requires_action"
+                            state.pending_call_id = f"call_{uuid.uuid4().hex[:24]}"
+                        return state
+                    phase_end = state.submitted_at
+                else:
+                    phase_end = state.phase_started_at + phase[1]
+                if now < phase_end:
+                    return state
+                if phase[0] == "tool":
+                    self._add_step(state, "tool_calls", state.phase_started_at, phase_end, phase[2],
+                                   call_id=state.pending_call_id, tokens=prompt_tokens)
+                    state.pending_call_id = state.submitted_at = None
+                state.status = "in_progress"
+                state.cursor += 1
+                if state.cursor < len(state.phases):
+                    state.phase_started_at = phase_end
+                else:
+                    state.finished_at = phase_end
+
+            reply = state.script.reply(state.prompt) if callable(state.script.reply) else state.script.reply
+            message = self._add_message(state.thread_id, "assistant", reply, run_id=state.id,
+                                        agent_id=state.agent["id"])
+            self._add_step(state, "message_creation", state.phase_started_at, state.finished_at,
+                           message_id=message["id"], tokens=prompt_tokens)
+            completion_tokens = len(reply) // 4
+            total_prompt = prompt_tokens * len(state.steps)
+            state.usage = {"prompt_tokens": total_prompt, "completion_tokens": completion_tokens,
+                           "total_tokens": total_prompt + completion_tokens}
+            state.status = "completed"
+            return state
+
+    def _run_model(self, state: _RunState) -> ThreadRun:
+        with self._lock:
+            run = {
+                "id": state.id,
+                "object": "thread.run",
+                "thread_id": state.thread_id,
+                "agent_id": state.agent["id"],
+                "status": state.status,
+                "model": state.agent.get("model"),
+                "instructions": state.agent.get("instructions") or "",
+                "tools": state.agent.get("tools") or [],
+                "created_at": _epoch(state.created_at),
+                "started_at": _epoch(state.started_at),
+                "metadata": {},
+                "last_error": state.last_error,
+                "usage": state.usage,
+            }
+            if state.status == "completed":
+                run["completed_at"] = _epoch(state.finished_at)
+            elif state.status == "failed":
+                run["failed_at"] = _epoch(state.finished_at)
+            elif state.status == "cancelled":
+                run["cancelled_at"] = _epoch(state.finished_at)
+            if state.status == "requires_action":
+                tool_call = state.phases[state.cursor][2]
+                run["required_action"] = {
+                    "type": "submit_tool_outputs",
+                    "submit_tool_outputs": {"tool_calls": [{
+                        "id": state.pending_call_id,
+                        "type": "function",
+                        "function": {"name": tool_call.name, "arguments": json.dumps(tool_call.arguments)},
+                    }]},
+                }
+            return ThreadRun(run)
+
+
+_shared_fake_client = None
+
+
+def fake_client_enabled() -> bool:
+    """Check the ``FAKE_AGENTS_CLIENT`` environment switch."""
+    return os.environ.get("FAKE_AGENTS_CLIENT", "").lower() in ("1", "true", "yes")
+
+
+def get_fake_agents_client() -> FakeAgentsClient:
+    """Get the process-wide fake client shared by the agent modules."""
+    global _shared_fake_client
+    if _shared_fake_client is None:
+        _shared_fake_client = FakeAgentsClient(
+            seed=int(os.environ.get("FAKE_AGENTS_SEED", "0")),
+            time_scale=float(os.environ.get("FAKE_AGENTS_TIME_SCALE", "1.0")),
+        )
+    return _shared_fake_client
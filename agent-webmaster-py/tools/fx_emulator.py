@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Local emulator of the project's Azure Functions.
+
+An asyncio HTTP server implementing the three functions of
+``AgenticWebGen.DotNetTools`` with the same request and response contracts:
+
+- ``POST /api/FxTemplateFiller``: JSON object of strings, fills the ``{{key}}``
+  placeholders of ``misc/business_card_template.html`` and returns ``{"url": ...}``
+- ``POST /api/FxSqlQuerier``: T-SQL text, runs it on a SQLite copy of the database
+  built from ``misc/db_structure.sql`` and ``misc/tech_sample_seed.sql`` (see
+  ``tools.tsql_sqlite``) and returns the rows as a JSON array
+- ``POST /api/FxReportUploader``: HTML text, stored as a report and returned as
+  ``{"url": ...}`` (a ``text/css`` body is stored as a shared report stylesheet)
+
+Filled cards and reports are written to ``<state dir>/fx_emulator/{cards,reports}``
+under the same content-hash names as the blobs (identical content is stored once and
+concurrent publishes never overwrite each other) and served back with ``GET /cards/<name>`` and
+``GET /reports/<name>``. Errors use the functions' status codes and messages, and a
+missing or wrong ``code`` query parameter is rejected with 401 like a function key.
+
+The server listens on the host and port of ``AZURE_FUNCTION_URL`` and accepts the
+``code`` of that URL, so ``parse_azure_function_url_and_modify_spec`` produces specs
+pointing at it unchanged. Point that variable at the emulator for local tool
+benchmarks (the Foundry service cannot reach a local address, so agents running
+server-side OpenAPI tools still need the deployed functions).
+
+``GET /metrics`` returns the per-endpoint request count, errors and latency
+percentiles, which are also printed when the server stops.
+
+Usage:
+    AZURE_FUNCTION_URL="http://localhost:7071/api/FxTemplateFiller?code=local" python tools/fx_emulator.py
+    python tools/fx_emulator.py --port 7071 --code local --scripts drill-down-data.sql
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.local_state import get_state_path
+from tools.tsql_sqlite import DEFAULT_SCRIPTS, MISC_DIR, connect, load_scripts, split_statements, translate
+
+DEFAULT_URL = "http://localhost:7071/api/FxTemplateFiller?code=local"
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+            405: "Method Not Allowed", 411: "Length Required", 500: "Internal Server Error"}
+
+
+class EndpointMetrics:
+    """Latency and error counters per endpoint."""
+
+    def __init__(self):
+        self._latencies: Dict[str, List[float]] = defaultdict(list)
+        self._errors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, status: int) -> None:
+        with self._lock:
+            self._latencies[endpoint].append(seconds)
+            if status >= 400:
+                self._errors[endpoint] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Get count, errors, mean, p50, p95, p99 and max latency (ms) per endpoint."""
+        with self._lock:
+            result = {}
+            for endpoint, latencies in self._latencies.items():
+                ordered = sorted(latencies)
+
+                def _at(fraction: float) -> float:
+                    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 2)
+
+                result[endpoint] = {
+                    "count": len(ordered),
+                    "errors": self._errors[endpoint],
+                    "mean_ms": round(statistics.mean(ordered) * 1000, 2),
+                    "p50_ms": _at(0.5),
+                    "p95_ms": _at(0.95),
+                    "p99_ms": _at(0.99),
+                    "max_ms": round(ordered[-1] * 1000, 2),
+                }
+            return result
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.hex()
+    return value
+
+
+class FunctionsEmulator:
+    """
+    The three functions and the file serving, independent of the HTTP layer.
+
+    Args:
+        base_url: Public base URL of the emulator (used in the returned URLs)
+        code: Function key expected in the ``code`` query parameter (None accepts any)
+        output_dir: Folder of the ``cards`` and ``reports`` containers
+        template_path: Business card template
+        scripts: T-SQL scripts creating and seeding the database
+    """
+
+    def __init__(self, base_url: str, code: Optional[str], output_dir: str,
+                 template_path: str = os.path.join(MISC_DIR, "business_card_template.html"),
+                 scripts=DEFAULT_SCRIPTS):
+        self.base_url = base_url.rstrip("/")
+        self.code = code
+        self.output_dir = output_dir
+        self.template_path = template_path
+        self.metrics = EndpointMetrics()
+        for container in ("cards", "reports"):
+            os.makedirs(os.path.join(output_dir, container), exist_ok=True)
+
+        # Seed a database file once; each worker thread opens its own connection to it
+        self.database_path = os.path.join(output_dir, "sql_querier.db")
+        if os.path.exists(self.database_path):
+            os.remove(self.database_path)
+        seed = connect(self.database_path)
+        load_scripts(seed, scripts)
+        seed.close()
+        self._local = threading.local()
+
+    def _connection(self):
+        if getattr(self._local, "connection", None) is None:
+            self._local.connection = connect(self.database_path, check_same_thread=False)
+        return self._local.connection
+
+    def _store(self, container: str, prefix: str, content: str, extension: str = "html") -> str:
+        data = content.encode("utf-8")
+        name = f"{prefix}_{hashlib.sha256(data).hexdigest()}.{extension}"
+        path = os.path.join(self.output_dir, container, name)
+        if not os.path.exists(path):
+            temporary = f"{path}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(data)
+            os.replace(temporary, path)
+        return f"{self.base_url}/{container}/{name}"
+
+    def template_filler(self, body: str) -> Tuple[int, str, str]:
+        if not body.strip():
+            return 400, "text/plain", "Request body cannot be empty."
+        try:
+            data = json.loads(body)
+        except json.JSONDecodeError:
+            return 400, "text/plain", "Malformed JSON."
+        if not isinstance(data, dict) or not all(isinstance(value, str) for value in data.values()):
+            return 400, "text/plain", "Invalid JSON or not a dictionary of string to string."
+        try:
+            with open(self.template_path, encoding="utf-8") as f:
+                html = f.read()
+        except OSError as e:
+            return 500, "text/plain", f"Error downloading template blob: {e}"
+        for key, value in data.items():
+            html = html.replace("{{" + key + "}}", value)
+        return 200, "application/json", json.dumps({"url": self._store("cards", "filled_template", html)})
+
+    def sql_querier(self, body: str) -> Tuple[int, str, str]:
+        if not body.strip():
+            return 400, "text/plain", "Request body cannot be empty. Please provide a T-SQL script."
+        try:
+            connection = self._connection()
+            rows = None
+            # Like the function's data reader, the first result set of the script is returned
+            for statement in split_statements(translate(body)):
+                cursor = connection.execute(statement)
+                if rows is None and cursor.description:
+                    columns = [column[0] for column in cursor.description]
+                    rows = [{column: _json_value(value) for column, value in zip(columns, row)} for row in cursor]
+            connection.commit()
+        except Exception as e:
+            return 500, "text/plain", f"Error executing SQL query: {e}"
+        return 200, "application/json", json.dumps(rows or [], indent=2, default=str)
+
+    def report_uploader(self, body: str, content_type: str = "text/html") -> Tuple[int, str, str]:
+        if not body.strip():
+            return 400, "text/plain", "Request body cannot be empty. Please provide HTML content."
+        if content_type.startswith("text/css"):
+            return 200, "application/json", json.dumps({"url": self._store("reports", "styles", body, "css")})
+        return 200, "application/json", json.dumps({"url": self._store("reports", "report", body)})
+
+    def serve_file(self, container: str, name: str) -> Tuple[int, str, str]:
+        path = os.path.join(self.output_dir, container, os.path.basename(unquote(name)))
+        if not os.path.isfile(path):
+            return 404, "text/plain", "The specified blob does not exist."
+        with open(path, encoding="utf-8") as f:
+            return 200, "text/css" if path.endswith(".css") else "text/html", f.read()
+
+    def handle(self, method: str, target: str, body: str, content_type: str = "") -> Tuple[str, int, str, str]:
+        """
+        Route one request.
+
+        Returns:
+            Tuple of (endpoint name for the metrics, status, content type, body)
+        """
+        parsed = urlparse(target)
+        path = parsed.path.rstrip("/")
+        functions = {
+            "/api/FxTemplateFiller": self.template_filler,
+            "/api/FxSqlQuerier": self.sql_querier,
+            "/api/FxReportUploader": self.report_uploader,
+        }
+        if path in functions:
+            endpoint = path.rsplit("/", 1)[-1]
+            if method != "POST":
+                return endpoint, 405, "text/plain", "Only POST is supported."
+            if self.code is not None and parse_qs(parsed.query).get("code", [None])[0] != self.code:
+                return endpoint, 401, "text/plain", ""
+            if path == "/api/FxReportUploader":
+                return (endpoint,) + self.report_uploader(body, content_type.lower())
+            return (endpoint,) + functions[path](body)
+        if path == "/metrics":
+            return "metrics", 200, "application/json", json.dumps(self.metrics.snapshot(), indent=2)
+        container, _, name = path.lstrip("/").partition("/")
+        if method == "GET" and container in ("cards", "reports") and name:
+            return container, *self.serve_file(container, name)
+        return "not_found", 404, "text/plain", "Not found."
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, target, version = request_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        return method, target, version, headers, None
+    length = int(headers.get("content-length") or 0)
+    body = await reader.readexactly(length) if length else b""
+    return method, target, version, headers, body
+
+
+class EmulatorServer:
+    """Asyncio HTTP/1.1 front end of a ``FunctionsEmulator`` (keep-alive supported)."""
+
+    def __init__(self, emulator: FunctionsEmulator, host: str, port: int):
+        self.emulator = emulator
+        self.host = host
+        self.port = port
+
+    async def _respond(self, writer, status: int, content_type: str, payload: bytes, keep_alive: bool) -> None:
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                start = time.perf_counter()
+                if body is None:
+                    endpoint, status, content_type = "unsupported", 411, "text/plain"
+                    text, keep_alive = "Chunked bodies are not supported.", False
+                else:
+                    # The SQL and file work runs in the default thread pool, off the event loop
+                    endpoint, status, content_type, text = await asyncio.get_running_loop().run_in_executor(
+                        None, self.emulator.handle, method, target, body.decode("utf-8", errors="replace"),
+                        headers.get("content-type", ""),
+                    )
+                self.emulator.metrics.record(endpoint, time.perf_counter() - start, status)
+                await self._respond(writer, status, content_type, text.encode("utf-8"), keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass  # Client went away or sent a malformed request line
+        finally:
+            writer.close()
+
+    async def serve_forever(self) -> None:
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+
+def _print_metrics(metrics: Dict[str, Dict[str, float]]) -> None:
+    if not metrics:
+        print("📊 No requests served.")
+        return
+    print(f"\n{'endpoint':<22} {'count':>6} {'errors':>7} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, stats in sorted(metrics.items()):
+        print(f"{endpoint:<22} {stats['count']:>6} {stats['errors']:>7} {stats['mean_ms']:>8.2f} "
+              f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+
+
+def main():
+    """Command line entry point for the emulator."""
+    parser = argparse.ArgumentParser(description="Emulate the FxTemplateFiller, FxSqlQuerier and FxReportUploader functions")
+    parser.add_argument("--url", default=os.environ.get("AZURE_FUNCTION_URL") or DEFAULT_URL,
+                        help="Function URL whose host, port and code the emulator serves (defaults to AZURE_FUNCTION_URL)")
+    parser.add_argument("--host", help="Listen address (overrides the URL's host)")
+    parser.add_argument("--port", type=int, help="Listen port (overrides the URL's port)")
+    parser.add_argument("--code", help="Function key (overrides the URL's code; 'any' accepts every key)")
+    parser.add_argument("--output-dir", help="Folder of the cards and reports (defaults to the state folder)")
+    parser.add_argument("--template", default=os.path.join(MISC_DIR, "business_card_template.html"),
+                        help="Business card template")
+    parser.add_argument("--scripts", nargs="+", default=list(DEFAULT_SCRIPTS),
+                        help="T-SQL scripts (names in misc/ or paths) creating and seeding the database")
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    host = args.host or url.hostname or "localhost"
+    port = args.port or url.port or 7071
+    code = args.code or parse_qs(url.query).get("code", [None])[0]
+    output_dir = args.output_dir or get_state_path("fx_emulator")
+
+    print(f"🗄️ Loading {', '.join(args.scripts)} into SQLite...")
+    emulator = FunctionsEmulator(
+        base_url=f"http://{host}:{port}",
+        code=None if code == "any" else code,
+        output_dir=output_dir,
+        template_path=args.template,
+        scripts=args.scripts,
+    )
+    print(f"🚀 Functions emulator listening on http://{host}:{port} (files in {output_dir})")
+    print(f"   AZURE_FUNCTION_URL=http://{host}:{port}/api/FxTemplateFiller?code={code or 'any'}")
+    try:
+        asyncio.run(EmulatorServer(emulator, host, port).serve_forever())
+    except KeyboardInterrupt:
+        pass
+    _print_metrics(emulator.metrics.snapshot())
+
+
+if __name__ == "__main__":
+    main()
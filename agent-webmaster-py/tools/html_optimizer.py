@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Minification and asset deduplication of generated HTML.
+
+Reports carry the whole template CSS plus the styles and scripts the model adds, often
+more than once, and every byte is saved, uploaded and served. ``optimize_html`` is a
+post-processing stage run before a report is saved or uploaded:
+
+- HTML: comments are removed (conditional comments and ``DRILLDOWN`` placeholders are
+  kept), whitespace runs between tags are collapsed and whitespace next to block-level
+  tags is dropped; tags themselves and ``pre`` and ``textarea`` contents are left
+  untouched
+- CSS: comments removed, whitespace collapsed and trimmed around ``{}:;,>``; a rule
+  repeated in the same or a later style block only keeps its last occurrence (the one
+  that wins the cascade), and style blocks left empty are removed
+- JavaScript: conservatively, with a lexer that only tracks string, template and
+  regular expression literals: comments starting a line, indentation and blank lines
+  are removed outside literals but line breaks are kept, so automatic semicolon
+  insertion and literals are unaffected; identical inline scripts only run once
+- external scripts and stylesheets loaded twice from the same URL (``http:``,
+  ``https:`` and protocol-relative spellings are the same URL) keep their first tag
+- JSON data blocks (``application/json``, ``application/ld+json``) are re-serialized
+  compactly
+
+The result reports the bytes before and after and what was removed.
+
+Usage:
+    python tools/html_optimizer.py report.html --output report.min.html
+"""
+
+import argparse
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Block-level elements only: whitespace next to inline ones (select, canvas, br...) is rendered
+_BLOCK_TAGS = (
+    "html|head|body|title|div|section|header|footer|nav|main|article|aside|address|"
+    "ul|ol|li|dl|dt|dd|table|thead|tbody|tfoot|tr|td|th|caption|colgroup|col|h[1-6]|p|form|fieldset|legend|"
+    "figure|figcaption|hr|blockquote"
+)
+_TOKEN_PATTERN = re.compile(
+    r"(?P<comment><!--.*?-->)"
+    r"|(?P<open><(?P<tag>script|style|pre|textarea)\b[^>]*>)(?P<content>.*?)(?P<close></(?P=tag)\s*>)",
+    re.IGNORECASE | re.DOTALL,
+)
+_KEEP_COMMENT_PATTERN = re.compile(r"^<!--\s*(\[if|<!\[endif|DRILLDOWN:)", re.IGNORECASE)
+_SPACE_AFTER_BLOCK_PATTERN = re.compile(rf"(</?(?:{_BLOCK_TAGS})\b[^>]*>)\s+", re.IGNORECASE)
+_SPACE_BEFORE_BLOCK_PATTERN = re.compile(rf"\s+(</?(?:{_BLOCK_TAGS})\b)", re.IGNORECASE)
+_ATTRIBUTE_PATTERN = r"""\b{name}\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))"""
+_TAG_PATTERN = re.compile(r"(<[^>]*>)")
+_LINK_PATTERN = re.compile(r"<link\b[^>]*>", re.IGNORECASE)
+_CSS_TOKEN_PATTERN = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*.*?\*/)""", re.DOTALL)
+_CSS_STRING_PATTERN = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""")
+_JSON_TYPES = ("application/json", "application/ld+json", "importmap")
+_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+_REGEX_KEYWORDS = {"return", "typeof", "instanceof", "in", "of", "new", "delete", "void", "throw", "case", "do",
+                   "else", "yield", "await"}
+
+
+@dataclass
+class OptimizationResult:
+    """Outcome of ``optimize_html``."""
+
+    html: str
+    original_bytes: int
+    optimized_bytes: int
+    removed: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.original_bytes - self.optimized_bytes
+
+    @property
+    def saved_ratio(self) -> float:
+        return self.saved_bytes / self.original_bytes if self.original_bytes else 0.0
+
+    def describe(self) -> str:
+        """One-line summary, e.g. for the CLIs."""
+        removed = ", ".join(f"{count} {name}" for name, count in self.removed.items() if count)
+        return (f"{self.original_bytes / 1024:.1f} KB → {self.optimized_bytes / 1024:.1f} KB "
+                f"(-{self.saved_ratio:.0%}){f'; removed {removed}' if removed else ''}")
+
+
+def minification_enabled() -> bool:
+    """Check the ``REPORT_MINIFY`` environment switch (on by default)."""
+    return os.environ.get("REPORT_MINIFY", "1").lower() not in ("0", "false", "no")
+
+
+def _attribute(tag: str, name: str) -> Optional[str]:
+    match = re.search(_ATTRIBUTE_PATTERN.format(name=name), tag, re.IGNORECASE)
+    if not match:
+        return None
+    return next(group for group in match.groups() if group is not None)
+
+
+def _normalize_url(url: str) -> str:
+    return re.sub(r"^(?:https?:)?//", "//", url.strip(), flags=re.IGNORECASE)
+
+
+def minify_css(css: str) -> str:
+    """Minify a style sheet, leaving string literals untouched."""
+    parts = []
+    for index, piece in enumerate(_CSS_STRING_PATTERN.split(_CSS_TOKEN_PATTERN.sub(
+            lambda match: match.group(1) or " ", css))):
+        if index % 2:
+            parts.append(piece)
+            continue
+        piece = re.sub(r"\s+", " ", piece)
+        piece = re.sub(r"\s*([{};,>])\s*", r"\1", piece)
+        piece = re.sub(r":\s+", ":", piece)
+        parts.append(piece.replace(";}", "}"))
+    return "".join(parts).strip()
+
+
+def css_statements(css: str) -> List[str]:
+    """Split minified CSS into its top-level statements (rules, at-rules with blocks)."""
+    statements, depth, start, quote = [], 0, 0, None
+    for index, char in enumerate(css):
+        if quote:
+            if char == quote and css[index - 1] != "\\":
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                statements.append(css[start:index + 1])
+                start = index + 1
+        elif char == ";" and depth == 0:
+            statements.append(css[start:index + 1])
+            start = index + 1
+    if css[start:].strip():
+        statements.append(css[start:])
+    return statements
+
+
+def _string_end(script: str, start: int, quote: str) -> int:
+    index = start + 1
+    while index < len(script):
+        char = script[index]
+        if char == "\\":
+            index += 2
+        elif char == quote:
+            return index + 1
+        elif char == "\n":  # Unterminated string: stop at the end of the line
+            return index
+        else:
+            index += 1
+    return len(script)
+
+
+def _regex_allowed(output: List[str]) -> bool:
+    """Whether a ``/`` following this output starts a regular expression rather than a division."""
+    tail = "".join(output[-32:]).rstrip()
+    if not tail:
+        return True
+    if tail[-1] in _REGEX_PRECEDERS:
+        return True
+    word = re.search(r"[A-Za-z_$][\w$]*$", tail)
+    return bool(word) and word.group(0) in _REGEX_KEYWORDS
+
+
+def _regex_end(script: str, start: int) -> int:
+    index, in_class = start + 1, False
+    while index < len(script):
+        char = script[index]
+        if char == "\\":
+            index += 2
+            continue
+        if char == "\n":
+            return start + 1  # Not a regular expression after all
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "/":
+            return index + 1
+        index += 1
+    return start + 1
+
+
+def minify_js(script: str) -> str:
+    """
+    Conservatively minify a script: comments on their own lines, indentation and blank lines.
+
+    String, template and regular expression literals are copied verbatim (a template
+    literal keeps its line breaks and indentation), and so are comments after code.
+    """
+    output: List[str] = []
+    templates: List[int] = []  # Brace depth at which each open ``${`` returns to its template literal
+    depth, index, length = 0, 0, len(script)
+    in_template, line_start = False, True
+    while index < length:
+        char = script[index]
+        if in_template:
+            if char == "\\":
+                output.append(script[index:index + 2])
+                index += 2
+            elif char == "`":
+                output.append(char)
+                index += 1
+                in_template = False
+            elif script.startswith("${", index):
+                output.append("${")
+                index += 2
+                templates.append(depth)
+                in_template = False
+            else:
+                output.append(char)
+                index += 1
+            continue
+        if line_start and char != "\n":
+            # Indentation and comments starting a line are dropped
+            if char in " \t\r\f\v":
+                index += 1
+                continue
+            if script.startswith("//", index):
+                end = script.find("\n", index)
+                index = length if end < 0 else end
+                continue
+            if script.startswith("/*", index):
+                end = script.find("*/", index + 2)
+                index = length if end < 0 else end + 2
+                continue
+            line_start = False
+        if char == "\n":
+            while output and output[-1] in (" ", "\t", "\r", "\f", "\v"):
+                output.pop()
+            if output and output[-1] != "\n":  # Blank lines are dropped
+                output.append("\n")
+            index += 1
+            line_start = True
+        elif char in "\"'":
+            end = _string_end(script, index, char)
+            output.append(script[index:end])
+            index = end
+        elif char == "`":
+            output.append(char)
+            index += 1
+            in_template = True
+        elif char == "{":
+            depth += 1
+            output.append(char)
+            index += 1
+        elif char == "}":
+            if templates and templates[-1] == depth:
+                templates.pop()
+                in_template = True
+            else:
+                depth -= 1
+            output.append(char)
+            index += 1
+        elif script.startswith("//", index):
+            end = script.find("\n", index)
+            end = length if end < 0 else end
+            output.append(script[index:end])
+            index = end
+        elif script.startswith("/*", index):
+            end = script.find("*/", index + 2)
+            end = length if end < 0 else end + 2
+            output.append(script[index:end])
+            index = end
+        elif char == "/" and _regex_allowed(output):
+            end = _regex_end(script, index)
+            output.append(script[index:end])
+            index = end
+        else:
+            output.append(char)
+            index += 1
+    return "".join(output).rstrip()
+
+
+def _minify_markup(text: str) -> str:
+    # Whitespace inside tags is left alone: attribute values and inline handlers may need it
+    pieces = _TAG_PATTERN.split(text)
+    text = "".join(piece if index % 2 else re.sub(r"\s+", " ", piece) for index, piece in enumerate(pieces))
+    text = _SPACE_AFTER_BLOCK_PATTERN.sub(r"\1", text)
+    return _SPACE_BEFORE_BLOCK_PATTERN.sub(r"\1", text)
+
+
+def optimize_html(html: str) -> OptimizationResult:
+    """
+    Minify a document and remove its duplicate styles and scripts.
+
+    Args:
+        html: Complete HTML document
+
+    Returns:
+        The optimized document with the byte counts and what was removed
+    """
+    removed = {"comments": 0, "duplicate css rules": 0, "duplicate scripts": 0, "duplicate stylesheets": 0}
+    # Pass 1: tokenize into markup, comments and raw-text elements
+    tokens: List[Tuple[str, str, str, str]] = []  # (kind, open tag, content, close tag)
+    position = 0
+    for match in _TOKEN_PATTERN.finditer(html):
+        if match.start() > position:
+            tokens.append(("markup", "", html[position:match.start()], ""))
+        if match.group("comment"):
+            tokens.append(("comment", "", match.group("comment"), ""))
+        else:
+            tokens.append((match.group("tag").lower(), match.group("open"), match.group("content"), match.group("close")))
+        position = match.end()
+    if position < len(html):
+        tokens.append(("markup", "", html[position:], ""))
+
+    # Pass 2: minify styles and find the last occurrence of every CSS statement
+    style_statements: Dict[int, List[str]] = {}
+    last_seen: Dict[str, Tuple[int, int]] = {}
+    for index, (kind, open_tag, content, _) in enumerate(tokens):
+        if kind == "style":
+            statements = css_statements(minify_css(content))
+            style_statements[index] = statements
+            for number, statement in enumerate(statements):
+                if not statement.startswith("@import") and not statement.startswith("@charset"):
+                    last_seen[statement] = (index, number)
+
+    output, seen_sources, seen_scripts = [], set(), set()
+    for index, (kind, open_tag, content, close_tag) in enumerate(tokens):
+        if kind == "markup":
+            def drop_duplicate_link(match: re.Match) -> str:
+                tag = match.group(0)
+                href = _attribute(tag, "href")
+                if href and "stylesheet" in (_attribute(tag, "rel") or "").lower():
+                    key = _normalize_url(href)
+                    if key in seen_sources:
+                        removed["duplicate stylesheets"] += 1
+                        return ""
+                    seen_sources.add(key)
+                return tag
+            output.append(_minify_markup(_LINK_PATTERN.sub(drop_duplicate_link, content)))
+        elif kind == "comment":
+            if _KEEP_COMMENT_PATTERN.match(content):
+                output.append(content)
+            else:
+                removed["comments"] += 1
+        elif kind == "style":
+            kept = []
+            for number, statement in enumerate(style_statements[index]):
+                if last_seen.get(statement, (index, number)) != (index, number):
+                    removed["duplicate css rules"] += 1
+                else:
+                    kept.append(statement)
+            if kept:
+                output.append(f"{open_tag}{''.join(kept)}{close_tag}")
+        elif kind == "script":
+            source = _attribute(open_tag, "src")
+            script_type = (_attribute(open_tag, "type") or "").lower()
+            if source:
+                key = "src:" + _normalize_url(source)
+                body = content
+            elif script_type in _JSON_TYPES:
+                try:
+                    body = json.dumps(json.loads(content), separators=(",", ":"), ensure_ascii=False)
+                    body = body.replace("</", "<\\/")
+                except ValueError:
+                    body = content.strip()
+                key = "inline:" + script_type + body
+            else:
+                body = minify_js(content)
+                key = "inline:" + script_type + body
+            if key in seen_scripts:
+                removed["duplicate scripts"] += 1
+                continue
+            seen_scripts.add(key)
+            output.append(f"{open_tag}{body}{close_tag}")
+        else:  # pre and textarea keep their whitespace
+            output.append(f"{open_tag}{content}{close_tag}")
+
+    optimized = "".join(output).strip()
+    return OptimizationResult(
+        html=optimized,
+        original_bytes=len(html.encode("utf-8")),
+        optimized_bytes=len(optimized.encode("utf-8")),
+        removed=removed,
+    )
+
+
+def main():
+    """Command line entry point: optimize HTML files."""
+    parser = argparse.ArgumentParser(description="Minify HTML reports and remove duplicate styles and scripts")
+    parser.add_argument("files", nargs="+", help="HTML files to optimize")
+    parser.add_argument("--output", help="Output file (single input) or folder")
+    parser.add_argument("--in-place", action="store_true", help="Overwrite the input files")
+    args = parser.parse_args()
+
+    for path in args.files:
+        with open(path, encoding="utf-8") as f:
+            result = optimize_html(f.read())
+        target = None
+        if args.in_place:
+            target = path
+        elif args.output:
+            target = os.path.join(args.output, os.path.basename(path)) if os.path.isdir(args.output) else args.output
+        if target:
+            with open(target, "w", encoding="utf-8") as f:
+                f.write(result.html)
+        print(f"🗜️  {os.path.basename(path)}: {result.describe()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Virtual-user load generator for the web generator pipeline.
+
+Every request follows the Streamlit app's flow: ``ag_web_gen.instance`` and
+``ag_web_gen.client``, then ``run_agent`` (thread with the message, run, reply) and the
+URL extraction of the reply. A request counts as an error when the run does not
+complete, the reply has no URL, or the call raises.
+
+Two load models:
+
+- closed (default): ``--users`` virtual users each send a request, wait for the reply,
+  think for an exponentially distributed time with mean ``--think-time`` and start over.
+  Users join evenly over ``--ramp-up`` seconds.
+- open (``--arrival-rate``): requests arrive as a Poisson process whose rate ramps up
+  linearly over ``--ramp-up`` seconds, and are served by at most ``--users`` concurrent
+  users. Latency is measured from the arrival, so it includes waiting for a free user.
+
+Targets: ``live`` uses the agents configured in ``.env``; ``fake`` the scripted
+``FakeAgentsClient`` and ``replay`` a recorded cassette. The local stand-ins keep their
+run history and ledgers in a temporary state folder.
+
+Throughput, error rate and latency percentiles are reported per ``--interval`` window
+and for the whole test, as CSV and/or JSON for capacity planning.
+
+Usage:
+    python load_generator.py --target fake --users 50 --duration 120 --ramp-up 30 --think-time 5
+    python load_generator.py --target live --arrival-rate 0.5 --users 20 --duration 600 --csv load.csv
+    python load_generator.py --target replay --cassette .cache/web_gen.cassette.json --json load.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+_AGENT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(_AGENT_ROOT, "agents", "ag_web_gen"))
+sys.path.append(_AGENT_ROOT)
+
+DEFAULT_PROMPTS = [
+    "Create a personal card for Sarah Chen, a data scientist from Singapore",
+    "Make a business card for Walter Okafor, an architect in Lagos",
+    "I need a card for Lucia Moreno, a pastry chef from Madrid",
+    "Create a professional card for Kenji Watanabe, a game designer in Osaka",
+    "Generate a card for Amira Haddad, a journalist based in Beirut",
+]
+
+
+@dataclass
+class RequestSample:
+    """Outcome of one virtual-user request."""
+
+    user: int
+    arrived: float  # Seconds since the start of the test
+    latency_seconds: float
+    queue_seconds: float
+    status: str
+    error: Optional[str] = None
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(samples: List[RequestSample], seconds: float) -> Dict[str, Any]:
+    """
+    Aggregate request samples.
+
+    Args:
+        samples: Requests to aggregate
+        seconds: Length of the window, for the throughput
+
+    Returns:
+        Dictionary with requests, errors, error_rate, throughput (completed requests per
+        second) and the mean, p50, p95 and p99 latency of the successful requests
+    """
+    latencies = [s.latency_seconds for s in samples if s.error is None]
+    errors = sum(1 for s in samples if s.error is not None)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "throughput": len(latencies) / seconds if seconds else 0.0,
+        "latency_mean": statistics.mean(latencies) if latencies else None,
+        "latency_p50": _percentile(latencies, 0.5),
+        "latency_p95": _percentile(latencies, 0.95),
+        "latency_p99": _percentile(latencies, 0.99),
+    }
+
+
+def windows(samples: List[RequestSample], interval: float, duration: float) -> List[Dict[str, Any]]:
+    """Summarize the samples per window of ``interval`` seconds, by completion time."""
+    rows = []
+    window_start = 0.0
+    while window_start < duration:
+        window_end = min(window_start + interval, duration)
+        in_window = [s for s in samples if window_start <= s.arrived + s.latency_seconds < window_end]
+        rows.append({"window_start": round(window_start, 1), **summarize(in_window, window_end - window_start)})
+        window_start = window_end
+    return rows
+
+
+class LoadGenerator:
+    """
+    Drive virtual users through the web generator flow.
+
+    Args:
+        client: AgentsClient (or a stand-in)
+        agent: Web generation agent
+        prompts: Prompts the users pick from at random
+        users: Number of virtual users (concurrency ceiling in the open model)
+        duration: Seconds during which new requests start
+        ramp_up: Seconds over which users join, or the arrival rate ramps up
+        think_time: Mean think time between two requests of a user (closed model)
+        arrival_rate: Requests per second (open model), or None for the closed model
+        use_cache: Let ``run_agent`` answer repeated prompts from the result cache
+        seed: Seed of the prompt, think time and arrival random generator
+    """
+
+    def __init__(self, client, agent, prompts: List[str], users: int, duration: float, ramp_up: float = 0.0,
+                 think_time: float = 0.0, arrival_rate: Optional[float] = None, use_cache: bool = False,
+                 seed: int = 0):
+        self.client = client
+        self.agent = agent
+        self.prompts = prompts
+        self.users = users
+        self.duration = duration
+        self.ramp_up = min(ramp_up, duration)
+        self.think_time = think_time
+        self.arrival_rate = arrival_rate
+        self.use_cache = use_cache
+        self.samples: List[RequestSample] = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._started = 0.0
+
+    def _now(self) -> float:
+        return time.perf_counter() - self._started
+
+    def _random(self, method: str, *args):
+        with self._lock:
+            return getattr(self._rng, method)(*args)
+
+    def _request(self, user: int, arrived: float) -> None:
+        from tools.run_helper import run_agent
+
+        started = self._now()
+        prompt = self._random("choice", self.prompts)
+        status, error = "exception", None
+        try:
+            result = run_agent(self.client, self.agent, prompt, use_cache=self.use_cache)
+            status = result.status
+            if not result.completed:
+                error = result.error or f"run {result.status}"
+            elif not result.url:
+                error = "no URL in reply"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        sample = RequestSample(
+            user=user,
+            arrived=round(arrived, 3),
+            latency_seconds=round(self._now() - arrived, 3),
+            queue_seconds=round(started - arrived, 3),
+            status=status,
+            error=error,
+        )
+        with self._lock:
+            self.samples.append(sample)
+
+    def _closed_user(self, user: int) -> None:
+        time.sleep(self.ramp_up * user / self.users)
+        while self._now() < self.duration:
+            self._request(user, self._now())
+            if self.think_time:
+                time.sleep(self._random("expovariate", 1 / self.think_time))
+
+    def _open_arrivals(self, executor: ThreadPoolExecutor) -> None:
+        # Ramped Poisson process by thinning: candidates at the full rate, each one kept
+        # with the probability of the ramped rate at its time
+        arrivals = 0
+        while True:
+            time.sleep(self._random("expovariate", self.arrival_rate))
+            now = self._now()
+            if now >= self.duration:
+                return
+            if self.ramp_up and self._random("random") > now / self.ramp_up:
+                continue
+            executor.submit(self._request, arrivals, now)
+            arrivals += 1
+
+    def run(self) -> List[RequestSample]:
+        """Run the test and return every request sample, in completion order."""
+        self._started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.users) as executor:
+            if self.arrival_rate:
+                self._open_arrivals(executor)
+            else:
+                for user in range(self.users):
+                    executor.submit(self._closed_user, user)
+        return self.samples
+
+
+def _format_seconds(value: Optional[float]) -> str:
+    return f"{value:.2f}" if value is not None else "-"
+
+
+def _print_table(rows: List[Dict[str, Any]]) -> None:
+    print(f"{'t (s)':>7} {'req':>5} {'err %':>6} {'req/s':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7}")
+    for row in rows:
+        print(f"{row['window_start']:>7.0f} {row['requests']:>5} {row['error_rate'] * 100:>6.1f} "
+              f"{row['throughput']:>7.2f} {_format_seconds(row['latency_p50']):>7} "
+              f"{_format_seconds(row['latency_p95']):>7} {_format_seconds(row['latency_p99']):>7}")
+
+
+def main():
+    """Command line entry point for the load generator."""
+    parser = argparse.ArgumentParser(description="Drive virtual users through the web generator pipeline")
+    parser.add_argument("--target", choices=["live", "fake", "replay"], default="fake",
+                        help="Service to load: the configured agents or a local stand-in")
+    parser.add_argument("--cassette", help="Cassette replayed by the 'replay' target")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Latency factor of the 'fake' and 'replay' targets")
+    parser.add_argument("--users", type=int, default=10, help="Virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds during which requests start")
+    parser.add_argument("--ramp-up", type=float, default=0, help="Seconds over which the load ramps up")
+    parser.add_argument("--think-time", type=float, default=0, help="Mean think time between requests of a user")
+    parser.add_argument("--arrival-rate", type=float, help="Requests per second (open model)")
+    parser.add_argument("--interval", type=float, default=10, help="Seconds per reporting window")
+    parser.add_argument("--prompts", help="File with one prompt per line")
+    parser.add_argument("--use-cache", action="store_true", help="Allow answers from the result cache")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator")
+    parser.add_argument("--csv", help="Write the per-window statistics to this CSV file")
+    parser.add_argument("--json", help="Write the windows, the summary and every request to this JSON file")
+    args = parser.parse_args()
+
+    if args.target == "replay" and not args.cassette:
+        parser.error("--target replay needs --cassette")
+    if args.target != "live":
+        os.environ["AGENT_STATE_DIR"] = tempfile.mkdtemp(prefix="agent-load-")
+        # The agent definition still needs a function URL; the stand-ins never call it
+        os.environ.setdefault("AZURE_FUNCTION_URL", "http://localhost:7071/api/FxTemplateFiller?code=local")
+    if args.target == "fake":
+        os.environ["FAKE_AGENTS_CLIENT"] = "1"
+        os.environ["FAKE_AGENTS_TIME_SCALE"] = str(args.time_scale)
+        os.environ["FAKE_AGENTS_SEED"] = str(args.seed)
+    elif args.target == "replay":
+        os.environ["AGENT_CASSETTE_REPLAY"] = args.cassette
+        os.environ["AGENT_CASSETTE_TIME_SCALE"] = str(args.time_scale)
+
+    prompts = DEFAULT_PROMPTS
+    if args.prompts:
+        with open(args.prompts, encoding="utf-8") as f:
+            prompts = [line.strip() for line in f if line.strip()]
+
+    import ag_web_gen
+
+    print(f"🤖 Resolving the web generation agent ({args.target})...")
+    agent, client = ag_web_gen.instance, ag_web_gen.client
+    model = f"open, {args.arrival_rate}/s" if args.arrival_rate else f"closed, think {args.think_time}s"
+    print(f"🚀 {args.users} virtual users for {args.duration:.0f}s ({model}, ramp-up {args.ramp_up:.0f}s)")
+
+    generator = LoadGenerator(
+        client, agent, prompts, users=args.users, duration=args.duration, ramp_up=args.ramp_up,
+        think_time=args.think_time, arrival_rate=args.arrival_rate, use_cache=args.use_cache, seed=args.seed,
+    )
+    samples = generator.run()
+    elapsed = max([s.arrived + s.latency_seconds for s in samples] + [args.duration])
+
+    rows = windows(samples, args.interval, elapsed)
+    summary = summarize(samples, elapsed)
+    _print_table(rows)
+    print(f"\n📊 {summary['requests']} requests, {summary['errors']} errors ({summary['error_rate']:.1%}), "
+          f"{summary['throughput']:.2f} req/s, latency p50 {_format_seconds(summary['latency_p50'])}s "
+          f"p95 {_format_seconds(summary['latency_p95'])}s p99 {_format_seconds(summary['latency_p99'])}s")
+    errors: Dict[str, int] = {}
+    for sample in samples:
+        if sample.error:
+            errors[sample.error[:80]] = errors.get(sample.error[:80], 0) + 1
+    for error, count in sorted(errors.items(), key=lambda item: -item[1])[:5]:
+        print(f"   ❌ {count} x {error}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"💾 Windows written to {args.csv}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "summary": summary, "windows": rows,
+                       "requests": [asdict(sample) for sample in samples]}, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import os
+
+
+def get_state_path(filename: str) -> str:
+    """
+    Resolve the path of a local state file (ledgers, caches, metrics) shared by the agents.
+
+    The folder defaults to ``agent-webmaster-py/.cache`` and can be moved with the
+    ``AGENT_STATE_DIR`` environment variable. It is created on first use.
+
+    Args:
+        filename: Name of the state file inside the state folder
+
+    Returns:
+        Absolute path of the state file
+    """
+    default_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+    state_dir = os.environ.get("AGENT_STATE_DIR") or default_dir
+    os.makedirs(state_dir, exist_ok=True)
+    return os.path.join(state_dir, filename)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Complexity-based model routing for agent runs.
+
+``ag_report_builder`` is created with ``ADVANCED_MODEL_DEPLOYMENT_NAME`` and a six-row
+table costs as much as a multi-chart dashboard. With ``MODEL_ROUTING=1`` every request
+is profiled first and simple ones run on the fast deployment through the run-level
+``model`` override of ``run_agent``, so the same agent (tools, instructions) serves
+both tiers:
+
+- the dataset profile counts the record rows, the columns of the widest record and
+  the sections (lists of records), and the prompt is scanned for the chart types it
+  asks for
+- a request goes to the advanced deployment when any threshold is exceeded or when
+  it asks for a chart the fast model does not handle well (scatter, heatmap,
+  drill-down...); every reason is kept with the decision
+
+Thresholds come from ``MODEL_ROUTER_MAX_ROWS``, ``MODEL_ROUTER_MAX_COLUMNS``,
+``MODEL_ROUTER_MAX_SECTIONS`` and ``MODEL_ROUTER_MAX_CHARTS``. The fast and advanced
+deployments default to ``MODEL_DEPLOYMENT_NAME`` and ``ADVANCED_MODEL_DEPLOYMENT_NAME``
+(``MODEL_ROUTER_FAST_MODEL`` and ``MODEL_ROUTER_ADVANCED_MODEL`` override them).
+
+Each decision is appended with the run's outcome and latency to a JSON lines log in the
+state folder; the summary groups them by tier and by size so thresholds can be tuned.
+
+Usage:
+    python tools/model_router.py --summary
+    python tools/model_router.py --dataset data.json --prompt "Scatter plot of price vs rating"
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.local_state import get_state_path
+
+FAST, ADVANCED = "fast", "advanced"
+LOG_FILENAME = "model_routing.jsonl"
+_CHART_PATTERN = re.compile(
+    r"\b(bar|column|line|pie|donut|doughnut|area|table|scatter|bubble|heat ?map|radar|sankey|treemap|"
+    r"gantt|funnel|waterfall|histogram|box ?plot|candlestick|map|drill[- ]?down|forecast|correlation)s?\b",
+    re.IGNORECASE,
+)
+# Charts and analyses routed to the advanced model whatever the dataset size
+ADVANCED_CHARTS = {"scatter", "bubble", "heatmap", "radar", "sankey", "treemap", "gantt", "funnel", "waterfall",
+                   "histogram", "boxplot", "candlestick", "map", "drilldown", "forecast", "correlation"}
+
+_log_lock = threading.Lock()
+
+
+@dataclass
+class RequestProfile:
+    """Size and shape of a request."""
+
+    rows: int = 0
+    columns: int = 0
+    sections: int = 0
+    dataset_bytes: int = 0
+    charts: List[str] = field(default_factory=list)
+
+
+@dataclass
+class RoutingDecision:
+    """Deployment chosen for a request and why."""
+
+    tier: str
+    model: Optional[str]
+    profile: RequestProfile
+    reasons: List[str] = field(default_factory=list)
+
+
+def routing_enabled() -> bool:
+    """Check the ``MODEL_ROUTING`` environment switch (off by default)."""
+    return os.environ.get("MODEL_ROUTING", "0").lower() in ("1", "true", "yes")
+
+
+def _threshold(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def profile_request(prompt: str, dataset: Any = None) -> RequestProfile:
+    """
+    Profile the dataset and the prompt of a request.
+
+    Args:
+        prompt: User message
+        dataset: JSON-serializable dataset, or None
+
+    Returns:
+        The rows, columns and sections of the dataset and the chart types asked for
+    """
+    profile = RequestProfile()
+    if dataset is not None:
+        profile.dataset_bytes = len(json.dumps(dataset, separators=(",", ":"), default=str))
+
+    def walk(value: Any) -> None:
+        if isinstance(value, list):
+            records = [item for item in value if isinstance(item, dict)]
+            if records or value and not any(isinstance(item, (list, dict)) for item in value):
+                profile.sections += 1
+                profile.rows += len(value)
+                profile.columns = max(profile.columns, max((len(record) for record in records), default=1))
+            for item in value:
+                if isinstance(item, (list, dict)):
+                    for child in (item.values() if isinstance(item, dict) else item):
+                        walk(child)
+        elif isinstance(value, dict):
+            for child in value.values():
+                walk(child)
+
+    walk(dataset)
+    charts = {re.sub(r"[\s-]", "", match.lower()) for match in _CHART_PATTERN.findall(prompt)}
+    profile.charts = sorted(charts)
+    return profile
+
+
+def route_request(prompt: str, dataset: Any = None) -> RoutingDecision:
+    """
+    Choose the fast or advanced deployment for a request.
+
+    Args:
+        prompt: User message
+        dataset: JSON-serializable dataset, or None
+
+    Returns:
+        The decision; its ``model`` is None when the chosen deployment is not configured
+        (the agent's own model is then used)
+    """
+    profile = profile_request(prompt, dataset)
+    reasons = []
+    limits = (
+        ("rows", profile.rows, _threshold("MODEL_ROUTER_MAX_ROWS", 50)),
+        ("columns", profile.columns, _threshold("MODEL_ROUTER_MAX_COLUMNS", 8)),
+        ("sections", profile.sections, _threshold("MODEL_ROUTER_MAX_SECTIONS", 2)),
+        ("charts", len(profile.charts), _threshold("MODEL_ROUTER_MAX_CHARTS", 2)),
+    )
+    for name, value, limit in limits:
+        if value > limit:
+            reasons.append(f"{value} {name} > {limit}")
+    advanced_charts = sorted(ADVANCED_CHARTS.intersection(profile.charts))
+    if advanced_charts:
+        reasons.append(f"asks for {', '.join(advanced_charts)}")
+
+    fast_model = os.environ.get("MODEL_ROUTER_FAST_MODEL") or os.environ.get("MODEL_DEPLOYMENT_NAME")
+    advanced_model = os.environ.get("MODEL_ROUTER_ADVANCED_MODEL") or os.environ.get("ADVANCED_MODEL_DEPLOYMENT_NAME")
+    if reasons:
+        return RoutingDecision(ADVANCED, advanced_model, profile, reasons)
+    if not fast_model:
+        return RoutingDecision(ADVANCED, advanced_model, profile, ["no fast deployment configured"])
+    return RoutingDecision(FAST, fast_model, profile, ["within the fast model thresholds"])
+
+
+def record_routing(decision: RoutingDecision, result, agent_name: Optional[str] = None) -> None:
+    """
+    Append a decision and the outcome of its run to the routing log.
+
+    Args:
+        decision: Decision returned by ``route_request``
+        result: AgentRunResult of the run
+        agent_name: Agent that ran the request
+    """
+    entry = {
+        "time": time.time(),
+        "agent": agent_name,
+        "tier": decision.tier,
+        "model": decision.model,
+        "reasons": decision.reasons,
+        "profile": asdict(decision.profile),
+        "status": result.status,
+        "cached": result.cached,
+        "seconds": result.timings.get("total"),
+        "run_seconds": result.timings.get("run"),
+    }
+    with _log_lock, open(get_state_path(LOG_FILENAME), "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def load_routing_log(days: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Read the routing log, optionally only the last ``days`` days."""
+    path = get_state_path(LOG_FILENAME)
+    if not os.path.exists(path):
+        return []
+    since = time.time() - days * 86400 if days else 0
+    with open(path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return [entry for entry in entries if entry["time"] >= since]
+
+
+def _bucket(rows: int) -> str:
+    for limit in (10, 50, 200, 1000):
+        if rows <= limit:
+            return f"≤{limit} rows"
+    return ">1000 rows"
+
+
+def summarize_routing(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Group logged runs by tier and dataset size.
+
+    Cached replies are left out of the latencies, which would otherwise measure the cache.
+
+    Returns:
+        One summary per (tier, rows bucket) with the count, failure rate and latencies
+    """
+    groups: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+    for entry in entries:
+        groups[(entry["tier"], _bucket(entry["profile"]["rows"]))].append(entry)
+    summaries = []
+    for (tier, bucket), group in sorted(groups.items()):
+        latencies = sorted(entry["seconds"] for entry in group
+                           if entry["seconds"] is not None and not entry["cached"] and entry["status"] == "completed")
+        summaries.append({
+            "tier": tier,
+            "bucket": bucket,
+            "runs": len(group),
+            "failed": sum(1 for entry in group if entry["status"] != "completed"),
+            "p50": statistics.median(latencies) if latencies else None,
+            "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+        })
+    return summaries
+
+
+def main():
+    """Command line entry point: route a request or summarize the routing log."""
+    parser = argparse.ArgumentParser(description="Profile requests and summarize model routing decisions")
+    parser.add_argument("--summary", action="store_true", help="Summarize the logged decisions and latencies")
+    parser.add_argument("--days", type=float, help="Only summarize the last DAYS days")
+    parser.add_argument("--dataset", help="JSON dataset to route")
+    parser.add_argument("--prompt", default="", help="Prompt to route")
+    args = parser.parse_args()
+
+    if args.dataset or args.prompt:
+        dataset = None
+        if args.dataset:
+            with open(args.dataset, encoding="utf-8") as f:
+                dataset = json.load(f)
+        decision = route_request(args.prompt, dataset)
+        profile = decision.profile
+        print(f"🧭 {decision.tier} ({decision.model or 'agent model'}): {'; '.join(decision.reasons)}")
+        print(f"   {profile.rows} rows, {profile.columns} columns, {profile.sections} sections, "
+              f"charts: {', '.join(profile.charts) or 'none'}")
+    if args.summary or not (args.dataset or args.prompt):
+        summaries = summarize_routing(load_routing_log(args.days))
+        if not summaries:
+            print("📭 No routing decisions logged yet.")
+        for summary in summaries:
+            latency = (f"p50 {summary['p50']:.1f}s  p95 {summary['p95']:.1f}s" if summary["p50"] is not None
+                       else "no timed runs")
+            print(f"📊 {summary['tier']:<8} {summary['bucket']:<12} {summary['runs']:>5} runs  "
+                  f"{summary['failed']} failed  {latency}")
+
+
+if __name__ == "__main__":
+    main()
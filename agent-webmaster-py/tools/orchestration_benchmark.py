@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the orchestration overhead per agent request, against the fake client.
+
+Each request goes through ``run_agent`` exactly like the testers and the Streamlit app,
+but against ``FakeAgentsClient``, so the service time of every run is known exactly.
+What remains of the request latency is ours: thread/run bookkeeping, poll granularity,
+rate limiter, ledgers and caches. For each concurrency level the benchmark reports the
+overhead percentiles, the client CPU time and the number of API calls per request.
+
+With ``--cassette`` the runs replay a recorded session (``tools.session_cassette``)
+instead of the scripted latencies, and ``--fail-above-ms`` turns the benchmark into a
+regression check that exits with status 1 when the p95 overhead exceeds the budget.
+
+The ledgers and caches are written to a temporary state folder, never to the real one.
+
+Usage:
+    python orchestration_benchmark.py
+    python orchestration_benchmark.py --agent ag-report-builder --concurrency 1,50,500 --time-scale 0.05
+    python orchestration_benchmark.py --cassette .cache/web_gen.cassette.json --time-scale 1 --fail-above-ms 1500
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_level(client, agent, concurrency: int, requests: int) -> Dict[str, Any]:
+    """
+    Send ``requests`` requests with ``concurrency`` in flight and measure the overhead.
+
+    Args:
+        client: FakeAgentsClient
+        agent: Agent created on the fake client
+        concurrency: Number of requests in flight
+        requests: Total number of requests
+
+    Returns:
+        Dictionary with wall time, throughput, overhead percentiles, CPU and calls per request
+    """
+    from tools.run_helper import run_agent
+
+    def _one(index: int):
+        start = time.perf_counter()
+        result = run_agent(client, agent, f"Benchmark request {index}", use_cache=False, hedge=False)
+        elapsed = time.perf_counter() - start
+        service = client.simulated_seconds(result.run_id) or 0.0
+        return elapsed, max(0.0, elapsed - service), result
+
+    calls_before = sum(client.call_counts.values())
+    cpu_before = time.process_time()
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(_one, range(requests)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_before
+    calls = sum(client.call_counts.values()) - calls_before
+
+    overheads = [overhead for _, overhead, _ in outcomes]
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "failed": sum(1 for _, _, result in outcomes if not result.completed),
+        "wall_seconds": wall,
+        "throughput": requests / wall if wall else 0.0,
+        "overhead_p50_ms": _percentile(overheads, 0.5) * 1000,
+        "overhead_p95_ms": _percentile(overheads, 0.95) * 1000,
+        "overhead_mean_ms": statistics.mean(overheads) * 1000,
+        "cpu_ms_per_request": cpu / requests * 1000,
+        "calls_per_request": calls / requests,
+        "polls_per_request": statistics.mean(result.poll_stats.polls if result.poll_stats else 0
+                                             for _, _, result in outcomes),
+    }
+
+
+def main():
+    """Command line entry point for the benchmark."""
+    parser = argparse.ArgumentParser(description="Measure the orchestration overhead per agent request")
+    parser.add_argument("--agent", default="ag-web-gen",
+                        choices=["ag-web-gen", "ag-card-generator", "ag-report-builder"],
+                        help="Scripted agent to run")
+    parser.add_argument("--concurrency", default="1,10,50,100,500",
+                        help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=0,
+                        help="Requests per level (default: twice the concurrency, at least 20)")
+    parser.add_argument("--time-scale", type=float, default=0.1,
+                        help="Factor applied to the scripted service latencies")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the latency generator")
+    parser.add_argument("--cassette", help="Replay the runs of a recorded session instead of the scripts")
+    parser.add_argument("--fail-above-ms", type=float,
+                        help="Exit with status 1 when the p95 overhead of a level exceeds this budget")
+    args = parser.parse_args()
+
+    # Keep the ledgers and caches of the benchmark away from the real ones
+    os.environ["AGENT_STATE_DIR"] = tempfile.mkdtemp(prefix="agent-benchmark-")
+    os.environ.pop("TRACE_EXPORT_PATH", None)
+
+    from tools.fake_agents_client import FakeAgentsClient
+    from tools.session_cassette import ReplayAgentsClient, load_cassette
+
+    if args.cassette:
+        client = ReplayAgentsClient(load_cassette(args.cassette), seed=args.seed, time_scale=args.time_scale)
+    else:
+        client = FakeAgentsClient(seed=args.seed, time_scale=args.time_scale)
+    agent = client.create_agent(model="benchmark-model", name=args.agent, instructions="Benchmark agent")
+    client.enable_auto_function_calls({_load_html_template})
+
+    source = f"cassette {args.cassette}" if args.cassette else "scripted latencies"
+    print(f"🏁 Orchestration benchmark - {args.agent}, {source}, time scale {args.time_scale}, "
+          f"state in {os.environ['AGENT_STATE_DIR']}")
+    print(f"{'conc.':>6} {'req':>5} {'fail':>5} {'wall s':>8} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'mean ms':>8} {'cpu ms':>7} {'calls':>6} {'polls':>6}")
+    over_budget = []
+    for concurrency in (int(level) for level in args.concurrency.split(",")):
+        requests = args.requests or max(20, concurrency * 2)
+        stats = run_level(client, agent, concurrency, requests)
+        print(f"{stats['concurrency']:>6} {stats['requests']:>5} {stats['failed']:>5} "
+              f"{stats['wall_seconds']:>8.2f} {stats['throughput']:>7.1f} {stats['overhead_p50_ms']:>8.1f} "
+              f"{stats['overhead_p95_ms']:>8.1f} {stats['overhead_mean_ms']:>8.1f} "
+              f"{stats['cpu_ms_per_request']:>7.2f} {stats['calls_per_request']:>6.1f} "
+              f"{stats['polls_per_request']:>6.1f}")
+        if args.fail_above_ms is not None and stats["overhead_p95_ms"] > args.fail_above_ms:
+            over_budget.append(concurrency)
+
+    if over_budget:
+        print(f"❌ p95 overhead above {args.fail_above_ms:.0f} ms at concurrency "
+              f"{', '.join(str(level) for level in over_budget)}")
+        sys.exit(1)
+
+
+def _load_html_template(template_name: str) -> str:
+    """
+    Stand-in for the report builder's template loader.
+
+    :param template_name: Name of the template file.
+    :return: The template HTML.
+    """
+    return "<html><body><section id=\"report-container\"></section></body></html>"
+
+
+if __name__ == "__main__":
+    main()
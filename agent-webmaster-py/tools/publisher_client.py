@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Pooled, concurrent client of the publishing functions.
+
+Publishing one artifact per ``urllib`` call opens a new TCP (and TLS) connection every
+time and uploads one artifact at a time. ``PublisherClient`` speaks the same contracts
+as the agents' tools:
+
+- ``FxTemplateFiller``: the card JSON described by the bundled
+  ``html_template_filler_openapi_spec.json`` (path and required fields are read from
+  it), answered with ``{"url": ...}``
+- ``FxReportUploader``: the report HTML as the request body, answered with
+  ``{"url": ...}`` (the function has no bundled spec; the contract follows its code)
+
+The base URL and function key come from ``AZURE_FUNCTION_URL`` through
+``extract_base_url_and_code``. Connections are kept alive in a bounded pool, at most
+``max_connections`` uploads run at once, and connection errors, 429 and 5xx answers
+are retried with exponential backoff and full jitter (honouring ``Retry-After``).
+``publish_cards`` and ``upload_reports`` upload a batch concurrently and return the
+results in input order.
+
+Usage:
+    python tools/publisher_client.py --report report.html
+    python tools/publisher_client.py --benchmark --emulator --count 200 --concurrency 16
+"""
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import quote, urlparse
+
+_AGENT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(_AGENT_ROOT, "agents", "ag_web_gen"))
+sys.path.append(_AGENT_ROOT)
+
+from tools.openapi_azurefx_configurator import extract_base_url_and_code
+from tools.card_contract import load_card_contract, parse_card, validate_card
+from tools.html_optimizer import minification_enabled, optimize_html
+
+REPORT_UPLOADER_PATH = "/api/FxReportUploader"
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class PublishResult:
+    """Outcome of one upload."""
+
+    url: Optional[str]
+    status: Optional[int]
+    attempts: int
+    seconds: float
+    error: Optional[str] = None
+    saved_bytes: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.url is not None
+
+
+class ConnectionPool:
+    """
+    Bounded pool of keep-alive HTTP connections to one host.
+
+    Args:
+        base_url: Scheme, host and port of the functions
+        size: Maximum number of open connections
+        timeout: Socket timeout in seconds
+    """
+
+    def __init__(self, base_url: str, size: int = 8, timeout: float = 60):
+        parsed = urlparse(base_url)
+        self._connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        self._host = parsed.hostname
+        self._port = parsed.port
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.opened = 0
+
+    def request(self, method: str, path: str, body: bytes, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Send one request on a pooled connection, reopening it once if the server closed it.
+
+        Returns:
+            Tuple of (status, lower-cased headers, body)
+        """
+        with self._slots:
+            try:
+                connection = self._idle.get_nowait()
+                reused = True
+            except queue.Empty:
+                connection, reused = self._open(), False
+            try:
+                try:
+                    response = self._send(connection, method, path, body, headers)
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                    if not reused:
+                        raise
+                    # The idle connection was closed by the server: retry once on a fresh one
+                    connection.close()
+                    connection = self._open()
+                    response = self._send(connection, method, path, body, headers)
+            except BaseException:
+                connection.close()
+                raise
+            if response[1].get("connection", "").lower() == "close":
+                connection.close()
+            else:
+                self._idle.put(connection)
+            return response
+
+    def _open(self) -> http.client.HTTPConnection:
+        self.opened += 1
+        return self._connection_class(self._host, self._port, timeout=self.timeout)
+
+    @staticmethod
+    def _send(connection, method, path, body, headers) -> Tuple[int, Dict[str, str], bytes]:
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        payload = response.read()
+        return response.status, {name.lower(): value for name, value in response.getheaders()}, payload
+
+    def close(self) -> None:
+        """Close the idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class PublisherClient:
+    """
+    Client of FxTemplateFiller and FxReportUploader with connection pooling, bounded
+    concurrency and retries.
+
+    Args:
+        base_url: Base URL of the functions (defaults to the one of ``AZURE_FUNCTION_URL``)
+        code: Function key (defaults to the one of ``AZURE_FUNCTION_URL``)
+        max_connections: Pooled connections, which also bounds the concurrent uploads
+        max_retries: Retries after the first attempt
+        backoff: Base delay in seconds of the exponential backoff
+        timeout: Socket timeout in seconds
+        optimize_reports: Minify reports before uploading them (defaults to ``REPORT_MINIFY``)
+    """
+
+    def __init__(self, base_url: Optional[str] = None, code: Optional[str] = None, max_connections: int = 8,
+                 max_retries: int = 3, backoff: float = 0.5, timeout: float = 60,
+                 optimize_reports: Optional[bool] = None):
+        if base_url is None or code is None:
+            default_url, default_code = extract_base_url_and_code()
+            base_url, code = base_url or default_url, code or default_code
+        self.base_url = base_url.rstrip("/")
+        self.code = code
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.optimize_reports = minification_enabled() if optimize_reports is None else optimize_reports
+        self.card_path, self.card_fields = load_card_contract()
+        self.pool = ConnectionPool(self.base_url, max_connections, timeout)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="publisher")
+
+    def __enter__(self) -> "PublisherClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the upload threads and close the pooled connections."""
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+
+    def _delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass  # HTTP-date form: fall back to the backoff
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def _post(self, path: str, body: bytes, content_type: str) -> PublishResult:
+        target = f"{path}?code={quote(self.code, safe='')}"
+        headers = {"Content-Type": content_type, "Connection": "keep-alive"}
+        start = time.perf_counter()
+        status, error = None, None
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                status, response_headers, payload = self.pool.request("POST", target, body, headers)
+                if status == 200:
+                    url = json.loads(payload.decode("utf-8")).get("url")
+                    return PublishResult(url, status, attempt + 1, time.perf_counter() - start)
+                error = payload.decode("utf-8", errors="replace") or f"HTTP {status}"
+                if status not in _RETRY_STATUSES:
+                    break
+                retry_after = response_headers.get("retry-after")
+            except (OSError, http.client.HTTPException) as e:
+                status, error = None, str(e) or type(e).__name__
+            except ValueError as e:
+                error = f"Invalid response: {e}"
+                break
+            if attempt < self.max_retries:
+                time.sleep(self._delay(attempt, retry_after))
+        return PublishResult(None, status, attempt + 1, time.perf_counter() - start, error)
+
+    def publish_card(self, card: Union[Dict[str, str], str]) -> PublishResult:
+        """
+        Fill the business card template and publish it.
+
+        The card is validated against the card contract first, so an invalid card fails
+        without a request.
+
+        Args:
+            card: Card fields (title, name, city, profession, message, date), or the card
+                generator's reply
+
+        Returns:
+            The upload result, with the card URL if it succeeded
+        """
+        if isinstance(card, str):
+            card, errors = parse_card(card, self.card_fields)
+        else:
+            errors = validate_card(card, self.card_fields)
+        if errors:
+            return PublishResult(None, None, 0, 0.0, f"Invalid card: {'; '.join(errors)}")
+        body = json.dumps({key: str(value) for key, value in card.items()}).encode("utf-8")
+        return self._post(self.card_path, body, "application/json")
+
+    def upload_report(self, report_html: str) -> PublishResult:
+        """
+        Upload an HTML report, minified first unless ``optimize_reports`` is off.
+
+        Args:
+            report_html: Complete HTML document
+
+        Returns:
+            The upload result, with the report URL if it succeeded and the bytes saved
+        """
+        saved_bytes = 0
+        if self.optimize_reports:
+            optimized = optimize_html(report_html)
+            report_html, saved_bytes = optimized.html, optimized.saved_bytes
+        result = self._post(REPORT_UPLOADER_PATH, report_html.encode("utf-8"), "text/html; charset=utf-8")
+        result.saved_bytes = saved_bytes
+        return result
+
+    def upload_stylesheet(self, css: str) -> PublishResult:
+        """
+        Upload a shared report stylesheet (stored under its content hash, cached immutably).
+
+        Args:
+            css: Style sheet text
+
+        Returns:
+            The upload result, with the stylesheet URL if it succeeded
+        """
+        return self._post(REPORT_UPLOADER_PATH, css.encode("utf-8"), "text/css; charset=utf-8")
+
+    def _bulk(self, upload: Callable[[Any], PublishResult], items: Sequence[Any]) -> List[PublishResult]:
+        return list(self._executor.map(upload, items))
+
+    def publish_cards(self, cards: Sequence[Union[Dict[str, str], str]]) -> List[PublishResult]:
+        """Publish many cards concurrently; results are in input order."""
+        return self._bulk(self.publish_card, cards)
+
+    def upload_reports(self, reports: Sequence[str]) -> List[PublishResult]:
+        """Upload many reports concurrently; results are in input order."""
+        return self._bulk(self.upload_report, reports)
+
+
+def _unpooled_upload(base_url: str, code: str, report_html: str) -> PublishResult:
+    """One ``urllib`` request per upload, the baseline of the benchmark."""
+    start = time.perf_counter()
+    request = urllib.request.Request(
+        f"{base_url}{REPORT_UPLOADER_PATH}?code={quote(code, safe='')}", data=report_html.encode("utf-8"),
+        headers={"Content-Type": "text/html; charset=utf-8"}, method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            url = json.loads(response.read().decode("utf-8")).get("url")
+            return PublishResult(url, response.status, 1, time.perf_counter() - start)
+    except Exception as e:
+        return PublishResult(None, None, 1, time.perf_counter() - start, str(e))
+
+
+def _summarize(name: str, results: List[PublishResult], seconds: float) -> Dict[str, Any]:
+    latencies = sorted(result.seconds * 1000 for result in results)
+    return {
+        "mode": name,
+        "uploads": len(results),
+        "errors": sum(not result.ok for result in results),
+        "seconds": seconds,
+        "per_second": len(results) / seconds if seconds else 0.0,
+        "p50_ms": statistics.median(latencies) if latencies else 0.0,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+    }
+
+
+def _start_emulator() -> Tuple[subprocess.Popen, str, str]:
+    """Start the local functions emulator on a free port."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(_AGENT_ROOT, "tools", "fx_emulator.py"), "--host", "127.0.0.1",
+         "--port", str(port), "--code", "bench", "--output-dir", tempfile.mkdtemp(prefix="publisher-bench-")],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process, f"http://127.0.0.1:{port}", "bench"
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("The functions emulator did not start")
+
+
+def run_benchmark(base_url: str, code: str, count: int, concurrency: int, size_kb: int) -> List[Dict[str, Any]]:
+    """
+    Compare one-connection-per-upload sequential uploads with pooled concurrent uploads.
+
+    Every report is distinct (content-addressed names would otherwise deduplicate them).
+    """
+    filler = "x" * (size_kb * 1024)
+    reports = [f"<html><body><h1>Report {i}</h1><p>{filler}</p></body></html>" for i in range(count)]
+    summaries = []
+
+    start = time.perf_counter()
+    results = [_unpooled_upload(base_url, code, report) for report in reports]
+    summaries.append(_summarize("sequential, new connection each", results, time.perf_counter() - start))
+
+    for connections in sorted({1, concurrency}):
+        marked = [report.replace("<h1>", f"<h1 data-pool='{connections}'>") for report in reports]
+        with PublisherClient(base_url, code, max_connections=connections, optimize_reports=False) as client:
+            start = time.perf_counter()
+            results = client.upload_reports(marked)
+            summary = _summarize(f"pooled, {connections} connection(s)", results, time.perf_counter() - start)
+            summary["connections_opened"] = client.pool.opened
+        summaries.append(summary)
+    return summaries
+
+
+def main():
+    """Command line entry point: upload files or benchmark the client."""
+    parser = argparse.ArgumentParser(description="Publish reports and cards through the Azure Functions")
+    parser.add_argument("--report", nargs="+", help="HTML report files to upload")
+    parser.add_argument("--card", nargs="+", help="Card JSON files to publish")
+    parser.add_argument("--concurrency", type=int, default=8, help="Pooled connections / concurrent uploads")
+    parser.add_argument("--benchmark", action="store_true", help="Compare unpooled and pooled uploads")
+    parser.add_argument("--emulator", action="store_true", help="Benchmark against a local functions emulator")
+    parser.add_argument("--count", type=int, default=200, help="Benchmark uploads")
+    parser.add_argument("--size-kb", type=int, default=20, help="Size of each benchmark report in KB")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        process = None
+        if args.emulator:
+            process, base_url, code = _start_emulator()
+        else:
+            base_url, code = extract_base_url_and_code()
+        try:
+            print(f"🏁 {args.count} report uploads of {args.size_kb} KB to {base_url}")
+            for summary in run_benchmark(base_url, code, args.count, args.concurrency, args.size_kb):
+                opened = f", {summary['connections_opened']} connections opened" if "connections_opened" in summary else ""
+                print(f"   {summary['mode']:<34} {summary['per_second']:>8.1f}/s  p50 {summary['p50_ms']:>7.1f} ms  "
+                      f"p95 {summary['p95_ms']:>7.1f} ms  {summary['errors']} errors{opened}")
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+        return
+
+    with PublisherClient(max_connections=args.concurrency) as client:
+        reports, cards = [], []
+        for path in args.report or []:
+            with open(path, encoding="utf-8") as f:
+                reports.append(f.read())
+        for path in args.card or []:
+            with open(path, encoding="utf-8") as f:
+                cards.append(f.read())
+        names = (args.report or []) + (args.card or [])
+        results = client.upload_reports(reports) + client.publish_cards(cards)
+    for name, result in zip(names, results):
+        if result.ok:
+            saved = f" ({result.saved_bytes / 1024:.1f} KB saved by minification)" if result.saved_bytes else ""
+            print(f"✅ {name}: {result.url}{saved}")
+        else:
+            print(f"❌ {name}: {result.error} (after {result.attempts} attempts)")
+
+
+if __name__ == "__main__":
+    main()
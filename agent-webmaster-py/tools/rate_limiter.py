@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Client-side rate limiter for the model deployments' quotas.
+
+Each model deployment has a requests-per-minute and a tokens-per-minute quota. Batches
+that ignore them get 429s and the runs fail with ``rate_limit_exceeded``. Before a run
+is created, ``acquire`` takes one request and the estimated tokens from two token
+buckets per deployment. The buckets live in a SQLite database under the local state
+directory and are updated inside ``BEGIN IMMEDIATE`` transactions, so every tester,
+worker process and the Streamlit app share them.
+
+The buckets refill at ``RATE_LIMIT_UTILIZATION`` (90 % by default) of the quota and hold
+at most ``burst_seconds`` worth of it, since the service enforces the quota over short
+windows rather than per minute. A rate-limited run blocks the deployment for the
+retry-after time the service reported (``back_off``) so that all processes back off
+together instead of retrying in lockstep.
+
+Quotas are configured per deployment:
+    MODEL_DEPLOYMENT_RPM / MODEL_DEPLOYMENT_TPM
+    ADVANCED_MODEL_DEPLOYMENT_RPM / ADVANCED_MODEL_DEPLOYMENT_TPM
+A deployment without a configured quota is not limited.
+
+Usage:
+    python rate_limiter.py --status
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.local_state import get_state_path
+
+# Deployment name variable -> prefix of its quota variables
+DEPLOYMENT_QUOTA_PREFIXES = {
+    "MODEL_DEPLOYMENT_NAME": "MODEL_DEPLOYMENT",
+    "ADVANCED_MODEL_DEPLOYMENT_NAME": "ADVANCED_MODEL_DEPLOYMENT",
+}
+CHARS_PER_TOKEN = 4
+DEFAULT_COMPLETION_TOKENS = 1000
+MAX_RATE_LIMIT_RETRIES = int(os.environ.get("RATE_LIMIT_MAX_RETRIES", "3"))
+
+_RETRY_AFTER_PATTERN = re.compile(
+    r"(?:try again|retry)\s+(?:in|after)\s+(\d+(?:\.\d+)?)\s*(?:seconds?|s\b)", re.IGNORECASE
+)
+_RATE_LIMIT_MESSAGE_PATTERN = re.compile(r"\b429\b|\brate[ _-]?limit", re.IGNORECASE)
+
+
+@dataclass
+class DeploymentQuota:
+    """Per-minute quota of one model deployment."""
+
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+
+    @property
+    def limited(self) -> bool:
+        return bool(self.requests_per_minute or self.tokens_per_minute)
+
+
+def get_deployment_quota(deployment: Optional[str]) -> DeploymentQuota:
+    """
+    Get the configured quota of a model deployment.
+
+    Args:
+        deployment: Name of the model deployment (e.g. ``agent.model``)
+
+    Returns:
+        DeploymentQuota, unlimited if the deployment has no quota variables
+    """
+    for name_variable, prefix in DEPLOYMENT_QUOTA_PREFIXES.items():
+        if deployment and os.environ.get(name_variable) == deployment:
+            rpm = os.environ.get(f"{prefix}_RPM")
+            tpm = os.environ.get(f"{prefix}_TPM")
+            return DeploymentQuota(
+                requests_per_minute=float(rpm) if rpm else None,
+                tokens_per_minute=float(tpm) if tpm else None,
+            )
+    return DeploymentQuota()
+
+
+def estimate_tokens(*texts: Optional[str], completion_tokens: int = DEFAULT_COMPLETION_TOKENS) -> int:
+    """
+    Estimate the tokens a run will consume from the size of its inputs.
+
+    Args:
+        *texts: Prompt, agent instructions and any other text sent to the model
+        completion_tokens: Allowance for the reply and the tool call round trips
+
+    Returns:
+        Estimated total tokens
+    """
+    characters = sum(len(text) for text in texts if text)
+    return characters // CHARS_PER_TOKEN + completion_tokens
+
+
+def is_rate_limited(run) -> bool:
+    """Check whether a run failed because the deployment's quota was exceeded."""
+    error = getattr(run, "last_error", None)
+    if not error:
+        return False
+    def field(name):
+        return error.get(name) if hasattr(error, "get") else getattr(error, name, None)
+
+    if field("code") == "rate_limit_exceeded" or str(field("status_code") or field("status")) == "429":
+        return True
+    # Other errors may carry a 429 only in their message; IDs containing "429" must not match
+    return bool(_RATE_LIMIT_MESSAGE_PATTERN.search(str(field("message") or "")))
+
+
+def parse_retry_after(run, default: float = 10.0) -> float:
+    """
+    Get the wait the service asked for in a rate-limited run's error message.
+
+    Args:
+        run: ThreadRun that failed with ``rate_limit_exceeded``
+        default: Seconds to wait when the message does not say
+
+    Returns:
+        Seconds to wait before resubmitting
+    """
+    match = _RETRY_AFTER_PATTERN.search(str(getattr(run, "last_error", "") or ""))
+    return float(match.group(1)) if match else default
+
+
+class TokenBucketLimiter:
+    """
+    Request and token buckets per deployment, shared through a SQLite database.
+
+    The database is opened per call, like the thread ledger, so processes never share
+    a connection.
+    """
+
+    def __init__(self, path: Optional[str] = None, burst_seconds: float = 10.0):
+        self.path = path or os.environ.get("RATE_LIMIT_DB_PATH") or get_state_path("rate_limits.db")
+        self.burst_seconds = burst_seconds
+        self.utilization = float(os.environ.get("RATE_LIMIT_UTILIZATION", "0.9"))
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS buckets (
+                       deployment    TEXT PRIMARY KEY,
+                       requests      REAL NOT NULL,
+                       tokens        REAL NOT NULL,
+                       updated_at    REAL NOT NULL,
+                       blocked_until REAL NOT NULL DEFAULT 0,
+                       acquired      INTEGER NOT NULL DEFAULT 0,
+                       throttled     INTEGER NOT NULL DEFAULT 0,
+                       waited        REAL NOT NULL DEFAULT 0
+                   )"""
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _capacities(self, quota: DeploymentQuota):
+        window = self.burst_seconds / 60.0 * self.utilization
+        requests = max(1.0, quota.requests_per_minute * window) if quota.requests_per_minute else None
+        tokens = max(1.0, quota.tokens_per_minute * window) if quota.tokens_per_minute else None
+        return requests, tokens
+
+    def _refill(self, row, quota: DeploymentQuota, now: float):
+        request_capacity, token_capacity = self._capacities(quota)
+        requests, tokens, updated_at = row
+        elapsed = max(0.0, now - updated_at)
+        if request_capacity is not None:
+            requests = min(request_capacity, requests + elapsed * quota.requests_per_minute * self.utilization / 60)
+        if token_capacity is not None:
+            tokens = min(token_capacity, tokens + elapsed * quota.tokens_per_minute * self.utilization / 60)
+        return requests, tokens
+
+    def acquire(self, deployment: str, tokens: int, quota: Optional[DeploymentQuota] = None) -> float:
+        """
+        Wait until the deployment has room for one more request of ``tokens`` tokens.
+
+        Args:
+            deployment: Name of the model deployment
+            tokens: Estimated tokens of the request
+            quota: Quota of the deployment (defaults to its configured quota)
+
+        Returns:
+            Seconds spent waiting
+        """
+        quota = quota or get_deployment_quota(deployment)
+        if not quota.limited:
+            return 0.0
+        request_capacity, token_capacity = self._capacities(quota)
+        if token_capacity is not None:
+            tokens = min(tokens, token_capacity)  # A single oversized request must still get through
+        waited = 0.0
+
+        while True:
+            with closing(self._connect()) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                now = time.time()
+                row = conn.execute(
+                    "SELECT requests, tokens, updated_at, blocked_until FROM buckets WHERE deployment = ?",
+                    (deployment,),
+                ).fetchone()
+                if row is None:
+                    row = (request_capacity or 0.0, token_capacity or 0.0, now, 0.0)
+                    conn.execute(
+                        "INSERT INTO buckets (deployment, requests, tokens, updated_at) VALUES (?, ?, ?, ?)",
+                        (deployment, row[0], row[1], now),
+                    )
+                requests, available_tokens = self._refill(row[:3], quota, now)
+                delay = max(0.0, row[3] - now)
+                if request_capacity is not None and requests < 1:
+                    delay = max(delay, (1 - requests) * 60 / (quota.requests_per_minute * self.utilization))
+                if token_capacity is not None and available_tokens < tokens:
+                    delay = max(
+                        delay, (tokens - available_tokens) * 60 / (quota.tokens_per_minute * self.utilization)
+                    )
+                if delay <= 0:
+                    conn.execute(
+                        "UPDATE buckets SET requests = ?, tokens = ?, updated_at = ?, acquired = acquired + 1, "
+                        "throttled = throttled + ?, waited = waited + ? WHERE deployment = ?",
+                        (requests - 1, available_tokens - tokens, now, int(waited > 0), waited, deployment),
+                    )
+                    conn.execute("COMMIT")
+                    return waited
+                conn.execute(
+                    "UPDATE buckets SET requests = ?, tokens = ?, updated_at = ? WHERE deployment = ?",
+                    (requests, available_tokens, now, deployment),
+                )
+                conn.execute("COMMIT")
+            # Re-check regularly: another process may have been penalized or settled meanwhile
+            delay = min(delay, self.burst_seconds)
+            time.sleep(delay)
+            waited += delay
+
+    def settle(self, deployment: str, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """
+        Correct the token bucket once the real usage of a run is known.
+
+        Args:
+            deployment: Name of the model deployment
+            estimated_tokens: Tokens taken by ``acquire``
+            actual_tokens: ``run.usage.total_tokens`` (ignored when unknown)
+        """
+        if actual_tokens is None or not get_deployment_quota(deployment).tokens_per_minute:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE buckets SET tokens = tokens - ? WHERE deployment = ?",
+                (actual_tokens - estimated_tokens, deployment),
+            )
+
+    def back_off(self, deployment: Optional[str], retry_after: float) -> None:
+        """
+        Hold back a deployment after the service rejected a run.
+
+        A deployment with a quota is blocked for every process until the retry-after
+        time; without a quota there is no shared bucket, so only the caller waits.
+
+        Args:
+            deployment: Name of the model deployment
+            retry_after: Seconds the service asked to wait
+        """
+        if not deployment or not get_deployment_quota(deployment).limited:
+            time.sleep(retry_after)
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE buckets SET blocked_until = MAX(blocked_until, ?), requests = MIN(requests, 0) "
+                "WHERE deployment = ?",
+                (time.time() + retry_after, deployment),
+            )
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get the limiter counters.
+
+        Returns:
+            Dictionary keyed by deployment with acquired, throttled, waited_seconds and
+            blocked_seconds (remaining block after a rate-limited run)
+        """
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                "SELECT deployment, acquired, throttled, waited, blocked_until FROM buckets"
+            ).fetchall()
+        return {
+            deployment: {
+                "acquired": acquired,
+                "throttled": throttled,
+                "waited_seconds": waited,
+                "blocked_seconds": max(0.0, blocked_until - now),
+            }
+            for deployment, acquired, throttled, waited, blocked_until in rows
+        }
+
+
+_limiter = None
+
+
+def get_rate_limiter() -> TokenBucketLimiter:
+    """Get the process-wide limiter."""
+    global _limiter
+    if _limiter is None:
+        _limiter = TokenBucketLimiter()
+    return _limiter
+
+
+def main():
+    """Command line entry point showing the shared limiter state."""
+    parser = argparse.ArgumentParser(description="Show the model deployment rate limiter state")
+    parser.add_argument("--status", action="store_true", help="Show the per-deployment counters")
+    parser.add_argument("--db", help="Path of the limiter database")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    limiter = TokenBucketLimiter(args.db)
+    summary = limiter.summary()
+    if not summary:
+        print("🪣 No deployment has been rate limited yet.")
+    for deployment, counters in summary.items():
+        quota = get_deployment_quota(deployment)
+        print(
+            f"🪣 {deployment}: {counters['acquired']} runs, {counters['throttled']} throttled, "
+            f"{counters['waited_seconds']:.1f}s waited, blocked {counters['blocked_seconds']:.1f}s "
+            f"(RPM {quota.requests_per_minute or '-'}, TPM {quota.tokens_per_minute or '-'})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of agent results.
+
+The same sample prompt or sample dataset sent twice triggers two full agent runs. The
+cache stores the reply of every completed run under a key derived from:
+
+- the agent fingerprint: model, instructions and tool definitions, so editing an agent
+  invalidates its entries,
+- the normalized prompt: runs of whitespace do not matter (case does),
+- the dataset hash: canonical JSON, so key order and indentation do not matter.
+
+``run_agent`` consults the cache before creating a thread, so a hit costs one SQLite
+lookup. Entries expire after ``RESULT_CACHE_TTL_HOURS`` and the least recently used
+ones are evicted once the cache exceeds ``RESULT_CACHE_MAX_MB``. Set
+``RESULT_CACHE_BYPASS=1`` (or pass ``use_cache=False``) to always run the agent.
+
+Usage:
+    python result_cache.py --stats
+    python result_cache.py --clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.local_state import get_state_path
+
+DEFAULT_TTL_HOURS = float(os.environ.get("RESULT_CACHE_TTL_HOURS", "24"))
+DEFAULT_MAX_MB = float(os.environ.get("RESULT_CACHE_MAX_MB", "100"))
+
+
+@dataclass
+class CachedResult:
+    """A stored agent reply."""
+
+    key: str
+    agent_name: Optional[str]
+    text: str
+    url: Optional[str]
+    created_at: float
+
+
+def cache_bypassed() -> bool:
+    """Check the ``RESULT_CACHE_BYPASS`` environment switch."""
+    return os.environ.get("RESULT_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+
+def _as_plain(value: Any) -> Any:
+    """Convert SDK models to JSON-serializable values for hashing."""
+    if hasattr(value, "as_dict"):
+        return value.as_dict()
+    return str(value)
+
+
+def agent_fingerprint(agent) -> str:
+    """
+    Hash the parts of an agent definition that shape its replies.
+
+    Args:
+        agent: Agent returned by the agents API
+
+    Returns:
+        Hex SHA-256 of the model, instructions, tools and response format
+    """
+    definition = {
+        "name": getattr(agent, "name", None),
+        "model": getattr(agent, "model", None),
+        "instructions": getattr(agent, "instructions", None),
+        "tools": getattr(agent, "tools", None),
+        "response_format": getattr(agent, "response_format", None),
+    }
+    canonical = json.dumps(definition, sort_keys=True, default=_as_plain)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so trivially different prompts share an entry; case is kept (it can change the content)."""
+    return " ".join(prompt.split())
+
+
+def dataset_hash(dataset: Any) -> Optional[str]:
+    """
+    Hash a dataset independently of its key order and formatting.
+
+    Args:
+        dataset: JSON-serializable dataset, or None
+
+    Returns:
+        Hex SHA-256 of the canonical JSON, or None without a dataset
+    """
+    if dataset is None:
+        return None
+    canonical = json.dumps(dataset, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def make_cache_key(agent, prompt: str, dataset: Any = None, model: Optional[str] = None,
+                   additional_instructions: Optional[str] = None) -> str:
+    """Build the cache key of an (agent, prompt, dataset) request, with its run-level overrides if given."""
+    parts = [agent_fingerprint(agent), normalize_prompt(prompt), dataset_hash(dataset) or ""]
+    if model and model != getattr(agent, "model", None):
+        parts.append(f"model={model}")
+    if additional_instructions:
+        parts.append(f"instructions={hashlib.sha256(additional_instructions.encode('utf-8')).hexdigest()}")
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    SQLite-backed store of agent replies with TTL and LRU size eviction.
+
+    Hit and miss counters are stored with the entries so the statistics cover every
+    process using the cache.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: float = DEFAULT_TTL_HOURS * 3600,
+        max_bytes: int = int(DEFAULT_MAX_MB * 1024 * 1024),
+    ):
+        self.path = path or os.environ.get("RESULT_CACHE_PATH") or get_state_path("result_cache.db")
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS results (
+                       key         TEXT PRIMARY KEY,
+                       agent_name  TEXT,
+                       text        TEXT NOT NULL,
+                       url         TEXT,
+                       size        INTEGER NOT NULL,
+                       created_at  REAL NOT NULL,
+                       last_access REAL NOT NULL,
+                       hits        INTEGER NOT NULL DEFAULT 0
+                   )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_results_access ON results (last_access)")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS lookups (
+                       agent_name TEXT PRIMARY KEY,
+                       hits       INTEGER NOT NULL DEFAULT 0,
+                       misses     INTEGER NOT NULL DEFAULT 0
+                   )"""
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _count_lookup(self, conn: sqlite3.Connection, agent_name: Optional[str], hit: bool) -> None:
+        conn.execute("INSERT OR IGNORE INTO lookups (agent_name) VALUES (?)", (agent_name or "",))
+        column = "hits" if hit else "misses"
+        conn.execute(f"UPDATE lookups SET {column} = {column} + 1 WHERE agent_name = ?", (agent_name or "",))
+
+    def get(self, key: str, agent_name: Optional[str] = None) -> Optional[CachedResult]:
+        """
+        Look up a reply.
+
+        Args:
+            key: Key built by ``make_cache_key``
+            agent_name: Agent name, used for the per-agent hit statistics
+
+        Returns:
+            The cached reply, or None if it is missing or expired
+        """
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT agent_name, text, url, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[3] > self.ttl_seconds:
+                conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                row = None
+            self._count_lookup(conn, agent_name, row is not None)
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE results SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+        return CachedResult(key=key, agent_name=row[0], text=row[1], url=row[2], created_at=row[3])
+
+    def put(self, key: str, text: str, url: Optional[str] = None, agent_name: Optional[str] = None) -> None:
+        """
+        Store a reply and evict the least recently used entries beyond the size bound.
+
+        Args:
+            key: Key built by ``make_cache_key``
+            text: Reply text (HTML for reports)
+            url: URL found in the reply
+            agent_name: Name of the agent that produced the reply
+        """
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, agent_name, text, url, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, agent_name, text, url, size, now, now),
+            )
+            conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, old_size in conn.execute(
+                    "SELECT key, size FROM results ORDER BY last_access"
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM results WHERE key = ?", (old_key,))
+                    total -= old_size
+
+    def clear(self) -> int:
+        """Delete every entry and reset the statistics; returns the number of entries removed."""
+        with closing(self._connect()) as conn, conn:
+            removed = conn.execute("DELETE FROM results").rowcount
+            conn.execute("DELETE FROM lookups")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the cache statistics.
+
+        Returns:
+            Dictionary with entries, bytes and per-agent hits, misses and hit_rate
+        """
+        with closing(self._connect()) as conn, conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+            lookups = conn.execute("SELECT agent_name, hits, misses FROM lookups").fetchall()
+        agents = {}
+        for agent_name, hits, misses in lookups:
+            total = hits + misses
+            agents[agent_name or "unknown"] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / total if total else 0.0,
+            }
+        return {"entries": entries, "bytes": size, "agents": agents}
+
+
+_result_cache = None
+
+
+def get_result_cache() -> ResultCache:
+    """Get the process-wide result cache."""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
+
+
+def main():
+    """Command line entry point for inspecting the cache."""
+    parser = argparse.ArgumentParser(description="Inspect the agent result cache")
+    parser.add_argument("--stats", action="store_true", help="Show entries and hit rates")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached result")
+    parser.add_argument("--cache", help="Path of the cache database")
+    args = parser.parse_args()
+
+    cache = ResultCache(args.cache)
+    if args.clear:
+        print(f"🗑️  Removed {cache.clear()} cached results.")
+        return
+    stats = cache.stats()
+    print(f"🗄️  {stats['entries']} cached results, {stats['bytes'] / 1024:.1f} KB")
+    for agent_name, counters in stats["agents"].items():
+        print(
+            f"   {agent_name}: {counters['hits']} hits / {counters['misses']} misses "
+            f"({counters['hit_rate']:.0%} hit rate)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Tail-latency hedging for agent runs.
+
+A run that is still queued or in progress after the agent's latency threshold (its
+recent p95, or a fixed fallback while the history is short) gets a duplicate started on
+a fresh thread. Whichever run completes first wins and the other one is cancelled.
+
+Agents whose tools have side effects declare them in ``side_effect_tools``; for
+``ag-web-gen`` that is ``html_template_filler``, which publishes the card. A run that
+has already called such a tool is never duplicated, and as soon as one of two racing
+runs calls it the race is settled in its favour and the other run is cancelled, so a
+card is published once. The only window left is two calls starting within the same
+poll interval, which the racing loop keeps short. The steps of a racing run are listed
+at most once per poll interval, and no more once the call was seen.
+
+Hedging is opt-in: set ``RUN_HEDGING=1`` or pass ``hedge=True`` to ``run_agent``.
+"""
+
+import os
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from azure.ai.agents.models import RunStatus
+
+from tools.run_poller import (
+    ACTIVE_RUN_STATUSES,
+    PollStats,
+    get_poll_policy,
+    get_run_durations,
+    record_run,
+    refresh_run,
+    wait_for_run,
+)
+
+
+@dataclass
+class HedgePolicy:
+    """When to duplicate a slow run of one agent."""
+
+    threshold_seconds: float  # Used until the agent has enough run history
+    history_percentile: float = 0.95
+    min_history: int = 10
+    side_effect_tools: Tuple[str, ...] = ()
+
+
+AGENT_HEDGE_POLICIES: Dict[str, HedgePolicy] = {
+    "ag-card-generator": HedgePolicy(threshold_seconds=15),
+    "ag-web-gen": HedgePolicy(threshold_seconds=45, side_effect_tools=("html_template_filler",)),
+    "ag-report-builder": HedgePolicy(threshold_seconds=180),
+}
+
+
+@dataclass
+class HedgeOutcome:
+    """What hedging did for one request."""
+
+    threshold_seconds: float
+    hedged: bool = False
+    winner: str = "primary"
+    skipped_reason: Optional[str] = None
+    estimated_saved_seconds: float = 0.0
+    losers: List[Any] = field(default_factory=list)  # Runs of the race that did not win, cancelled or failed
+
+
+_counters: Dict[str, Dict[str, float]] = {}
+_counters_lock = threading.Lock()
+
+
+def hedging_enabled() -> bool:
+    """Check the ``RUN_HEDGING`` environment switch."""
+    return os.environ.get("RUN_HEDGING", "").lower() in ("1", "true", "yes")
+
+
+def get_hedge_policy(agent_name: Optional[str]) -> HedgePolicy:
+    """Get the hedging policy of an agent (a 60 s threshold for unknown agents)."""
+    return AGENT_HEDGE_POLICIES.get(agent_name or "", HedgePolicy(threshold_seconds=60))
+
+
+def hedge_threshold(agent_name: Optional[str], policy: HedgePolicy) -> float:
+    """
+    Get the age after which a run of the agent is duplicated.
+
+    Returns:
+        The configured percentile of the recent run durations, or the policy's fixed
+        threshold while fewer than ``min_history`` runs have been recorded
+    """
+    durations = sorted(get_run_durations(agent_name)) if agent_name else []
+    if len(durations) < policy.min_history:
+        return policy.threshold_seconds
+    index = min(len(durations) - 1, int(len(durations) * policy.history_percentile))
+    return durations[index]
+
+
+def get_hedge_counters() -> Dict[str, Dict[str, float]]:
+    """
+    Get the hedging counters of this process.
+
+    Returns:
+        Dictionary keyed by agent name with requests, hedged, hedge_wins,
+        skipped_side_effect and estimated_saved_seconds
+    """
+    with _counters_lock:
+        return {agent_name: dict(counter) for agent_name, counter in _counters.items()}
+
+
+def _count(agent_name: str, outcome: HedgeOutcome) -> None:
+    with _counters_lock:
+        counter = _counters.setdefault(agent_name, {
+            "requests": 0, "hedged": 0, "hedge_wins": 0,
+            "skipped_side_effect": 0, "estimated_saved_seconds": 0.0,
+        })
+        counter["requests"] += 1
+        counter["hedged"] += int(outcome.hedged)
+        counter["hedge_wins"] += int(outcome.winner == "hedge")
+        counter["skipped_side_effect"] += int(outcome.skipped_reason == "side_effect_started")
+        counter["estimated_saved_seconds"] += outcome.estimated_saved_seconds
+
+
+def tool_call_name(tool_call) -> str:
+    """Get the function/operation name of a run step tool call."""
+    tool_type = tool_call.get("type") if hasattr(tool_call, "get") else getattr(tool_call, "type", "")
+    details = tool_call.get(tool_type) if hasattr(tool_call, "get") else getattr(tool_call, tool_type, None)
+    if details is None:
+        return tool_type or ""
+    name = details.get("name") if hasattr(details, "get") else getattr(details, "name", None)
+    return name or tool_type or ""
+
+
+def started_side_effect(client, run, side_effect_tools: Tuple[str, ...]) -> bool:
+    """
+    Check whether a run has already called one of the side-effecting tools.
+
+    OpenAPI tool calls are named ``<tool name>_<operationId>``, so a call matches when
+    its name starts with one of the tool names.
+    """
+    if not side_effect_tools:
+        return False
+    for step in client.run_steps.list(thread_id=run.thread_id, run_id=run.id):
+        details = getattr(step, "step_details", None)
+        for tool_call in getattr(details, "tool_calls", None) or []:
+            name = tool_call_name(tool_call)
+            if any(name.startswith(tool_name) for tool_name in side_effect_tools):
+                return True
+    return False
+
+
+class _SideEffectWatch:
+    """
+    Checks racing runs for side-effecting tool calls without listing their steps on every poll.
+
+    The steps of a run are listed at most once per poll interval, never while it is
+    queued (it cannot have called a tool yet), and no more once the call was seen.
+    """
+
+    def __init__(self, client, side_effect_tools: Tuple[str, ...]):
+        self._client = client
+        self._tools = side_effect_tools
+        self._checked_at: Dict[str, float] = {}
+        self._started: Set[str] = set()
+
+    def started(self, run, interval: float) -> bool:
+        if not self._tools:
+            return False
+        if run.id in self._started:
+            return True
+        now = time.monotonic()
+        if run.status == RunStatus.QUEUED or now - self._checked_at.get(run.id, float("-inf")) < interval:
+            return False
+        self._checked_at[run.id] = now
+        if started_side_effect(self._client, run, self._tools):
+            self._started.add(run.id)
+            return True
+        return False
+
+
+def _cancel_quietly(client, run) -> None:
+    try:
+        client.runs.cancel(thread_id=run.thread_id, run_id=run.id)
+    except Exception:
+        pass  # The run may have finished meanwhile; the loser's result is discarded anyway
+
+
+def _estimate_saved_seconds(agent_name: Optional[str], primary, elapsed: float, winner_seconds: float) -> float:
+    """
+    Estimate how much later the primary would have completed than the winning hedge.
+
+    A primary still queued needs a whole typical run from now. A running one is
+    expected to take the mean of the recorded runs longer than its current age or,
+    when none was that slow, its age plus a typical run. A typical run is the median
+    of the history, or the winning run's own duration while there is none.
+    """
+    durations = get_run_durations(agent_name) if agent_name else []
+    typical = statistics.median(durations) if durations else winner_seconds
+    if primary.status == RunStatus.QUEUED:
+        return typical
+    slower = [duration for duration in durations if duration > elapsed]
+    expected = statistics.mean(slower) if slower else elapsed + typical
+    return max(0.0, expected - elapsed)
+
+
+def wait_with_hedging(
+    client,
+    run,
+    start_duplicate: Callable[[], Any],
+    agent_name: Optional[str] = None,
+    policy: Optional[HedgePolicy] = None,
+) -> Tuple[Any, PollStats, HedgeOutcome]:
+    """
+    Wait for a run, duplicating it once if it is slower than the agent's threshold.
+
+    Args:
+        client: AgentsClient
+        run: ThreadRun of the primary attempt
+        start_duplicate: Callable that creates a fresh thread with the same message and
+            returns the new ThreadRun
+        agent_name: Name of the agent, used for the policy, the history and the counters
+        policy: Hedging policy overriding the agent's default
+
+    Returns:
+        Tuple of (winning ThreadRun, PollStats of the request, HedgeOutcome); the
+        outcome's ``losers`` are the other runs started for the request
+    """
+    policy = policy or get_hedge_policy(agent_name)
+    outcome = HedgeOutcome(threshold_seconds=hedge_threshold(agent_name, policy))
+    start = time.perf_counter()
+
+    run, stats = wait_for_run(
+        client, run, agent_name=agent_name, timeout_seconds=outcome.threshold_seconds, cancel_on_timeout=False
+    )
+    if run.status not in ACTIVE_RUN_STATUSES:
+        if agent_name:
+            _count(agent_name, outcome)
+        return run, stats, outcome
+
+    poll_policy = get_poll_policy(agent_name)
+    interval = poll_policy.initial_interval
+    side_effects = _SideEffectWatch(client, policy.side_effect_tools)
+    if side_effects.started(run, interval):
+        # Publishing already started: a duplicate would publish a second time
+        outcome.skipped_reason = "side_effect_started"
+        run, stats = wait_for_run(client, run, agent_name=agent_name, stats=stats)
+        if agent_name:
+            _count(agent_name, outcome)
+        return run, stats, outcome
+
+    outcome.hedged = True
+    primary = run
+    hedge_offset = time.perf_counter() - start
+    racers = {"primary": run, "hedge": start_duplicate()}
+    winner_name, winner = None, None
+    finished = []  # (name, run) of the racers that failed or were cancelled
+
+    while racers and winner is None:
+        time.sleep(interval)
+        for name in list(racers):
+            racers[name], _ = refresh_run(client, racers[name], stats)
+            if name == "primary":
+                primary = racers[name]
+            if racers[name].status == RunStatus.COMPLETED:
+                winner_name, winner = name, racers.pop(name)
+                break
+            if racers[name].status not in ACTIVE_RUN_STATUSES:
+                finished.append((name, racers.pop(name)))  # Failed or cancelled: the other one may still win
+        if winner is None and policy.side_effect_tools:
+            committed = next((name for name in racers if side_effects.started(racers[name], interval)), None)
+            if committed is not None:
+                # Settle the race before a second publish can start
+                for name in [name for name in racers if name != committed]:
+                    loser = racers.pop(name)
+                    _cancel_quietly(client, loser)
+                    finished.append((name, loser))
+                winner_name = committed
+                stats.elapsed_seconds = time.perf_counter() - start
+                winner, stats = wait_for_run(client, racers.pop(committed), stats=stats)
+        interval = min(interval * poll_policy.multiplier, poll_policy.max_interval)
+
+    for name, loser in racers.items():
+        _cancel_quietly(client, loser)
+        finished.append((name, loser))
+
+    elapsed = time.perf_counter() - start
+    stats.elapsed_seconds = elapsed
+    if winner is None:
+        # Neither run completed: the result is the last one to finish, under its own name
+        winner_name, winner = finished[-1]
+    outcome.winner = winner_name
+    outcome.losers = [loser for _, loser in finished if loser is not winner]
+    # The history gets the winning run's own duration, without the wait before the hedge started
+    winner_seconds = elapsed - hedge_offset if winner_name == "hedge" else elapsed
+    if winner_name == "hedge" and winner.status == RunStatus.COMPLETED:
+        outcome.estimated_saved_seconds = _estimate_saved_seconds(agent_name, primary, elapsed, winner_seconds)
+    if agent_name:
+        record_run(agent_name, winner, replace(stats, elapsed_seconds=winner_seconds))
+        _count(agent_name, outcome)
+    return winner, stats, outcome
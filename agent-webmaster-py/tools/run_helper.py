@@ -0,0 +1,384 @@
+"""
+Shared "send a prompt to an agent and get its reply" helper.
+
+The thread is created together with the user message in a single call, the run is
+waited on with the adaptive poller (``tools.run_poller``) and only the newest message
+of that run is fetched (descending order, limit 1) instead of listing and reversing
+the whole thread.
+Each phase is timed so the callers can show where the seconds go.
+"""
+
+import json
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from azure.ai.agents.models import ListSortOrder, MessageRole, ThreadMessageOptions
+
+from tools.rate_limiter import (
+    MAX_RATE_LIMIT_RETRIES,
+    estimate_tokens,
+    get_rate_limiter,
+    is_rate_limited,
+    parse_retry_after,
+)
+from tools.result_cache import cache_bypassed, get_result_cache, make_cache_key
+from tools.run_hedging import HedgeOutcome, hedging_enabled, tool_call_name, wait_with_hedging
+from tools.run_poller import PollStats, wait_for_run
+from tools.thread_reaper import ThreadLedger
+from tools.tracing import add_span, span, tracing_enabled
+from tools.usage_ledger import record_run_in_background, usage_ledger_enabled
+
+# Markdown link target first, then any bare URL
+_MARKDOWN_URL_PATTERN = re.compile(r"\]\((https?://[^\s)]+)\)")
+_URL_PATTERN = re.compile(r"https?://[^\s<>\"'`\]\)]+")
+_URL_TRAILING_PUNCTUATION = ".,;:!?*_"
+
+_default_ledger = None
+
+
+@dataclass
+class AgentRunResult:
+    """Outcome of one agent interaction."""
+
+    status: str
+    thread_id: Optional[str] = None
+    request_id: Optional[str] = None
+    run_id: Optional[str] = None
+    text: Optional[str] = None
+    url: Optional[str] = None
+    error: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    poll_stats: Optional[PollStats] = None
+    hedge: Optional[HedgeOutcome] = None
+    rate_limit_retries: int = 0
+    cached: bool = False
+    run: Any = None
+
+    @property
+    def completed(self) -> bool:
+        return self.status == "completed"
+
+
+def _get_default_ledger() -> ThreadLedger:
+    global _default_ledger
+    if _default_ledger is None:
+        _default_ledger = ThreadLedger()
+    return _default_ledger
+
+
+def extract_message_text(message) -> str:
+    """
+    Get the text of a thread message, joining all of its text parts.
+
+    Args:
+        message: ThreadMessage returned by the messages API
+
+    Returns:
+        The message text, or the string form of its content when it has no text parts
+    """
+    parts = []
+    for part in getattr(message, "content", None) or []:
+        text = getattr(part, "text", None)
+        value = getattr(text, "value", None)
+        if value is None and isinstance(part, dict):
+            value = (part.get("text") or {}).get("value")
+        if value:
+            parts.append(value)
+    if parts:
+        return "\n".join(parts)
+    return str(getattr(message, "content", ""))
+
+
+def extract_url(text: Optional[str]) -> Optional[str]:
+    """
+    Find the first URL in an agent reply.
+
+    Markdown links are preferred so that ``[Open](https://...)`` yields the target and
+    not the text around it. Trailing punctuation is stripped.
+
+    Args:
+        text: Reply text
+
+    Returns:
+        The URL, or None if the text contains no URL
+    """
+    if not text:
+        return None
+    match = _MARKDOWN_URL_PATTERN.search(text) or _URL_PATTERN.search(text)
+    if not match:
+        return None
+    url = match.group(1) if match.re is _MARKDOWN_URL_PATTERN else match.group()
+    return url.rstrip(_URL_TRAILING_PUNCTUATION)
+
+
+def get_latest_assistant_message(client, thread_id: str, run_id: Optional[str] = None):
+    """
+    Fetch only the newest assistant message of a thread.
+
+    Args:
+        client: AgentsClient
+        thread_id: ID of the thread
+        run_id: Restrict the lookup to the messages produced by this run
+
+    Returns:
+        The newest assistant ThreadMessage, or None if there is none
+    """
+    messages = client.messages.list(
+        thread_id=thread_id,
+        run_id=run_id,
+        order=ListSortOrder.DESCENDING,
+        limit=1,
+    )
+    latest = next(iter(messages), None)
+    if latest is None or latest.role != MessageRole.AGENT:
+        return None
+    return latest
+
+
+def build_prompt(prompt: str, dataset: Any = None) -> str:
+    """Append a dataset to a prompt as the indented JSON block the agents expect."""
+    if dataset is None:
+        return prompt
+    return f"{prompt}\n\nDataset:\n{json.dumps(dataset, indent=2)}"
+
+
+def _run_end(run):
+    """Get the time a run or run step reached its terminal status."""
+    for attribute in ("completed_at", "failed_at", "cancelled_at", "expired_at"):
+        value = getattr(run, attribute, None)
+        if value is not None:
+            return value
+    return None
+
+
+def trace_run(client, run) -> None:
+    """
+    Add the service-side phases of a finished run to the current trace.
+
+    The queue time (created to started) and the execution are taken from the run's
+    timestamps, and every run step becomes a child span of the execution. Tool calls
+    have no timestamps of their own, so each one spans its step.
+
+    Args:
+        client: AgentsClient
+        run: Finished ThreadRun
+    """
+    add_span("run.queue", run.created_at, getattr(run, "started_at", None), run_id=run.id)
+    execute_span = add_span(
+        "run.execute",
+        getattr(run, "started_at", None),
+        _run_end(run),
+        error=str(run.last_error) if getattr(run, "last_error", None) else None,
+        run_id=run.id,
+        status=getattr(run.status, "value", run.status),
+    )
+    if execute_span is None:
+        return
+    for step in client.run_steps.list(thread_id=run.thread_id, run_id=run.id):
+        usage = getattr(step, "usage", None)
+        step_span = add_span(
+            f"run_step.{getattr(step.type, 'value', step.type)}",
+            step.created_at,
+            _run_end(step),
+            parent=execute_span,
+            error=str(step.last_error) if getattr(step, "last_error", None) else None,
+            step_id=step.id,
+            status=getattr(step.status, "value", step.status),
+            total_tokens=getattr(usage, "total_tokens", None),
+        )
+        details = getattr(step, "step_details", None)
+        for tool_call in getattr(details, "tool_calls", None) or []:
+            if step_span is None:
+                break
+            tool_type = tool_call.get("type") if hasattr(tool_call, "get") else getattr(tool_call, "type", None)
+            add_span(
+                f"tool_call.{tool_call_name(tool_call)}",
+                step.created_at,
+                _run_end(step),
+                parent=step_span,
+                tool_type=tool_type,
+            )
+
+
+def run_agent(
+    client,
+    agent,
+    prompt: str,
+    ledger: Optional[ThreadLedger] = None,
+    hedge: Optional[bool] = None,
+    dataset: Any = None,
+    use_cache: Optional[bool] = None,
+    model: Optional[str] = None,
+    additional_instructions: Optional[str] = None,
+) -> AgentRunResult:
+    """
+    Run an agent on a new thread and return its reply.
+
+    A completed reply is stored in the result cache (``tools.result_cache``) and the
+    same request is answered from it without creating a thread.
+
+    Runs are admitted by the shared rate limiter of the agent's model deployment
+    (``tools.rate_limiter``) and a run rejected with ``rate_limit_exceeded`` is
+    resubmitted on the same thread after the retry-after time the service reported.
+
+    Args:
+        client: AgentsClient
+        agent: Agent to run (its ``id`` and ``name`` are used)
+        prompt: User message
+        ledger: Thread ledger that records the new thread for the reaper
+        hedge: Duplicate the run if it is slower than the agent's tail-latency threshold
+            (see ``tools.run_hedging``); defaults to the ``RUN_HEDGING`` setting
+        dataset: JSON-serializable data appended to the prompt (hashed separately for
+            the cache key)
+        use_cache: Consult and fill the result cache; defaults to on unless
+            ``RESULT_CACHE_BYPASS`` is set
+        model: Model deployment to run with instead of the agent's (see
+            ``tools.model_router``); the rate limiter and cache key follow it
+        additional_instructions: Instructions appended to the agent's for this run only
+            (part of the cache key)
+
+    Returns:
+        AgentRunResult with the status, reply text, first URL in the reply, the
+        polling statistics of the run and the duration in seconds of each phase
+        (``thread_create``, ``run``, ``reply_fetch`` and ``total``, plus
+        ``rate_limit_wait`` when the limiter held the run back, or ``cache_lookup``
+        and ``total`` for a cached reply)
+    """
+    with span("agent.run", agent=getattr(agent, "name", None)) as run_span:
+        result = _run_agent(client, agent, prompt, ledger, hedge, dataset, use_cache, model, additional_instructions)
+        run_span.set_attribute("status", result.status)
+        run_span.set_attribute("cached", result.cached)
+        run_span.set_attribute("thread_id", result.thread_id)
+        run_span.set_attribute("run_id", result.run_id)
+    return result
+
+
+def _run_agent(client, agent, prompt, ledger, hedge, dataset, use_cache, model, additional_instructions) -> AgentRunResult:
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    agent_name = getattr(agent, "name", None)
+    ledger = ledger or _get_default_ledger()
+
+    if hedge is None:
+        hedge = hedging_enabled()
+    if use_cache is None:
+        use_cache = not cache_bypassed()
+
+    if use_cache:
+        with span("cache.lookup") as lookup_span:
+            cache_key = make_cache_key(agent, prompt, dataset, model=model,
+                                       additional_instructions=additional_instructions)
+            cached = get_result_cache().get(cache_key, agent_name)
+            lookup_span.set_attribute("hit", cached is not None)
+        if cached is not None:
+            timings["cache_lookup"] = timings["total"] = time.perf_counter() - start
+            return AgentRunResult(
+                status="completed", text=cached.text, url=cached.url, timings=timings, cached=True
+            )
+    message_content = build_prompt(prompt, dataset)
+    request_id = uuid.uuid4().hex  # Shared by the retries and hedges of this request
+
+    def _create_thread():
+        # The user message travels with the thread creation: one round trip instead of two
+        return client.threads.create(
+            messages=[ThreadMessageOptions(role=MessageRole.USER, content=message_content)]
+        )
+
+    deployment = model or getattr(agent, "model", None)
+    limiter = get_rate_limiter()
+    estimated_tokens = estimate_tokens(message_content, getattr(agent, "instructions", None), additional_instructions)
+
+    def _create_run(thread_id: str):
+        with span("rate_limit.acquire", deployment=deployment, estimated_tokens=estimated_tokens):
+            waited = limiter.acquire(deployment, estimated_tokens) if deployment else 0.0
+        if waited:
+            timings["rate_limit_wait"] = timings.get("rate_limit_wait", 0.0) + waited
+        with span("run.create", thread_id=thread_id):
+            overrides = {}
+            if model:
+                overrides["model"] = model
+            if additional_instructions:
+                overrides["additional_instructions"] = additional_instructions
+            return client.runs.create(thread_id=thread_id, agent_id=agent.id, **overrides)
+
+    def _start_duplicate():
+        duplicate = _create_thread()
+        ledger.track(duplicate.id, agent_name)
+        return _create_run(duplicate.id)
+
+    superseded = []  # Other runs of this request: hedges that lost and rate-limited attempts
+
+    def _wait(run):
+        if hedge:
+            run, poll_stats, hedge_outcome = wait_with_hedging(client, run, _start_duplicate, agent_name=agent_name)
+            superseded.extend(hedge_outcome.losers)
+            return run, poll_stats, hedge_outcome
+        return wait_for_run(client, run, agent_name=agent_name) + (None,)
+
+    with span("thread.create"):
+        thread = _create_thread()
+    timings["thread_create"] = time.perf_counter() - start
+    ledger.track(thread.id, agent_name)
+
+    phase_start = time.perf_counter()
+    with span("run") as wait_span:
+        run, poll_stats, hedge_outcome = _wait(_create_run(thread.id))
+        rate_limit_retries = 0
+        while is_rate_limited(run) and rate_limit_retries < MAX_RATE_LIMIT_RETRIES:
+            # Every process backs off until the retry-after, then the same thread is run again
+            rate_limit_retries += 1
+            superseded.append(run)
+            limiter.back_off(deployment, parse_retry_after(run))
+            run, poll_stats, hedge_outcome = _wait(_create_run(run.thread_id))
+        wait_span.set_attribute("polls", poll_stats.polls)
+        wait_span.set_attribute("rate_limit_retries", rate_limit_retries)
+        if tracing_enabled():
+            trace_run(client, run)
+    timings["run"] = time.perf_counter() - phase_start
+    usage = getattr(run, "usage", None)
+    if deployment and usage is not None:
+        limiter.settle(deployment, estimated_tokens, getattr(usage, "total_tokens", None))
+
+    status = getattr(run.status, "value", run.status)
+    result = AgentRunResult(
+        status=status,
+        thread_id=run.thread_id,
+        request_id=request_id,
+        run_id=run.id,
+        poll_stats=poll_stats,
+        hedge=hedge_outcome,
+        rate_limit_retries=rate_limit_retries,
+        run=run,
+    )
+    if run.status == "completed":
+        phase_start = time.perf_counter()
+        with span("reply.fetch"):
+            message = get_latest_assistant_message(client, run.thread_id, run_id=run.id)
+        timings["reply_fetch"] = time.perf_counter() - phase_start
+        if message is not None:
+            result.text = extract_message_text(message)
+            result.url = extract_url(result.text)
+            if use_cache:
+                get_result_cache().put(cache_key, result.text, result.url, agent_name)
+    elif getattr(run, "last_error", None):
+        result.error = str(run.last_error)
+
+    if usage_ledger_enabled():
+        artifact = None
+        if result.text:
+            artifact = result.url or ("html" if "<html" in result.text.lower() else "text")
+        record_run_in_background(client, run, agent_name, request_id=request_id, artifact=artifact)
+        for other_run in superseded:
+            record_run_in_background(client, other_run, agent_name, request_id=request_id, refresh=True)
+
+    timings["total"] = time.perf_counter() - start
+    result.timings = timings
+    return result
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    """Render phase timings as ``phase 1.23s | ...`` for console output."""
+    return " | ".join(f"{phase} {seconds:.2f}s" for phase, seconds in timings.items())
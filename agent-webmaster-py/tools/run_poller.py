@@ -0,0 +1,302 @@
+"""
+Adaptive waiter for agent runs.
+
+``runs.create_and_process`` polls every second no matter what: a card run that finishes
+in 1.3 s waits until 2 s, and a three-minute report run issues 180 ``runs.get`` calls.
+``wait_for_run`` instead:
+
+- skips the polls that the agent's run-duration history says are hopeless (a report
+  never completes in its first seconds),
+- polls at a short initial interval around the expected completion time,
+- backs off exponentially with jitter up to a cap once the run is slower than usual.
+
+Every run's poll count is added to per-agent counters (``get_poll_counters``) so the
+latency / request trade-off can be tuned with ``RUN_POLL_INTERVAL_SCALE``: values below
+1 favour completion latency, values above 1 favour fewer requests.
+"""
+
+import os
+import random
+import sqlite3
+import statistics
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from azure.ai.agents.models import RunStatus, SubmitToolOutputsAction, ToolSet
+
+from tools.local_state import get_state_path
+from tools.tracing import span
+
+ACTIVE_RUN_STATUSES = (RunStatus.QUEUED, RunStatus.IN_PROGRESS, RunStatus.REQUIRES_ACTION)
+HISTORY_SIZE = 50
+MAX_TOOL_ROUNDS = 20
+
+
+@dataclass
+class PollPolicy:
+    """Polling intervals (in seconds) for one kind of agent run."""
+
+    initial_interval: float = 0.5
+    max_interval: float = 5.0
+    multiplier: float = 1.5
+    jitter: float = 0.2  # Fraction of the interval randomly added or removed
+    history_skip_fraction: float = 0.8  # First poll at this fraction of the fastest typical run
+
+
+# Card runs are short and latency-sensitive; report runs are long and only need a cap
+AGENT_POLL_POLICIES: Dict[str, PollPolicy] = {
+    "ag-card-generator": PollPolicy(initial_interval=0.25, max_interval=2.0),
+    "ag-web-gen": PollPolicy(initial_interval=0.4, max_interval=3.0),
+    "ag-report-builder": PollPolicy(initial_interval=1.0, max_interval=8.0, multiplier=1.7),
+}
+
+
+@dataclass
+class PollStats:
+    """What waiting for one run cost."""
+
+    polls: int = 0
+    tool_rounds: int = 0
+    slept_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+    expected_seconds: Optional[float] = None
+
+
+class RunDurationHistory:
+    """Recent run durations per agent, persisted so short-lived testers learn too."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or get_state_path("run_history.db")
+        self._cache: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS run_durations (
+                       agent_name  TEXT NOT NULL,
+                       duration    REAL NOT NULL,
+                       finished_at REAL NOT NULL
+                   )"""
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def durations(self, agent_name: str) -> List[float]:
+        """Get the most recent durations of an agent's completed runs."""
+        with self._lock:
+            if agent_name not in self._cache:
+                with self._connect() as conn:
+                    rows = conn.execute(
+                        "SELECT duration FROM run_durations WHERE agent_name = ? "
+                        "ORDER BY finished_at DESC LIMIT ?",
+                        (agent_name, HISTORY_SIZE),
+                    ).fetchall()
+                self._cache[agent_name] = [row[0] for row in reversed(rows)]
+            return list(self._cache[agent_name])
+
+    def record(self, agent_name: str, duration: float) -> None:
+        """Add the duration of a completed run."""
+        durations = self.durations(agent_name)
+        with self._lock:
+            self._cache[agent_name] = (durations + [duration])[-HISTORY_SIZE:]
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO run_durations (agent_name, duration, finished_at) VALUES (?, ?, ?)",
+                (agent_name, duration, time.time()),
+            )
+
+
+class _PollSchedule:
+    """Produces the successive sleep intervals for one run."""
+
+    def __init__(self, policy: PollPolicy, durations: List[float], scale: float):
+        self.policy = policy
+        self.scale = scale
+        self.interval = policy.initial_interval * scale
+        self.first_delay = None
+        self.expected = None
+        if len(durations) >= 3:
+            ordered = sorted(durations)
+            fastest_typical = ordered[max(0, len(ordered) // 10)]
+            self.expected = statistics.median(ordered)
+            self.slow = ordered[min(len(ordered) - 1, (len(ordered) * 9) // 10)]
+            self.first_delay = fastest_typical * policy.history_skip_fraction
+        else:
+            self.slow = None
+
+    def next_delay(self, elapsed: float) -> float:
+        if self.first_delay is not None and elapsed < self.first_delay:
+            delay = self.first_delay - elapsed
+            self.first_delay = None
+            return delay
+        delay = self.interval
+        # Poll densely until the run is slower than usual, then back off up to the cap
+        if self.slow is None or elapsed >= self.slow:
+            self.interval = min(self.interval * self.policy.multiplier, self.policy.max_interval * self.scale)
+        jitter = delay * self.policy.jitter
+        return max(0.05, delay + random.uniform(-jitter, jitter))
+
+    def reset(self) -> None:
+        self.interval = self.policy.initial_interval * self.scale
+
+
+_history = None
+_counters: Dict[str, Dict[str, float]] = {}
+_counters_lock = threading.Lock()
+
+
+def _get_history() -> RunDurationHistory:
+    global _history
+    if _history is None:
+        _history = RunDurationHistory()
+    return _history
+
+
+def get_poll_policy(agent_name: Optional[str]) -> PollPolicy:
+    """Get the polling policy of an agent (the default policy for unknown agents)."""
+    return AGENT_POLL_POLICIES.get(agent_name or "", PollPolicy())
+
+
+def get_poll_counters() -> Dict[str, Dict[str, float]]:
+    """
+    Get the polling counters of this process.
+
+    Returns:
+        Dictionary keyed by agent name with runs, polls, polls_per_run and
+        average wait seconds
+    """
+    with _counters_lock:
+        report = {}
+        for agent_name, counter in _counters.items():
+            runs = counter["runs"] or 1
+            report[agent_name] = {
+                "runs": counter["runs"],
+                "polls": counter["polls"],
+                "polls_per_run": counter["polls"] / runs,
+                "avg_wait_seconds": counter["elapsed_seconds"] / runs,
+            }
+        return report
+
+
+def _count(agent_name: str, stats: PollStats) -> None:
+    with _counters_lock:
+        counter = _counters.setdefault(agent_name, {"runs": 0, "polls": 0, "elapsed_seconds": 0.0})
+        counter["runs"] += 1
+        counter["polls"] += stats.polls
+        counter["elapsed_seconds"] += stats.elapsed_seconds
+
+
+def _submit_function_outputs(client, run) -> bool:
+    """
+    Execute the local function calls a run is waiting for and submit their outputs.
+
+    The functions are the ones registered with ``client.enable_auto_function_calls``,
+    exactly as ``runs.create_and_process`` does.
+
+    Returns:
+        False if the run asked for an action without tool calls and must be cancelled
+    """
+    tool_calls = run.required_action.submit_tool_outputs.tool_calls
+    if not tool_calls:
+        return False
+    function_tool = getattr(client.runs, "_function_tool", None)
+    if function_tool is not None and any(tool_call.type == "function" for tool_call in tool_calls):
+        toolset = ToolSet()
+        toolset.add(function_tool)
+        names = [tool_call.function.name for tool_call in tool_calls if tool_call.type == "function"]
+        with span("tool.execute", tools=names):
+            tool_outputs = toolset.execute_tool_calls(tool_calls)
+        if tool_outputs:
+            client.runs.submit_tool_outputs(thread_id=run.thread_id, run_id=run.id, tool_outputs=tool_outputs)
+    return True
+
+
+def refresh_run(client, run, stats: PollStats) -> Tuple[Any, bool]:
+    """
+    Poll a run once, executing the local function calls it may be waiting for.
+
+    Args:
+        client: AgentsClient
+        run: ThreadRun to refresh
+        stats: Statistics of the run, updated in place
+
+    Returns:
+        Tuple of (refreshed ThreadRun, True if tool outputs were submitted)
+    """
+    run = client.runs.get(thread_id=run.thread_id, run_id=run.id)
+    stats.polls += 1
+    if run.status == RunStatus.REQUIRES_ACTION and isinstance(run.required_action, SubmitToolOutputsAction):
+        stats.tool_rounds += 1
+        if stats.tool_rounds > MAX_TOOL_ROUNDS or not _submit_function_outputs(client, run):
+            return client.runs.cancel(thread_id=run.thread_id, run_id=run.id), False
+        return run, True
+    return run, False
+
+
+def wait_for_run(
+    client,
+    run,
+    agent_name: Optional[str] = None,
+    policy: Optional[PollPolicy] = None,
+    timeout_seconds: Optional[float] = None,
+    cancel_on_timeout: bool = True,
+    stats: Optional[PollStats] = None,
+) -> Tuple[Any, PollStats]:
+    """
+    Poll a run until it reaches a terminal status.
+
+    Args:
+        client: AgentsClient
+        run: ThreadRun returned by ``client.runs.create``
+        agent_name: Name of the agent, used to pick the policy and the duration history
+        policy: Polling policy overriding the agent's default
+        timeout_seconds: Stop waiting if the run is still active after this many seconds
+        cancel_on_timeout: Cancel the run on timeout (otherwise it is returned still active)
+        stats: Statistics to continue from when resuming the wait on the same run
+
+    Returns:
+        Tuple of (final ThreadRun, PollStats)
+    """
+    policy = policy or get_poll_policy(agent_name)
+    scale = float(os.environ.get("RUN_POLL_INTERVAL_SCALE", "1.0"))
+    history = _get_history()
+    durations = history.durations(agent_name) if agent_name else []
+    schedule = _PollSchedule(policy, durations, scale)
+    stats = stats or PollStats(expected_seconds=schedule.expected)
+    start = time.perf_counter() - stats.elapsed_seconds
+
+    while run.status in ACTIVE_RUN_STATUSES:
+        elapsed = time.perf_counter() - start
+        if timeout_seconds is not None and elapsed >= timeout_seconds:
+            if cancel_on_timeout:
+                run = client.runs.cancel(thread_id=run.thread_id, run_id=run.id)
+            stats.elapsed_seconds = elapsed
+            return run, stats
+        delay = schedule.next_delay(elapsed)
+        if timeout_seconds is not None:
+            delay = min(delay, max(0.0, timeout_seconds - elapsed))
+        time.sleep(delay)
+        stats.slept_seconds += delay
+        run, acted = refresh_run(client, run, stats)
+        if acted:
+            # The model resumes right after the tool outputs: look again soon
+            schedule.reset()
+
+    stats.elapsed_seconds = time.perf_counter() - start
+    if agent_name:
+        record_run(agent_name, run, stats)
+    return run, stats
+
+
+def record_run(agent_name: str, run, stats: PollStats) -> None:
+    """Add a finished run to the agent's duration history and poll counters."""
+    if run.status == RunStatus.COMPLETED:
+        _get_history().record(agent_name, stats.elapsed_seconds)
+    _count(agent_name, stats)
+
+
+def get_run_durations(agent_name: str) -> List[float]:
+    """Get the recent durations of an agent's completed runs."""
+    return _get_history().durations(agent_name)
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Record real agent sessions into cassettes and replay them offline.
+
+Recording: with ``AGENT_CASSETTE_RECORD=<path>`` the agent modules wrap their
+``AgentsClient`` in ``RecordingAgentsClient``. Every call is logged with its arguments,
+its response (``as_dict()`` of the SDK model) and its round-trip time, and each run's
+status changes are timed as the client observes them. The run steps and the reply of
+every finished run are part of the cassette, which is written when the process exits.
+
+Replaying: ``ReplayAgentsClient`` is a ``FakeAgentsClient`` whose runs follow the
+recorded ones instead of a latency model. Each new run of an agent replays the next
+recorded run of that agent (cycling): same queue time, same tool calls with their
+arguments and outputs, same reply, and every API call takes a round-trip time drawn
+from the recorded ones. Function tools still run locally, so the client side is
+exercised exactly like in production. ``time_scale`` replays faster or slower.
+
+The client only sees a status change at its next poll, so each transition is placed
+halfway between the last poll that saw the old status and the first that saw the new
+one, and kept within a second of the service's own timestamps (which have a one-second
+resolution) for runs that were polled too rarely to place it.
+
+Usage:
+    AGENT_CASSETTE_RECORD=.cache/web_gen.cassette.json python agents/ag_web_gen/ag_web_gen_tester.py
+    AGENT_CASSETTE_REPLAY=.cache/web_gen.cassette.json python agents/ag_web_gen/ag_web_gen_tester.py
+    python tools/session_cassette.py .cache/web_gen.cassette.json
+    python tools/orchestration_benchmark.py --cassette .cache/web_gen.cassette.json
+"""
+
+import argparse
+import atexit
+import json
+import os
+import statistics
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from tools.fake_agents_client import AgentScript, FakeAgentsClient, ScriptedToolCall, _RunState
+from tools.run_hedging import tool_call_name
+
+CASSETTE_VERSION = 1
+_TERMINAL_STATUSES = ("completed", "failed", "cancelled", "expired")
+
+
+def _jsonable(value: Any) -> Any:
+    """Convert SDK models, enums and containers to plain JSON values."""
+    if hasattr(value, "as_dict"):
+        return value.as_dict()
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return getattr(value, "value", value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return str(value)
+
+
+def _epoch(value: Any) -> Optional[float]:
+    """Convert a timestamp from a recorded response (ISO string or epoch) to epoch seconds."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _run_end(run: Dict[str, Any]) -> Optional[float]:
+    for key in ("completed_at", "failed_at", "cancelled_at", "expired_at"):
+        if run.get(key) is not None:
+            return _epoch(run[key])
+    return None
+
+
+def _transition(observations: List[List[Any]], left: tuple) -> Optional[float]:
+    """
+    Estimate when a run left the given statuses, from the client's observations.
+
+    Returns:
+        Seconds after the run's creation, halfway between the last observation in
+        ``left`` and the first one outside it, or None if it was not observed
+    """
+    last_inside = None
+    for offset, status in observations:
+        if status in left:
+            last_inside = offset
+        elif last_inside is not None:
+            return (last_inside + offset) / 2
+    return None
+
+
+def _within_a_second(observed: Optional[float], service: Optional[float]) -> float:
+    """Keep an observed transition within the one-second resolution of the service timestamp."""
+    if observed is None:
+        return max(0.0, service or 0.0)
+    if service is None:
+        return observed
+    return min(max(observed, service - 1), service + 1)
+
+
+class SessionRecorder:
+    """Process-wide log of the calls made through the recording clients."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._calls: List[Dict[str, Any]] = []
+        self._agents: Dict[str, str] = {}  # agent ID -> name
+        self._runs: Dict[str, Dict[str, Any]] = {}
+        self._clients: List[Any] = []
+
+    def offset(self) -> float:
+        return time.perf_counter() - self._started
+
+    def register(self, client) -> None:
+        with self._lock:
+            self._clients.append(client)
+
+    def record_call(self, operation: str, kwargs: Dict[str, Any], result: Any,
+                    started: float, seconds: float, error: Optional[str] = None) -> None:
+        """Log one call and update the per-run bookkeeping from its response."""
+        payload = _jsonable(result)
+        with self._lock:
+            self._calls.append({
+                "op": operation,
+                "offset": round(started, 4),
+                "seconds": round(seconds, 4),
+                "request": _jsonable(kwargs),
+                "response": payload,
+                "error": error,
+            })
+            if error is not None:
+                return
+            if operation in ("list_agents", "get_agent", "create_agent", "update_agent"):
+                for agent in payload if isinstance(payload, list) else [payload]:
+                    if isinstance(agent, dict) and agent.get("id"):
+                        self._agents[agent["id"]] = agent.get("name") or agent["id"]
+            elif operation.startswith("runs.") and isinstance(payload, dict) and payload.get("id"):
+                run = self._runs.setdefault(payload["id"], {"created_offset": started + seconds, "observations": []})
+                run["last"] = payload
+                run["observations"].append([round(started + seconds - run["created_offset"], 4), payload["status"]])
+            elif operation == "run_steps.list" and kwargs.get("run_id") in self._runs:
+                self._runs[kwargs["run_id"]]["steps"] = payload
+            elif operation == "messages.list" and kwargs.get("run_id") in self._runs and payload:
+                self._runs[kwargs["run_id"]]["reply_message"] = payload[0]
+
+    def _complete_finished_runs(self) -> None:
+        """Fetch the steps and reply of finished runs the session did not look at."""
+        client = self._clients[0]._client if self._clients else None
+        for run_id, run in list(self._runs.items()):
+            last = run.get("last", {})
+            if client is None or last.get("status") not in _TERMINAL_STATUSES:
+                continue
+            try:
+                if "steps" not in run:
+                    run["steps"] = _jsonable(list(client.run_steps.list(thread_id=last["thread_id"], run_id=run_id)))
+                if "reply_message" not in run and last["status"] == "completed":
+                    messages = list(client.messages.list(thread_id=last["thread_id"], run_id=run_id, limit=1))
+                    if messages:
+                        run["reply_message"] = _jsonable(messages[0])
+            except Exception:
+                pass  # Thread already deleted: the run is replayed without its steps
+
+    def _summarize_run(self, run_id: str, run: Dict[str, Any]) -> Dict[str, Any]:
+        last = run["last"]
+        observations = run["observations"]
+        created = _epoch(last.get("created_at"))
+        started = _epoch(last.get("started_at"))
+        ended = _run_end(last)
+
+        service_queue = started - created if started is not None and created is not None else None
+        service_end = ended - created if ended is not None and created is not None else None
+        queue_seconds = _within_a_second(_transition(observations, ("queued",)), service_queue)
+        end_seconds = _within_a_second(
+            _transition(observations, ("queued", "in_progress", "requires_action", "cancelling")), service_end
+        )
+        run_seconds = max(0.0, end_seconds - queue_seconds)
+
+        # Tool steps with the thinking time before each one, then the final thinking time
+        segments, previous_end = [], started
+        for step in sorted(run.get("steps") or [], key=lambda s: _epoch(s.get("created_at")) or 0):
+            tool_calls = (step.get("step_details") or {}).get("tool_calls") or []
+            step_start, step_end = _epoch(step.get("created_at")), _run_end(step)
+            if not tool_calls or step_start is None or step_end is None:
+                continue
+            calls = []
+            for tool_call in tool_calls:
+                details = tool_call.get(tool_call.get("type")) or {}
+                arguments = details.get("arguments")
+                calls.append({
+                    "type": tool_call.get("type"),
+                    "name": tool_call_name(tool_call),
+                    "arguments": json.loads(arguments) if isinstance(arguments, str) and arguments else {},
+                    "output": details.get("output") or "{}",
+                })
+            segments.append({"think": max(0.0, step_start - (previous_end or step_start)),
+                             "seconds": max(0.0, step_end - step_start), "tool_calls": calls})
+            previous_end = step_end
+        final_think = max(0.0, (ended or previous_end or 0) - (previous_end or ended or 0))
+
+        # Rescale the one-second timestamps to the observed execution time
+        total = sum(s["think"] + s["seconds"] for s in segments) + final_think
+        factor = run_seconds / total if total else 0.0
+        for segment in segments:
+            segment["think"] = round(segment["think"] * factor, 4)
+            segment["seconds"] = round(segment["seconds"] * factor, 4)
+        final_think = round(final_think * factor if total else run_seconds, 4)
+
+        content = (run.get("reply_message") or {}).get("content") or []
+        reply = "\n".join((part.get("text") or {}).get("value") or "" for part in content) or None
+        return {
+            "run_id": run_id,
+            "agent": self._agents.get(last.get("agent_id"), last.get("agent_id")),
+            "model": last.get("model"),
+            "status": last.get("status"),
+            "last_error": last.get("last_error"),
+            "usage": last.get("usage"),
+            "queue_seconds": round(queue_seconds, 4),
+            "run_seconds": round(run_seconds, 4),
+            "segments": segments,
+            "final_think_seconds": final_think,
+            "reply": reply,
+            "observations": observations,
+        }
+
+    def save(self) -> Optional[str]:
+        """Write the cassette; returns its path, or None when nothing was recorded."""
+        self._complete_finished_runs()
+        with self._lock:
+            if not self._calls:
+                return None
+            cassette = {
+                "version": CASSETTE_VERSION,
+                "recorded_at": datetime.now(timezone.utc).isoformat(),
+                "agents": self._agents,
+                "runs": [self._summarize_run(run_id, run) for run_id, run in self._runs.items()
+                         if run.get("last", {}).get("status") in _TERMINAL_STATUSES],
+                "calls": self._calls,
+            }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(cassette, f, ensure_ascii=False)
+        return self.path
+
+
+class _RecordingNamespace:
+    """Proxy of a client or one of its namespaces that records every method call."""
+
+    def __init__(self, target, prefix: str, recorder: SessionRecorder):
+        self._target = target
+        self._prefix = prefix
+        self._recorder = recorder
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+        operation = f"{self._prefix}{name}"
+        recorder = self._recorder
+
+        def _recorded(*args, **kwargs):
+            started = recorder.offset()
+            try:
+                result = attribute(*args, **kwargs)
+                if operation.endswith(".list") or operation == "list_agents":
+                    result = list(result)  # Materialize the pager so the response can be logged
+            except Exception as e:
+                recorder.record_call(operation, kwargs, None, started, recorder.offset() - started,
+                                     error=f"{type(e).__name__}: {e}")
+                raise
+            recorder.record_call(operation, kwargs, result, started, recorder.offset() - started)
+            return result
+
+        return _recorded
+
+
+class RecordingAgentsClient(_RecordingNamespace):
+    """``AgentsClient`` wrapper that logs the session into a cassette."""
+
+    def __init__(self, client, recorder: SessionRecorder):
+        super().__init__(client, "", recorder)
+        self._client = client
+        self.threads = _RecordingNamespace(client.threads, "threads.", recorder)
+        self.messages = _RecordingNamespace(client.messages, "messages.", recorder)
+        self.runs = _RecordingNamespace(client.runs, "runs.", recorder)
+        self.run_steps = _RecordingNamespace(client.run_steps, "run_steps.", recorder)
+        recorder.register(self)
+
+
+def load_cassette(path: str) -> Dict[str, Any]:
+    """Read a cassette file and check its version."""
+    with open(path, encoding="utf-8") as f:
+        cassette = json.load(f)
+    if cassette.get("version") != CASSETTE_VERSION:
+        raise ValueError(f"Unsupported cassette version {cassette.get('version')} in {path}")
+    return cassette
+
+
+class ReplayAgentsClient(FakeAgentsClient):
+    """
+    ``FakeAgentsClient`` whose runs and API latencies follow a recorded cassette.
+
+    Args:
+        cassette: Cassette loaded with ``load_cassette``
+        seed: Seed of the round-trip time sampling
+        time_scale: Factor applied to every recorded duration (0.5 replays twice as fast)
+        api_latency: Add the recorded round-trip times to the API calls
+    """
+
+    def __init__(self, cassette: Dict[str, Any], seed: int = 0, time_scale: float = 1.0, api_latency: bool = True):
+        super().__init__(scripts={}, seed=seed, time_scale=time_scale)
+        self.cassette = cassette
+        self._recorded_runs: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for run in cassette.get("runs", []):
+            error_code = (run.get("last_error") or {}).get("code")
+            if run["status"] == "completed" or error_code == "rate_limit_exceeded":
+                self._recorded_runs[run["agent"]].append(run)
+        self._next_run: Dict[str, int] = defaultdict(int)
+        self._round_trips: Dict[str, List[float]] = defaultdict(list)
+        if api_latency:
+            for call in cassette.get("calls", []):
+                self._round_trips[call["op"]].append(call["seconds"])
+
+    def _count(self, operation: str) -> None:
+        with self._lock:
+            self.call_counts[operation] += 1
+            round_trips = self._round_trips.get(operation)
+            delay = self._rng.choice(round_trips) * self.time_scale if round_trips else 0.0
+        if delay:
+            time.sleep(delay)
+
+    def _start_run(self, thread_id: str, agent_id: str, model: Optional[str], additional_instructions):
+        thread = self._thread(thread_id)
+        with self._lock:
+            agent = dict(self._agents[agent_id]) if agent_id in self._agents else None
+            if agent is None:
+                return super()._start_run(thread_id, agent_id, model, additional_instructions)
+            recorded_runs = self._recorded_runs.get(agent["name"])
+            if not recorded_runs:
+                raise ValueError(f"The cassette has no replayable run of agent '{agent['name']}'")
+            recorded = recorded_runs[self._next_run[agent["name"]] % len(recorded_runs)]
+            self._next_run[agent["name"]] += 1
+            if model:
+                agent["model"] = model
+
+            scale = self.time_scale
+            phases = []
+            tool_calls = []
+            for segment in recorded["segments"]:
+                for call in segment["tool_calls"]:
+                    tool_call = ScriptedToolCall(call["type"], call["name"], call["arguments"], call["output"])
+                    phases.append(("think", segment["think"] * scale))
+                    phases.append(("tool", segment["seconds"] * scale, tool_call))
+                    tool_calls.append(tool_call)
+            phases.append(("think", recorded["final_think_seconds"] * scale))
+            now = time.time()
+            prompt = next((m["content"][0]["text"]["value"] for m in reversed(thread["messages"])
+                           if m["role"] == "user"), "")
+            state = _RunState(
+                run_id=f"run_replay_{len(self._runs):06d}",
+                thread_id=thread_id,
+                agent=agent,
+                script=AgentScript(reply=recorded.get("reply") or "", tool_calls=tool_calls),
+                prompt=prompt + (additional_instructions or ""),
+                phases=phases,
+                created_at=now,
+                queued_until=now + recorded["queue_seconds"] * scale,
+                rate_limited=recorded["status"] != "completed",
+            )
+            self._runs[state.id] = state
+        return self._run_model(state)
+
+
+_recorder = None
+_replay_client = None
+
+
+def recording_enabled() -> bool:
+    """Check whether ``AGENT_CASSETTE_RECORD`` names a cassette to record."""
+    return bool(os.environ.get("AGENT_CASSETTE_RECORD"))
+
+
+def replay_enabled() -> bool:
+    """Check whether ``AGENT_CASSETTE_REPLAY`` names a cassette to replay."""
+    return bool(os.environ.get("AGENT_CASSETTE_REPLAY"))
+
+
+def record_session(client):
+    """
+    Wrap a client for recording when ``AGENT_CASSETTE_RECORD`` is set.
+
+    All wrapped clients of the process share one cassette, written at exit.
+
+    Returns:
+        The RecordingAgentsClient, or the client itself when recording is off
+    """
+    global _recorder
+    if not recording_enabled():
+        return client
+    if _recorder is None:
+        _recorder = SessionRecorder(os.environ["AGENT_CASSETTE_RECORD"])
+        atexit.register(_recorder.save)
+    return RecordingAgentsClient(client, _recorder)
+
+
+def get_replay_agents_client() -> ReplayAgentsClient:
+    """Get the process-wide client replaying the ``AGENT_CASSETTE_REPLAY`` cassette."""
+    global _replay_client
+    if _replay_client is None:
+        _replay_client = ReplayAgentsClient(
+            load_cassette(os.environ["AGENT_CASSETTE_REPLAY"]),
+            time_scale=float(os.environ.get("AGENT_CASSETTE_TIME_SCALE", "1.0")),
+        )
+    return _replay_client
+
+
+def summarize_cassette(cassette: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Summarize the latency profile of a cassette.
+
+    Returns:
+        Dictionary with ``runs`` (per agent: count, median/p95 queue and run seconds,
+        tool calls per run) and ``calls`` (per operation: count, median/p95 seconds)
+    """
+    def _p95(values: List[float]) -> float:
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    runs: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for run in cassette.get("runs", []):
+        runs[run["agent"]].append(run)
+    calls: Dict[str, List[float]] = defaultdict(list)
+    for call in cassette.get("calls", []):
+        calls[call["op"]].append(call["seconds"])
+    return {
+        "runs": {
+            agent: {
+                "count": len(agent_runs),
+                "queue_median": statistics.median(r["queue_seconds"] for r in agent_runs),
+                "queue_p95": _p95([r["queue_seconds"] for r in agent_runs]),
+                "run_median": statistics.median(r["run_seconds"] for r in agent_runs),
+                "run_p95": _p95([r["run_seconds"] for r in agent_runs]),
+                "tool_calls": statistics.mean(sum(len(s["tool_calls"]) for s in r["segments"]) for r in agent_runs),
+            }
+            for agent, agent_runs in runs.items()
+        },
+        "calls": {
+            operation: {"count": len(seconds), "median": statistics.median(seconds), "p95": _p95(seconds)}
+            for operation, seconds in calls.items()
+        },
+    }
+
+
+def main():
+    """Command line entry point printing the latency profile of a cassette."""
+    parser = argparse.ArgumentParser(description="Show the latency profile of a recorded agent session")
+    parser.add_argument("path", help="Cassette file")
+    args = parser.parse_args()
+
+    cassette = load_cassette(args.path)
+    summary = summarize_cassette(cassette)
+    print(f"📼 {args.path} - recorded {cassette['recorded_at']}, {len(cassette['calls'])} calls")
+    print(f"\n{'agent':<22} {'runs':>5} {'queue p50':>10} {'queue p95':>10} {'run p50':>8} {'run p95':>8} {'tools':>6}")
+    for agent, stats in sorted(summary["runs"].items()):
+        print(f"{agent:<22} {stats['count']:>5} {stats['queue_median']:>10.2f} {stats['queue_p95']:>10.2f} "
+              f"{stats['run_median']:>8.2f} {stats['run_p95']:>8.2f} {stats['tool_calls']:>6.1f}")
+    print(f"\n{'operation':<26} {'calls':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for operation, stats in sorted(summary["calls"].items()):
+        print(f"{operation:<26} {stats['count']:>6} {stats['median'] * 1000:>8.1f} {stats['p95'] * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Tests of the content-addressed artifact store."""
+
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tools.artifact_store import ArtifactStore, content_hash
+
+REPORT = "<html><body>" + "<p>Quarterly sales</p>" * 50 + "</body></html>"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path / "artifacts"))
+
+
+def test_content_is_stored_under_its_hash_with_a_gzip_variant(store):
+    artifact = store.put(REPORT, kind="report", label="sales")
+
+    assert artifact.hash == content_hash(REPORT) == content_hash(REPORT.encode("utf-8"))
+    assert artifact.path == os.path.join(store.root, "objects", artifact.hash[:2], artifact.hash + ".html")
+    assert not artifact.deduplicated and artifact.puts == 1
+    with open(artifact.path, encoding="utf-8") as f:
+        assert f.read() == REPORT
+    with open(artifact.gzip_path, "rb") as f:
+        assert gzip.decompress(f.read()).decode("utf-8") == REPORT
+    assert store.put("{}", kind="card", content_type="application/json").path.endswith(".json")
+
+
+def test_identical_content_is_stored_once(store):
+    first = store.put(REPORT)
+    second = store.put(REPORT, label="ignored")
+
+    assert second.deduplicated and second.puts == 2
+    assert second.path == first.path and second.label is None
+    stats = store.stats()
+    assert (stats["artifacts"], stats["puts"]) == (1, 2)
+    assert stats["deduplicated_bytes"] == len(REPORT)
+    assert stats["gzip_bytes"] < stats["bytes"]
+
+
+def test_concurrent_identical_puts_leave_one_complete_object(store):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        artifacts = list(pool.map(lambda _: store.put(REPORT), range(16)))
+
+    assert len({artifact.path for artifact in artifacts}) == 1
+    assert store.stats()["puts"] == 16
+    folder = os.path.dirname(artifacts[0].path)
+    assert not [name for name in os.listdir(folder) if name.startswith(".tmp-")]
+
+
+def test_lookups_by_prefix_kind_and_label(store):
+    report = store.put(REPORT, kind="report", label="sales")
+    card = store.put("<html>card</html>", kind="card", label="ada")
+
+    assert store.get(report.hash[:8]).hash == report.hash
+    assert store.get("") is None  # Ambiguous prefix
+    assert store.get(content_hash("never stored")) is None
+    assert [artifact.hash for artifact in store.find(kind="card")] == [card.hash]
+    assert [artifact.hash for artifact in store.find(label="sales")] == [report.hash]
+    assert store.stats()["kinds"] == {"report": 1, "card": 1}
+
+
+def test_best_variant_follows_accept_encoding(store):
+    artifact = store.put(REPORT)
+    assert store.best_variant(artifact, "gzip, deflate") == (artifact.gzip_path, "gzip")
+    assert store.best_variant(artifact, "identity") == (artifact.path, None)
+    if artifact.brotli_path:
+        assert store.best_variant(artifact, "gzip, br;q=1.0") == (artifact.brotli_path, "br")
+    else:
+        assert store.best_variant(artifact, "br") == (artifact.path, None)
@@ -0,0 +1,112 @@
+"""Tests of the offline bulk card renderer."""
+
+import json
+import os
+
+import pytest
+
+from tools import card_batch
+from tools.card_batch import (
+    card_id,
+    compile_template,
+    read_roster,
+    rebuild_cards,
+    render_card,
+    render_roster,
+    template_hash,
+)
+
+CARD = {"title": "Card", "name": "Ada Lovelace", "city": "London", "profession": "Engineer",
+        "message": "Hello", "date": "2024-05-01"}
+DEFAULTS = {"title": "Business Card", "date": "2025-01-15"}
+
+
+def test_cards_are_rendered_with_escaped_values():
+    parts = compile_template("<h1>{{title}}</h1><p>{{name}}</p><p>{{unknown}}</p>")
+    assert parts == ["<h1>", "title", "</h1><p>", "name", "</p><p>", "unknown", "</p>"]
+    assert render_card(parts, {"title": "A & B", "name": "<Ada>"}) == \
+        "<h1>A &amp; B</h1><p>&lt;Ada&gt;</p><p>{{unknown}}</p>"
+    assert card_id(CARD) == card_id(dict(reversed(list(CARD.items()))))
+
+
+def test_roster_files_are_streamed_with_their_line_numbers(tmp_path):
+    csv_path = tmp_path / "roster.csv"
+    csv_path.write_text("name,city,profession,message,team\nAda,London,Engineer,Hi,R&D\n", encoding="utf-8")
+    assert list(read_roster(str(csv_path))) == [
+        (2, {"name": "Ada", "city": "London", "profession": "Engineer", "message": "Hi", "team": "R&D"})
+    ]
+    jsonl_path = tmp_path / "roster.jsonl"
+    jsonl_path.write_text('{"name": "Ada"}\n\nnot json\n', encoding="utf-8")
+    rows = list(read_roster(str(jsonl_path)))
+    assert rows[0] == (1, {"name": "Ada"})
+    assert rows[1][0] == 3 and rows[1][1].startswith("invalid JSON")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_roster_is_rendered_with_a_manifest(tmp_path, workers):
+    person = {"name": "Ada", "city": "London", "profession": "Engineer", "message": "Hi", "team": "R&D"}
+    rows = [
+        (2, person),
+        (3, dict(person, name="Grace")),
+        (4, dict(person)),  # Duplicate of line 2
+        (5, dict(person, name="", date="2024-13-01")),
+        (6, "invalid JSON: boom"),
+    ]
+    output = tmp_path / "cards"
+    result = render_roster(rows, str(output), workers=workers, chunk_size=2, defaults=DEFAULTS)
+
+    assert (result.rendered, result.duplicates) == (2, 1)
+    assert [(row["line"], row["errors"]) for row in result.rejected] == [
+        (5, ["field 'name' is empty", "field 'date' must be a YYYY-MM-DD date, got '2024-13-01'"]),
+        (6, ["invalid JSON: boom"]),
+    ]
+    with open(result.manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert [card["line"] for card in manifest["cards"]] == [2, 3]
+    first = manifest["cards"][0]
+    assert first["id"] == card_id({"title": "Business Card", "name": "Ada", "city": "London",
+                                   "profession": "Engineer", "message": "Hi", "date": "2025-01-15"})
+    with open(os.path.join(output, first["file"]), encoding="utf-8") as f:
+        html = f.read()
+    assert len(html.encode("utf-8")) == first["bytes"]
+    assert "<strong>Name:</strong> Ada" in html and "R&amp;D" not in html
+    assert sorted(os.listdir(output)) == sorted([card["file"] for card in manifest["cards"]] + ["manifest.json"])
+
+
+def test_duplicate_rows_are_rendered_once(tmp_path, monkeypatch):
+    rendered = []
+    monkeypatch.setattr(card_batch, "render_card", lambda parts, card: rendered.append(card["name"]) or "<p></p>")
+    rows = [(2, dict(CARD)), (3, dict(CARD)), (4, dict(CARD, name="Grace Hopper")), (5, dict(CARD))]
+    result = render_roster(rows, str(tmp_path / "cards"), workers=1, chunk_size=1)
+    assert (result.rendered, result.duplicates) == (2, 2)
+    assert rendered == ["Ada Lovelace", "Grace Hopper"]
+
+
+def test_only_cards_of_an_older_template_are_rebuilt(tmp_path):
+    template = tmp_path / "template.html"
+    template.write_text("<h1>{{name}}</h1>", encoding="utf-8")
+    output = tmp_path / "cards"
+    rows = [(2, dict(CARD)), (3, dict(CARD, name="Grace Hopper"))]
+    render_roster(rows, str(output), str(template), workers=1)
+
+    result = rebuild_cards(str(output), str(template), workers=1)
+    assert (result.rendered, result.up_to_date, result.errors) == (0, 2, [])
+
+    template.write_text("<h2>{{name}}</h2>", encoding="utf-8")
+    with open(output / "manifest.json", encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["cards"].append({"id": "0" * 16, "file": "card_legacy.html", "line": 9, "bytes": 1})
+    with open(output / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    result = rebuild_cards(str(output), str(template), workers=2)
+    assert (result.rendered, result.up_to_date) == (2, 0)
+    assert result.errors == ["card_legacy.html: no source data in the manifest"]
+    with open(output / manifest["cards"][1]["file"], encoding="utf-8") as f:
+        assert f.read() == "<h2>Grace Hopper</h2>"
+    with open(output / "manifest.json", encoding="utf-8") as f:
+        rebuilt = json.load(f)
+    assert [card["file"] for card in rebuilt["cards"]] == [card["file"] for card in manifest["cards"]]
+    assert rebuilt["cards"][0]["template_hash"] == template_hash(str(template))
+
+    assert rebuild_cards(str(output), str(template), workers=1, force=True).rendered == 2
@@ -0,0 +1,79 @@
+"""Tests of the card contract: schema, local validation and repair of replies, metrics."""
+
+import json
+
+import pytest
+
+from tools.card_contract import (
+    TEMPLATE_FILLER_SPEC,
+    apply_card_schema,
+    card_json_schema,
+    load_card_contract,
+    parse_card,
+    reset_validation_stats,
+    validate_card,
+    validation_stats,
+)
+
+FIELDS = ["title", "name", "city", "profession", "message", "date"]
+CARD = {"title": "Card", "name": "Ada Lovelace", "city": "London", "profession": "Engineer",
+        "message": "Hello", "date": "2024-05-01"}
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_STATE_DIR", str(tmp_path))
+
+
+def test_contract_comes_from_the_template_filler_spec():
+    assert load_card_contract() == ("/api/FxTemplateFiller", FIELDS)
+
+
+def test_card_json_schema_is_strict():
+    schema = card_json_schema()
+    assert schema["required"] == FIELDS
+    assert schema["additionalProperties"] is False
+    assert schema["properties"]["date"]["pattern"] == "^[0-9]{4}-[0-9]{2}-[0-9]{2}$"
+    assert card_json_schema(["name"]) == {"type": "object", "properties": {"name": {"type": "string"}},
+                                          "required": ["name"], "additionalProperties": False}
+
+
+def test_validate_card():
+    assert validate_card(CARD, FIELDS) == []
+    assert validate_card([], FIELDS) == ["expected a JSON object, got list"]
+    errors = validate_card({"name": "", "title": 3, "date": "05/01/2024", "extra": "x"}, FIELDS)
+    assert "missing field 'city'" in errors
+    assert "field 'name' is empty" in errors
+    assert "field 'title' must be a string" in errors
+    assert "unexpected field 'extra'" in errors
+    assert "field 'date' must be a YYYY-MM-DD date, got '05/01/2024'" in errors
+
+
+@pytest.mark.parametrize("date", ["2024-5-1", "2024-05-1", "2024-02-30", "２０２４-05-01", " 2024-05-01", "2024-05-01\n"])
+def test_dates_must_match_the_schema_pattern_and_the_calendar(date):
+    assert validate_card(dict(CARD, date=date), FIELDS) == [f"field 'date' must be a YYYY-MM-DD date, got '{date}'"]
+
+
+def test_template_filler_spec_gets_the_card_constraints():
+    with open(TEMPLATE_FILLER_SPEC, encoding="utf-8") as f:
+        spec = apply_card_schema(json.load(f))
+    schema = spec["paths"]["/api/FxTemplateFiller"]["post"]["requestBody"]["content"]["application/json"]["schema"]
+    assert schema["additionalProperties"] is False
+    assert schema["properties"]["date"] == {"type": "string", "description": "Date for the card generation",
+                                            "pattern": "^[0-9]{4}-[0-9]{2}-[0-9]{2}$", "minLength": 1}
+    assert schema["properties"]["name"]["minLength"] == 1
+    assert schema["required"] == FIELDS
+
+
+def test_parse_card_repairs_fenced_and_wrapped_replies():
+    assert parse_card(json.dumps(CARD), FIELDS) == (CARD, [])
+    assert parse_card(f"```json\n{json.dumps(CARD)}\n```", FIELDS) == (CARD, [])
+    assert parse_card(f"Here is the card: {json.dumps(CARD)} Enjoy!", FIELDS) == (CARD, [])
+    card, errors = parse_card("not json at all", FIELDS)
+    assert card is None and errors[0].startswith("invalid JSON")
+    card, errors = parse_card(json.dumps({"name": "Ada"}), FIELDS)
+    assert card is None and "missing field 'title'" in errors
+
+    assert validation_stats() == {"valid": 1, "repaired": 2, "rejected": 2}
+    reset_validation_stats()
+    assert validation_stats() == {}
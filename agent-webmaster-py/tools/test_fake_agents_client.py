@@ -0,0 +1,91 @@
+"""Tests of the offline fake AgentsClient, driven through run_agent."""
+
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+
+from tools.fake_agents_client import AgentScript, FakeAgentsClient, Latency, ScriptedToolCall
+from tools.run_helper import run_agent
+from tools.thread_reaper import ThreadLedger
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    monkeypatch.setenv("RUN_POLL_INTERVAL_SCALE", "0.1")
+    return ThreadLedger(str(tmp_path / "threads.db"))
+
+
+def _load_html_template(template_name: str) -> str:
+    """
+    Template loader registered as the report builder's function tool.
+
+    :param template_name: Name of the template file.
+    :return: The template HTML.
+    """
+    return f"<html><body><!-- {template_name} --></body></html>"
+
+
+def test_latency_samples_around_its_median():
+    import random
+
+    rng = random.Random(0)
+    samples = sorted(Latency(1.0, 3.0).sample(rng) for _ in range(2000))
+    assert samples[1000] == pytest.approx(1.0, rel=0.15)
+    assert samples[1900] == pytest.approx(3.0, rel=0.25)
+    assert Latency(2.0).sample(rng, scale=0.5) == 1.0
+    assert Latency(0).sample(rng) == 0.0
+
+
+def test_web_generator_run_publishes_a_card_through_its_tools(ledger):
+    client = FakeAgentsClient(time_scale=0)
+    agent = client.create_agent(model="gpt-4", name="ag-web-gen", instructions="Publish a card")
+
+    result = run_agent(client, agent, "Make a card for Ada", ledger=ledger, use_cache=False)
+
+    assert result.completed
+    assert result.url.startswith("https://fakestorage.blob.core.windows.net/cards/")
+    assert client.simulated_seconds(result.run_id) == 0
+    steps = client.run_steps.list(thread_id=result.thread_id, run_id=result.run_id)
+    tool_types = [call.type for step in steps for call in (getattr(step.step_details, "tool_calls", None) or [])]
+    assert tool_types == ["connected_agent", "openapi"]
+    assert ledger.summary()["tracked"] == 1
+
+
+def test_function_tool_calls_are_executed_by_the_client(ledger):
+    client = FakeAgentsClient(time_scale=0)
+    agent = client.create_agent(model="gpt-4", name="ag-report-builder", instructions="Build a report")
+    client.enable_auto_function_calls({_load_html_template})
+
+    result = run_agent(client, agent, "Quarterly sales", ledger=ledger, use_cache=False)
+
+    assert result.completed
+    assert "<title>Quarterly sales</title>" in result.text
+    assert client.call_counts["runs.submit_tool_outputs"] == 1
+
+
+def test_scripted_latency_and_rate_limits(ledger):
+    scripts = {
+        "slow": AgentScript(reply="done", queue_latency=Latency(0.1), thinking_latency=Latency(0.1),
+                            tool_calls=[ScriptedToolCall("openapi", "lookup", latency=Latency(0.1))]),
+        "throttled": AgentScript(reply="never", queue_latency=Latency(0), rate_limit_probability=1.0),
+    }
+    client = FakeAgentsClient(scripts=scripts)
+    slow = client.create_agent(model="gpt-4", name="slow")
+    result = run_agent(client, slow, "Hello", ledger=ledger, use_cache=False)
+    assert result.text == "done"
+    # Queue, half a thinking segment before the tool call, the tool call and the final thinking
+    assert client.simulated_seconds(result.run_id) == pytest.approx(0.35, abs=0.01)
+
+    throttled = client.create_agent(model="gpt-4", name="throttled")
+    thread = client.threads.create()
+    run = client.runs.create(thread_id=thread.id, agent_id=throttled.id)
+    run = client.runs.get(thread_id=thread.id, run_id=run.id)
+    assert run.status == "failed"
+    assert run.last_error["code"] == "rate_limit_exceeded"
+
+
+def test_deleted_threads_are_gone():
+    client = FakeAgentsClient(time_scale=0)
+    thread = client.threads.create()
+    client.threads.delete(thread.id)
+    with pytest.raises(ResourceNotFoundError):
+        client.threads.delete(thread.id)
@@ -0,0 +1,98 @@
+"""Tests of the local Azure Functions emulator and of its T-SQL translation."""
+
+import json
+
+import pytest
+
+from tools.fx_emulator import EndpointMetrics, FunctionsEmulator
+from tools.tsql_sqlite import split_statements, translate
+
+
+@pytest.fixture(scope="module")
+def emulator(tmp_path_factory):
+    return FunctionsEmulator("http://localhost:7071/", "local", str(tmp_path_factory.mktemp("fx")))
+
+
+def test_template_filler_stores_a_card_served_back(emulator):
+    endpoint, status, content_type, body = emulator.handle(
+        "POST", "/api/FxTemplateFiller?code=local", json.dumps({"name": "Ada", "city": "London"}))
+    assert (endpoint, status, content_type) == ("FxTemplateFiller", 200, "application/json")
+    url = json.loads(body)["url"]
+    assert url.startswith("http://localhost:7071/cards/filled_template_")
+    # Cards are named by content: the same card is published once under the same name
+    assert emulator.handle("POST", "/api/FxTemplateFiller?code=local",
+                           json.dumps({"name": "Ada", "city": "London"}))[3] == body
+
+    endpoint, status, content_type, html = emulator.handle("GET", url[len(emulator.base_url):], "")
+    assert (endpoint, status, content_type) == ("cards", 200, "text/html")
+    assert "<strong>Name:</strong> Ada" in html
+    assert "<strong>City:</strong> London" in html
+
+
+@pytest.mark.parametrize("body, message", [
+    ("", "Request body cannot be empty."),
+    ("{", "Malformed JSON."),
+    ('{"age": 42}', "Invalid JSON or not a dictionary of string to string."),
+])
+def test_template_filler_rejects_bad_bodies(emulator, body, message):
+    assert emulator.handle("POST", "/api/FxTemplateFiller?code=local", body)[1:] == (400, "text/plain", message)
+
+
+def test_sql_querier_returns_the_first_result_set(emulator):
+    _, status, _, body = emulator.handle(
+        "POST", "/api/FxSqlQuerier?code=local",
+        "SELECT TOP 2 ProductID, LEFT(ProductName, 3) AS Prefix FROM dbo.Products ORDER BY ProductID; "
+        "SELECT COUNT(*) FROM dbo.Sales;")
+    assert status == 200
+    rows = json.loads(body)
+    assert [row["ProductID"] for row in rows] == [1, 2]
+    assert all(len(row["Prefix"]) <= 3 for row in rows)
+
+
+def test_sql_querier_reports_errors_like_the_function(emulator):
+    _, status, _, body = emulator.handle("POST", "/api/FxSqlQuerier?code=local", "SELECT * FROM dbo.Missing")
+    assert status == 500
+    assert body.startswith("Error executing SQL query: ")
+
+
+def test_report_uploader_and_routing(emulator):
+    _, status, _, body = emulator.handle("POST", "/api/FxReportUploader?code=local", "<html>report</html>")
+    assert status == 200
+    name = json.loads(body)["url"].rsplit("/", 1)[-1]
+    assert emulator.serve_file("reports", name) == (200, "text/html", "<html>report</html>")
+
+    _, status, _, body = emulator.handle("POST", "/api/FxReportUploader?code=local", ".a{color:red}",
+                                         "text/css; charset=utf-8")
+    name = json.loads(body)["url"].rsplit("/", 1)[-1]
+    assert name.startswith("styles_") and name.endswith(".css")
+    assert emulator.handle("GET", f"/reports/{name}", "")[1:] == (200, "text/css", ".a{color:red}")
+
+    assert emulator.handle("POST", "/api/FxReportUploader?code=wrong", "<html/>")[1] == 401
+    assert emulator.handle("POST", "/api/FxReportUploader", "<html/>")[1] == 401
+    assert emulator.handle("GET", "/api/FxReportUploader?code=local", "")[1] == 405
+    assert emulator.handle("GET", "/reports/missing.html", "")[1] == 404
+    assert emulator.handle("GET", "/elsewhere", "")[:2] == ("not_found", 404)
+
+
+def test_endpoint_metrics_snapshot():
+    metrics = EndpointMetrics()
+    for milliseconds in range(1, 101):
+        metrics.record("FxSqlQuerier", milliseconds / 1000, 200 if milliseconds <= 95 else 500)
+
+    stats = metrics.snapshot()["FxSqlQuerier"]
+    assert stats["count"] == 100
+    assert stats["errors"] == 5
+    assert stats["mean_ms"] == pytest.approx(50.5)
+    assert (stats["p50_ms"], stats["p95_ms"], stats["p99_ms"], stats["max_ms"]) == (51.0, 96.0, 100.0, 100.0)
+
+
+def test_translate_rewrites_tsql_for_sqlite():
+    sql = translate("SELECT TOP (5) CAST(SaleDate AS DATE), ISNULL(Notes, N'none') FROM [dbo].Sales\nGO\n"
+                    "SET NOCOUNT ON;\nSELECT DATEPART(year, SaleDate) FROM dbo.Sales")
+    statements = split_statements(sql)
+    assert statements[0] == "SELECT date(SaleDate), ifnull(Notes, 'none') FROM Sales\nLIMIT 5"
+    assert statements[1] == "SELECT DATEPART('year', SaleDate) FROM Sales"
+
+
+def test_split_statements_ignores_quoted_separators():
+    assert split_statements("SELECT 'a;b'; SELECT (1); ") == ["SELECT 'a;b'", "SELECT (1)"]
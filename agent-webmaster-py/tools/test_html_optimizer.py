@@ -0,0 +1,102 @@
+"""Tests of the HTML minification and asset deduplication stage."""
+
+import pytest
+
+from tools.html_optimizer import minification_enabled, minify_css, minify_js, optimize_html
+
+
+def test_minify_css_keeps_strings():
+    css = "/* theme */\n.a  >  .b {\n  color:  red ;\n  content: ' ; { ' ;\n}\n"
+    assert minify_css(css) == ".a>.b{color:red;content:' ; { '}"
+
+
+def test_minify_js_drops_comment_lines_and_indentation():
+    script = "\n    /* setup\n       more */\n    // greeting\n    const a = 1;\n\n    call(a);\n"
+    assert minify_js(script) == "const a = 1;\ncall(a);"
+
+
+def test_minify_js_keeps_literals_intact():
+    script = (
+        "function greet(name) {\n"
+        "    // greeting\n"
+        "    const text = `Hello,\n"
+        "    ${name.split(' ').map(part => `${part}`).join(' ')}\n"
+        "        // not a comment`;\n"
+        "\n"
+        "    const url = 'http://example.com'; // trailing\n"
+        "    return text.replace(/\\s+\\/\\/ x/g, \"  //  \") + url;\n"
+        "}\n"
+    )
+    minified = minify_js(script)
+    assert "// greeting" not in minified
+    assert "`Hello,\n    ${name.split(' ').map(part => `${part}`).join(' ')}\n        // not a comment`" in minified
+    assert "'http://example.com'" in minified
+    assert "/\\s+\\/\\/ x/g" in minified and '"  //  "' in minified
+    assert "\n\n" not in minified and "\n    const" not in minified
+
+
+def test_optimize_html_removes_duplicates_and_keeps_inline_whitespace():
+    style = "<style>\n  .a { color: red; }\n</style>"
+    script = "<script src=\"chart.js\"></script>"
+    html = (f"<html>\n  <head>\n    {style}\n    {style}\n    {script}\n  </head>\n  <body>\n"
+            f"    <div>\n      <p>Total: <b>12</b> <i>units</i></p>\n"
+            f"      <select><option>A</option> <option>B</option></select>\n    </div>\n"
+            f"    {script}\n  </body>\n</html>")
+    result = optimize_html(html)
+    assert result.saved_bytes > 0
+    assert result.html.count("chart.js") == 1
+    assert result.html.count(".a{color:red") == 1
+    assert "<b>12</b> <i>units</i>" in result.html
+    assert "<option>A</option> <option>B</option>" in result.html
+    assert "<div><p>" in result.html
+
+
+def test_repeated_css_rules_keep_their_last_occurrence():
+    html = ("<html><head><style>.a { color: red; }\n.b { margin: 0; }</style>"
+            "<style>.a { color: red; }</style><style>.b { margin: 0; }</style></head><body></body></html>")
+    result = optimize_html(html)
+    assert result.html == "<html><head><style>.a{color:red}</style><style>.b{margin:0}</style></head><body></body></html>"
+    assert result.removed["duplicate css rules"] == 2
+
+
+def test_duplicate_scripts_and_stylesheets_are_loaded_once():
+    html = ('<html><head><link rel="stylesheet" href="https://cdn.example.com/a.css">'
+            '<link rel="stylesheet" href="//cdn.example.com/a.css">'
+            '<script src="http://cdn.example.com/chart.js"></script></head><body>'
+            '<script>\n  draw();\n</script><script>draw();</script>'
+            '<script src="https://cdn.example.com/chart.js"></script></body></html>')
+    result = optimize_html(html)
+    assert result.html.count("a.css") == 1
+    assert result.html.count("chart.js") == 1
+    assert result.html.count("draw();") == 1
+    assert result.removed["duplicate scripts"] == 2
+    assert result.removed["duplicate stylesheets"] == 1
+
+
+def test_comments_are_dropped_except_placeholders():
+    html = ("<html><body><!-- note --><!-- DRILLDOWN:0123456789abcdef -->"
+            "<!--[if IE]><p>old</p><![endif]--></body></html>")
+    result = optimize_html(html)
+    assert "note" not in result.html
+    assert "<!-- DRILLDOWN:0123456789abcdef -->" in result.html
+    assert "<!--[if IE]>" in result.html
+    assert result.removed["comments"] == 1
+
+
+def test_json_blocks_are_compacted_and_pre_is_kept():
+    html = ('<html><body><script type="application/json" id="data">{\n  "a": [1, 2],\n  "b": "</x>"\n}</script>'
+            "<pre>  keep\n    this  </pre></body></html>")
+    result = optimize_html(html)
+    assert '<script type="application/json" id="data">{"a":[1,2],"b":"<\\/x>"}</script>' in result.html
+    assert "<pre>  keep\n    this  </pre>" in result.html
+    assert result.saved_bytes > 0
+    assert result.describe().startswith(f"{result.original_bytes / 1024:.1f} KB")
+
+
+@pytest.mark.parametrize("value, expected", [(None, True), ("0", False), ("false", False), ("1", True)])
+def test_minification_switch(monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv("REPORT_MINIFY", raising=False)
+    else:
+        monkeypatch.setenv("REPORT_MINIFY", value)
+    assert minification_enabled() is expected
@@ -0,0 +1,91 @@
+"""Tests of complexity-based model routing."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from tools.fake_agents_client import FakeAgentsClient
+from tools.model_router import (
+    ADVANCED,
+    FAST,
+    load_routing_log,
+    profile_request,
+    record_routing,
+    route_request,
+    summarize_routing,
+)
+from tools.result_cache import make_cache_key
+from tools.run_helper import run_agent
+from tools.thread_reaper import ThreadLedger
+
+SMALL = {"title": "Q1", "sales": [{"region": "North", "amount": 1}, {"region": "South", "amount": 2}]}
+
+
+@pytest.fixture(autouse=True)
+def deployments(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_STATE_DIR", str(tmp_path))
+    monkeypatch.setenv("MODEL_DEPLOYMENT_NAME", "gpt-fast")
+    monkeypatch.setenv("ADVANCED_MODEL_DEPLOYMENT_NAME", "gpt-advanced")
+    for name in ("MODEL_ROUTER_FAST_MODEL", "MODEL_ROUTER_ADVANCED_MODEL", "MODEL_ROUTER_MAX_ROWS",
+                 "MODEL_ROUTER_MAX_COLUMNS", "MODEL_ROUTER_MAX_SECTIONS", "MODEL_ROUTER_MAX_CHARTS"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_profile_counts_rows_columns_sections_and_charts():
+    dataset = {"sales": [{"a": 1, "b": 2, "c": 3}] * 4, "months": ["Jan", "Feb"], "totals": {"sum": 1}}
+    profile = profile_request("A bar chart and a heat map of sales, plus bar totals", dataset)
+    assert (profile.rows, profile.columns, profile.sections) == (6, 3, 2)
+    assert profile.charts == ["bar", "heatmap"]
+    assert profile.dataset_bytes > 0
+    assert profile_request("Hello").rows == 0
+
+
+def test_simple_requests_run_on_the_fast_deployment():
+    decision = route_request("A bar chart of sales by region", SMALL)
+    assert (decision.tier, decision.model) == (FAST, "gpt-fast")
+    assert decision.reasons == ["within the fast model thresholds"]
+
+
+def test_large_or_advanced_requests_run_on_the_advanced_deployment(monkeypatch):
+    decision = route_request("Scatter plot of price vs rating", {"rows": [{"a": i} for i in range(60)]})
+    assert (decision.tier, decision.model) == (ADVANCED, "gpt-advanced")
+    assert decision.reasons == ["60 rows > 50", "asks for scatter"]
+
+    monkeypatch.setenv("MODEL_ROUTER_MAX_ROWS", "100")
+    assert route_request("A table", {"rows": [{"a": i} for i in range(60)]}).tier == FAST
+
+    monkeypatch.delenv("MODEL_DEPLOYMENT_NAME")
+    decision = route_request("A table", SMALL)
+    assert decision.tier == ADVANCED and decision.reasons == ["no fast deployment configured"]
+
+
+def test_routing_log_is_summarized_by_tier_and_size():
+    def result(seconds, status="completed", cached=False):
+        return SimpleNamespace(status=status, cached=cached, timings={"total": seconds, "run": seconds})
+
+    fast = route_request("A table", SMALL)
+    advanced = route_request("A forecast", SMALL)
+    for seconds in (1.0, 2.0, 3.0):
+        record_routing(fast, result(seconds), "ag-report-builder")
+    record_routing(fast, result(0.01, cached=True))
+    record_routing(advanced, result(9.0, status="failed"))
+
+    entries = load_routing_log()
+    assert len(entries) == 5 and entries[0]["agent"] == "ag-report-builder"
+    assert summarize_routing(entries) == [
+        {"tier": ADVANCED, "bucket": "≤10 rows", "runs": 1, "failed": 1, "p50": None, "p95": None},
+        {"tier": FAST, "bucket": "≤10 rows", "runs": 4, "failed": 0, "p50": 2.0, "p95": 3.0},
+    ]
+
+
+def test_run_agent_runs_with_the_routed_model(tmp_path):
+    client = FakeAgentsClient(time_scale=0)
+    agent = client.create_agent(model="gpt-advanced", name="routed", instructions="Answer")
+    ledger = ThreadLedger(str(tmp_path / "threads.db"))
+
+    result = run_agent(client, agent, "A table", ledger=ledger, use_cache=False, model="gpt-fast")
+    assert result.completed
+    assert client.runs.get(thread_id=result.thread_id, run_id=result.run_id).model == "gpt-fast"
+
+    assert make_cache_key(agent, "A table", SMALL, model="gpt-fast") != make_cache_key(agent, "A table", SMALL)
+    assert make_cache_key(agent, "A table", SMALL, model="gpt-advanced") == make_cache_key(agent, "A table", SMALL)
@@ -0,0 +1,32 @@
+"""Tests of the orchestration benchmark against the fake client."""
+
+import pytest
+
+from tools.fake_agents_client import FakeAgentsClient
+from tools.orchestration_benchmark import _load_html_template, run_level
+
+CONCURRENCY_LEVELS = (1, 10, 50, 100, 500)
+# Mostly poll granularity: the first poll of a web generator run comes after 0.4 s
+OVERHEAD_P95_BUDGET_MS = 5000
+
+
+@pytest.fixture(scope="module")
+def benchmark():
+    client = FakeAgentsClient(seed=0, time_scale=0.01)
+    agent = client.create_agent(model="benchmark-model", name="ag-web-gen", instructions="Benchmark agent")
+    client.enable_auto_function_calls({_load_html_template})
+    return client, agent
+
+
+@pytest.mark.parametrize("concurrency", CONCURRENCY_LEVELS)
+def test_every_concurrency_level_completes_with_bounded_overhead(benchmark, concurrency):
+    client, agent = benchmark
+    stats = run_level(client, agent, concurrency, requests=max(20, concurrency))
+
+    assert stats["requests"] == max(20, concurrency)
+    assert stats["failed"] == 0
+    assert stats["throughput"] > 0
+    assert 0 <= stats["overhead_p50_ms"] <= stats["overhead_p95_ms"] < OVERHEAD_P95_BUDGET_MS
+    # Thread create, run create, polls and the reply: a handful of calls, not a poll per 100 ms
+    assert 3 <= stats["calls_per_request"] <= 15
+    assert stats["polls_per_request"] >= 1
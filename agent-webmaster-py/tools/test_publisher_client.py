@@ -0,0 +1,128 @@
+"""Tests of the pooled publisher client against the functions emulator and a flaky server."""
+
+import asyncio
+import contextlib
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tools.fx_emulator import EmulatorServer, FunctionsEmulator
+from tools.publisher_client import PublisherClient, load_card_contract
+
+CARD = {"title": "Card", "name": "Ada", "city": "London", "profession": "Engineer", "message": "Hi",
+        "date": "2024-05-01"}
+
+
+@pytest.fixture(scope="module")
+def emulator_url(tmp_path_factory):
+    """Base URL of a functions emulator served from a background event loop."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}"
+    emulator = FunctionsEmulator(base_url, "secret", str(tmp_path_factory.mktemp("publisher")))
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(EmulatorServer(emulator, "127.0.0.1", port).serve_forever())
+
+    def serve():
+        with contextlib.suppress(asyncio.CancelledError):
+            loop.run_until_complete(task)
+        loop.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    for _ in range(50):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    yield base_url
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join(timeout=5)
+
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    """Answers with the scripted statuses in turn, then with a report URL."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests += 1
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        body = json.dumps({"url": "https://example.com/reports/r.html"}) if status == 200 else "busy"
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def flaky_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FlakyHandler)
+    server.statuses, server.requests = [], 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_card_contract_is_read_from_the_spec():
+    path, fields = load_card_contract()
+    assert path == "/api/FxTemplateFiller"
+    assert fields == ["title", "name", "city", "profession", "message", "date"]
+
+
+def test_batches_are_uploaded_on_pooled_connections_in_order(emulator_url):
+    reports = [f"<html><body>Report {index}</body></html>" for index in range(20)]
+    with PublisherClient(emulator_url, "secret", max_connections=4) as client:
+        results = client.upload_reports(reports)
+        cards = client.publish_cards([CARD, dict(CARD, name="Grace")])
+        opened = client.pool.opened
+
+    assert all(result.ok and result.attempts == 1 for result in results + cards)
+    assert len({result.url for result in results}) == len(reports)
+    assert all(result.url.startswith(f"{emulator_url}/reports/report_") for result in results)
+    assert cards[0].url != cards[1].url
+    assert opened <= 4
+
+
+def test_invalid_cards_are_not_sent(emulator_url):
+    with PublisherClient(emulator_url, "secret") as client:
+        missing = client.publish_card({"name": "Ada"})
+        reply = client.publish_card(f"```json\n{json.dumps(CARD)}\n```")
+        bad_date = client.publish_card(json.dumps(dict(CARD, date="May 1st")))
+    assert not missing.ok and missing.attempts == 0
+    assert missing.error.startswith("Invalid card: missing field 'title'; missing field 'city'")
+    assert reply.ok and reply.attempts == 1
+    assert bad_date.error == "Invalid card: field 'date' must be a YYYY-MM-DD date, got 'May 1st'"
+
+
+def test_client_errors_are_not_retried(emulator_url):
+    with PublisherClient(emulator_url, "wrong", backoff=0) as client:
+        result = client.upload_report("<html></html>")
+    assert (result.ok, result.status, result.attempts, result.error) == (False, 401, 1, "HTTP 401")
+
+
+def test_throttled_and_failed_uploads_are_retried(flaky_server):
+    flaky_server.statuses = [429, 503]
+    base_url = f"http://127.0.0.1:{flaky_server.server_address[1]}"
+    with PublisherClient(base_url, "code", max_retries=3, backoff=0.01) as client:
+        result = client.upload_report("<html></html>")
+    assert result.ok and result.attempts == 3 and flaky_server.requests == 3
+
+    flaky_server.statuses = [500] * 5
+    with PublisherClient(base_url, "code", max_retries=2, backoff=0.01) as client:
+        result = client.upload_report("<html></html>")
+    assert (result.ok, result.status, result.attempts, result.error) == (False, 500, 3, "busy")
@@ -0,0 +1,95 @@
+"""Tests of the cross-process rate limiter."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from tools.rate_limiter import (
+    DeploymentQuota,
+    TokenBucketLimiter,
+    estimate_tokens,
+    get_deployment_quota,
+    is_rate_limited,
+    parse_retry_after,
+)
+
+DEPLOYMENT = "gpt-test"
+
+
+@pytest.fixture
+def quota_env(monkeypatch):
+    monkeypatch.setenv("MODEL_DEPLOYMENT_NAME", DEPLOYMENT)
+    monkeypatch.setenv("MODEL_DEPLOYMENT_RPM", "600")
+    monkeypatch.setenv("MODEL_DEPLOYMENT_TPM", "60000")
+    monkeypatch.setenv("RATE_LIMIT_UTILIZATION", "1.0")
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "rate_limits.db")
+
+
+def test_quota_comes_from_the_deployment_variables(quota_env):
+    assert get_deployment_quota(DEPLOYMENT) == DeploymentQuota(requests_per_minute=600, tokens_per_minute=60000)
+    assert not get_deployment_quota("other-deployment").limited
+    assert not get_deployment_quota(None).limited
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("a" * 400, None, "b" * 40, completion_tokens=100) == 210
+
+
+def test_rate_limited_runs_are_recognized():
+    assert is_rate_limited(SimpleNamespace(last_error={"code": "rate_limit_exceeded", "message": "slow down"}))
+    assert is_rate_limited(SimpleNamespace(last_error=SimpleNamespace(code="rate_limit_exceeded")))
+    assert not is_rate_limited(SimpleNamespace(last_error={"code": "server_error", "message": "boom"}))
+    assert not is_rate_limited(SimpleNamespace(last_error=None))
+
+
+@pytest.mark.parametrize("error, limited", [
+    ({"code": "server_error", "status_code": 429}, True),
+    (SimpleNamespace(code="server_error", status="429", message="boom"), True),
+    ({"code": "server_error", "message": "Request failed with status 429"}, True),
+    ({"code": "server_error", "message": "Rate limit is exceeded"}, True),
+    ({"code": "server_error", "message": "Run run_4290abc failed on thread_x1429"}, False),
+    ({"code": "server_error", "message": "Took 14290 ms", "status_code": 500}, False),
+])
+def test_429_is_matched_on_the_status_or_as_a_whole_word(error, limited):
+    assert is_rate_limited(SimpleNamespace(last_error=error)) is limited
+
+
+def test_retry_after_is_read_from_the_error_message():
+    run = SimpleNamespace(last_error={"message": "Rate limit is exceeded. Try again in 7 seconds."})
+    assert parse_retry_after(run) == 7.0
+    assert parse_retry_after(SimpleNamespace(last_error={"message": "Too many requests"}), default=3.0) == 3.0
+
+
+def test_unlimited_deployment_never_waits(db_path):
+    limiter = TokenBucketLimiter(db_path)
+    assert limiter.acquire("unlimited", 10_000) == 0.0
+    assert limiter.summary() == {}
+
+
+def test_requests_beyond_the_burst_wait_for_the_refill(quota_env, db_path):
+    # 600 RPM over a 0.1 s burst: one request at once, then one every 0.1 s
+    first, second = TokenBucketLimiter(db_path, burst_seconds=0.1), TokenBucketLimiter(db_path, burst_seconds=0.1)
+    assert first.acquire(DEPLOYMENT, 10) == 0.0
+    assert second.acquire(DEPLOYMENT, 10) == pytest.approx(0.1, abs=0.05)
+    summary = first.summary()[DEPLOYMENT]
+    assert summary["acquired"] == 2 and summary["throttled"] == 1
+
+
+def test_back_off_blocks_the_deployment_for_every_limiter(quota_env, db_path):
+    limiter = TokenBucketLimiter(db_path, burst_seconds=10)
+    limiter.acquire(DEPLOYMENT, 10)
+    limiter.back_off(DEPLOYMENT, 0.3)
+    assert TokenBucketLimiter(db_path).summary()[DEPLOYMENT]["blocked_seconds"] > 0
+    assert TokenBucketLimiter(db_path, burst_seconds=10).acquire(DEPLOYMENT, 10) >= 0.25
+
+
+def test_settle_charges_the_actual_tokens(quota_env, db_path):
+    # 60000 TPM over a 1 s burst: 1000 tokens of capacity, refilled at 1000 per second
+    limiter = TokenBucketLimiter(db_path, burst_seconds=1)
+    limiter.acquire(DEPLOYMENT, 100)
+    limiter.settle(DEPLOYMENT, 100, 1000)
+    assert limiter.acquire(DEPLOYMENT, 100) >= 0.05
@@ -0,0 +1,67 @@
+"""Tests of the agent result cache."""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from tools.result_cache import ResultCache, dataset_hash, make_cache_key
+
+AGENT = SimpleNamespace(name="ag-web-gen", model="gpt-4", instructions="Make a card", tools=[], response_format=None)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "result_cache.db"))
+
+
+def test_key_ignores_formatting_of_the_prompt_and_dataset():
+    key = make_cache_key(AGENT, "Make a card for Ada", {"name": "Ada", "team": ["a", "b"]})
+    assert key == make_cache_key(AGENT, "  Make a card\n for Ada ", {"team": ["a", "b"], "name": "Ada"})
+    assert key != make_cache_key(AGENT, "Make a card for ADA", {"name": "Ada", "team": ["a", "b"]})
+    assert key != make_cache_key(AGENT, "Make a card for Ada", {"name": "Ada", "team": ["b", "a"]})
+    assert dataset_hash(None) is None
+
+
+def test_key_changes_with_the_agent_definition():
+    edited = SimpleNamespace(**dict(vars(AGENT), instructions="Make a badge"))
+    assert make_cache_key(AGENT, "Make a card") != make_cache_key(edited, "Make a card")
+
+
+def test_put_get_and_hit_statistics(cache):
+    assert cache.get("key", "ag-web-gen") is None
+    cache.put("key", "<html>card</html>", "https://example.com/card.html", "ag-web-gen")
+    cached = cache.get("key", "ag-web-gen")
+    assert (cached.text, cached.url, cached.agent_name) == ("<html>card</html>", "https://example.com/card.html",
+                                                            "ag-web-gen")
+    stats = cache.stats()
+    assert stats["entries"] == 1 and stats["bytes"] == len("<html>card</html>")
+    assert stats["agents"]["ag-web-gen"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResultCache(str(tmp_path / "result_cache.db"), ttl_seconds=0.05)
+    cache.put("key", "reply")
+    time.sleep(0.1)
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted_beyond_the_size_bound(tmp_path):
+    cache = ResultCache(str(tmp_path / "result_cache.db"), max_bytes=25)
+    cache.put("old", "x" * 10)
+    time.sleep(0.01)
+    cache.put("used", "y" * 10)
+    time.sleep(0.01)
+    cache.get("old")
+    time.sleep(0.01)
+    cache.put("new", "z" * 10)
+    assert cache.get("used") is None
+    assert cache.get("old") is not None and cache.get("new") is not None
+
+
+def test_clear(cache):
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.clear() == 2
+    assert cache.stats() == {"entries": 0, "bytes": 0, "agents": {}}
@@ -0,0 +1,169 @@
+"""Tests of tail-latency hedging."""
+
+import itertools
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from tools import run_poller
+from tools.run_hedging import HedgePolicy, _SideEffectWatch, hedge_threshold, wait_with_hedging
+from tools.run_poller import RunDurationHistory
+
+AGENT = "ag-card-generator"
+
+
+class _TimedRuns:
+    """
+    ``client.runs`` and ``client.run_steps`` of runs that finish after a set time.
+
+    Each run is created with its duration and, optionally, the time after which it
+    calls the ``html_template_filler`` tool.
+    """
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self.runs = {}
+        self.cancelled = []
+        self.step_lists = 0
+
+    def start(self, seconds, tool_after=None, final="completed"):
+        run_id = f"run_{next(self._ids)}"
+        self.runs[run_id] = {"end": time.monotonic() + seconds, "tool_at": None if tool_after is None
+                             else time.monotonic() + tool_after, "final": final}
+        return self._view(run_id)
+
+    def _view(self, run_id):
+        entry = self.runs[run_id]
+        status = entry.get("cancelled") or ("in_progress" if time.monotonic() < entry["end"] else entry["final"])
+        return SimpleNamespace(id=run_id, thread_id=f"thread_{run_id}", status=status, required_action=None)
+
+    def get(self, thread_id, run_id):
+        return self._view(run_id)
+
+    def cancel(self, thread_id, run_id):
+        self.cancelled.append(run_id)
+        if self._view(run_id).status == "in_progress":
+            self.runs[run_id]["cancelled"] = "cancelled"
+        return self._view(run_id)
+
+    def list(self, thread_id, run_id):
+        self.step_lists += 1
+        tool_at = self.runs[run_id]["tool_at"]
+        if tool_at is None or time.monotonic() < tool_at:
+            return []
+        tool_call = {"type": "openapi", "openapi": {"name": "html_template_filler_fill"}}
+        return [SimpleNamespace(step_details=SimpleNamespace(tool_calls=[tool_call]))]
+
+
+def _client(runs):
+    return SimpleNamespace(runs=runs, run_steps=runs)
+
+
+@pytest.fixture(autouse=True)
+def history(tmp_path, monkeypatch):
+    history = RunDurationHistory(str(tmp_path / "run_history.db"))
+    monkeypatch.setattr(run_poller, "_history", history)
+    monkeypatch.setenv("RUN_POLL_INTERVAL_SCALE", "0.1")
+    return history
+
+
+def test_fast_run_is_not_hedged():
+    runs = _TimedRuns()
+    duplicates = []
+    run, _, outcome = wait_with_hedging(_client(runs), runs.start(0.1), lambda: duplicates.append(1),
+                                        agent_name=AGENT, policy=HedgePolicy(threshold_seconds=1.0))
+    assert run.status == "completed"
+    assert not outcome.hedged and outcome.winner == "primary"
+    assert duplicates == []
+
+
+def test_slow_run_is_duplicated_and_the_first_to_complete_wins():
+    runs = _TimedRuns()
+    primary = runs.start(10.0)
+    run, _, outcome = wait_with_hedging(_client(runs), primary, lambda: runs.start(0.2),
+                                        agent_name=AGENT, policy=HedgePolicy(threshold_seconds=0.3))
+    assert outcome.hedged and outcome.winner == "hedge"
+    assert run.id != primary.id and run.status == "completed"
+    assert runs.cancelled == [primary.id]
+    assert [loser.id for loser in outcome.losers] == [primary.id]
+
+
+def test_hedge_win_records_the_winners_own_duration_and_the_savings(history):
+    runs = _TimedRuns()
+    run, _, outcome = wait_with_hedging(_client(runs), runs.start(10.0), lambda: runs.start(0.2),
+                                        agent_name=AGENT, policy=HedgePolicy(threshold_seconds=0.3))
+    assert outcome.winner == "hedge"
+    # The hedge ran for ~0.2 s: the 0.3 s spent waiting on the primary is not part of its duration
+    [duration] = history.durations(AGENT)
+    assert 0.15 < duration < 0.45
+    # The primary was running: it still needed at least a typical run (the winner's own duration)
+    assert outcome.estimated_saved_seconds == pytest.approx(duration)
+
+
+def test_failed_hedge_leaves_the_primary_to_win():
+    runs = _TimedRuns()
+    primary = runs.start(1.0)
+    run, _, outcome = wait_with_hedging(_client(runs), primary, lambda: runs.start(0.1, final="failed"),
+                                        agent_name=AGENT, policy=HedgePolicy(threshold_seconds=0.3))
+    assert outcome.winner == "primary"
+    assert run.id == primary.id and run.status == "completed"
+
+
+def test_when_both_runs_fail_the_last_one_is_reported_under_its_own_name():
+    runs = _TimedRuns()
+    primary = runs.start(0.4, final="failed")
+    run, _, outcome = wait_with_hedging(_client(runs), primary, lambda: runs.start(0.5, final="failed"),
+                                        agent_name=AGENT, policy=HedgePolicy(threshold_seconds=0.3))
+    assert outcome.winner == "hedge" and run.id == "run_2" and run.status == "failed"
+    assert [loser.id for loser in outcome.losers] == [primary.id]
+    assert outcome.estimated_saved_seconds == 0.0
+
+
+def test_steps_are_listed_at_most_once_per_interval_and_not_after_the_call():
+    runs = _TimedRuns()
+    watch = _SideEffectWatch(_client(runs), ("html_template_filler",))
+    run = runs.start(5.0, tool_after=0.1)
+    assert not watch.started(run, interval=0.2)
+    assert not watch.started(run, interval=0.2)
+    assert runs.step_lists == 1
+    time.sleep(0.2)
+    assert watch.started(run, interval=0.2)
+    assert watch.started(run, interval=0.2) and watch.started(run, interval=0)
+    assert runs.step_lists == 2
+
+    queued = SimpleNamespace(id="run_queued", thread_id="thread_queued", status="queued")
+    assert not watch.started(queued, interval=0)
+    assert runs.step_lists == 2
+
+
+def test_run_that_started_publishing_is_not_duplicated():
+    runs = _TimedRuns()
+    duplicates = []
+    policy = HedgePolicy(threshold_seconds=0.3, side_effect_tools=("html_template_filler",))
+    run, _, outcome = wait_with_hedging(_client(runs), runs.start(0.8, tool_after=0.1),
+                                        lambda: duplicates.append(1), agent_name=AGENT, policy=policy)
+    assert outcome.skipped_reason == "side_effect_started" and not outcome.hedged
+    assert run.status == "completed"
+    assert duplicates == []
+
+
+def test_racer_that_starts_publishing_settles_the_race():
+    runs = _TimedRuns()
+    primary = runs.start(1.5, tool_after=0.6)
+    policy = HedgePolicy(threshold_seconds=0.3, side_effect_tools=("html_template_filler",))
+    run, _, outcome = wait_with_hedging(_client(runs), primary, lambda: runs.start(10.0),
+                                        agent_name=AGENT, policy=policy)
+    assert outcome.hedged and outcome.winner == "primary"
+    assert run.id == primary.id and run.status == "completed"
+    assert runs.cancelled == ["run_2"]
+
+
+def test_threshold_follows_the_history_once_it_is_long_enough(history):
+    policy = HedgePolicy(threshold_seconds=45, min_history=10)
+    for duration in range(1, 10):
+        history.record(AGENT, float(duration))
+    assert hedge_threshold(AGENT, policy) == 45
+    for duration in range(10, 21):
+        history.record(AGENT, float(duration))
+    assert hedge_threshold(AGENT, policy) == 20.0
@@ -0,0 +1,51 @@
+"""Tests of the shared run_agent helper."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from tools import result_cache
+from tools.fake_agents_client import FakeAgentsClient
+from tools.result_cache import ResultCache
+from tools.run_helper import extract_message_text, extract_url, format_timings, run_agent
+from tools.thread_reaper import ThreadLedger
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Your page: [Open](https://example.com/page.html).", "https://example.com/page.html"),
+    ("Published at https://example.com/site/index.html.", "https://example.com/site/index.html"),
+    ("See **https://example.com/a?b=1**!", "https://example.com/a?b=1"),
+    ("No link here", None),
+    ("", None),
+    (None, None),
+])
+def test_extract_url(text, expected):
+    assert extract_url(text) == expected
+
+
+def test_extract_message_text_joins_text_parts():
+    message = SimpleNamespace(content=[
+        SimpleNamespace(text=SimpleNamespace(value="First")),
+        {"text": {"value": "Second"}},
+        SimpleNamespace(image_file=SimpleNamespace(file_id="file_1")),
+    ])
+    assert extract_message_text(message) == "First\nSecond"
+    assert extract_message_text(SimpleNamespace(content=[])) == "[]"
+
+
+def test_format_timings():
+    assert format_timings({"thread_create": 0.5, "run": 12.345}) == "thread_create 0.50s | run 12.35s"
+
+
+def test_cached_reply_has_no_poll_stats(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "_result_cache", ResultCache(str(tmp_path / "result_cache.db")))
+    client = FakeAgentsClient(time_scale=0)
+    agent = client.create_agent(model="gpt-4", name="cached", instructions="Answer")
+    ledger = ThreadLedger(str(tmp_path / "threads.db"))
+
+    first = run_agent(client, agent, "Hello", ledger=ledger, hedge=False)
+    assert not first.cached and first.poll_stats.polls >= 1
+    # Readers such as the web generator tester must not expect polls for a cache hit
+    second = run_agent(client, agent, "Hello", ledger=ledger, hedge=False)
+    assert second.cached and second.text == first.text
+    assert second.poll_stats is None and second.hedge is None
@@ -0,0 +1,85 @@
+"""Tests of the adaptive run waiter."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from tools import run_poller
+from tools.run_poller import HISTORY_SIZE, PollPolicy, RunDurationHistory, _PollSchedule, wait_for_run
+
+
+class _Runs:
+    """``client.runs`` returning a scripted sequence of statuses, one per poll."""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.gets = 0
+        self.cancelled = False
+
+    def get(self, thread_id, run_id):
+        self.gets += 1
+        status = self.statuses.pop(0) if self.statuses else "in_progress"
+        return SimpleNamespace(id=run_id, thread_id=thread_id, status=status, required_action=None)
+
+    def cancel(self, thread_id, run_id):
+        self.cancelled = True
+        return SimpleNamespace(id=run_id, thread_id=thread_id, status="cancelled", required_action=None)
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    history = RunDurationHistory(str(tmp_path / "run_history.db"))
+    monkeypatch.setattr(run_poller, "_history", history)
+    monkeypatch.setenv("RUN_POLL_INTERVAL_SCALE", "0.01")
+    return history
+
+
+def test_history_is_persisted_and_capped(tmp_path):
+    path = str(tmp_path / "run_history.db")
+    history = RunDurationHistory(path)
+    for duration in range(HISTORY_SIZE + 5):
+        history.record("ag-web-gen", float(duration))
+    durations = RunDurationHistory(path).durations("ag-web-gen")
+    assert len(durations) == HISTORY_SIZE
+    assert durations[-1] == HISTORY_SIZE + 4
+    assert RunDurationHistory(path).durations("ag-card-generator") == []
+
+
+def test_schedule_skips_the_hopeless_polls_then_backs_off_to_the_cap():
+    policy = PollPolicy(initial_interval=1.0, max_interval=4.0, multiplier=2.0, jitter=0.0)
+    schedule = _PollSchedule(policy, [10.0] * 10, scale=1.0)
+    assert schedule.expected == 10.0
+    assert schedule.next_delay(0.0) == pytest.approx(8.0)
+    delays = [schedule.next_delay(elapsed) for elapsed in (12.0, 13.0, 15.0, 19.0, 23.0)]
+    assert delays == [1.0, 2.0, 4.0, 4.0, 4.0]
+    schedule.reset()
+    assert schedule.next_delay(30.0) == 1.0
+
+
+def test_schedule_without_history_polls_from_the_start():
+    schedule = _PollSchedule(PollPolicy(initial_interval=0.5, jitter=0.0), [], scale=2.0)
+    assert schedule.expected is None
+    assert schedule.next_delay(0.0) == 1.0
+
+
+def test_wait_for_run_polls_until_completion_and_records_the_duration(history):
+    runs = _Runs(["queued", "in_progress", "completed"])
+    run = SimpleNamespace(id="run_1", thread_id="thread_1", status="queued", required_action=None)
+
+    final, stats = wait_for_run(SimpleNamespace(runs=runs), run, agent_name="ag-web-gen")
+
+    assert final.status == "completed"
+    assert stats.polls == runs.gets == 3
+    assert history.durations("ag-web-gen") == [stats.elapsed_seconds]
+    assert run_poller.get_poll_counters()["ag-web-gen"]["runs"] >= 1
+
+
+def test_wait_for_run_cancels_after_the_timeout(history):
+    runs = _Runs([])
+    run = SimpleNamespace(id="run_1", thread_id="thread_1", status="in_progress", required_action=None)
+
+    final, stats = wait_for_run(SimpleNamespace(runs=runs), run, agent_name="ag-web-gen", timeout_seconds=0.2)
+
+    assert runs.cancelled
+    assert final.status == "cancelled"
+    assert history.durations("ag-web-gen") == []
@@ -0,0 +1,93 @@
+"""Tests of session recording and replay, and of the benchmark replaying a cassette."""
+
+import os
+import sys
+
+import pytest
+
+from tools.fake_agents_client import FakeAgentsClient
+from tools.orchestration_benchmark import main as benchmark_main
+from tools.run_helper import run_agent
+from tools.session_cassette import (
+    RecordingAgentsClient,
+    ReplayAgentsClient,
+    SessionRecorder,
+    load_cassette,
+    summarize_cassette,
+)
+from tools.thread_reaper import ThreadLedger
+
+RECORDED_RUNS = 3
+
+
+@pytest.fixture(scope="module")
+def cassette_path(tmp_path_factory):
+    """A session of web generator runs recorded from the fake client."""
+    path = str(tmp_path_factory.mktemp("cassettes") / "web_gen.cassette.json")
+    ledger = ThreadLedger(str(tmp_path_factory.mktemp("state") / "threads.db"))
+    recorder = SessionRecorder(path)
+    client = RecordingAgentsClient(FakeAgentsClient(seed=0, time_scale=0.05), recorder)
+    agent = client.create_agent(model="benchmark-model", name="ag-web-gen", instructions="Benchmark agent")
+    for index in range(RECORDED_RUNS):
+        assert run_agent(client, agent, f"Recorded request {index}", ledger=ledger, use_cache=False).completed
+    assert recorder.save() == path
+    return path
+
+
+def test_recorded_runs_keep_their_tool_calls_and_reply(cassette_path):
+    cassette = load_cassette(cassette_path)
+    assert cassette["agents"] and set(cassette["agents"].values()) == {"ag-web-gen"}
+    assert len(cassette["runs"]) == RECORDED_RUNS
+    for run in cassette["runs"]:
+        assert run["status"] == "completed"
+        assert [call["type"] for segment in run["segments"] for call in segment["tool_calls"]] == \
+            ["connected_agent", "openapi"]
+        assert "[Open card](https://fakestorage.blob.core.windows.net/cards/" in run["reply"]
+
+    summary = summarize_cassette(cassette)
+    assert summary["runs"]["ag-web-gen"]["count"] == RECORDED_RUNS
+    assert summary["runs"]["ag-web-gen"]["tool_calls"] == 2
+    assert summary["calls"]["threads.create"]["count"] == RECORDED_RUNS
+
+
+def test_replayed_runs_follow_the_recording(cassette_path, tmp_path):
+    cassette = load_cassette(cassette_path)
+    client = ReplayAgentsClient(cassette, time_scale=0.5, api_latency=False)
+    agent = client.create_agent(model="benchmark-model", name="ag-web-gen", instructions="Benchmark agent")
+    ledger = ThreadLedger(str(tmp_path / "threads.db"))
+
+    replies = [run_agent(client, agent, "Any prompt", ledger=ledger, use_cache=False).text
+               for _ in range(RECORDED_RUNS + 1)]
+
+    recorded_replies = [run["reply"] for run in cassette["runs"]]
+    assert replies == recorded_replies + recorded_replies[:1]
+
+
+def test_replay_refuses_agents_missing_from_the_cassette(cassette_path):
+    client = ReplayAgentsClient(load_cassette(cassette_path), api_latency=False)
+    agent = client.create_agent(model="benchmark-model", name="ag-report-builder")
+    thread = client.threads.create()
+    with pytest.raises(ValueError, match="no replayable run of agent 'ag-report-builder'"):
+        client.runs.create(thread_id=thread.id, agent_id=agent.id)
+
+
+def test_benchmark_replays_the_cassette_within_budget(cassette_path, monkeypatch, capsys):
+    # The benchmark moves the state folder; monkeypatch restores it afterwards
+    monkeypatch.setenv("AGENT_STATE_DIR", os.environ["AGENT_STATE_DIR"])
+    monkeypatch.setattr(sys, "argv", ["orchestration_benchmark.py", "--cassette", cassette_path,
+                                      "--concurrency", "1,10,100", "--requests", "20", "--time-scale", "0.5",
+                                      "--fail-above-ms", "5000"])
+    benchmark_main()
+    output = capsys.readouterr().out
+    assert f"cassette {cassette_path}" in output
+    assert "❌" not in output
+
+
+def test_benchmark_fails_above_the_budget(cassette_path, monkeypatch, capsys):
+    monkeypatch.setenv("AGENT_STATE_DIR", os.environ["AGENT_STATE_DIR"])
+    monkeypatch.setattr(sys, "argv", ["orchestration_benchmark.py", "--cassette", cassette_path,
+                                      "--concurrency", "1", "--requests", "2", "--fail-above-ms", "0"])
+    with pytest.raises(SystemExit) as exit_info:
+        benchmark_main()
+    assert exit_info.value.code == 1
+    assert "p95 overhead above 0 ms at concurrency 1" in capsys.readouterr().out
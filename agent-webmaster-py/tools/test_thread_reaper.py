@@ -0,0 +1,100 @@
+"""Tests of the thread ledger and reaper."""
+
+import sqlite3
+import time
+from contextlib import closing
+
+import pytest
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+
+from tools.thread_reaper import ThreadLedger, _RateLimiter, reap_expired_threads
+
+
+class _Threads:
+    """``client.threads`` whose deletions succeed unless a thread is listed in ``errors``."""
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.deleted = []
+
+    def delete(self, thread_id):
+        if thread_id in self.errors:
+            raise self.errors[thread_id]
+        self.deleted.append(thread_id)
+
+
+class _Client:
+    def __init__(self, errors=None):
+        self.threads = _Threads(errors)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return ThreadLedger(str(tmp_path / "threads.db"))
+
+
+def test_track_is_idempotent(ledger):
+    ledger.track("thread_a", "ag-web-gen")
+    ledger.track("thread_a", "ag-web-gen")
+    assert ledger.summary() == {"tracked": 1, "deleted": 0, "pending": 1, "abandoned": 0}
+
+
+def test_expired_returns_old_threads_oldest_first(ledger):
+    for thread_id in ("thread_a", "thread_b", "thread_c"):
+        ledger.track(thread_id)
+        time.sleep(0.01)
+    assert ledger.expired(3600) == []
+    assert ledger.expired(0) == ["thread_a", "thread_b", "thread_c"]
+    assert ledger.expired(0, limit=2) == ["thread_a", "thread_b"]
+    assert ledger.backlog(0) == 3
+
+
+def test_reap_deletes_expired_threads_and_keeps_failures_for_the_next_pass(ledger):
+    for thread_id in ("thread_ok", "thread_gone", "thread_error"):
+        ledger.track(thread_id)
+    client = _Client({
+        "thread_gone": ResourceNotFoundError("not found"),
+        "thread_error": HttpResponseError("service unavailable"),
+    })
+
+    stats = reap_expired_threads(client, ledger, ttl_seconds=0, max_per_second=0)
+
+    assert client.threads.deleted == ["thread_ok"]
+    assert stats["deleted"] == 2
+    assert stats["failed"] == 1
+    assert stats["backlog"] == 1
+    assert ledger.expired(0) == ["thread_error"]
+    assert ledger.summary() == {"tracked": 3, "deleted": 2, "pending": 1, "abandoned": 0}
+
+
+def test_threads_that_keep_failing_do_not_hold_up_the_batches(ledger):
+    for thread_id in ("thread_stuck", "thread_flaky", "thread_new"):
+        ledger.track(thread_id)
+        time.sleep(0.01)
+    ledger.mark_failed("thread_flaky", "service unavailable")
+    for _ in range(5):
+        ledger.mark_failed("thread_stuck", "forbidden")
+
+    assert ledger.expired(0) == ["thread_new", "thread_flaky"]
+    assert ledger.expired(0, limit=1) == ["thread_new"]
+    assert ledger.expired(0, max_attempts=10) == ["thread_new", "thread_flaky", "thread_stuck"]
+    assert ledger.backlog(0) == 2
+    assert ledger.summary()["abandoned"] == 1
+    assert ledger.summary(max_attempts=1)["abandoned"] == 2
+    assert ledger.summary(max_attempts=10)["abandoned"] == 0
+
+
+def test_a_successful_deletion_is_not_counted_as_a_failed_attempt(ledger):
+    ledger.track("thread_a")
+    ledger.mark_failed("thread_a", "service unavailable")
+    ledger.mark_deleted("thread_a")
+    with closing(sqlite3.connect(ledger.path)) as conn:
+        assert conn.execute("SELECT attempts, last_error FROM threads").fetchone() == (1, None)
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = _RateLimiter(per_second=20)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.wait()
+    assert time.monotonic() - start >= 4 / 20 - 0.01
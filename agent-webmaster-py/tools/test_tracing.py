@@ -0,0 +1,68 @@
+"""Tests of the span tracing and its OTLP/JSON export."""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from tools.tracing import add_span, current_span, load_spans, span, summarize
+
+
+@pytest.fixture
+def export_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "traces.jsonl")
+    monkeypatch.setenv("TRACE_EXPORT_PATH", path)
+    return path
+
+
+def test_spans_cost_nothing_while_tracing_is_off(tmp_path):
+    with span("agent.request", agent="ag-web-gen") as root:
+        root.set_attribute("cached", True)
+        assert current_span() is None
+        assert add_span("run.queue", 1.0, 2.0) is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_nested_spans_are_exported_as_one_trace(export_path):
+    started = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+    with span("agent.request", agent="ag-web-gen") as root:
+        with span("thread.create") as child:
+            assert current_span() is child
+        add_span("run.queue", started, started + timedelta(seconds=2), queued=True)
+        root.set_attribute("polls", 3)
+    assert current_span() is None
+
+    with open(export_path, encoding="utf-8") as f:
+        lines = f.readlines()
+    assert len(lines) == 1
+    exported = json.loads(lines[0])["resourceSpans"][0]
+    assert exported["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "agent-webmaster"}}]
+
+    spans = {item["name"]: item for item in load_spans(export_path)}
+    assert set(spans) == {"agent.request", "thread.create", "run.queue"}
+    assert len({item["traceId"] for item in spans.values()}) == 1
+    assert "parentSpanId" not in spans["agent.request"]
+    assert spans["thread.create"]["parentSpanId"] == spans["agent.request"]["spanId"]
+    assert spans["run.queue"]["parentSpanId"] == spans["agent.request"]["spanId"]
+    assert {"key": "polls", "value": {"intValue": "3"}} in spans["agent.request"]["attributes"]
+    assert {"key": "queued", "value": {"boolValue": True}} in spans["run.queue"]["attributes"]
+    assert summarize(export_path)["run.queue"]["total"] == pytest.approx(2.0)
+
+
+def test_failed_span_records_the_error(export_path):
+    with pytest.raises(ValueError):
+        with span("agent.request"):
+            raise ValueError("boom")
+    exported = load_spans(export_path)[0]
+    assert exported["status"] == {"code": 2, "message": "ValueError: boom"}
+
+
+def test_summary_aggregates_by_span_name(export_path):
+    for seconds in (1, 2, 3):
+        with span("agent.request") as root:
+            add_span("run.step", 0, seconds, parent=root)
+    summary = summarize(export_path)
+    assert summary["run.step"]["count"] == 3
+    assert summary["run.step"]["total"] == pytest.approx(6.0)
+    assert summary["run.step"]["mean"] == pytest.approx(2.0)
+    assert summary["run.step"]["p95"] == pytest.approx(3.0)
@@ -0,0 +1,112 @@
+"""Tests of the token usage ledger."""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from tools import usage_ledger
+from tools.usage_ledger import UsageLedger, record_run_in_background
+
+STARTED = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _usage(prompt, completion):
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion, total_tokens=prompt + completion)
+
+
+def _run(run_id, thread_id, seconds, usage, status="completed"):
+    return SimpleNamespace(id=run_id, thread_id=thread_id, model="gpt-4", status=status, usage=usage,
+                           started_at=STARTED, completed_at=STARTED + timedelta(seconds=seconds))
+
+
+def _step(step_id, step_type, usage, tool_calls=None):
+    return SimpleNamespace(id=step_id, type=step_type, usage=usage, created_at=STARTED,
+                           completed_at=STARTED + timedelta(seconds=1),
+                           step_details=SimpleNamespace(tool_calls=tool_calls))
+
+
+class _Client:
+    """Client exposing the steps of a web generator run whose card generator sub-run is readable."""
+
+    def __init__(self, sub_run_exposed=True):
+        connected = {"name": "card_generator"}
+        if sub_run_exposed:
+            connected.update(thread_id="thread_sub", run_id="run_sub")
+        self.steps = [
+            _step("step_1", "tool_calls", _usage(100, 20), [{"id": "call_1", "type": "connected_agent",
+                                                             "connected_agent": connected}]),
+            _step("step_2", "tool_calls", _usage(150, 30), [{"type": "openapi",
+                                                             "openapi": {"name": "html_template_filler_fill"}}]),
+            _step("step_3", "message_creation", _usage(200, 50)),
+        ]
+        self.run_steps = SimpleNamespace(list=lambda thread_id, run_id: self.steps)
+        self.runs = SimpleNamespace(get=lambda thread_id, run_id: _run("run_sub", "thread_sub", 2, _usage(80, 40)))
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return UsageLedger(str(tmp_path / "usage.db"))
+
+
+def test_run_steps_and_connected_sub_run_are_recorded_under_the_request(ledger):
+    run = _run("run_1", "thread_1", 10, _usage(450, 100))
+    ledger.record_run(_Client(), run, "ag-web-gen", request_id="request_1", artifact="https://example.com/card")
+
+    daily = {row["agent_name"]: row for row in ledger.daily_summary()}
+    assert daily["ag-web-gen"]["total_tokens"] == 550
+    assert daily["ag-web-gen"]["tokens_per_second"] == pytest.approx(55.0)
+    assert daily["ag-web-gen"]["tokens_per_artifact"] == 550
+    assert daily["ag-card-generator"]["total_tokens"] == 120
+    assert daily["ag-card-generator"]["artifacts"] == 0
+
+    top = ledger.top_requests()
+    assert top == [{"request_id": "request_1", "agents": top[0]["agents"], "runs": 2, "total_tokens": 670,
+                    "artifact": "https://example.com/card"}]
+    assert set(top[0]["agents"].split(",")) == {"ag-web-gen", "ag-card-generator"}
+
+    steps = {(row["step_type"], row["tool_name"]): row for row in ledger.step_breakdown()}
+    assert steps[("tool_calls", "card_generator")]["total_tokens"] == 120
+    assert steps[("tool_calls", "html_template_filler_fill")]["total_tokens"] == 180
+    assert steps[("message_creation", None)]["seconds"] == pytest.approx(1.0)
+
+
+def test_connected_call_without_a_sub_run_is_kept_without_tokens(ledger):
+    run = _run("run_1", "thread_1", 10, _usage(450, 100))
+    ledger.record_run(_Client(sub_run_exposed=False), run, "ag-web-gen", request_id="request_1")
+
+    assert [row["agent_name"] for row in ledger.daily_summary()] == ["ag-web-gen"]
+    steps = {(row["agent_name"], row["step_type"]): row for row in ledger.step_breakdown()}
+    assert steps[("ag-card-generator", "connected_agent")] == {
+        "agent_name": "ag-card-generator", "step_type": "connected_agent", "tool_name": "card_generator",
+        "steps": 1, "total_tokens": 0, "seconds": 1.0,
+    }
+
+
+def test_recording_a_run_again_replaces_it(ledger):
+    run = _run("run_1", "thread_1", 10, _usage(450, 100))
+    ledger.record_run(_Client(), run, "ag-web-gen", request_id="request_1")
+    ledger.record_run(_Client(), run, "ag-web-gen", request_id="request_1")
+    assert ledger.top_requests()[0]["runs"] == 2
+
+
+def test_background_recording_never_raises(ledger, monkeypatch):
+    monkeypatch.setattr(usage_ledger, "_usage_ledger", ledger)
+    broken = SimpleNamespace(run_steps=SimpleNamespace(list=lambda thread_id, run_id: 1 / 0))
+    record_run_in_background(broken, _run("run_0", "thread_0", 1, None), "ag-web-gen")
+    record_run_in_background(_Client(), _run("run_1", "thread_1", 10, _usage(450, 100)), "ag-web-gen",
+                             request_id="request_1")
+    usage_ledger._recorder.submit(lambda: None).result()
+    assert [row["request_id"] for row in ledger.top_requests()] == ["request_1"]
+
+
+@pytest.mark.parametrize("refresh, total_tokens", [(True, 120), (False, 0)])
+def test_superseded_runs_are_fetched_again_before_recording(ledger, monkeypatch, refresh, total_tokens):
+    monkeypatch.setattr(usage_ledger, "_usage_ledger", ledger)
+    finished = _run("run_2", "thread_1", 2, _usage(80, 40), status="cancelled")
+    client = SimpleNamespace(run_steps=SimpleNamespace(list=lambda thread_id, run_id: []),
+                             runs=SimpleNamespace(get=lambda thread_id, run_id: finished))
+    running = _run("run_2", "thread_1", 1, None, status="in_progress")
+    record_run_in_background(client, running, "ag-web-gen", request_id="request_1", refresh=refresh)
+    usage_ledger._recorder.submit(lambda: None).result()
+    assert ledger.top_requests()[0]["total_tokens"] == total_tokens
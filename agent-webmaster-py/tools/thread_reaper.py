@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Thread ledger and reaper for agent conversations.
+
+Every agent interaction creates a thread in the Foundry project and nothing ever deletes
+it. The entry points record each thread they create in a local SQLite ledger
+(``ThreadLedger.track``) and the reaper deletes the ones older than a TTL, concurrently
+and under a requests-per-second budget so the cleanup never competes with live traffic.
+Failed deletions are retried on later passes, threads with the fewest failures first;
+after ``THREAD_REAPER_MAX_ATTEMPTS`` failures (5) a thread is given up on so it cannot
+hold up the batches.
+
+Usage:
+    python thread_reaper.py --status
+    python thread_reaper.py --ttl-minutes 60 --workers 8 --rate 5
+    python thread_reaper.py --loop --interval 300
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Any, Dict, List, Optional
+
+from azure.core.exceptions import ResourceNotFoundError
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.local_state import get_state_path
+
+DEFAULT_TTL_MINUTES = float(os.environ.get("THREAD_TTL_MINUTES", "60"))
+DEFAULT_WORKERS = 8
+DEFAULT_DELETES_PER_SECOND = 5.0
+# Threads whose deletion failed this many times (403, wrong project...) are left out of the batches
+DEFAULT_MAX_ATTEMPTS = int(os.environ.get("THREAD_REAPER_MAX_ATTEMPTS", "5"))
+
+
+class ThreadLedger:
+    """
+    SQLite ledger of the threads created by this application.
+
+    The database is opened per call so the ledger can be shared by the Streamlit app,
+    the console testers and the reaper process at the same time.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get("THREAD_LEDGER_PATH") or get_state_path("threads.db")
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS threads (
+                       thread_id  TEXT PRIMARY KEY,
+                       agent_name TEXT,
+                       created_at REAL NOT NULL,
+                       deleted_at REAL,
+                       attempts   INTEGER NOT NULL DEFAULT 0,
+                       last_error TEXT
+                   )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_threads_pending ON threads (deleted_at, created_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def track(self, thread_id: str, agent_name: Optional[str] = None) -> None:
+        """
+        Record a newly created thread.
+
+        Args:
+            thread_id: ID of the thread returned by ``client.threads.create()``
+            agent_name: Name of the agent that will run on the thread
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO threads (thread_id, agent_name, created_at) VALUES (?, ?, ?)",
+                (thread_id, agent_name, time.time()),
+            )
+
+    def expired(self, ttl_seconds: float, limit: int = 500, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> List[str]:
+        """
+        Get the IDs of threads older than the TTL that have not been deleted yet.
+
+        Args:
+            ttl_seconds: Age after which a thread is considered abandoned
+            limit: Maximum number of IDs to return
+            max_attempts: Failed deletions after which a thread is no longer returned
+
+        Returns:
+            List of thread IDs, the fewest failed attempts first, then oldest first
+        """
+        cutoff = time.time() - ttl_seconds
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                "SELECT thread_id FROM threads WHERE deleted_at IS NULL AND created_at < ? AND attempts < ? "
+                "ORDER BY attempts, created_at LIMIT ?",
+                (cutoff, max_attempts, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def backlog(self, ttl_seconds: float, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+        """Count the expired threads still waiting to be deleted (those given up on excluded)."""
+        cutoff = time.time() - ttl_seconds
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM threads WHERE deleted_at IS NULL AND created_at < ? AND attempts < ?",
+                (cutoff, max_attempts),
+            ).fetchone()[0]
+
+    def mark_deleted(self, thread_id: str) -> None:
+        """Flag a thread as deleted."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE threads SET deleted_at = ?, last_error = NULL WHERE thread_id = ?",
+                (time.time(), thread_id),
+            )
+
+    def mark_failed(self, thread_id: str, error: str) -> None:
+        """Record a failed deletion attempt so it is retried on the next pass."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE threads SET attempts = attempts + 1, last_error = ? WHERE thread_id = ?",
+                (error[:500], thread_id),
+            )
+
+    def summary(self, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> Dict[str, int]:
+        """
+        Get the ledger totals.
+
+        Args:
+            max_attempts: Failed deletions after which a pending thread counts as given up
+
+        Returns:
+            Dictionary with tracked, deleted and pending thread counts, and the pending
+            threads given up on after ``max_attempts`` failed deletions
+        """
+        with closing(self._connect()) as conn, conn:
+            tracked, deleted, abandoned = conn.execute(
+                "SELECT COUNT(*), COUNT(deleted_at), COUNT(CASE WHEN deleted_at IS NULL AND attempts >= ? THEN 1 END) "
+                "FROM threads",
+                (max_attempts,),
+            ).fetchone()
+        return {"tracked": tracked, "deleted": deleted, "pending": tracked - deleted, "abandoned": abandoned}
+
+
+class _RateLimiter:
+    """Spaces calls evenly so that at most ``per_second`` start each second."""
+
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def reap_expired_threads(
+    client,
+    ledger: Optional[ThreadLedger] = None,
+    ttl_seconds: float = DEFAULT_TTL_MINUTES * 60,
+    max_workers: int = DEFAULT_WORKERS,
+    max_per_second: float = DEFAULT_DELETES_PER_SECOND,
+    batch_size: int = 500,
+) -> Dict[str, Any]:
+    """
+    Delete one batch of expired threads.
+
+    Args:
+        client: AgentsClient used to delete the threads
+        ledger: Ledger to read from (defaults to the shared ledger)
+        ttl_seconds: Age after which a thread is deleted
+        max_workers: Number of concurrent delete calls
+        max_per_second: Upper bound of delete calls started per second
+        batch_size: Maximum number of threads handled in this pass
+
+    Returns:
+        Dictionary with deleted, failed, elapsed_seconds, deletions_per_second and backlog
+    """
+    ledger = ledger or ThreadLedger()
+    thread_ids = ledger.expired(ttl_seconds, limit=batch_size)
+    limiter = _RateLimiter(max_per_second)
+    start = time.perf_counter()
+
+    def _delete(thread_id: str) -> bool:
+        limiter.wait()
+        try:
+            client.threads.delete(thread_id)
+        except ResourceNotFoundError:
+            pass  # Already gone: nothing left to reap
+        except Exception as e:
+            ledger.mark_failed(thread_id, str(e))
+            return False
+        ledger.mark_deleted(thread_id)
+        return True
+
+    deleted = 0
+    if thread_ids:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            deleted = sum(executor.map(_delete, thread_ids))
+
+    elapsed = time.perf_counter() - start
+    return {
+        "deleted": deleted,
+        "failed": len(thread_ids) - deleted,
+        "elapsed_seconds": elapsed,
+        "deletions_per_second": deleted / elapsed if elapsed > 0 else 0.0,
+        "backlog": ledger.backlog(ttl_seconds),
+    }
+
+
+class ThreadReaper(threading.Thread):
+    """
+    Daemon thread that reaps expired threads periodically.
+
+    The statistics of the last pass are kept in ``last_stats`` for status displays.
+    """
+
+    def __init__(
+        self,
+        client,
+        ledger: Optional[ThreadLedger] = None,
+        interval_seconds: float = 300,
+        **reap_options: Any,
+    ):
+        super().__init__(name="thread-reaper", daemon=True)
+        self.client = client
+        self.ledger = ledger or ThreadLedger()
+        self.interval_seconds = interval_seconds
+        self.reap_options = reap_options
+        self.last_stats: Optional[Dict[str, Any]] = None
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.last_stats = reap_expired_threads(self.client, self.ledger, **self.reap_options)
+                # Keep draining without waiting while a full batch was deleted
+                if self.last_stats["deleted"] and self.last_stats["backlog"]:
+                    continue
+            except Exception as e:
+                self.last_stats = {"error": str(e)}
+            self._stop_event.wait(self.interval_seconds)
+
+    def stop(self) -> None:
+        """Ask the reaper to finish after the current pass."""
+        self._stop_event.set()
+
+
+_background_reaper = None
+
+
+def start_background_reaper(client, **options: Any) -> ThreadReaper:
+    """
+    Start the process-wide background reaper once and return it.
+
+    Args:
+        client: AgentsClient used to delete the threads
+        **options: Arguments forwarded to ``ThreadReaper``
+
+    Returns:
+        The running ThreadReaper
+    """
+    global _background_reaper
+    if _background_reaper is None or not _background_reaper.is_alive():
+        _background_reaper = ThreadReaper(client, **options)
+        _background_reaper.start()
+    return _background_reaper
+
+
+def _get_agents_client():
+    """Create an AgentsClient from the .env configuration."""
+    from azure.ai.agents import AgentsClient
+    from azure.identity import DefaultAzureCredential
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return AgentsClient(
+        endpoint=os.environ.get("PROJECT_ENDPOINT"),
+        credential=DefaultAzureCredential()
+    )
+
+
+def _print_stats(stats: Dict[str, Any]) -> None:
+    print(
+        f"🧹 Deleted {stats['deleted']} threads ({stats['failed']} failed) "
+        f"in {stats['elapsed_seconds']:.1f}s - {stats['deletions_per_second']:.2f} deletions/s, "
+        f"backlog {stats['backlog']}"
+    )
+
+
+def main():
+    """Command line entry point for the reaper."""
+    parser = argparse.ArgumentParser(description="Delete abandoned agent threads")
+    parser.add_argument("--ttl-minutes", type=float, default=DEFAULT_TTL_MINUTES,
+                        help="Delete threads older than this many minutes")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Concurrent delete calls")
+    parser.add_argument("--rate", type=float, default=DEFAULT_DELETES_PER_SECOND,
+                        help="Maximum delete calls per second")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="Maximum threads deleted per pass")
+    parser.add_argument("--loop", action="store_true",
+                        help="Keep reaping until interrupted")
+    parser.add_argument("--interval", type=float, default=300,
+                        help="Seconds between passes when looping")
+    parser.add_argument("--status", action="store_true",
+                        help="Only show the ledger totals")
+    parser.add_argument("--ledger", help="Path of the ledger database")
+    args = parser.parse_args()
+
+    ledger = ThreadLedger(args.ledger)
+    ttl_seconds = args.ttl_minutes * 60
+    if args.status:
+        summary = ledger.summary()
+        print(f"📒 Tracked: {summary['tracked']}  Deleted: {summary['deleted']}  "
+              f"Pending: {summary['pending']}  Expired backlog: {ledger.backlog(ttl_seconds)}  "
+              f"Given up: {summary['abandoned']}")
+        return
+
+    client = _get_agents_client()
+    try:
+        while True:
+            stats = reap_expired_threads(
+                client,
+                ledger,
+                ttl_seconds=ttl_seconds,
+                max_workers=args.workers,
+                max_per_second=args.rate,
+                batch_size=args.batch_size,
+            )
+            _print_stats(stats)
+            if stats["deleted"] and stats["backlog"]:
+                continue
+            if not args.loop:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\n👋 Reaper stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Lightweight tracing of agent interactions, exported as OpenTelemetry JSON.
+
+``span(name, **attributes)`` times a block and nests under the span that is current in
+the calling context. When a root span ends, its whole trace is appended as one line of
+OTLP/JSON (an ``ExportTraceServiceRequest``, the format written by the OpenTelemetry
+collector's file exporter) to ``TRACE_EXPORT_PATH``. Tracing is off, and ``span`` costs
+nothing, while that variable is unset.
+
+Phases measured by the service rather than locally (the run's queue time, each run step
+and its tool calls) are added from the run and run-step timestamps with ``add_span``.
+
+Usage:
+    TRACE_EXPORT_PATH=.cache/traces.jsonl python agents/ag_web_gen/ag_web_gen_tester.py
+    python tools/tracing.py .cache/traces.jsonl
+"""
+
+import argparse
+import contextvars
+import json
+import os
+import secrets
+import statistics
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+SERVICE_NAME = "agent-webmaster"
+_SPAN_KIND_INTERNAL = 1
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+
+@dataclass
+class Span:
+    """One timed operation of a trace."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_seconds(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+
+class _NoopSpan:
+    """Stand-in yielded by ``span`` while tracing is disabled."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+_open_traces: Dict[str, List[Span]] = defaultdict(list)
+_traces_lock = threading.Lock()
+
+
+def tracing_enabled() -> bool:
+    """Check whether spans are recorded (``TRACE_EXPORT_PATH`` is set)."""
+    return bool(os.environ.get("TRACE_EXPORT_PATH"))
+
+
+def current_span() -> Optional[Span]:
+    """Get the span that is current in the calling context."""
+    return _current_span.get()
+
+
+def _finish(finished: Span) -> None:
+    with _traces_lock:
+        _open_traces[finished.trace_id].append(finished)
+        if finished.parent_id is not None:
+            return
+        spans = _open_traces.pop(finished.trace_id)
+    export_spans(spans)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    Time a block as a span nested under the current span.
+
+    Args:
+        name: Span name, dotted by component (e.g. ``thread.create``)
+        **attributes: Span attributes
+
+    Yields:
+        The Span, so the block can add attributes once they are known
+    """
+    if not tracing_enabled():
+        yield _NOOP_SPAN
+        return
+    parent = _current_span.get()
+    new_span = Span(
+        name=name,
+        trace_id=parent.trace_id if parent else secrets.token_hex(16),
+        span_id=secrets.token_hex(8),
+        parent_id=parent.span_id if parent else None,
+        start_ns=time.time_ns(),
+        attributes=dict(attributes),
+    )
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        new_span.end_ns = time.time_ns()
+        _finish(new_span)
+
+
+def _to_ns(value: Any) -> Optional[int]:
+    """Convert an SDK timestamp (datetime or epoch seconds) to epoch nanoseconds."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1e9)
+    return int(float(value) * 1e9)
+
+
+def add_span(
+    name: str,
+    start: Any,
+    end: Any,
+    parent: Optional[Span] = None,
+    error: Optional[str] = None,
+    **attributes: Any,
+) -> Optional[Span]:
+    """
+    Record an already finished span from service timestamps.
+
+    Args:
+        name: Span name
+        start: Start time (datetime or epoch seconds)
+        end: End time (datetime or epoch seconds); the span is skipped without one
+        parent: Parent span (defaults to the current span)
+        error: Error description when the operation failed
+        **attributes: Span attributes
+
+    Returns:
+        The recorded Span, or None when tracing is off or a timestamp is missing
+    """
+    parent = parent or _current_span.get()
+    start_ns, end_ns = _to_ns(start), _to_ns(end)
+    if not tracing_enabled() or parent is None or start_ns is None or end_ns is None:
+        return None
+    recorded = Span(
+        name=name,
+        trace_id=parent.trace_id,
+        span_id=secrets.token_hex(8),
+        parent_id=parent.span_id,
+        start_ns=start_ns,
+        end_ns=max(start_ns, end_ns),
+        attributes=dict(attributes),
+        error=error,
+    )
+    _finish(recorded)
+    return recorded
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def _otlp_span(recorded: Span) -> Dict[str, Any]:
+    otlp = {
+        "traceId": recorded.trace_id,
+        "spanId": recorded.span_id,
+        "name": recorded.name,
+        "kind": _SPAN_KIND_INTERNAL,
+        "startTimeUnixNano": str(recorded.start_ns),
+        "endTimeUnixNano": str(recorded.end_ns),
+        "attributes": _otlp_attributes(recorded.attributes),
+        "status": {"code": _STATUS_ERROR, "message": recorded.error} if recorded.error else {"code": _STATUS_OK},
+    }
+    if recorded.parent_id:
+        otlp["parentSpanId"] = recorded.parent_id
+    return otlp
+
+
+_export_lock = threading.Lock()
+
+
+def export_spans(spans: List[Span], path: Optional[str] = None) -> None:
+    """
+    Append a finished trace to the export file as one OTLP/JSON line.
+
+    Args:
+        spans: Spans of the trace
+        path: Export file (defaults to ``TRACE_EXPORT_PATH``)
+    """
+    path = path or os.environ.get("TRACE_EXPORT_PATH")
+    if not path or not spans:
+        return
+    request = {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{
+                "scope": {"name": "agent-webmaster.tracing"},
+                "spans": [_otlp_span(recorded) for recorded in sorted(spans, key=lambda s: s.start_ns)],
+            }],
+        }]
+    }
+    line = json.dumps(request, separators=(",", ":"))
+    with _export_lock:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    """Read every span of an OTLP/JSON lines export file."""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource_spans in json.loads(line).get("resourceSpans", []):
+                for scope_spans in resource_spans.get("scopeSpans", []):
+                    spans.extend(scope_spans.get("spans", []))
+    return spans
+
+
+def summarize(path: str) -> Dict[str, Dict[str, float]]:
+    """
+    Aggregate the span durations of an export file by span name.
+
+    Returns:
+        Dictionary keyed by span name with count, total, mean and p95 seconds
+    """
+    durations: Dict[str, List[float]] = defaultdict(list)
+    for exported in load_spans(path):
+        seconds = (int(exported["endTimeUnixNano"]) - int(exported["startTimeUnixNano"])) / 1e9
+        durations[exported["name"]].append(seconds)
+    summary = {}
+    for name, values in durations.items():
+        ordered = sorted(values)
+        summary[name] = {
+            "count": len(values),
+            "total": sum(values),
+            "mean": statistics.mean(values),
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        }
+    return summary
+
+
+def main():
+    """Command line entry point summarizing an export file."""
+    parser = argparse.ArgumentParser(description="Summarize exported agent trace spans")
+    parser.add_argument("path", nargs="?", default=os.environ.get("TRACE_EXPORT_PATH"),
+                        help="OTLP/JSON lines file (defaults to TRACE_EXPORT_PATH)")
+    args = parser.parse_args()
+    if not args.path or not os.path.exists(args.path):
+        print("❌ No trace export file found. Set TRACE_EXPORT_PATH or pass a path.")
+        return
+
+    summary = summarize(args.path)
+    print(f"{'span':<40} {'count':>6} {'total s':>9} {'mean s':>8} {'p95 s':>8}")
+    for name, stats in sorted(summary.items(), key=lambda item: -item[1]["total"]):
+        print(f"{name:<40} {stats['count']:>6} {stats['total']:>9.2f} {stats['mean']:>8.3f} {stats['p95']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
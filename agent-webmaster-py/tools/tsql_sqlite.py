@@ -0,0 +1,425 @@
+"""
+Run the project's T-SQL against SQLite.
+
+The schema and seed scripts in ``misc/`` target Azure SQL, and the report builder's
+queries are written in T-SQL. ``translate`` rewrites the constructs SQLite does not
+understand and ``connect`` registers the T-SQL functions the queries commonly use, so
+a local SQLite copy of the database answers the same statements:
+
+- comments, ``GO`` batch separators and ``SET ...`` session statements are dropped, and
+  so are trigger definitions (they only maintain ``UpdatedAt``)
+- ``dbo.`` / ``[dbo].`` prefixes are removed, ``N'...'`` literals lose their ``N``
+- ``INT IDENTITY(1,1) PRIMARY KEY`` becomes ``INTEGER PRIMARY KEY``, ``(MAX)`` lengths
+  are dropped and ``DEFAULT SYSDATETIME()`` becomes ``DEFAULT CURRENT_TIMESTAMP``
+- computed columns (``x AS (expr) PERSISTED``) become stored generated columns
+- ``SELECT TOP (n)`` in the outer query becomes ``LIMIT n``
+- ``CAST``/``CONVERT`` to date, datetime and number types map to SQLite's date
+  functions and affinities, ``LEFT``/``RIGHT`` to substrings and ``ISNULL`` to ``ifnull``
+- ``LEN``, ``YEAR``, ``MONTH``, ``DAY``, ``DATEPART``, ``DATENAME``,
+  ``DATEADD``, ``DATEDIFF``, ``EOMONTH``, ``FORMAT``, ``GETDATE`` and ``SYSDATETIME``
+  are provided as functions
+
+This is a pragmatic translation for local benchmarking, not a T-SQL parser:
+statements it cannot map fail the way a bad query fails on the real database.
+"""
+
+import calendar
+import os
+import re
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional
+
+MISC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "misc")
+DEFAULT_SCRIPTS = ("db_structure.sql", "tech_sample_seed.sql")
+
+_GO_PATTERN = re.compile(r"^\s*GO\s*;?\s*$", re.IGNORECASE | re.MULTILINE)
+_SET_PATTERN = re.compile(r"^\s*SET\s+(NOCOUNT|IDENTITY_INSERT|ANSI_\w+|QUOTED_IDENTIFIER|XACT_ABORT)\b[^;\n]*;?",
+                          re.IGNORECASE | re.MULTILINE)
+_TRIGGER_PATTERN = re.compile(r"^\s*CREATE\s+(OR\s+ALTER\s+)?TRIGGER\b", re.IGNORECASE)
+_SCHEMA_PATTERN = re.compile(r"(\[dbo\]|\bdbo)\.", re.IGNORECASE)
+_UNICODE_LITERAL_PATTERN = re.compile(r"\bN'")
+_IDENTITY_PATTERN = re.compile(r"\b(?:BIG|SMALL|TINY)?INT\s+IDENTITY\s*\(\s*\d+\s*,\s*\d+\s*\)", re.IGNORECASE)
+_MAX_LENGTH_PATTERN = re.compile(r"\(\s*MAX\s*\)", re.IGNORECASE)
+_DEFAULT_NOW_PATTERN = re.compile(
+    r"DEFAULT\s+(\(\s*)?(SYSDATETIME|GETDATE|GETUTCDATE|SYSUTCDATETIME)\s*\(\s*\)(?(1)\s*\))", re.IGNORECASE
+)
+_COMPUTED_COLUMN_PATTERN = re.compile(r"^(\s*\[?\w+\]?\s+)AS\s+(.+?)\s+PERSISTED\s*(,?)\s*$",
+                                      re.IGNORECASE | re.MULTILINE)
+_TOP_PATTERN = re.compile(r"^(\s*SELECT\s+(?:DISTINCT\s+)?)TOP\s*\(?\s*(\d+)\s*\)?\s+", re.IGNORECASE)
+_CAST_PATTERN = re.compile(r"\b(CAST|CONVERT)\s*\(", re.IGNORECASE)
+_LEFT_RIGHT_PATTERN = re.compile(r"\b(LEFT|RIGHT)\s*\(", re.IGNORECASE)
+_DATE_PART_ARGUMENT_PATTERN = re.compile(r"\b(DATEPART|DATENAME|DATEADD|DATEDIFF)\s*\(\s*(\w+)\s*,", re.IGNORECASE)
+_ISNULL_PATTERN = re.compile(r"\bISNULL\s*\(", re.IGNORECASE)  # ISNULL is an operator in SQLite
+
+
+def split_batches(script: str) -> List[str]:
+    """Split a T-SQL script on its ``GO`` separators."""
+    return [batch for batch in _GO_PATTERN.split(script) if batch.strip()]
+
+
+def strip_comments(sql: str) -> str:
+    """Remove ``--`` and ``/* */`` comments outside string literals."""
+    output, index, quote = [], 0, None
+    while index < len(sql):
+        char = sql[index]
+        if quote:
+            output.append(char)
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+            output.append(char)
+        elif sql.startswith("--", index):
+            end = sql.find("\n", index)
+            index = len(sql) if end < 0 else end
+            continue
+        elif sql.startswith("/*", index):
+            end = sql.find("*/", index + 2)
+            index = len(sql) if end < 0 else end + 2
+            continue
+        else:
+            output.append(char)
+        index += 1
+    return "".join(output)
+
+
+def _matching_paren(text: str, open_index: int) -> int:
+    """Index of the parenthesis closing the one at ``open_index`` (quotes aware)."""
+    depth, quote = 0, None
+    for index in range(open_index, len(text)):
+        char = text[index]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return index
+    return -1
+
+
+def _split_top_level(text: str, separator: str) -> List[str]:
+    """Split on a separator (case-insensitive) outside parentheses and quotes."""
+    parts, depth, quote, start = [], 0, None, 0
+    upper, target = text.upper(), separator.upper()
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0 and upper.startswith(target, index):
+            parts.append(text[start:index])
+            start = index = index + len(target)
+            continue
+        index += 1
+    parts.append(text[start:])
+    return parts
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split translated SQL into its statements (``;`` outside quotes and parentheses)."""
+    return [statement.strip() for statement in _split_top_level(sql, ";") if statement.strip()]
+
+
+def _cast_expression(expression: str, type_name: str) -> str:
+    base = type_name.strip().split("(")[0].strip().upper()
+    if base == "DATE":
+        return f"date({expression})"
+    if base in ("DATETIME", "DATETIME2", "SMALLDATETIME", "DATETIMEOFFSET"):
+        return f"datetime({expression})"
+    if base in ("INT", "BIGINT", "SMALLINT", "TINYINT", "BIT"):
+        return f"CAST({expression} AS INTEGER)"
+    if base in ("DECIMAL", "NUMERIC", "FLOAT", "REAL", "MONEY", "SMALLMONEY"):
+        return f"CAST({expression} AS REAL)"
+    return f"CAST({expression} AS TEXT)"
+
+
+def _rewrite_calls(sql: str, pattern: re.Pattern, rewrite) -> str:
+    """Rewrite every call matched by ``pattern`` (innermost arguments first)."""
+    output, position = [], 0
+    while True:
+        match = pattern.search(sql, position)
+        if match is None:
+            output.append(sql[position:])
+            return "".join(output)
+        open_index = match.end() - 1
+        close_index = _matching_paren(sql, open_index)
+        if close_index < 0:
+            output.append(sql[position:])
+            return "".join(output)
+        arguments = _rewrite_calls(sql[open_index + 1:close_index], pattern, rewrite)
+        output.append(sql[position:match.start()])
+        output.append(rewrite(match.group(1).upper(), arguments))
+        position = close_index + 1
+
+
+def _rewrite_cast(function: str, arguments: str) -> str:
+    if function == "CAST":
+        parts = _split_top_level(arguments, " AS ")
+        if len(parts) != 2:
+            return f"CAST({arguments})"
+        return _cast_expression(parts[0].strip(), parts[1])
+    parts = _split_top_level(arguments, ",")
+    if len(parts) < 2:
+        return f"CONVERT({arguments})"
+    return _cast_expression(parts[1].strip(), parts[0])
+
+
+def _rewrite_left_right(function: str, arguments: str) -> str:
+    parts = _split_top_level(arguments, ",")
+    if len(parts) != 2:
+        return f"{function}({arguments})"
+    text, length = parts[0].strip(), parts[1].strip()
+    if function == "LEFT":
+        return f"substr({text}, 1, {length})"
+    return f"substr({text}, -({length}))"
+
+
+def _move_top_to_limit(statement: str) -> str:
+    match = _TOP_PATTERN.match(statement)
+    if match is None:
+        return statement
+    body = match.group(1) + statement[match.end():]
+    stripped = body.rstrip().rstrip(";").rstrip()
+    return f"{stripped}\nLIMIT {match.group(2)}"
+
+
+def translate(sql: str) -> str:
+    """
+    Translate a T-SQL script or query to SQLite.
+
+    Args:
+        sql: T-SQL text (a script with ``GO`` batches or a single query)
+
+    Returns:
+        SQLite text, statements separated by ``;``
+    """
+    batches = []
+    for batch in split_batches(strip_comments(sql)):
+        if _TRIGGER_PATTERN.match(batch):
+            continue
+        batch = _SET_PATTERN.sub("", batch)
+        batch = _SCHEMA_PATTERN.sub("", batch)
+        batch = _UNICODE_LITERAL_PATTERN.sub("'", batch)
+        batch = _IDENTITY_PATTERN.sub("INTEGER", batch)
+        batch = _MAX_LENGTH_PATTERN.sub("", batch)
+        batch = _DEFAULT_NOW_PATTERN.sub("DEFAULT CURRENT_TIMESTAMP", batch)
+        batch = _COMPUTED_COLUMN_PATTERN.sub(lambda m: f"{m.group(1)}GENERATED ALWAYS AS ({m.group(2)}) STORED{m.group(3)}",
+                                             batch)
+        batch = _rewrite_calls(batch, _CAST_PATTERN, _rewrite_cast)
+        batch = _rewrite_calls(batch, _LEFT_RIGHT_PATTERN, _rewrite_left_right)
+        batch = _DATE_PART_ARGUMENT_PATTERN.sub(lambda m: f"{m.group(1)}('{m.group(2)}',", batch)
+        batch = _ISNULL_PATTERN.sub("ifnull(", batch)
+        statements = [_move_top_to_limit(statement) for statement in _split_top_level(batch, ";")]
+        batches.append(";\n".join(statement for statement in statements if statement.strip()))
+    return ";\n".join(batches)
+
+
+# T-SQL functions
+
+def _parse_datetime(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
+    text = str(value).strip().replace(" ", "T", 1)
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return None
+
+
+_DATE_PARTS = {
+    "year": "year", "yy": "year", "yyyy": "year",
+    "quarter": "quarter", "qq": "quarter", "q": "quarter",
+    "month": "month", "mm": "month", "m": "month",
+    "dayofyear": "dayofyear", "dy": "dayofyear", "y": "dayofyear",
+    "day": "day", "dd": "day", "d": "day",
+    "week": "week", "wk": "week", "ww": "week",
+    "weekday": "weekday", "dw": "weekday",
+    "hour": "hour", "hh": "hour",
+    "minute": "minute", "mi": "minute", "n": "minute",
+    "second": "second", "ss": "second", "s": "second",
+}
+
+
+def _date_part(part: str) -> str:
+    name = _DATE_PARTS.get(str(part).strip().strip("'").lower())
+    if name is None:
+        raise ValueError(f"Unsupported date part '{part}'")
+    return name
+
+
+def _datepart(part, value):
+    moment = _parse_datetime(value)
+    if moment is None:
+        return None
+    name = _date_part(part)
+    if name == "quarter":
+        return (moment.month - 1) // 3 + 1
+    if name == "dayofyear":
+        return moment.timetuple().tm_yday
+    if name == "week":
+        # SQL Server counts weeks from January 1st, starting on Sunday
+        first = date(moment.year, 1, 1)
+        return (moment.timetuple().tm_yday + (first.weekday() + 1) % 7 - 1) // 7 + 1
+    if name == "weekday":
+        return (moment.weekday() + 1) % 7 + 1  # Sunday = 1
+    return getattr(moment, name)
+
+
+def _datename(part, value):
+    moment = _parse_datetime(value)
+    if moment is None:
+        return None
+    name = _date_part(part)
+    if name == "month":
+        return calendar.month_name[moment.month]
+    if name == "weekday":
+        return calendar.day_name[moment.weekday()]
+    return str(_datepart(part, value))
+
+
+def _add_months(moment: datetime, months: int) -> datetime:
+    month_index = moment.month - 1 + months
+    year, month = moment.year + month_index // 12, month_index % 12 + 1
+    return moment.replace(year=year, month=month, day=min(moment.day, calendar.monthrange(year, month)[1]))
+
+
+def _format_moment(moment: datetime, original) -> str:
+    has_time = "T" in str(original) or " " in str(original).strip() or not isinstance(original, str)
+    return moment.isoformat(sep=" ") if has_time else moment.date().isoformat()
+
+
+def _dateadd(part, amount, value):
+    moment = _parse_datetime(value)
+    if moment is None or amount is None:
+        return None
+    name, amount = _date_part(part), int(amount)
+    if name in ("year", "quarter", "month"):
+        moment = _add_months(moment, amount * {"year": 12, "quarter": 3, "month": 1}[name])
+    else:
+        unit = {"dayofyear": "days", "day": "days", "weekday": "days", "week": "weeks",
+                "hour": "hours", "minute": "minutes", "second": "seconds"}[name]
+        moment = moment + timedelta(**{unit: amount})
+    return _format_moment(moment, value)
+
+
+def _datediff(part, start, end):
+    first, second = _parse_datetime(start), _parse_datetime(end)
+    if first is None or second is None:
+        return None
+    name = _date_part(part)
+    if name == "year":
+        return second.year - first.year
+    if name == "quarter":
+        return (second.year - first.year) * 4 + (second.month - 1) // 3 - (first.month - 1) // 3
+    if name == "month":
+        return (second.year - first.year) * 12 + second.month - first.month
+    if name == "week":
+        # Sunday-based week boundaries crossed
+        return ((second.date() - timedelta(days=(second.weekday() + 1) % 7))
+                - (first.date() - timedelta(days=(first.weekday() + 1) % 7))).days // 7
+    if name in ("day", "dayofyear", "weekday"):
+        return (second.date() - first.date()).days
+    seconds = int((second.replace(microsecond=0) - first.replace(microsecond=0)).total_seconds())
+    return {"hour": seconds // 3600, "minute": seconds // 60, "second": seconds}[name]
+
+
+def _eomonth(value, months=0):
+    moment = _parse_datetime(value)
+    if moment is None:
+        return None
+    moment = _add_months(moment.replace(day=1), int(months or 0))
+    return moment.replace(day=calendar.monthrange(moment.year, moment.month)[1]).date().isoformat()
+
+
+_FORMAT_TOKENS = [("yyyy", "%Y"), ("yy", "%y"), ("MMMM", "%B"), ("MMM", "%b"), ("MM", "%m"),
+                  ("dddd", "%A"), ("ddd", "%a"), ("dd", "%d"), ("HH", "%H"), ("mm", "%M"), ("ss", "%S")]
+
+
+def _format(value, pattern, culture=None):
+    if value is None or pattern is None:
+        return None
+    moment = _parse_datetime(value) if isinstance(value, str) else None
+    if moment is None:
+        if isinstance(value, (int, float)):
+            if pattern.upper().startswith("N"):
+                digits = int(pattern[1:] or 2)
+                return f"{value:,.{digits}f}"
+            if pattern.upper().startswith("C"):
+                digits = int(pattern[1:] or 2)
+                return f"${value:,.{digits}f}"
+        return str(value)
+    result, index = [], 0
+    while index < len(pattern):
+        for token, directive in _FORMAT_TOKENS:
+            if pattern.startswith(token, index):
+                result.append(moment.strftime(directive))
+                index += len(token)
+                break
+        else:
+            result.append(pattern[index])
+            index += 1
+    return "".join(result)
+
+
+def _now() -> str:
+    return datetime.now().isoformat(sep=" ", timespec="seconds")
+
+
+def register_functions(connection: sqlite3.Connection) -> None:
+    """Register the T-SQL functions on a SQLite connection."""
+    # SYSDATETIME is declared deterministic so computed columns may use it, like the
+    # scripts' Promotions.IsActive (its value is frozen when the row is written)
+    connection.create_function("SYSDATETIME", 0, _now, deterministic=True)
+    connection.create_function("GETDATE", 0, _now)
+    connection.create_function("GETUTCDATE", 0, lambda: datetime.utcnow().isoformat(sep=" ", timespec="seconds"))
+    connection.create_function("LEN", 1, lambda value: None if value is None else len(str(value).rstrip()),
+                               deterministic=True)
+    for name, part in (("YEAR", "year"), ("MONTH", "month"), ("DAY", "day")):
+        connection.create_function(name, 1, lambda value, part=part: _datepart(part, value), deterministic=True)
+    connection.create_function("DATEPART", 2, _datepart, deterministic=True)
+    connection.create_function("DATENAME", 2, _datename, deterministic=True)
+    connection.create_function("DATEADD", 3, _dateadd, deterministic=True)
+    connection.create_function("DATEDIFF", 3, _datediff, deterministic=True)
+    connection.create_function("EOMONTH", 1, _eomonth, deterministic=True)
+    connection.create_function("EOMONTH", 2, _eomonth, deterministic=True)
+    connection.create_function("FORMAT", 2, _format, deterministic=True)
+    connection.create_function("FORMAT", 3, _format, deterministic=True)
+
+
+def connect(path: str = ":memory:", **kwargs) -> sqlite3.Connection:
+    """Open a SQLite connection with the T-SQL functions registered."""
+    connection = sqlite3.connect(path, **kwargs)
+    register_functions(connection)
+    return connection
+
+
+def load_scripts(connection: sqlite3.Connection, scripts: Iterable[str] = DEFAULT_SCRIPTS,
+                 directory: str = MISC_DIR) -> None:
+    """
+    Create and seed a database from the T-SQL scripts.
+
+    Args:
+        connection: Connection from ``connect``
+        scripts: Script file names (or paths), run in order
+        directory: Folder of relative script names (defaults to ``misc/``)
+    """
+    for script in scripts:
+        path = script if os.path.isabs(script) else os.path.join(directory, script)
+        with open(path, encoding="utf-8-sig") as f:
+            connection.executescript(translate(f.read()))
+    connection.commit()
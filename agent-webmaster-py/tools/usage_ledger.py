@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Token usage ledger for agent runs.
+
+``run.usage`` holds the prompt and completion tokens of a run and every run step carries
+its own usage. ``UsageLedger.record_run`` stores both in a local SQLite database, keyed
+by the request that caused them, so a card (``ag-web-gen`` plus its connected
+``ag-card-generator`` sub-run) and a report (``ag-report-builder``) can be costed.
+
+Connected agent calls run on a separate thread in the service. When the step details
+expose the sub-run (``thread_id`` and ``run_id``) its usage is fetched and recorded
+under the connected agent; otherwise the call is recorded without tokens so it still
+shows up in the step counts.
+
+``run_agent`` records every finished run on a background worker so the caller does not
+wait for the extra run-steps request. Set ``USAGE_LEDGER_ENABLED=0`` to turn it off.
+
+Usage:
+    python usage_ledger.py --days 7
+    python usage_ledger.py --top 10 --prompt-price 0.0025 --completion-price 0.01
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.local_state import get_state_path
+
+# Connected agent tool name -> agent the sub-run belongs to
+CONNECTED_AGENT_NAMES = {
+    "card_generator": "ag-card-generator",
+}
+
+
+def usage_ledger_enabled() -> bool:
+    """Check the ``USAGE_LEDGER_ENABLED`` environment switch (on by default)."""
+    return os.environ.get("USAGE_LEDGER_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+def _tokens(usage) -> Dict[str, Optional[int]]:
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "total_tokens": getattr(usage, "total_tokens", None),
+    }
+
+
+def _seconds_between(start, end) -> Optional[float]:
+    if start is None or end is None:
+        return None
+    return max(0.0, (end - start).total_seconds())
+
+
+def _finished_at(item):
+    for attribute in ("completed_at", "failed_at", "cancelled_at", "expired_at"):
+        value = getattr(item, attribute, None)
+        if value is not None:
+            return value
+    return None
+
+
+def _get(details, key: str):
+    return details.get(key) if hasattr(details, "get") else getattr(details, key, None)
+
+
+class UsageLedger:
+    """
+    SQLite ledger of run and run-step token usage.
+
+    The database is opened per call, like the thread ledger, so every tester and the
+    Streamlit app can write to it at the same time.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get("USAGE_LEDGER_PATH") or get_state_path("usage.db")
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS runs (
+                       run_id            TEXT PRIMARY KEY,
+                       request_id        TEXT,
+                       thread_id         TEXT,
+                       agent_name        TEXT,
+                       model             TEXT,
+                       status            TEXT,
+                       prompt_tokens     INTEGER,
+                       completion_tokens INTEGER,
+                       total_tokens      INTEGER,
+                       duration_seconds  REAL,
+                       artifact          TEXT,
+                       recorded_at       REAL NOT NULL
+                   )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS steps (
+                       step_id           TEXT PRIMARY KEY,
+                       run_id            TEXT NOT NULL,
+                       agent_name        TEXT,
+                       step_type         TEXT,
+                       tool_name         TEXT,
+                       prompt_tokens     INTEGER,
+                       completion_tokens INTEGER,
+                       total_tokens      INTEGER,
+                       duration_seconds  REAL
+                   )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_runs_recorded ON runs (recorded_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_steps_run ON steps (run_id)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _insert_run(self, conn, run, agent_name, request_id, artifact) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO runs (run_id, request_id, thread_id, agent_name, model, status, "
+            "prompt_tokens, completion_tokens, total_tokens, duration_seconds, artifact, recorded_at) "
+            "VALUES (:run_id, :request_id, :thread_id, :agent_name, :model, :status, :prompt_tokens, "
+            ":completion_tokens, :total_tokens, :duration_seconds, :artifact, :recorded_at)",
+            {
+                "run_id": run.id,
+                "request_id": request_id,
+                "thread_id": run.thread_id,
+                "agent_name": agent_name,
+                "model": getattr(run, "model", None),
+                "status": getattr(run.status, "value", run.status),
+                "duration_seconds": _seconds_between(getattr(run, "started_at", None), _finished_at(run)),
+                "artifact": artifact,
+                "recorded_at": time.time(),
+                **_tokens(getattr(run, "usage", None)),
+            },
+        )
+
+    def record_run(
+        self,
+        client,
+        run,
+        agent_name: Optional[str],
+        request_id: Optional[str] = None,
+        artifact: Optional[str] = None,
+    ) -> None:
+        """
+        Record the usage of a finished run, of its steps and of its connected sub-runs.
+
+        Args:
+            client: AgentsClient used to list the run steps
+            run: Finished ThreadRun
+            agent_name: Name of the agent that ran
+            request_id: ID shared by every run of one request (retries, hedges)
+            artifact: What the request produced (card URL, ``report``) or None
+        """
+        step_rows: List[Dict[str, Any]] = []
+        sub_runs = []
+        for step in client.run_steps.list(thread_id=run.thread_id, run_id=run.id):
+            row = {
+                "step_id": step.id,
+                "run_id": run.id,
+                "agent_name": agent_name,
+                "step_type": getattr(step.type, "value", step.type),
+                "tool_name": None,
+                "duration_seconds": _seconds_between(step.created_at, _finished_at(step)),
+                **_tokens(getattr(step, "usage", None)),
+            }
+            step_rows.append(row)
+            details = getattr(step, "step_details", None)
+            for index, tool_call in enumerate(getattr(details, "tool_calls", None) or []):
+                tool_type = _get(tool_call, "type")
+                call_details = _get(tool_call, tool_type) or {}
+                name = _get(call_details, "name") or tool_type
+                if index == 0:
+                    row["tool_name"] = name
+                if tool_type != "connected_agent":
+                    continue
+                sub_thread_id, sub_run_id = _get(call_details, "thread_id"), _get(call_details, "run_id")
+                if sub_thread_id and sub_run_id:
+                    sub_runs.append((CONNECTED_AGENT_NAMES.get(name, name), sub_thread_id, sub_run_id))
+                else:
+                    # The sub-run is not exposed: keep the call, without tokens
+                    step_rows.append({
+                        "step_id": f"{step.id}:{_get(tool_call, 'id') or index}",
+                        "run_id": run.id,
+                        "agent_name": CONNECTED_AGENT_NAMES.get(name, name),
+                        "step_type": "connected_agent",
+                        "tool_name": name,
+                        "prompt_tokens": None,
+                        "completion_tokens": None,
+                        "total_tokens": None,
+                        "duration_seconds": row["duration_seconds"],
+                    })
+
+        fetched_sub_runs = []
+        for sub_agent_name, sub_thread_id, sub_run_id in sub_runs:
+            try:
+                fetched_sub_runs.append((sub_agent_name, client.runs.get(thread_id=sub_thread_id, run_id=sub_run_id)))
+            except Exception:
+                pass  # The sub-run may not be readable from this project: the parent is still recorded
+
+        with self._connect() as conn:
+            self._insert_run(conn, run, agent_name, request_id, artifact)
+            for sub_agent_name, sub_run in fetched_sub_runs:
+                self._insert_run(conn, sub_run, sub_agent_name, request_id, None)
+            conn.executemany(
+                "INSERT OR REPLACE INTO steps (step_id, run_id, agent_name, step_type, tool_name, prompt_tokens, "
+                "completion_tokens, total_tokens, duration_seconds) VALUES (:step_id, :run_id, :agent_name, "
+                ":step_type, :tool_name, :prompt_tokens, :completion_tokens, :total_tokens, :duration_seconds)",
+                step_rows,
+            )
+
+    def daily_summary(self, days: int = 7) -> List[Dict[str, Any]]:
+        """
+        Aggregate the usage per day and agent.
+
+        Args:
+            days: Number of days to include, today included
+
+        Returns:
+            Rows with day, agent_name, requests, runs, artifacts, prompt/completion/total
+            tokens, tokens_per_second and tokens_per_artifact
+        """
+        since = time.time() - days * 86400
+        with self._connect() as conn:
+            rows = conn.execute(
+                """SELECT date(recorded_at, 'unixepoch', 'localtime') AS day, agent_name,
+                          COUNT(DISTINCT request_id), COUNT(*), COUNT(artifact),
+                          COALESCE(SUM(prompt_tokens), 0), COALESCE(SUM(completion_tokens), 0),
+                          COALESCE(SUM(total_tokens), 0), COALESCE(SUM(duration_seconds), 0)
+                   FROM runs WHERE recorded_at >= ?
+                   GROUP BY day, agent_name ORDER BY day, agent_name""",
+                (since,),
+            ).fetchall()
+        summary = []
+        for day, agent_name, requests, runs, artifacts, prompt, completion, total, seconds in rows:
+            summary.append({
+                "day": day,
+                "agent_name": agent_name,
+                "requests": requests,
+                "runs": runs,
+                "artifacts": artifacts,
+                "prompt_tokens": prompt,
+                "completion_tokens": completion,
+                "total_tokens": total,
+                "tokens_per_second": total / seconds if seconds else 0.0,
+                "tokens_per_artifact": total / artifacts if artifacts else None,
+            })
+        return summary
+
+    def top_requests(self, limit: int = 10, days: int = 7) -> List[Dict[str, Any]]:
+        """
+        Get the requests that consumed the most tokens, sub-runs included.
+
+        Returns:
+            Rows with request_id, agents, runs, total_tokens and artifact
+        """
+        since = time.time() - days * 86400
+        with self._connect() as conn:
+            rows = conn.execute(
+                """SELECT request_id, GROUP_CONCAT(DISTINCT agent_name), COUNT(*),
+                          COALESCE(SUM(total_tokens), 0), MAX(artifact)
+                   FROM runs WHERE recorded_at >= ? AND request_id IS NOT NULL
+                   GROUP BY request_id ORDER BY SUM(total_tokens) DESC LIMIT ?""",
+                (since, limit),
+            ).fetchall()
+        return [
+            {"request_id": request_id, "agents": agents, "runs": runs, "total_tokens": total, "artifact": artifact}
+            for request_id, agents, runs, total, artifact in rows
+        ]
+
+    def step_breakdown(self, days: int = 7) -> List[Dict[str, Any]]:
+        """
+        Aggregate the step usage per agent, step type and tool.
+
+        Returns:
+            Rows with agent_name, step_type, tool_name, steps, total_tokens and seconds
+        """
+        since = time.time() - days * 86400
+        with self._connect() as conn:
+            rows = conn.execute(
+                """SELECT s.agent_name, s.step_type, s.tool_name, COUNT(*),
+                          COALESCE(SUM(s.total_tokens), 0), COALESCE(SUM(s.duration_seconds), 0)
+                   FROM steps s JOIN runs r ON r.run_id = s.run_id
+                   WHERE r.recorded_at >= ?
+                   GROUP BY s.agent_name, s.step_type, s.tool_name
+                   ORDER BY SUM(s.total_tokens) DESC""",
+                (since,),
+            ).fetchall()
+        return [
+            {"agent_name": agent_name, "step_type": step_type, "tool_name": tool_name,
+             "steps": steps, "total_tokens": total, "seconds": seconds}
+            for agent_name, step_type, tool_name, steps, total, seconds in rows
+        ]
+
+
+_usage_ledger = None
+_recorder = None
+
+
+def get_usage_ledger() -> UsageLedger:
+    """Get the process-wide usage ledger."""
+    global _usage_ledger
+    if _usage_ledger is None:
+        _usage_ledger = UsageLedger()
+    return _usage_ledger
+
+
+def record_run_in_background(client, run, agent_name, request_id=None, artifact=None, refresh=False) -> None:
+    """
+    Queue ``UsageLedger.record_run`` on a single background worker.
+
+    Failures are dropped: usage accounting must never break an agent interaction.
+    The executor's worker is joined at interpreter exit, so pending records are kept.
+    With ``refresh`` the run is fetched again first, e.g. for a hedge that was cancelled
+    while it was still running and whose usage is only known afterwards.
+    """
+    global _recorder
+    if _recorder is None:
+        _recorder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="usage-ledger")
+
+    def _record():
+        try:
+            finished = client.runs.get(thread_id=run.thread_id, run_id=run.id) if refresh else run
+            get_usage_ledger().record_run(client, finished, agent_name, request_id=request_id, artifact=artifact)
+        except Exception:
+            pass
+
+    _recorder.submit(_record)
+
+
+def main():
+    """Command line entry point printing the usage summary."""
+    parser = argparse.ArgumentParser(description="Summarize agent token usage")
+    parser.add_argument("--days", type=int, default=7, help="Number of days to include")
+    parser.add_argument("--top", type=int, default=5, help="Number of most expensive requests to list")
+    parser.add_argument("--prompt-price", type=float, help="Price per 1K prompt tokens, to estimate cost")
+    parser.add_argument("--completion-price", type=float, help="Price per 1K completion tokens, to estimate cost")
+    parser.add_argument("--ledger", help="Path of the usage database")
+    args = parser.parse_args()
+
+    ledger = UsageLedger(args.ledger)
+    daily = ledger.daily_summary(args.days)
+    if not daily:
+        print(f"📭 No usage recorded in the last {args.days} days.")
+        return
+
+    print(f"📊 Token usage, last {args.days} days")
+    print(f"{'day':<11} {'agent':<20} {'req':>5} {'runs':>5} {'prompt':>9} {'compl.':>8} "
+          f"{'total':>9} {'tok/s':>7} {'tok/artifact':>13}")
+    for row in daily:
+        per_artifact = f"{row['tokens_per_artifact']:.0f}" if row["tokens_per_artifact"] else "-"
+        print(f"{row['day']:<11} {row['agent_name'] or '?':<20} {row['requests']:>5} {row['runs']:>5} "
+              f"{row['prompt_tokens']:>9} {row['completion_tokens']:>8} {row['total_tokens']:>9} "
+              f"{row['tokens_per_second']:>7.1f} {per_artifact:>13}")
+
+    if args.prompt_price is not None or args.completion_price is not None:
+        prompt = sum(row["prompt_tokens"] for row in daily)
+        completion = sum(row["completion_tokens"] for row in daily)
+        cost = prompt / 1000 * (args.prompt_price or 0) + completion / 1000 * (args.completion_price or 0)
+        print(f"\n💰 Estimated cost: {cost:.2f} ({prompt} prompt + {completion} completion tokens)")
+
+    print("\n🔎 Steps by token consumption")
+    for row in ledger.step_breakdown(args.days)[:10]:
+        print(f"   {row['agent_name'] or '?':<20} {row['step_type'] or '?':<17} {row['tool_name'] or '-':<32} "
+              f"{row['steps']:>5} steps {row['total_tokens']:>9} tokens {row['seconds']:>8.1f}s")
+
+    print(f"\n🏆 Top {args.top} requests")
+    for row in ledger.top_requests(args.top, args.days):
+        print(f"   {row['request_id']}  {row['total_tokens']:>8} tokens  {row['runs']} runs  "
+              f"{row['agents']}  {row['artifact'] or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,8 @@ import streamlit.components.v1 as components
 # Add your agent paths
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
-web_gen_path = os.path.join(parent_dir, 'agent-webmaster-py', 'agents', 'ag_web_gen')
+agent_root_path = os.path.join(parent_dir, 'agent-webmaster-py')
+web_gen_path = os.path.join(agent_root_path, 'agents', 'ag_web_gen')
 
 # Add web gen path to sys.path if it exists
 if os.path.exists(web_gen_path):
@@ -20,6 +21,9 @@ if os.path.exists(web_gen_path):
 else:
     st.error(f"Web Gen path does not exist: {web_gen_path}")
 
+# Shared tools (thread ledger and reaper) live at the agents project root
+sys.path.append(agent_root_path)
+
 # Import ag_web_gen agent
 try:
     import ag_web_gen
@@ -28,6 +32,16 @@ except ImportError as e:
     web_gen_imported = False
     st.error(f"Failed to import ag_web_gen: {e}")
 
+from tools.result_cache import get_result_cache
+from tools.run_helper import format_timings, run_agent
+from tools.thread_reaper import ThreadLedger, start_background_reaper
+
+
+@st.cache_resource
+def get_thread_ledger():
+    """Shared ledger of the threads created by this app."""
+    return ThreadLedger()
+
 # Show import status in expander for debugging
 with st.expander("🔍 Import Status (Click to Debug)", expanded=False):
     st.write("**Agent Import Status:**")
@@ -112,6 +126,8 @@ def initialize_web_gen_agent():
             st.session_state.web_gen_agent = ag_web_gen.instance
             st.session_state.web_gen_client = ag_web_gen.client
             st.session_state.web_gen_error = None
+            # One reaper per server process deletes the threads left by finished chats
+            start_background_reaper(st.session_state.web_gen_client, ledger=get_thread_ledger())
             return True
         except Exception as e:
             st.session_state.web_gen_error = str(e)
@@ -160,6 +176,13 @@ with st.sidebar:
         if hasattr(st.session_state, 'web_gen_error') and st.session_state.web_gen_error:
             st.error(f"Error: {st.session_state.web_gen_error}")
     
+    # Result cache
+    st.subheader("🗄️ Result Cache")
+    bypass_cache = st.checkbox("Bypass cache (always run the agent)", value=False)
+    cache_stats = get_result_cache().stats()["agents"].get("ag-web-gen")
+    if cache_stats:
+        st.caption(f"Hit rate: {cache_stats['hit_rate']:.0%} ({cache_stats['hits']} hits / {cache_stats['misses']} misses)")
+    
     # Generated cards history
     if st.session_state.generated_cards:
         st.subheader("🎴 Generated Cards")
@@ -196,58 +219,48 @@ with col1:
             else:
                 try:
                     with st.spinner("🤖 Generating your personal card..."):
-                        # Create thread and send message
-                        thread = st.session_state.web_gen_client.threads.create()
-                        st.session_state.web_gen_client.messages.create(
-                            thread_id=thread.id,
-                            role="user",
-                            content=prompt
+                        # Create thread with the message, run and fetch only the newest reply
+                        result = run_agent(
+                            st.session_state.web_gen_client,
+                            st.session_state.web_gen_agent,
+                            prompt,
+                            ledger=get_thread_ledger(),
+                            use_cache=not bypass_cache
                         )
                         
-                        # Start the run
-                        run = st.session_state.web_gen_client.runs.create_and_process(
-                            thread_id=thread.id,
-                            agent_id=st.session_state.web_gen_agent.id
-                        )
-                        
-                        if run.status == "completed":
-                            # Get the assistant's response
-                            messages = list(st.session_state.web_gen_client.messages.list(thread_id=thread.id))
-                            for msg in reversed(messages):
-                                if msg.role == "assistant":
-                                    response_content = msg.content[0].text.value if hasattr(msg.content[0], "text") else str(msg.content)
-                                    
-                                    # Display response
-                                    st.markdown(response_content)
-                                    
-                                    # Add to chat history
-                                    st.session_state.web_gen_messages.append({"role": "assistant", "content": response_content})
-                                    
-                                    # Extract URL if present
-                                    url_match = re.search(r'https?://[^\s]+', response_content)
-                                    if url_match:
-                                        url = url_match.group()
-                                        
-                                        # Extract name from prompt (simple extraction)
-                                        name_match = re.search(r'(?:for|card for|name is)\s+([A-Za-z\s]+)', prompt, re.IGNORECASE)
-                                        name = name_match.group(1).strip() if name_match else f"Card {len(st.session_state.generated_cards) + 1}"
-                                        
-                                        # Store card info
-                                        card_info = {
-                                            "name": name,
-                                            "url": url,
-                                            "timestamp": datetime.now(),
-                                            "prompt": prompt
-                                        }
-                                        st.session_state.generated_cards.append(card_info)
-                                        
-                                        # Show success message
-                                        st.success(f"✅ Card created successfully! [Open Card]({url})")
-                                    break
+                        if result.completed and result.text is not None:
+                            response_content = result.text
+                            
+                            # Display response
+                            st.markdown(response_content)
+                            st.caption(f"{'⚡ Cached' if result.cached else '⏱️'} {format_timings(result.timings)}")
+                            
+                            # Add to chat history
+                            st.session_state.web_gen_messages.append({"role": "assistant", "content": response_content})
+                            
+                            # Extract URL if present
+                            if result.url:
+                                url = result.url
+                                
+                                # Extract name from prompt (simple extraction)
+                                name_match = re.search(r'(?:for|card for|name is)\s+([A-Za-z\s]+)', prompt, re.IGNORECASE)
+                                name = name_match.group(1).strip() if name_match else f"Card {len(st.session_state.generated_cards) + 1}"
+                                
+                                # Store card info
+                                card_info = {
+                                    "name": name,
+                                    "url": url,
+                                    "timestamp": datetime.now(),
+                                    "prompt": prompt
+                                }
+                                st.session_state.generated_cards.append(card_info)
+                                
+                                # Show success message
+                                st.success(f"✅ Card created successfully! [Open Card]({url})")
                         else:
-                            error_msg = f"❌ Generation failed with status: {run.status}"
-                            if hasattr(run, 'last_error') and run.last_error:
-                                error_msg += f"\nError: {run.last_error}"
+                            error_msg = f"❌ Generation failed with status: {result.status}"
+                            if result.error:
+                                error_msg += f"\nError: {result.error}"
                             st.error(error_msg)
                             st.session_state.web_gen_messages.append({"role": "assistant", "content": error_msg})
                             